@@ -0,0 +1,119 @@
+# # --PROJECT-COMMENT-BLOCK--
+# File Path: bench_dom_index.py
+# Author:
+# Create Date:
+# Description: 在 5 万节点的合成 ERP 表格页面上对比 DOM 元素模型的内存占用和查询耗时：
+#              普通 dict 节点 vs __slots__ 的 DOMElement vs 列式 ElementTable + ElementIndex。
+# # --PROJECT-COMMENT-BLOCK--
+
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "python_adapter_py" / "src"))
+
+from erp_core.models.dom_element import BoundingBox, DOMElement, ElementTable  # noqa: E402
+from erp_dom_analyzer.component_recognizer import ComponentRecognizer  # noqa: E402
+from erp_dom_analyzer.element_index import ElementIndex  # noqa: E402
+
+NODE_COUNT = 50_000
+QUERY_COUNT = 1_000
+COLUMNS = 10
+ROW_HEIGHT = 28
+COL_WIDTH = 120
+
+
+def synthetic_nodes(count: int):
+    """生成类似大表格页面的节点：表头标签 + 每行 COLUMNS 个单元格输入框。"""
+    random.seed(42)
+    for i in range(count):
+        row, col = divmod(i, COLUMNS)
+        tag = "input" if i % 7 else "label"
+        attrs = {
+            "id": f"cell_{row}_{col}",
+            "name": f"F{col:02d}",
+            "class": "kd-grid-cell" if tag == "input" else "kd-label",
+            "role": "gridcell" if tag == "input" else "label",
+            "__label": f"字段{col}" if tag == "input" else "",
+        }
+        if not attrs["__label"]:
+            del attrs["__label"]
+        yield (i + 1, tag, attrs, (col * COL_WIDTH, row * ROW_HEIGHT, COL_WIDTH - 4, ROW_HEIGHT - 4),
+               True, f"GYS{row:05d}" if col == 0 else "", "iframe:iframe#mainFrame", row + 1)
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current / 1024 / 1024, elapsed
+
+
+def timed(label: str, func, repeat: int = QUERY_COUNT):
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(i)
+    per_query = (time.perf_counter() - start) / repeat * 1e6
+    print(f"  {label:<32} {per_query:10.1f} µs/次")
+
+
+def main():
+    nodes = list(synthetic_nodes(NODE_COUNT))
+    print(f"🚀 合成页面: {NODE_COUNT} 个节点, {COLUMNS} 列")
+
+    dicts, dict_mb, dict_s = measure(lambda: [
+        {"node_id": n[0], "tag": n[1], "attributes": dict(n[2]), "rect": dict(zip("xywh", n[3])),
+         "visible": n[4], "text": n[5], "frame_path": tuple(n[6].split(" >> ")), "parent_id": n[7]}
+        for n in nodes])
+    elements, slot_mb, slot_s = measure(lambda: [
+        DOMElement(n[0], n[1], dict(n[2]), BoundingBox(*n[3]), n[4], n[5], (n[6],), n[7]) for n in nodes])
+
+    def build_table():
+        table = ElementTable()
+        for n in nodes:
+            table.append(*n)
+        return table
+
+    table, table_mb, table_s = measure(build_table)
+    index, index_mb, index_s = measure(lambda: ElementIndex(table))
+
+    print("📦 内存 / 构建耗时")
+    print(f"  {'dict 节点':<32} {dict_mb:8.1f} MB  {dict_s:6.2f}s")
+    print(f"  {'__slots__ DOMElement':<32} {slot_mb:8.1f} MB  {slot_s:6.2f}s")
+    print(f"  {'ElementTable (列式)':<32} {table_mb:8.1f} MB  {table_s:6.2f}s")
+    print(f"  {'ElementIndex (哈希 + R 树)':<32} {index_mb:8.1f} MB  {index_s:6.2f}s")
+
+    rows = NODE_COUNT // COLUMNS
+    ids = [f"cell_{random.randrange(rows)}_{random.randrange(COLUMNS)}" for _ in range(QUERY_COUNT)]
+    points = [(random.uniform(0, COLUMNS * COL_WIDTH), random.uniform(0, rows * ROW_HEIGHT))
+              for _ in range(QUERY_COUNT)]
+
+    print("🔍 查询耗时（线性扫描 vs 索引）")
+    timed("按 id 线性扫描", lambda i: [e for e in elements if e.attributes.get("id") == ids[i]], 50)
+    timed("按 id 索引", lambda i: index.find_by_id(ids[i]))
+    timed("按标签线性扫描", lambda i: [e for e in elements if e.attributes.get("__label") == "字段3"], 50)
+    timed("按标签索引", lambda i: index.find_by_label("字段3"))
+
+    def linear_point(i):
+        x, y = points[i]
+        return [e for e in elements if e.rect.x <= x <= e.rect.right and e.rect.y <= y <= e.rect.bottom]
+
+    timed("点查询线性扫描", linear_point, 50)
+    timed("点查询 R 树", lambda i: index.at_point(*points[i]))
+    timed("窗口查询 R 树 (300x100)", lambda i: index.in_rect(points[i][0], points[i][1],
+                                                           points[i][0] + 300, points[i][1] + 100))
+    timed("最近 5 个元素 R 树", lambda i: index.nearest(points[i][0], points[i][1], 5))
+
+    recognizer = ComponentRecognizer(index)
+    timed("ComponentRecognizer.find_field", lambda i: recognizer.find_field(f"字段{i % COLUMNS}"))
+
+    del dicts
+
+
+if __name__ == "__main__":
+    main()
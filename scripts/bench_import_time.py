@@ -0,0 +1,103 @@
+# # --PROJECT-COMMENT-BLOCK--
+# File Path: bench_import_time.py
+# Author:
+# Create Date:
+# Description: 测量各包和命令行入口在全新解释器中的启动耗时（python -X importtime），
+#              输出中位数耗时和累计耗时最高的模块，可用 --budget 作为 CI 门槛。
+#              用法: python scripts/bench_import_time.py [-n 5] [--budget 1.0] [--json out.json] [模块 ...]
+# # --PROJECT-COMMENT-BLOCK--
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SRC = Path(__file__).resolve().parent.parent / "services" / "python_adapter_py" / "src"
+
+# 默认测量对象：命令行入口、worker 进程会导入的模块，以及三个按需导入的子包
+DEFAULT_TARGETS = [
+    "erp_core.config",
+    "erp_deploy_engine.__main__",
+    "erp_deploy_engine.task_executor",
+    "erp_deploy_engine.record_diff",
+    "erp_ui_adapter",
+    "erp_vision_analyzer",
+    "erp_ai_core",
+]
+
+
+def run_once(module: str) -> Tuple[float, List[Tuple[int, str]]]:
+    """在新进程中导入 module，返回 (墙钟秒数, [(累计微秒, 模块名), ...])。"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC), env.get("PYTHONPATH")]))
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{proc.stderr[-2000:]}")
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        modules.append((int(cumulative_us), name))
+    return elapsed, modules
+
+
+def measure(module: str, repeat: int, top: int) -> Dict:
+    times = []
+    slowest: Dict[str, int] = {}
+    for _ in range(repeat):
+        elapsed, modules = run_once(module)
+        times.append(elapsed)
+        for cumulative, name in modules:
+            slowest[name] = min(slowest.get(name, cumulative), cumulative)
+    ranked = sorted(slowest.items(), key=lambda item: -item[1])[:top]
+    return {
+        "module": module,
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "slowest_imports": [{"module": name, "cumulative_ms": us / 1000} for name, us in ranked],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="测量模块导入耗时")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_TARGETS)
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="每个目标列出的最慢导入数")
+    parser.add_argument("--budget", type=float, default=None, help="中位数耗时上限（秒），超出时返回非零")
+    parser.add_argument("--json", default=None, help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    # 解释器本身的启动耗时作为基线
+    baseline = measure("sys", args.repeat, 0)["median_s"]
+    print(f"解释器基线: {baseline * 1000:.0f} ms")
+    results = []
+    over_budget = []
+    for module in args.modules:
+        result = measure(module, args.repeat, args.top)
+        results.append(result)
+        print(f"\n{module}: 中位数 {result['median_s'] * 1000:.0f} ms (最快 {result['min_s'] * 1000:.0f} ms)")
+        for item in result["slowest_imports"]:
+            print(f"    {item['cumulative_ms']:8.1f} ms  {item['module']}")
+        if args.budget is not None and result["median_s"] > args.budget:
+            over_budget.append(module)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"baseline_s": baseline, "results": results}, f, ensure_ascii=False, indent=2)
+    if over_budget:
+        print(f"\n❌ 超出 {args.budget}s 预算: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
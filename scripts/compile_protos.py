@@ -0,0 +1,49 @@
+# # --PROJECT-COMMENT-BLOCK--
+# File Path: compile_protos.py
+# Author:
+# Create Date:
+# Description: 把 proto/ 目录下的 .proto 文件编译成 Python gRPC 代码，
+#              输出到 erp_deploy_engine/rpc 包中，并把生成代码里的绝对导入改成包内相对导入。
+# # --PROJECT-COMMENT-BLOCK--
+
+import re
+import sys
+from pathlib import Path
+
+from grpc_tools import protoc
+
+ROOT = Path(__file__).resolve().parent.parent
+PROTO_DIR = ROOT / "proto"
+OUTPUT_DIR = ROOT / "services" / "python_adapter_py" / "src" / "erp_deploy_engine" / "rpc"
+
+
+def fix_imports(output_dir: Path) -> None:
+    """grpc_tools 生成的是 `import xxx_pb2`，放进包里需要改成 `from . import xxx_pb2`。"""
+    for path in output_dir.glob("*_pb2*.py"):
+        text = path.read_text(encoding="utf-8")
+        fixed = re.sub(r"^import (\w+_pb2) as", r"from . import \1 as", text, flags=re.MULTILINE)
+        if fixed != text:
+            path.write_text(fixed, encoding="utf-8")
+
+
+def main() -> int:
+    protos = sorted(str(p.name) for p in PROTO_DIR.glob("*.proto") if p.stat().st_size > 0)
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    args = [
+        "grpc_tools.protoc",
+        f"-I{PROTO_DIR}",
+        f"--python_out={OUTPUT_DIR}",
+        f"--grpc_python_out={OUTPUT_DIR}",
+        *protos,
+    ]
+    print(f"🔧 Compiling: {', '.join(protos)}")
+    if protoc.main(args) != 0:
+        print("❌ protoc 编译失败")
+        return 1
+    fix_imports(OUTPUT_DIR)
+    print(f"✅ 生成代码已写入 {OUTPUT_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+# # --PROJECT-COMMENT-BLOCK--
+# File Path: mock_erp/server.py
+# Author:
+# Create Date:
+# Description: 本地模拟 ERP（金蝶风格的页面结构），供基准测试和适配器调试使用，不依赖真实金蝶 / YonBIP 实例。
+#              提供登录页、菜单、列表搜索、新增表单（含字段校验提示）、可粘贴和引入 Excel 的分录表格、加载遮罩、iframe 大页面和分页报表；
+#              接口延迟和遮罩时长可配置。用法: python scripts/mock_erp/server.py [--port 8765] [--latency-ms 80]
+# # --PROJECT-COMMENT-BLOCK--
+
+import argparse
+import base64
+import csv
+import io
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zipfile
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+
+USERNAME = "bench"
+PASSWORD = "bench"
+
+# 模拟的业务实体：表单实体有 fields，分录实体有 grid 列
+ENTITIES: Dict[str, Dict[str, Any]] = {
+    "supplier": {
+        "title": "供应商",
+        "menu": ["基础管理", "基础资料", "供应商"],
+        "fields": ["编码", "名称", "简称", "联系人", "电话", "地址"],
+        "required": ["编码", "名称"],
+    },
+    "material": {
+        "title": "物料",
+        "menu": ["基础管理", "基础资料", "物料"],
+        # 大表单，用于字段定位延迟测试
+        "fields": ["编码", "名称", "规格型号", "基本单位"] + [f"扩展属性{i:02d}" for i in range(1, 37)],
+        "required": ["编码", "名称"],
+    },
+    "purchase_order": {
+        "title": "采购订单",
+        "menu": ["供应链", "采购管理", "采购订单"],
+        "grid": ["物料编码", "物料名称", "数量", "单价", "交货日期"],
+    },
+}
+
+# 分页报表的列（report.html），用于导出基准
+REPORT_COLUMNS = ["单据编号", "物料名称", "数量", "单价", "日期"]
+
+
+def validate_line(line: Dict[str, str]) -> Optional[str]:
+    """分录行的服务端校验，与页面上的同步校验（app.js validateRow）规则相同。空行返回 None。"""
+    get = lambda name: line.get(name, "").strip()  # noqa: E731
+    if not any(v.strip() for v in line.values()):
+        return None
+    if "物料编码" in line and not get("物料编码"):
+        return "物料编码不能为空"
+    for name in ("数量", "单价"):
+        if get(name) and not re.fullmatch(r"-?\d+(\.\d+)?", get(name)):
+            return f"{name}必须是数字"
+    if get("交货日期") and not re.fullmatch(r"\d{4}-\d{2}-\d{2}", get("交货日期")):
+        return "交货日期格式应为 yyyy-mm-dd"
+    return None
+
+
+def read_import_file(filename: str, data: bytes) -> List[List[str]]:
+    """读取引入的文件（xlsx 需要 openpyxl，否则按 UTF-8 CSV），返回包括表头在内的所有行。"""
+    if filename.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        sheet = load_workbook(io.BytesIO(data), read_only=True).worksheets[0]
+        return [["" if v is None else str(v) for v in row] for row in sheet.iter_rows(values_only=True)]
+    return list(csv.reader(io.StringIO(data.decode("utf-8-sig"))))
+
+
+def import_lines(columns: List[str], table: List[List[str]]) -> Dict[str, Any]:
+    """
+    金蝶“引入”的行为：按表头对应列，校验通过的行返回给页面追加到分录，被拒的行不进表格，
+    错误按 Excel 行号（表头为第 1 行）报告。
+    """
+    if not table:
+        return {"lines": [], "errors": {}, "error": "文件为空"}
+    header = [h.strip() for h in table[0]]
+    missing = [c for c in columns if c not in header]
+    if missing:
+        return {"lines": [], "errors": {}, "error": f"缺少列 {'、'.join(missing)}"}
+    lines, errors = [], {}
+    for number, values in enumerate(table[1:], start=2):
+        line = {c: (values[header.index(c)] if header.index(c) < len(values) else "").strip() for c in columns}
+        if not any(line.values()):
+            continue
+        error = validate_line(line)
+        if error:
+            errors[number] = error
+        else:
+            lines.append(line)
+    return {"lines": lines, "errors": errors}
+
+
+class MockErpState:
+    """内存中的记录存储和请求统计，线程安全。"""
+
+    def __init__(self, latency_ms: float = 80.0, jitter: float = 0.25, mask_ms: float = 120.0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.mask_ms = mask_ms
+        self.records: Dict[str, Dict[str, Dict[str, str]]] = {name: {} for name in ENTITIES}
+        # 保存成功的分录单据，每张单据是分录行列表（行 = 列名 -> 值）
+        self.orders: List[List[Dict[str, str]]] = []
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def delay(self) -> None:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+
+    def save(self, entity: str, fields: Dict[str, str]) -> Dict[str, str]:
+        """保存记录，返回字段校验错误（字段 -> 提示），没有错误时返回空字典。"""
+        spec = ENTITIES[entity]
+        errors = {name: f"{name}不能为空" for name in spec.get("required", []) if not fields.get(name, "").strip()}
+        key = fields.get("编码", "").strip()
+        if key and not re.fullmatch(r"[A-Za-z0-9_-]+", key):
+            errors["编码"] = "编码只能包含字母、数字、下划线和横线"
+        with self._lock:
+            if key and key in self.records[entity] and "编码" not in errors:
+                errors["编码"] = f"编码 {key} 已存在"
+            if not errors:
+                self.records[entity][key] = dict(fields)
+        return errors
+
+    def save_order(self, entity: str, lines: List[Dict[str, str]]) -> Dict[int, str]:
+        """保存一张分录单据，返回行号 -> 校验错误；有任何错误时整张单据不保存。空行忽略。"""
+        errors = {}
+        for i, line in enumerate(lines):
+            error = validate_line(line)
+            if error:
+                errors[i] = error
+        kept = [line for line in lines if any(v.strip() for v in line.values())]
+        if not kept:
+            errors.setdefault(-1, "单据没有分录")
+        with self._lock:
+            if not errors:
+                self.orders.append(kept)
+        return errors
+
+    def saved_lines(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [line for order in self.orders for line in order]
+
+    def search(self, entity: str, query: str) -> List[Dict[str, str]]:
+        with self._lock:
+            records = list(self.records[entity].values())
+        query = query.strip()
+        matched = [r for r in records if not query or query in r.get("编码", "") or query in r.get("名称", "")]
+        return matched[:200]
+
+    @staticmethod
+    def report_page(page: int, size: int, total: int) -> Dict[str, Any]:
+        """分页报表（只读）：按行号确定性生成 total 行，返回第 page 页（从 1 开始）。"""
+        start = (page - 1) * size
+        rows = [[f"R{n:07d}", f"物料{n % 500:03d}", str(n % 97 + 1), f"{(n % 1000) / 10 + 1:.2f}",
+                 f"2024-{n % 12 + 1:02d}-{n % 28 + 1:02d}"] for n in range(max(start, 0), min(start + size, total))]
+        return {"columns": REPORT_COLUMNS, "rows": rows, "page": page, "pages": max((total + size - 1) // size, 1)}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": self.requests, "records": {name: len(r) for name, r in self.records.items()},
+                    "orders": len(self.orders), "order_lines": sum(len(order) for order in self.orders)}
+
+    def reset(self) -> None:
+        with self._lock:
+            for records in self.records.values():
+                records.clear()
+            self.orders.clear()
+            self.requests = 0
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    state: MockErpState
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=str(STATIC_DIR), **kwargs)
+
+    def log_message(self, format, *args):  # noqa: A002 - 覆盖基类方法
+        pass
+
+    def end_headers(self):
+        self.send_header("Cache-Control", "no-store")
+        super().end_headers()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/":
+            self.send_response(HTTPStatus.FOUND)
+            self.send_header("Location", "/login.html")
+            self.end_headers()
+            return
+        if url.path.startswith("/api/"):
+            self._api("GET", url.path, parse_qs(url.query), None)
+            return
+        super().do_GET()
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._json({"error": "请求体不是 JSON"}, HTTPStatus.BAD_REQUEST)
+            return
+        self._api("POST", url.path, parse_qs(url.query), body)
+
+    def _api(self, method: str, path: str, query: Dict[str, List[str]], body: Optional[Dict[str, Any]]) -> None:
+        state = self.state
+        with state._lock:
+            state.requests += 1
+        if path == "/api/config":
+            self._json({"entities": ENTITIES, "mask_ms": state.mask_ms})
+            return
+        if path == "/api/stats":
+            self._json(state.stats())
+            return
+        if path == "/api/reset" and method == "POST":
+            state.reset()
+            self._json({"ok": True})
+            return
+
+        state.delay()
+        if path == "/api/login" and method == "POST":
+            ok = body.get("username") == USERNAME and body.get("password") == PASSWORD
+            self._json({"ok": ok} if ok else {"ok": False, "error": "用户名或密码错误"},
+                       HTTPStatus.OK if ok else HTTPStatus.UNAUTHORIZED)
+        elif path == "/api/orders" and method == "POST":
+            lines = [{k: str(v) for k, v in line.items()} for line in body.get("lines") or []]
+            errors = state.save_order(body.get("entity", ""), lines)
+            self._json({"ok": not errors, "errors": {str(k): v for k, v in errors.items()}},
+                       HTTPStatus.UNPROCESSABLE_ENTITY if errors else HTTPStatus.OK)
+        elif path == "/api/import" and method == "POST":
+            entity = ENTITIES.get(body.get("entity", ""), {})
+            try:
+                table = read_import_file(body.get("filename", ""), base64.b64decode(body.get("data", "")))
+            except (ImportError, ValueError, zipfile.BadZipFile) as e:
+                self._json({"lines": [], "errors": {}, "error": f"无法读取文件: {e}"}, HTTPStatus.BAD_REQUEST)
+                return
+            result = import_lines(entity.get("grid", []), table)
+            self._json(result, HTTPStatus.BAD_REQUEST if result.get("error") else HTTPStatus.OK)
+        elif path == "/api/report":
+            def arg(name: str, default: int) -> int:
+                return int((query.get(name) or [default])[0])
+            self._json(state.report_page(arg("page", 1), arg("size", 500), arg("rows", 5000)))
+        elif path == "/api/records":
+            entity = (query.get("entity") or [body.get("entity") if body else ""])[0]
+            if entity not in ENTITIES:
+                self._json({"error": f"未知实体 {entity}"}, HTTPStatus.NOT_FOUND)
+            elif method == "GET":
+                self._json({"records": state.search(entity, (query.get("q") or [""])[0])})
+            else:
+                errors = state.save(entity, {k: str(v) for k, v in (body.get("fields") or {}).items()})
+                self._json({"ok": not errors, "errors": errors},
+                           HTTPStatus.UNPROCESSABLE_ENTITY if errors else HTTPStatus.OK)
+        else:
+            self._json({"error": f"未知接口 {path}"}, HTTPStatus.NOT_FOUND)
+
+    def _json(self, data: Dict[str, Any], status: HTTPStatus = HTTPStatus.OK) -> None:
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class MockErpServer:
+    """在后台线程中运行的模拟 ERP，port=0 时自动选择空闲端口。"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 80.0, mask_ms: float = 120.0):
+        self.state = MockErpState(latency_ms=latency_ms, mask_ms=mask_ms)
+        handler = type("Handler", (_Handler,), {"state": self.state})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def login_url(self) -> str:
+        return f"{self.url}/login.html"
+
+    def page_url(self, page: str, **params: Any) -> str:
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        return f"{self.url}/{page}" + (f"?{query}" if query else "")
+
+    def start(self) -> "MockErpServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-erp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockErpServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="本地模拟 ERP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="接口平均延迟")
+    parser.add_argument("--mask-ms", type=float, default=120.0, help="接口返回后加载遮罩继续显示的时间")
+    args = parser.parse_args()
+    server = MockErpServer(args.host, args.port, args.latency_ms, args.mask_ms)
+    print(f"模拟 ERP: {server.login_url}  (账号 {USERNAME} / 密码 {PASSWORD})")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
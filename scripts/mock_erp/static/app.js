@@ -0,0 +1,395 @@
+// 模拟 ERP 的页面逻辑：登录、菜单、列表 / 表单视图、可粘贴的分录表格和大页面。
+// DOM 结构沿用金蝶云星空的类名（kd-mainframe / kd-grid / kd-loading ...），适配器的选择器不用改就能跑。
+(function (w) {
+    'use strict';
+    const doc = w.document;
+    let config = {entities: {}, mask_ms: 0};
+    let pendingRequests = 0;
+    let maskTimer = null;
+
+    function el(tag, attrs, children) {
+        const node = doc.createElement(tag);
+        for (const [key, value] of Object.entries(attrs || {})) {
+            if (key === 'text') node.textContent = value;
+            else if (key === 'class') node.className = value;
+            else if (key.startsWith('on')) node.addEventListener(key.slice(2), value);
+            else node.setAttribute(key, value);
+        }
+        for (const child of children || []) node.appendChild(child);
+        return node;
+    }
+
+    // 请求期间及返回后 mask_ms 毫秒内显示加载遮罩，模拟 ERP 的渲染延迟
+    function showMask() {
+        clearTimeout(maskTimer);
+        const mask = doc.getElementById('mask');
+        if (mask) mask.classList.add('active');
+    }
+
+    function hideMaskLater() {
+        if (pendingRequests > 0) return;
+        maskTimer = setTimeout(() => {
+            const mask = doc.getElementById('mask');
+            if (mask && pendingRequests === 0) mask.classList.remove('active');
+        }, config.mask_ms);
+    }
+
+    function request(method, url, body) {
+        return new Promise((resolve) => {
+            const xhr = new XMLHttpRequest();
+            pendingRequests++;
+            showMask();
+            xhr.open(method, url);
+            xhr.setRequestHeader('Content-Type', 'application/json');
+            xhr.onloadend = () => {
+                pendingRequests--;
+                hideMaskLater();
+                let data = {};
+                try { data = JSON.parse(xhr.responseText || '{}'); } catch (e) { data = {error: xhr.statusText}; }
+                resolve({status: xhr.status, data: data});
+            };
+            xhr.send(body === undefined ? null : JSON.stringify(body));
+        });
+    }
+
+    // ---------------- 登录页 ----------------
+
+    function initLogin() {
+        doc.getElementById('btnLogin').addEventListener('click', async () => {
+            const tip = doc.getElementById('loginError');
+            tip.textContent = '';
+            const res = await request('POST', '/api/login', {
+                username: doc.getElementById('user').value,
+                password: doc.getElementById('password').value,
+            });
+            if (res.data.ok) w.location.href = 'main.html';
+            else tip.textContent = res.data.error || '登录失败';
+        });
+    }
+
+    // ---------------- 主界面 ----------------
+
+    async function initMain() {
+        doc.querySelector('.kd-notice .close').addEventListener('click', (e) => {
+            e.target.closest('.kd-notice').remove();
+        });
+        config = (await request('GET', '/api/config')).data;
+        buildMenu();
+    }
+
+    function buildMenu() {
+        // 菜单树：分组 -> 子分组 -> 叶子。点击分组只展开不折叠，重复执行菜单路径是幂等的
+        const tree = {};
+        for (const [name, spec] of Object.entries(config.entities)) {
+            let node = tree;
+            spec.menu.slice(0, -1).forEach((label) => { node = node[label] = node[label] || {}; });
+            node[spec.menu[spec.menu.length - 1]] = name;
+        }
+        const render = (node) => {
+            const children = [];
+            for (const [label, value] of Object.entries(node)) {
+                if (typeof value === 'string') {
+                    children.push(el('div', {class: 'menu-leaf', role: 'menuitem', text: label,
+                                             onclick: () => openEntity(value)}));
+                } else {
+                    const box = el('div', {class: 'menu-children'}, render(value));
+                    children.push(el('div', {class: 'menu-group'}, [
+                        el('div', {class: 'menu-label', role: 'menuitem', text: label,
+                                   onclick: () => box.classList.add('open')}),
+                        box,
+                    ]));
+                }
+            }
+            return children;
+        };
+        const menu = doc.getElementById('menu');
+        menu.innerHTML = '';
+        render(tree).forEach((child) => menu.appendChild(child));
+    }
+
+    function setTab(title) {
+        const tab = doc.querySelector('.kd-tab-active');
+        tab.textContent = title;
+    }
+
+    function setView(children) {
+        const view = doc.getElementById('view');
+        view.innerHTML = '';
+        children.forEach((child) => view.appendChild(child));
+    }
+
+    function openEntity(name) {
+        const spec = config.entities[name];
+        setTab(spec.title);
+        if (spec.grid) showGrid(name, spec);
+        else showList(name, spec, '');
+    }
+
+    // ---------------- 列表 / 表单 ----------------
+
+    async function showList(name, spec, query) {
+        const search = el('input', {placeholder: '搜索…', value: query});
+        search.addEventListener('keydown', (e) => { if (e.key === 'Enter') showList(name, spec, search.value); });
+        const refresh = el('button', {class: 'kd-icon-btn', title: '刷新', 'aria-label': '刷新',
+                                      onclick: () => showList(name, spec, search.value)});
+        refresh.innerHTML = '<svg viewBox="0 0 16 16" width="16" height="16"><path d="M8 2a6 6 0 1 0 6 6h-2a4 4 0 '
+            + '1 1-4-4V2z" fill="#2a7ae2"/></svg>';
+        const toolbar = el('div', {class: 'kd-toolbar'}, [
+            el('button', {class: 'kd-btn', text: '新增', onclick: () => showForm(name, spec)}),
+            refresh,
+            search,
+        ]);
+        const res = await request('GET', `/api/records?entity=${encodeURIComponent(name)}&q=${encodeURIComponent(query)}`);
+        const columns = spec.fields.slice(0, 4);
+        const table = el('table', {class: 'kd-list'}, [
+            el('thead', {}, [el('tr', {}, columns.map((c) => el('th', {text: c})))]),
+            el('tbody', {}, (res.data.records || []).map((r) => el('tr', {
+                ondblclick: () => showForm(name, spec, r),
+            }, columns.map((c) => el('td', {text: r[c] || ''}))))),
+        ]);
+        setView([toolbar, table]);
+        // 重新聚焦搜索框，便于连续搜索
+        if (query) doc.querySelector('#view input').focus();
+    }
+
+    function showForm(name, spec, record) {
+        const inputs = {};
+        const tips = {};
+        const items = spec.fields.map((field, i) => {
+            const id = `f_${name}_${i}`;
+            inputs[field] = el('input', {id: id, name: field, value: (record && record[field]) || ''});
+            tips[field] = el('div', {class: 'kd-error-tip'});
+            return el('div', {class: 'kd-form-item'}, [el('label', {for: id, text: field}), inputs[field], tips[field]]);
+        });
+        const toast = el('div', {class: 'kd-toast'});
+        const save = async () => {
+            const fields = {};
+            for (const [field, input] of Object.entries(inputs)) fields[field] = input.value;
+            Object.values(tips).forEach((tip) => { tip.textContent = ''; });
+            toast.textContent = '';
+            const res = await request('POST', '/api/records', {entity: name, fields: fields});
+            if (res.data.ok) {
+                toast.textContent = '保存成功';
+                Object.values(inputs).forEach((input) => { input.value = ''; });
+            } else {
+                for (const [field, message] of Object.entries(res.data.errors || {})) {
+                    if (tips[field]) tips[field].textContent = message;
+                }
+            }
+        };
+        const toolbar = el('div', {class: 'kd-toolbar'}, [
+            el('button', {class: 'kd-btn', text: '保存', onclick: save}),
+            el('button', {class: 'kd-btn', text: '返回', onclick: () => showList(name, spec, '')}),
+        ]);
+        setView([toolbar, toast, el('div', {class: 'kd-form'}, items)]);
+    }
+
+    // ---------------- 分录表格 ----------------
+
+    // 同步校验一行：数量、单价必须是数字，交货日期必须是 yyyy-mm-dd，物料编码不能为空
+    function validateRow(values, columns) {
+        const get = (c) => (values[columns.indexOf(c)] || '').trim();
+        if (values.every((v) => !v.trim())) return null;
+        if (columns.includes('物料编码') && !get('物料编码')) return '物料编码不能为空';
+        for (const c of ['数量', '单价']) {
+            if (columns.includes(c) && get(c) && !/^-?\d+(\.\d+)?$/.test(get(c))) return `${c}必须是数字`;
+        }
+        if (columns.includes('交货日期') && get('交货日期') && !/^\d{4}-\d{2}-\d{2}$/.test(get('交货日期'))) {
+            return '交货日期格式应为 yyyy-mm-dd';
+        }
+        return null;
+    }
+
+    function showGrid(name, spec) {
+        const columns = spec.grid;
+        const body = el('tbody', {class: 'kd-grid-body'});
+        const cellsOf = (row) => Array.from(row.querySelectorAll('td'));
+        const valuesOf = (row) => cellsOf(row).map((td) => td.textContent);
+        const isBlank = (row) => valuesOf(row).every((v) => !v.trim());
+
+        const markRow = (row) => {
+            const error = validateRow(valuesOf(row), columns);
+            row.classList.toggle('kd-grid-error', !!error);
+            if (error) row.setAttribute('title', error); else row.removeAttribute('title');
+        };
+        const newRow = () => {
+            const row = el('tr', {}, columns.map(() => el('td', {contenteditable: 'true'})));
+            row.addEventListener('input', () => {
+                markRow(row);
+                // 在最后一行输入时自动追加空行，与金蝶分录一致
+                if (row === body.lastElementChild) body.appendChild(newRow());
+            });
+            return row;
+        };
+        const ensureTrailingBlank = () => {
+            if (!body.lastElementChild || !isBlank(body.lastElementChild)) body.appendChild(newRow());
+        };
+
+        const grid = el('table', {class: 'kd-grid'}, [
+            el('thead', {class: 'kd-grid-header'}, [el('tr', {}, columns.map((c) => el('td', {text: c})))]),
+            body,
+        ]);
+        // 粘贴 TSV：从焦点所在行开始覆盖；焦点行已有内容时追加到末尾。行数不够自动追加，粘贴后同步校验
+        grid.onpaste = (e) => {
+            e.preventDefault();
+            const text = (e.clipboardData || w.clipboardData).getData('text/plain');
+            const lines = text.replace(/\r/g, '').split('\n').filter((line, i, all) => line || i < all.length - 1);
+            const rows = Array.from(body.children);
+            const focused = e.target.closest && e.target.closest('tr');
+            let start = focused && focused.parentNode === body ? rows.indexOf(focused) : rows.length;
+            if (start >= 0 && start < rows.length && !isBlank(rows[start])) start = rows.length;
+            lines.forEach((line, i) => {
+                let row = body.children[start + i];
+                if (!row) { row = newRow(); body.appendChild(row); }
+                const values = line.split('\t');
+                cellsOf(row).forEach((td, j) => { td.textContent = values[j] || ''; });
+                markRow(row);
+            });
+            ensureTrailingBlank();
+        };
+        ensureTrailingBlank();
+        // 保存整张单据：空行不提交；服务端校验失败时整张单据不保存，出错行标红并显示保存失败提示
+        const toast = el('div', {class: 'kd-toast'});
+        const saveError = el('div', {class: 'kd-save-error'});
+        const save = async () => {
+            toast.textContent = '';
+            saveError.textContent = '';
+            const rows = Array.from(body.children).filter((row) => !isBlank(row));
+            const lines = rows.map((row) => {
+                const line = {};
+                valuesOf(row).forEach((v, j) => { line[columns[j]] = v; });
+                return line;
+            });
+            const res = await request('POST', '/api/orders', {entity: name, lines: lines});
+            if (res.data.ok) {
+                toast.textContent = '保存成功';
+                return;
+            }
+            const errors = res.data.errors || {};
+            for (const [index, message] of Object.entries(errors)) {
+                const row = rows[parseInt(index, 10)];
+                if (!row) continue;
+                row.classList.add('kd-grid-error');
+                row.setAttribute('title', message);
+            }
+            saveError.textContent = '保存失败：' + Object.values(errors).join('；');
+        };
+        // 引入 Excel / CSV：校验通过的行追加到最后一个数据行之后，被拒的行不进表格，结果按 Excel 行号列出
+        const appendLines = (lines) => {
+            const rows = Array.from(body.children);
+            let next = rows.length;
+            while (next > 0 && isBlank(rows[next - 1])) next--;
+            lines.forEach((line) => {
+                let row = body.children[next++];
+                if (!row) { row = newRow(); body.appendChild(row); }
+                cellsOf(row).forEach((td, j) => { td.textContent = line[columns[j]] || ''; });
+                markRow(row);
+            });
+            ensureTrailingBlank();
+        };
+        const showImport = () => {
+            const input = el('input', {type: 'file', accept: '.xlsx,.csv'});
+            const content = el('div', {class: 'kd-dialog-content'}, [el('div', {text: '选择要引入的文件：'}), input]);
+            const close = () => dialog.remove();
+            const confirm = async () => {
+                const file = input.files[0];
+                if (!file) return;
+                const bytes = new Uint8Array(await file.arrayBuffer());
+                let binary = '';
+                for (let i = 0; i < bytes.length; i += 0x8000) {
+                    binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+                }
+                const res = await request('POST', '/api/import', {entity: name, filename: file.name, data: w.btoa(binary)});
+                const lines = res.data.lines || [];
+                const errors = Object.entries(res.data.errors || {});
+                appendLines(lines);
+                const text = res.data.error ? `引入失败：${res.data.error}`
+                    : [`引入完成：成功 ${lines.length} 条，失败 ${errors.length} 条`]
+                        .concat(errors.map(([number, message]) => `第 ${number} 行：${message}`)).join('\n');
+                content.replaceChildren(el('div', {class: 'kd-import-result', text: text}));
+                buttons.replaceChildren(el('button', {class: 'kd-btn', text: '关闭', onclick: close}));
+            };
+            const buttons = el('div', {class: 'kd-dialog-buttons'}, [
+                el('button', {class: 'kd-btn', text: '引入', onclick: confirm}),
+                el('button', {class: 'kd-btn', text: '取消', onclick: close}),
+            ]);
+            const dialog = el('div', {class: 'kd-dialog'}, [el('div', {class: 'kd-dialog-title', text: '引入数据'}),
+                                                            content, buttons]);
+            doc.body.appendChild(dialog);
+        };
+        const toolbar = el('div', {class: 'kd-toolbar'}, [
+            el('button', {class: 'kd-btn', text: '保存', onclick: save}),
+            el('button', {class: 'kd-btn', text: '引入', onclick: showImport}),
+            el('button', {class: 'kd-btn', text: '清空', onclick: () => { body.innerHTML = ''; ensureTrailingBlank(); }}),
+        ]);
+        setView([toolbar, toast, saveError, grid]);
+    }
+
+    // ---------------- 大页面（DOM 解析基准） ----------------
+
+    function buildBigTable(target, rows, cols) {
+        const table = doc.createElement('table');
+        table.className = 'kd-grid';
+        const header = table.createTHead().insertRow();
+        for (let c = 0; c < cols; c++) header.appendChild(el('th', {text: `列${c + 1}`}));
+        const body = table.createTBody();
+        for (let r = 0; r < rows; r++) {
+            const row = body.insertRow();
+            for (let c = 0; c < cols; c++) {
+                const cell = row.insertCell();
+                if (c === 0) cell.appendChild(el('input', {name: `code_${r}`, value: `M${String(r).padStart(6, '0')}`}));
+                else cell.textContent = `${r}-${c}`;
+            }
+        }
+        target.appendChild(table);
+    }
+
+    function initBigPage() {
+        const params = new URLSearchParams(w.location.search);
+        const rows = parseInt(params.get('rows') || '1000', 10);
+        const cols = parseInt(params.get('cols') || '10', 10);
+        if (params.get('iframe') === '1') {
+            const frame = el('iframe', {id: 'mainFrame', src: `bigpage.html?rows=${rows}&cols=${cols}`});
+            doc.body.appendChild(frame);
+        } else {
+            buildBigTable(doc.body, rows, cols);
+        }
+    }
+
+    // ---------------- 分页报表（导出基准） ----------------
+
+    async function initReport() {
+        const params = new URLSearchParams(w.location.search);
+        const rows = parseInt(params.get('rows') || '5000', 10);
+        const size = parseInt(params.get('size') || '500', 10);
+        if (params.get('iframe') === '1') {
+            doc.body.appendChild(el('iframe', {id: 'mainFrame', src: `report.html?rows=${rows}&size=${size}`}));
+            return;
+        }
+        config = (await request('GET', '/api/config')).data;
+        const head = el('thead', {class: 'kd-grid-header'});
+        const body = el('tbody', {class: 'kd-grid-body'});
+        const info = el('span', {class: 'kd-pager-info'});
+        const prev = el('button', {class: 'kd-btn kd-pager-prev', text: '上一页'});
+        const next = el('button', {class: 'kd-btn kd-pager-next', text: '下一页'});
+        let page = 1;
+        const load = async (target) => {
+            const res = await request('GET', `/api/report?page=${target}&size=${size}&rows=${rows}`);
+            page = res.data.page;
+            head.innerHTML = '';
+            head.appendChild(el('tr', {}, res.data.columns.map((c) => el('td', {text: c}))));
+            body.innerHTML = '';
+            res.data.rows.forEach((r) => body.appendChild(el('tr', {}, r.map((v) => el('td', {text: v})))));
+            info.textContent = `第 ${page} / ${res.data.pages} 页`;
+            prev.disabled = page <= 1;
+            next.disabled = page >= res.data.pages;
+        };
+        prev.addEventListener('click', () => load(page - 1));
+        next.addEventListener('click', () => load(page + 1));
+        doc.body.appendChild(el('table', {class: 'kd-grid'}, [head, body]));
+        doc.body.appendChild(el('div', {class: 'kd-pager'}, [prev, info, next]));
+        await load(1);
+    }
+
+    w.MockErp = {initLogin: initLogin, initMain: initMain, initBigPage: initBigPage, initReport: initReport};
+})(window);
@@ -5,15 +5,25 @@
 # Description: A tool to analyze a software repository using a local Ollama model,
 #              featuring streaming output, incremental reporting, and analysis history.
 #              This version saves analysis in a mirrored directory structure.
+#              Files are analyzed concurrently by a bounded thread pool; history is an append-only
+#              JSONL keyed by content hash, so only changed files are re-analyzed; large files are
+#              split into chunks. 用法: python repo_analyzer_v3.py [项目路径] [--workers 4] [--force]
 # # --PROJECT-COMMENT-BLOCK--
 
-import os
-import sys
+import argparse
+import hashlib
 import json
+import os
 import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
 import requests
-from typing import List, Set, Dict
 
 # --- 配置 ---
 
@@ -25,8 +35,14 @@ OLLAMA_API_URL = "http://localhost:11964/api/generate"
 OLLAMA_MODEL = "qwen3:latest"
 # 输出分析文件的根目录名
 OUTPUT_ROOT_DIR = "analysis_output"
-# 历史记录文件名
-HISTORY_FILENAME = ".repo_analysis_history.json"
+# 历史记录文件名：每分析完一个文件追加一行，不再整体重写
+HISTORY_FILENAME = ".repo_analysis_history.jsonl"
+# 旧版（整体重写的 JSON）历史记录文件名，首次运行时迁移
+LEGACY_HISTORY_FILENAME = ".repo_analysis_history.json"
+# 同时发给 Ollama 的请求数，应与 Ollama 的 OLLAMA_NUM_PARALLEL 一致
+MAX_WORKERS = 4
+# 超过该字符数的文件按行切成多块分别分析
+CHUNK_CHARS = 60000
 
 # 目录和文件排除规则
 EXCLUDE_DIRS: Set[str] = {
@@ -38,6 +54,72 @@ EXCLUDE_EXTENSIONS: Set[str] = {
     ".png", ".jpg", ".jpeg", ".gif", ".svg", ".ico", ".mp4", ".mp3", ".wav",
 }
 
+# 每个线程一个 HTTP 会话，复用到 Ollama 的连接
+_local = threading.local()
+# 并发模式下多个线程的输出不交错
+_print_lock = threading.Lock()
+
+
+def log(message: str) -> None:
+    with _print_lock:
+        print(message, flush=True)
+
+
+class AnalysisHistory:
+    """
+    按内容哈希记录已分析的文件：路径 -> sha256。
+    追加写入 JSONL，同一路径以最后一行为准；重复行过多时在加载后压缩重写一次。
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        lines = 0
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # 中断时写了一半的末行
+                    self.entries[record["path"]] = record
+                    lines += 1
+        if lines > 2 * len(self.entries) + 100:
+            self._compact()
+
+    def is_current(self, relative_path: str, digest: str) -> bool:
+        return self.entries.get(relative_path, {}).get("sha256") == digest
+
+    def record(self, relative_path: str, digest: str, chunks: int) -> None:
+        entry = {"path": relative_path, "sha256": digest, "chunks": chunks, "time": int(time.time())}
+        self.entries[relative_path] = entry
+        # 单次追加一行，中途被杀掉最多丢失正在写的这一行
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def migrate_legacy(self, legacy_path: Path, root: Path, output_dir: Path) -> int:
+        """
+        导入旧版 {路径: {"analysis_count": n}} 历史。旧历史没有内容哈希，
+        已分析且报告仍在的文件按当前内容记入，假定它们在上次分析后没有修改。
+        """
+        legacy = load_history(legacy_path)
+        migrated = 0
+        for relative_path, item in legacy.items():
+            source = root / relative_path
+            report = report_path(output_dir, Path(relative_path))
+            if item.get("analysis_count", 0) >= 1 and source.is_file() and report.exists() \
+                    and relative_path not in self.entries:
+                self.record(relative_path, file_digest(source.read_bytes()), 1)
+                migrated += 1
+        return migrated
+
+    def _compact(self) -> None:
+        temp = self.path.with_suffix(".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(temp, self.path)
+
 
 def load_history(history_path: Path) -> Dict:
     """从JSON文件加载分析历史。"""
@@ -51,22 +133,58 @@ def load_history(history_path: Path) -> Dict:
         return {}
 
 
-def save_history(history_path: Path, history_data: Dict):
-    """将分析历史保存到JSON文件。"""
-    try:
-        with open(history_path, "w", encoding="utf-8") as f:
-            json.dump(history_data, f, indent=4)
-    except IOError as e:
-        print(f"❌  Error saving history file '{history_path}': {e}")
-
-
-def analyze_file_with_ollama(file_path: str, file_content: str) -> str:
+def file_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def report_path(output_dir: Path, relative_file_path: Path) -> Path:
+    return output_dir / relative_file_path.with_name(f"{relative_file_path.name}-analysis.md")
+
+
+def split_chunks(content: str, limit: int) -> List[Tuple[int, int, str]]:
+    """按行切块，每块不超过 limit 个字符（单行超长时单独成块再按字符截断），返回 (起始行, 结束行, 文本)。"""
+    if len(content) <= limit:
+        return [(1, content.count("\n") + 1, content)]
+    chunks: List[Tuple[int, int, str]] = []
+    lines: List[str] = []
+    size = 0
+    start = 1
+    for number, line in enumerate(content.splitlines(keepends=True), start=1):
+        if lines and size + len(line) > limit:
+            chunks.append((start, number - 1, "".join(lines)))
+            lines, size, start = [], 0, number
+        for offset in range(0, max(len(line), 1), limit):
+            piece = line[offset:offset + limit]
+            if size + len(piece) > limit and lines:
+                chunks.append((start, number, "".join(lines)))
+                lines, size, start = [], 0, number
+            lines.append(piece)
+            size += len(piece)
+    if lines:
+        chunks.append((start, number, "".join(lines)))
+    return chunks
+
+
+def clean_response(complete_text: str) -> str:
+    clean_text = re.sub(r'<think>.*?</think>', '', complete_text.strip(), flags=re.DOTALL)
+    clean_text = clean_text.strip()
+    if clean_text.startswith("```markdown"):
+        clean_text = clean_text[len("```markdown"):].strip()
+    if clean_text.startswith("```typescript"):
+        clean_text = clean_text[len("```typescript"):].strip()
+    if clean_text.endswith("```"):
+        clean_text = clean_text[:-3].strip()
+    return clean_text
+
+
+def analyze_file_with_ollama(file_path: str, file_content: str, part: str = "", stream_output: bool = True) -> str:
     """
-    使用 Ollama API 分析单个文件的内容，并流式输出到控制台。
+    使用 Ollama API 分析单个文件（或大文件的一块）的内容。
+    stream_output 为 True 时把模型输出实时打印到控制台（仅单线程模式）。请求失败时抛出 requests 异常。
     """
 
     prompt = f"""
-    作为软件架构师，请分析以下代码文件。
+    作为软件架构师，请分析以下代码文件{f"的{part}" if part else ""}。
 
     文件路径：`{file_path}`
 
@@ -84,47 +202,31 @@ def analyze_file_with_ollama(file_path: str, file_content: str) -> str:
     payload = {
         "model": OLLAMA_MODEL,
         "prompt": prompt,
-        "stream": False
+        "stream": stream_output
     }
 
-    raw_full_response = []
-    print(f"\n🧠  Analyzing: {file_path}...")
-
-    try:
-        with requests.post(OLLAMA_API_URL, json=payload, stream=True, timeout=300) as response:
-            response.raise_for_status()
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
 
-            for chunk in response.iter_lines():
-                if chunk:
-                    decoded_chunk = chunk.decode('utf-8')
-                    try:
-                        json_chunk = json.loads(decoded_chunk)
-                        response_part = json_chunk.get("response", "")
-                        print(response_part, end="", flush=True)
-                        raw_full_response.append(response_part)
-                    except json.JSONDecodeError:
-                        print(f"\n[Warning: Could not decode a JSON chunk: {decoded_chunk}]")
-
-            print()
-
-            complete_text = "".join(raw_full_response).strip()
-            clean_text = re.sub(r'<think>.*?</think>', '', complete_text, flags=re.DOTALL)
-            clean_text = clean_text.strip()
-            if clean_text.startswith("```markdown"):
-                clean_text = clean_text[len("```markdown"):].strip()
-            if clean_text.startswith("```typescript"):
-                clean_text = clean_text[len("```typescript"):].strip()
-            if clean_text.endswith("```"):
-                clean_text = clean_text[:-3].strip()
-
-            return clean_text
-
-    except requests.exceptions.RequestException as e:
-        print(f"\n❌  Error calling Ollama API for {file_path}: {e}")
-        return f"Error: Could not get analysis from Ollama API. Details: {e}"
-    except Exception as e:
-        print(f"\n❌  An unexpected error occurred during analysis of {file_path}: {e}")
-        return f"Error: An unexpected error occurred. Details: {e}"
+    raw_full_response = []
+    with session.post(OLLAMA_API_URL, json=payload, stream=stream_output, timeout=300) as response:
+        response.raise_for_status()
+        for chunk in response.iter_lines():
+            if not chunk:
+                continue
+            decoded_chunk = chunk.decode('utf-8')
+            try:
+                response_part = json.loads(decoded_chunk).get("response", "")
+            except json.JSONDecodeError:
+                log(f"\n[Warning: Could not decode a JSON chunk: {decoded_chunk}]")
+                continue
+            if stream_output:
+                print(response_part, end="", flush=True)
+            raw_full_response.append(response_part)
+    if stream_output:
+        print()
+    return clean_response("".join(raw_full_response))
 
 
 def is_excluded(path: Path, root: Path) -> bool:
@@ -138,9 +240,73 @@ def is_excluded(path: Path, root: Path) -> bool:
     return False
 
 
-def main(project_path: str):
+def walk_files(root: Path) -> Iterator[Path]:
+    """遍历项目文件，被排除的目录直接剪枝而不是进入后再过滤（node_modules 等目录可能有几十万个文件）。"""
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in EXCLUDE_DIRS)
+        for filename in sorted(filenames):
+            path = Path(directory) / filename
+            if not is_excluded(path, root):
+                yield path
+
+
+@dataclass
+class FileJob:
+    """
+    一个待分析文件：只记路径和摘要，轮到它提交时才读文件、切块（load），块文本随请求提交出去，
+    不在任务里保留。各块的分析结果到齐后由主线程写报告和历史。
+    """
+    relative_path: str
+    path: Path
+    digest: str
+    report: Path
+    spans: List[Tuple[int, int]] = field(default_factory=list)  # 各块的 (起始行, 结束行)，load 后填入
+    results: Dict[int, str] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def done(self) -> bool:
+        return len(self.results) + len(self.errors) == len(self.spans)
+
+    def load(self, chunk_chars: int) -> List[str]:
+        """读文件并切块，返回各块文本；摘要按实际读到的内容更新，文件在扫描后被改过时历史仍然准确。"""
+        data = self.path.read_bytes()
+        self.digest = file_digest(data)
+        content = data.decode("utf-8")
+        chunks = split_chunks(content, chunk_chars) if content.strip() else []
+        self.spans = [(start, end) for start, end, _ in chunks]
+        return [text for _, _, text in chunks]
+
+
+def prepare_job(file_path: Path, root: Path, output_dir: Path, history: AnalysisHistory,
+                force: bool) -> Optional[FileJob]:
+    relative_file_path = file_path.relative_to(root)
+    relative_path_str = relative_file_path.as_posix()
+    digest = file_digest(file_path.read_bytes())
+    if not force and history.is_current(relative_path_str, digest):
+        return None
+    return FileJob(relative_path_str, file_path, digest, report_path(output_dir, relative_file_path))
+
+
+def write_report(job: FileJob) -> None:
+    job.report.parent.mkdir(parents=True, exist_ok=True)
+    if not job.spans:
+        body = "File is empty."
+    elif len(job.spans) == 1:
+        body = job.results.get(0, "\n".join(job.errors))
+    else:
+        sections = []
+        for i, (start, end) in enumerate(job.spans):
+            text = job.results.get(i, "Error: analysis of this part failed.")
+            sections.append(f"## Part {i + 1}/{len(job.spans)} (lines {start}-{end})\n\n{text}")
+        body = "\n\n".join(sections)
+    with open(job.report, "w", encoding="utf-8") as report_file:
+        report_file.write(f"# Analysis for `{job.relative_path}`\n\n{body}")
+
+
+def main(project_path: str, workers: int = MAX_WORKERS, force: bool = False, chunk_chars: int = CHUNK_CHARS):
     """
-    主函数，遍历项目，调用AI分析，并以镜像目录结构增量生成报告。
+    主函数，遍历项目，只把内容有变化的文件交给线程池并行分析，并以镜像目录结构增量生成报告。
     """
     root_path = Path(project_path)
     if not root_path.is_dir():
@@ -148,73 +314,107 @@ def main(project_path: str):
         return
 
     script_dir = Path(__file__).parent
-    # ⭐ 核心修改 1：定义并创建输出的根目录
     output_dir = script_dir / OUTPUT_ROOT_DIR
     output_dir.mkdir(exist_ok=True)
 
     history_path = script_dir / HISTORY_FILENAME
-    history_data = load_history(history_path)
+    history = AnalysisHistory(history_path)
+    legacy_path = script_dir / LEGACY_HISTORY_FILENAME
+    if not history.entries and legacy_path.exists():
+        print(f"📦 Migrated {history.migrate_legacy(legacy_path, root_path, output_dir)} entries "
+              f"from legacy history {legacy_path.name}")
 
     print(f"🚀 Starting analysis of project: {root_path.resolve()}")
-    print(f"🤖 Using Ollama model: {OLLAMA_MODEL}")
+    print(f"🤖 Using Ollama model: {OLLAMA_MODEL} ({workers} concurrent requests)")
     print(f"💾 Using history file: {history_path.resolve()}")
     print(f"📄 Analysis files will be saved in: {output_dir.resolve()}")
 
-    all_files: List[Path] = [
-        path for path in root_path.rglob("*")
-        if path.is_file() and not is_excluded(path, root_path)
-    ]
-
-    files_to_analyze = []
-    for file_path in all_files:
-        relative_path_str = file_path.relative_to(root_path).as_posix()
-        if history_data.get(relative_path_str, {}).get("analysis_count", 0) >= 1:
-            print(f"✅  Skipping (already analyzed): {relative_path_str}")
-            continue
-        files_to_analyze.append(file_path)
-
-    print(f"🔍 Found {len(all_files)} total files. Need to analyze {len(files_to_analyze)} new files.")
-
-    for i, file_path in enumerate(files_to_analyze):
-        print(f"\n--- Processing new file {i + 1}/{len(files_to_analyze)} ---")
-        relative_path_str = file_path.relative_to(root_path).as_posix()
-
+    jobs: List[FileJob] = []
+    total = 0
+    for file_path in walk_files(root_path):
+        total += 1
         try:
-            # ⭐ 核心修改 2：构建镜像目录结构和新的文件名
-            relative_file_path = file_path.relative_to(root_path)
-            new_filename = f"{file_path.name}-analysis.md"
-            target_analysis_path = output_dir / relative_file_path.with_name(new_filename)
-
-            # 确保目标目录存在
-            target_analysis_path.parent.mkdir(parents=True, exist_ok=True)
-
-            content = file_path.read_text(encoding="utf-8")
-
-            if len(content.strip()) == 0:
-                analysis_result = f"# Analysis for `{relative_path_str}`\n\nFile is empty."
-            elif len(content) > 100000:
-                analysis_result = f"# Analysis for `{relative_path_str}`\n\nFile is too large to be analyzed."
-            else:
-                ai_analysis = analyze_file_with_ollama(relative_path_str, content)
-                analysis_result = f"# Analysis for `{relative_path_str}`\n\n{ai_analysis}"
-
-            # 核心修改 3：写入到独立的分析文件中
-            with open(target_analysis_path, "w", encoding="utf-8") as report_file:
-                report_file.write(analysis_result)
-            print(f"📄 Report saved to: {target_analysis_path}")
-
-            history_data[relative_path_str] = {"analysis_count": 1}
-            save_history(history_path, history_data)
-
-        except Exception as e:
-            print(f"❌  Could not read or process file {relative_path_str}: {e}")
-
-    print(f"\n🎉 Analysis complete! All reports have been saved in {output_dir.resolve()}")
+            job = prepare_job(file_path, root_path, output_dir, history, force)
+        except OSError as e:
+            print(f"❌  Could not read file {file_path.relative_to(root_path).as_posix()}: {e}")
+            continue
+        if job is not None:
+            jobs.append(job)
+    print(f"🔍 Found {total} total files. Need to analyze {len(jobs)} new or changed files.")
+
+    started = time.monotonic()
+    finished = 0
+    unreadable = 0
+    stream_output = workers == 1
+
+    def complete(job: FileJob) -> None:
+        nonlocal finished
+        finished += 1
+        count = len(jobs) - unreadable
+        write_report(job)
+        if job.errors:
+            # 失败的文件不记入历史，下次运行重试
+            log(f"❌  [{finished}/{count}] {job.relative_path}: {job.errors[0]}")
+        else:
+            history.record(job.relative_path, job.digest, len(job.spans))
+            log(f"📄  [{finished}/{count}] Report saved to: {job.report}")
+
+    def analyze(job: FileJob, index: int, text: str) -> str:
+        start, end = job.spans[index]
+        part = f"第 {index + 1}/{len(job.spans)} 部分（第 {start}-{end} 行）" if len(job.spans) > 1 else ""
+        if stream_output:
+            print(f"\n🧠  Analyzing: {job.relative_path} {part}...")
+        return analyze_file_with_ollama(job.relative_path, text, part, stream_output)
+
+    def chunks() -> Iterator[Tuple[FileJob, int, str]]:
+        # 文件在轮到它提交时才读入、切块；内存中只有当前文件的块和在途请求的文本
+        nonlocal unreadable
+        for job in jobs:
+            try:
+                texts = job.load(chunk_chars)
+            except (UnicodeDecodeError, OSError) as e:
+                unreadable += 1
+                log(f"❌  Could not read file {job.relative_path}: {e}")
+                continue
+            if not texts:
+                complete(job)
+            for index, text in enumerate(texts):
+                yield job, index, text
+
+    # 有界提交：同时在途的块数不超过 workers 的两倍，避免一次把所有文件内容堆进队列
+    pending = chunks()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ollama") as pool:
+        running: Dict[Future, Tuple[FileJob, int]] = {}
+        while True:
+            for job, index, text in pending:
+                running[pool.submit(analyze, job, index, text)] = (job, index)
+                if len(running) >= workers * 2:
+                    break
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, index = running.pop(future)
+                try:
+                    job.results[index] = future.result()
+                except Exception as e:
+                    job.errors.append(f"Error: Could not get analysis from Ollama API. Details: {e}")
+                if job.done:
+                    complete(job)
+
+    elapsed = time.monotonic() - started
+    print(f"\n🎉 Analysis complete in {elapsed:.0f}s! All reports have been saved in {output_dir.resolve()}")
 
 
 if __name__ == "__main__":
-    if not PROJECT_TO_ANALYZE_PATH or not Path(PROJECT_TO_ANALYZE_PATH).is_dir():
-        print(f"❌ 错误: 请在脚本顶部的 'PROJECT_TO_ANALYZE_PATH' 变量中设置一个有效的项目绝对路径。")
-        print(f"当前设置的值是: '{PROJECT_TO_ANALYZE_PATH}'")
+    parser = argparse.ArgumentParser(description="用本地 Ollama 模型分析项目中的每个文件")
+    parser.add_argument("project", nargs="?", default=PROJECT_TO_ANALYZE_PATH)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="同时发给 Ollama 的请求数，1 为流式单线程")
+    parser.add_argument("--chunk-chars", type=int, default=CHUNK_CHARS, help="超过该字符数的文件分块分析")
+    parser.add_argument("--force", action="store_true", help="忽略历史，重新分析所有文件")
+    args = parser.parse_args()
+    if not args.project or not Path(args.project).is_dir():
+        print(f"❌ 错误: 请在命令行或脚本顶部的 'PROJECT_TO_ANALYZE_PATH' 变量中设置一个有效的项目绝对路径。")
+        print(f"当前设置的值是: '{args.project}'")
         sys.exit(1)
-    main(PROJECT_TO_ANALYZE_PATH)
\ No newline at end of file
+    main(args.project, max(1, args.workers), args.force, args.chunk_chars)
@@ -0,0 +1,496 @@
+# # --PROJECT-COMMENT-BLOCK--
+# File Path: run_plugin_manual.py
+# Author:
+# Create Date:
+# Description: 端到端基准测试：启动本地模拟 ERP（scripts/mock_erp），用无头 Chrome 跑真实的适配器代码路径，
+#              测量每分钟录入记录/行数、字段定位延迟 p50/p99、DOM 抽取耗时、页面就绪等待和引擎吞吐。
+#              结果写成 JSON（默认 .cache/bench/），--baseline 与历史结果比较，退化超过阈值时返回非零。
+#              用法: python scripts/run_plugin_manual.py [场景 ...] [--baseline old.json] [--threshold 0.1]
+#                    python scripts/run_plugin_manual.py --compare new.json --baseline old.json
+# # --PROJECT-COMMENT-BLOCK--
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "services" / "python_adapter_py" / "src"
+sys.path.insert(0, str(SRC))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_erp.server import ENTITIES, PASSWORD, USERNAME, MockErpServer  # noqa: E402
+
+SERVER = "BENCH"
+RESULTS_DIR = ROOT / ".cache" / "bench"
+
+# 指标命名约定决定比较方向：*_per_min / *_rate 越大越好，*_ms 越小越好，其余只记录不比较
+HIGHER_IS_BETTER = ("_per_min", "_rate")
+LOWER_IS_BETTER = ("_ms",)
+
+
+class BenchContext:
+    """一次基准运行共享的模拟 ERP、会话池配置和命令行参数。"""
+
+    def __init__(self, server: MockErpServer, args: argparse.Namespace):
+        from erp_core.config import ServerConfig, SessionPoolConfig
+
+        self.server = server
+        self.args = args
+        self.server_config = ServerConfig(url=server.login_url, username=USERNAME, password=PASSWORD)
+        self.pool_config = SessionPoolConfig(size=1, headless=not args.headed, max_uses=10_000)
+
+    def new_driver(self):
+        from erp_ui_adapter.utils.driver_utils import create_chrome_driver
+        return create_chrome_driver(self.pool_config)
+
+    def new_adapter(self, browsers: int = 1):
+        """创建使用独立会话池的金蝶适配器，不读取平台配置里的服务器。"""
+        from erp_ui_adapter.adapters.kingdee_adapter import KingdeeAdapter
+        from erp_ui_adapter.utils.driver_utils import SessionPool
+
+        config = self.pool_config.model_copy(update={"size": browsers})
+        adapter: Optional[KingdeeAdapter] = None
+        pool = SessionPool(SERVER, self.server_config, lambda driver, server: adapter.login(driver, server), config)
+        adapter = KingdeeAdapter(SERVER, pool=pool)
+        return adapter
+
+    def open_entity(self, driver, entity: str) -> None:
+        from erp_ui_adapter.operations.navigation import open_menu
+        open_menu(driver, ENTITIES[entity]["menu"])
+
+
+def percentiles(samples_ms: Sequence[float], prefix: str) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {}
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {f"{prefix}_p50_ms": round(statistics.median(ordered), 3), f"{prefix}_p99_ms": round(at(0.99), 3)}
+
+
+def timed_ms(func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def supplier_fields(i: int) -> Dict[str, str]:
+    return {"编码": f"B{i:06d}", "名称": f"基准供应商{i}", "联系人": "张三", "电话": f"138{i:08d}"}
+
+
+def order_rows(count: int, invalid_every: int = 0) -> List[Dict[str, str]]:
+    """采购订单分录行；invalid_every > 0 时每隔若干行放一行日期格式错误的数据，测回退路径。"""
+    rows = []
+    for i in range(count):
+        bad = invalid_every and i % invalid_every == invalid_every - 1
+        rows.append({"物料编码": f"M{i:06d}", "物料名称": f"物料{i}", "数量": str(i % 50 + 1),
+                     "单价": f"{(i % 97) + 0.5:.2f}", "交货日期": "2026/13/01" if bad else "2026-11-01"})
+    return rows
+
+
+# ---------------- 场景 ----------------
+
+Scenario = Callable[[BenchContext], Dict[str, Any]]
+SCENARIOS: Dict[str, Scenario] = {}
+
+
+def scenario(name: str) -> Callable[[Scenario], Scenario]:
+    def decorator(func: Scenario) -> Scenario:
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+
+@scenario("login")
+def bench_login(ctx: BenchContext) -> Dict[str, Any]:
+    """全新浏览器中完成登录（含关闭公告）的耗时。"""
+    adapter = ctx.new_adapter()
+    driver = ctx.new_driver()
+    samples = []
+    try:
+        for _ in range(ctx.args.repeat):
+            driver.delete_all_cookies()
+            samples.append(timed_ms(lambda: adapter.login(driver, ctx.server_config)))
+    finally:
+        driver.quit()
+    return percentiles(samples, "login")
+
+
+@scenario("form_entry")
+def bench_form_entry(ctx: BenchContext) -> Dict[str, Any]:
+    """逐条打开菜单、新增、逐字段填写并保存供应商，即 create 任务的完整路径。"""
+    adapter = ctx.new_adapter()
+    menu = ENTITIES["supplier"]["menu"]
+    count = ctx.args.records
+    before = ctx.server.state.stats()["records"]["supplier"]
+    samples = []
+    try:
+        with adapter.session() as driver:
+            for i in range(count):
+                samples.append(timed_ms(lambda: adapter.create_record(driver, menu, supplier_fields(i))))
+    finally:
+        adapter.pool.close()
+    saved = ctx.server.state.stats()["records"]["supplier"] - before
+    macros = adapter.macros.stats
+    return {"records": count, "saved": saved, "records_per_min": round(saved * 60_000 / sum(samples), 2),
+            "macro_replays": macros.replayed, "macro_fallbacks": macros.fallbacks,
+            **percentiles(samples, "create_record")}
+
+
+def _bulk(ctx: BenchContext, mode_name: str) -> Dict[str, Any]:
+    from erp_ui_adapter.adapters.kingdee_adapter import KingdeeAdapter
+    from erp_ui_adapter.operations.table import BulkEntry, EntryMode, RowStatus
+
+    from mock_erp.server import validate_line
+
+    adapter = ctx.new_adapter()
+    rows = order_rows(ctx.args.rows, ctx.args.invalid_every)
+    ctx.server.state.reset()
+    try:
+        with adapter.session() as driver:
+            ctx.open_entity(driver, "purchase_order")
+            entry = BulkEntry(driver, KingdeeAdapter.GRID, ctx.args.batch_size)
+            report = entry.fill(rows, mode=EntryMode(mode_name))
+    finally:
+        adapter.pool.close()
+    # 以模拟 ERP 实际保存的分录核对结果：合法行必须原样保存、非法行不能保存，且报告与之一致
+    saved = ctx.server.state.saved_lines()
+    expected = [row for row in rows if validate_line(row) is None]
+    succeeded = {r.index for r in report.rows if r.status != RowStatus.FAILED}
+    correct = saved == expected and succeeded == {i for i, row in enumerate(rows) if validate_line(row) is None}
+    return {"rows": len(rows), "saved": len(saved), "failed": len(report.failed_rows), "correct": correct,
+            "rows_per_min": round(len(saved) * 60.0 / (report.finished_at - report.started_at), 2),
+            "fallback_rate": round(report.count(RowStatus.FALLBACK) / len(rows), 4) if rows else 0.0}
+
+
+@scenario("bulk_paste")
+def bench_bulk_paste(ctx: BenchContext) -> Dict[str, Any]:
+    """分录表格按批粘贴 TSV，校验失败的行逐格回退。"""
+    return _bulk(ctx, "paste")
+
+
+@scenario("bulk_import")
+def bench_bulk_import(ctx: BenchContext) -> Dict[str, Any]:
+    """同一批分录走“引入”对话框整体导入，被拒的行追加到表格末尾逐格回退。"""
+    return _bulk(ctx, "import")
+
+
+@scenario("bulk_per_row")
+def bench_bulk_per_row(ctx: BenchContext) -> Dict[str, Any]:
+    """同一批分录逐行逐格录入，作为粘贴的对照。"""
+    return _bulk(ctx, "per_row")
+
+
+@scenario("locate")
+def bench_locate(ctx: BenchContext) -> Dict[str, Any]:
+    """40 个字段的物料表单上，XPath 逐个定位 vs 一次 DOM 快照后走索引定位。"""
+    from selenium.webdriver.common.by import By
+
+    from erp_dom_analyzer.component_recognizer import ComponentRecognizer
+    from erp_dom_analyzer.dom_parser import DOMParser
+    from erp_ui_adapter.operations.form import find_field
+    from erp_ui_adapter.operations.navigation import click_text
+
+    adapter = ctx.new_adapter()
+    labels = ENTITIES["material"]["fields"]
+    xpath_samples: List[float] = []
+    index_samples: List[float] = []
+    snapshot_samples: List[float] = []
+    misses = 0
+    try:
+        with adapter.session() as driver:
+            ctx.open_entity(driver, "material")
+            click_text(driver, adapter.NEW_BUTTON_TEXT)
+            for _ in range(ctx.args.repeat):
+                for label in labels:
+                    xpath_samples.append(timed_ms(lambda: find_field(driver, label)))
+                parser = DOMParser(driver)
+                holder: Dict[str, Any] = {}
+                snapshot_samples.append(timed_ms(
+                    lambda: holder.update(recognizer=ComponentRecognizer(parser.snapshot().build_index()))))
+                recognizer = holder["recognizer"]
+                for label in labels:
+                    start = time.perf_counter()
+                    row = recognizer.find_field(label)
+                    index_samples.append((time.perf_counter() - start) * 1000)
+                    misses += row is None
+            inputs = len(driver.find_elements(By.CSS_SELECTOR, ".kd-form input"))
+    finally:
+        adapter.pool.close()
+    return {"fields": len(labels), "inputs": inputs, "index_misses": misses,
+            **percentiles(xpath_samples, "locate_xpath"), **percentiles(index_samples, "locate_index"),
+            **percentiles(snapshot_samples, "snapshot_index")}
+
+
+@scenario("dom_parse")
+def bench_dom_parse(ctx: BenchContext) -> Dict[str, Any]:
+    """大表格页面（可选放进 iframe）上的全量 DOM 抽取：对象快照与列式表两种形式。"""
+    from erp_dom_analyzer.dom_parser import DOMParser
+    from erp_ui_adapter.operations.navigation import wait_for_ready
+
+    driver = ctx.new_driver()
+    metrics: Dict[str, Any] = {}
+    try:
+        for iframe in (0, 1):
+            suffix = "_iframe" if iframe else ""
+            driver.get(ctx.server.page_url("bigpage.html", rows=ctx.args.rows, cols=10, iframe=iframe))
+            wait_for_ready(driver, 60.0)
+            parser = DOMParser(driver)
+            elements = len(parser.snapshot())
+            metrics[f"elements{suffix}"] = elements
+            metrics.update(percentiles([timed_ms(parser.snapshot) for _ in range(ctx.args.repeat)],
+                                       f"snapshot{suffix}"))
+            metrics.update(percentiles([timed_ms(parser.snapshot_table) for _ in range(ctx.args.repeat)],
+                                       f"snapshot_table{suffix}"))
+    finally:
+        driver.quit()
+    return metrics
+
+
+@scenario("export")
+def bench_export(ctx: BenchContext) -> Dict[str, Any]:
+    """分页报表（放在 iframe 中）逐页流式导出：CSV，以及装了 pyarrow 时的 Parquet。"""
+    import tempfile
+
+    from erp_ui_adapter.adapters.kingdee_adapter import KingdeeAdapter
+    from erp_ui_adapter.operations.export import GridExporter, resolve_format
+    from erp_ui_adapter.operations.navigation import wait_for_ready
+    from erp_ui_adapter.utils.driver_utils import frame_context
+
+    driver = ctx.new_driver()
+    metrics: Dict[str, Any] = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ("report.csv", "report.parquet"):
+                if f"{resolve_format(name)[0]}_rows" in metrics:
+                    continue  # 未安装 pyarrow 时 Parquet 回退为 CSV，不重复测
+                driver.get(ctx.server.page_url("report.html", rows=ctx.args.rows * 10, size=500, iframe=1))
+                frame_context(driver).forget()
+                wait_for_ready(driver, 60.0)
+                report = GridExporter(driver, KingdeeAdapter.GRID, 60.0).export(Path(tmp) / name)
+                metrics[f"{report.format}_rows"] = report.rows
+                metrics[f"{report.format}_pages"] = report.pages
+                metrics[f"{report.format}_rows_per_min"] = round(report.rows_per_minute, 2)
+    finally:
+        driver.quit()
+    return metrics
+
+
+@scenario("navigation")
+def bench_navigation(ctx: BenchContext) -> Dict[str, Any]:
+    """在供应商列表和采购订单之间来回切换，测菜单导航和页面就绪等待。"""
+    from erp_ui_adapter.operations.navigation import wait_engine
+
+    adapter = ctx.new_adapter()
+    samples = []
+    wait_engine.reset()
+    try:
+        with adapter.session() as driver:
+            for i in range(ctx.args.repeat * 2):
+                entity = "supplier" if i % 2 == 0 else "purchase_order"
+                samples.append(timed_ms(lambda: ctx.open_entity(driver, entity)))
+    finally:
+        adapter.pool.close()
+    waits = [h for h in wait_engine.histograms().values()]
+    count = sum(h.count for h in waits)
+    return {"wait_mean_ms": round(sum(h.total_ms for h in waits) / count, 3) if count else 0.0,
+            "wait_timeouts": sum(h.timeouts for h in waits), **percentiles(samples, "open_menu")}
+
+
+@scenario("vision")
+def bench_vision(ctx: BenchContext) -> Dict[str, Any]:
+    """以列表工具栏的刷新图标为模板做截图匹配定位；没有 opencv / Pillow 时跳过。"""
+    try:
+        import numpy  # noqa: F401
+        try:
+            import cv2  # noqa: F401
+        except ImportError:
+            import PIL  # noqa: F401
+    except ImportError:
+        return {"skipped": "未安装 vision 可选依赖（numpy + opencv 或 Pillow）"}
+    from selenium.webdriver.common.by import By
+
+    from erp_vision_analyzer.element_locator import ElementLocator
+    from erp_vision_analyzer.screenshot_analyzer import grab_frame
+    from erp_vision_analyzer.visual_matcher import Template
+
+    adapter = ctx.new_adapter()
+    samples = []
+    hits = 0
+    try:
+        with adapter.session() as driver:
+            ctx.open_entity(driver, "supplier")
+            icon = driver.find_element(By.CSS_SELECTOR, ".kd-icon-btn")
+            ratio = driver.execute_script("return window.devicePixelRatio") or 1
+            frame = grab_frame(driver)
+            r = {k: int(v * ratio) for k, v in icon.rect.items()}
+            template = Template("refresh", frame[r["y"]:r["y"] + r["height"], r["x"]:r["x"] + r["width"]].copy())
+            locator = ElementLocator([template])
+            try:
+                for _ in range(ctx.args.repeat):
+                    start = time.perf_counter()
+                    hits += locator.locate(driver, "refresh") is not None
+                    samples.append((time.perf_counter() - start) * 1000)
+            finally:
+                locator.close()
+    finally:
+        adapter.pool.close()
+    return {"hit_rate": round(hits / len(samples), 4) if samples else 0.0, **percentiles(samples, "vision_locate")}
+
+
+@scenario("engine")
+def bench_engine(ctx: BenchContext) -> Dict[str, Any]:
+    """编排器 + 任务执行器按蓝图并行新增供应商，浏览器数为 --browsers。"""
+    from erp_core.models.blueprint import parse_blueprint
+    from erp_core.models.task import TaskStatus
+    from erp_deploy_engine.orchestrator import Orchestrator
+    from erp_deploy_engine.task_executor import TaskExecutor
+
+    browsers = ctx.args.browsers
+    adapter = ctx.new_adapter(browsers)
+    offset = 500_000  # 与 form_entry 的编码错开
+    steps = [{"id": f"s{i:05d}", "action": "create", "entity": "supplier", "menu": ENTITIES["supplier"]["menu"],
+              "server": SERVER, "key": supplier_fields(offset + i)["编码"], "fields": supplier_fields(offset + i)}
+             for i in range(ctx.args.records)]
+    blueprint = parse_blueprint(json.dumps({
+        "name": "bench_engine", "company": "bench", "erp_type": "kingdee",
+        "concurrency": {"max_workers": browsers}, "steps": steps}, ensure_ascii=False))
+    try:
+        adapter.pool.warm_up(browsers)
+        report = Orchestrator(TaskExecutor("kingdee", adapters={SERVER: adapter}), max_workers=browsers).run(blueprint)
+    finally:
+        adapter.pool.close()
+    elapsed = report.finished_at - report.started_at
+    succeeded = report.count(TaskStatus.SUCCEEDED)
+    return {"browsers": browsers, "tasks": len(steps), "succeeded": succeeded,
+            "tasks_per_min": round(succeeded * 60 / elapsed, 2) if elapsed > 0 else 0.0}
+
+
+# ---------------- 运行与比较 ----------------
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenarios(names: Sequence[str], args: argparse.Namespace) -> Dict[str, Any]:
+    """依次运行场景；单个场景失败只记录错误，不影响其余场景。"""
+    results: Dict[str, Any] = {
+        "meta": {"commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                 "time": datetime.now().isoformat(timespec="seconds"), "latency_ms": args.latency_ms,
+                 "mask_ms": args.mask_ms, "params": {k: getattr(args, k) for k in
+                                                     ("repeat", "records", "rows", "batch_size", "browsers")}},
+        "scenarios": {},
+    }
+    with MockErpServer(latency_ms=args.latency_ms, mask_ms=args.mask_ms) as server:
+        ctx = BenchContext(server, args)
+        print(f"模拟 ERP: {server.url}")
+        for name in names:
+            server.state.reset()
+            start = time.perf_counter()
+            try:
+                entry = {"metrics": SCENARIOS[name](ctx), "error": None}
+            except Exception as e:
+                entry = {"metrics": {}, "error": f"{type(e).__name__}: {e}"}
+                if args.verbose:
+                    traceback.print_exc()
+            entry["seconds"] = round(time.perf_counter() - start, 3)
+            results["scenarios"][name] = entry
+            status = "❌ " + entry["error"].splitlines()[0] if entry["error"] else "✅"
+            print(f"{name:<14} {entry['seconds']:>8.1f}s  {status}")
+            for key, value in entry["metrics"].items():
+                print(f"    {key:<28} {value}")
+    return results
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """返回相对基线退化超过 threshold（比例）的指标说明。"""
+    regressions = []
+    print(f"\n与基线比较（{baseline['meta'].get('commit')} @ {baseline['meta'].get('time')}，阈值 {threshold:.0%}）")
+    for name, entry in current["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            continue
+        if entry["error"] and not old["error"]:
+            regressions.append(f"{name}: 基线成功，本次失败 ({entry['error']})")
+            continue
+        for key, value in entry["metrics"].items():
+            before = old["metrics"].get(key)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)) or not before:
+                continue
+            if key.endswith(HIGHER_IS_BETTER):
+                change = (before - value) / before
+            elif key.endswith(LOWER_IS_BETTER):
+                change = (value - before) / before
+            else:
+                continue
+            mark = "❌" if change > threshold else ("✅" if change < -threshold else "  ")
+            print(f"  {mark} {name}.{key:<28} {before:>12} → {value:<12} ({(value - before) / before:+.1%})")
+            if change > threshold:
+                regressions.append(f"{name}.{key}: {before} → {value}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="基于本地模拟 ERP 的端到端基准测试")
+    parser.add_argument("scenarios", nargs="*", help=f"要运行的场景，默认全部: {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=20, help="定位 / 登录 / 导航等场景的重复次数")
+    parser.add_argument("--records", type=int, default=30, help="form_entry / engine 新增的记录数")
+    parser.add_argument("--rows", type=int, default=1000, help="批量录入的分录行数、大页面的表格行数；export 导出其 10 倍行数")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--invalid-every", type=int, default=50, help="每隔多少行放一行非法数据，0 表示全部合法")
+    parser.add_argument("--browsers", type=int, default=2, help="engine 场景的浏览器数")
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="模拟 ERP 接口延迟")
+    parser.add_argument("--mask-ms", type=float, default=120.0, help="模拟 ERP 加载遮罩时长")
+    parser.add_argument("--headed", action="store_true", help="显示浏览器窗口")
+    parser.add_argument("--output", default=None, help=f"结果 JSON 路径，默认 {RESULTS_DIR}/<时间>.json")
+    parser.add_argument("--baseline", default=None, help="与之比较的历史结果 JSON")
+    parser.add_argument("--threshold", type=float, default=0.10, help="判定退化的相对变化比例")
+    parser.add_argument("--compare", default=None, help="不运行，只把该结果文件与 --baseline 比较")
+    parser.add_argument("-v", "--verbose", action="store_true", help="打印场景失败的完整堆栈")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+
+    if args.compare:
+        if not args.baseline:
+            parser.error("--compare 需要同时给出 --baseline")
+        results = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+    else:
+        from erp_core.logging import setup_logging
+        setup_logging()
+        results = run_scenarios(args.scenarios or list(SCENARIOS), args)
+        output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n结果已写入 {output}")
+
+    failed = [name for name, entry in results["scenarios"].items() if entry["error"]]
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text(encoding="utf-8")), args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 项指标退化:")
+            for line in regressions:
+                print(f"    {line}")
+            return 1
+        print("\n✅ 没有超过阈值的退化")
+    return 1 if failed and not args.compare else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
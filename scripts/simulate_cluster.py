@@ -0,0 +1,210 @@
+# # --PROJECT-COMMENT-BLOCK--
+# File Path: simulate_cluster.py
+# Author:
+# Create Date:
+# Description: 在本机用多进程模拟分布式部署：启动 --cluster 模式的部署引擎和 N 个适配器 worker 进程，
+#              worker 用文件模拟 ERP（每条记录一个文件），提交合成蓝图后在运行途中 SIGKILL 一个 worker，
+#              检查所有任务都成功、每条记录恰好写入一次，并统计重新分配的租约。
+#              用法: python scripts/simulate_cluster.py [--nodes 4] [--slots 2] [--tasks 120] [--kill 1]
+# # --PROJECT-COMMENT-BLOCK--
+
+import argparse
+import contextlib
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Sequence
+
+SRC = Path(__file__).resolve().parent.parent / "services" / "python_adapter_py" / "src"
+sys.path.insert(0, str(SRC))
+
+ERP_TYPE = "kingdee"
+SERVER = "SIM"
+
+
+class FileErpAdapter:
+    """
+    用目录模拟 ERP：create_record 在耗时中途写入记录文件（模拟"已保存但还没返回"的窗口），
+    每次写入和确认都追加到 ops.log，供主进程核对是否有重复写入。
+    """
+
+    def __init__(self, store: Path, task_seconds: float):
+        self.store = store
+        self.task_seconds = task_seconds
+        self.log = store / "ops.log"
+
+    @contextlib.contextmanager
+    def session(self, timeout=None) -> Iterator[None]:
+        yield None
+
+    def create_record(self, driver, menu: Sequence[str], fields: Mapping[str, Any]) -> None:
+        key = fields["编码"]
+        time.sleep(self.task_seconds / 2)
+        fd = os.open(self.store / f"{key}.rec", os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(fd)
+        self._log("create", key)
+        time.sleep(self.task_seconds / 2)
+
+    def record_exists(self, driver, menu: Sequence[str], key: str) -> bool:
+        exists = (self.store / f"{key}.rec").exists()
+        self._log("verify-found" if exists else "verify-missing", key)
+        return exists
+
+    def _log(self, op: str, key: str) -> None:
+        # O_APPEND 的单次小写入在多进程间是原子的
+        with open(self.log, "a", encoding="utf-8") as f:
+            f.write(f"{op} {key} {os.getpid()}\n")
+
+
+def run_node(args: argparse.Namespace) -> int:
+    from erp_core.logging import setup_logging
+    from erp_deploy_engine.task_executor import TaskExecutor
+    from erp_deploy_engine.worker import run_worker
+
+    setup_logging()
+    adapter = FileErpAdapter(Path(args.store), args.task_seconds)
+    run_worker(args.engine, args.slots, [ERP_TYPE],
+               executor_factory=lambda erp_type: TaskExecutor(erp_type, adapters={SERVER: adapter}),
+               hostname=f"sim-node-{args.index}", poll_seconds=2.0)
+    return 0
+
+
+def make_blueprint(tasks: int) -> str:
+    """合成蓝图：每 10 个记录一组，组内第一条是其余记录的上游，形成两层依赖。"""
+    lines = ["name: simulated_cluster", "company: sim", f"erp_type: {ERP_TYPE}",
+             "concurrency:", "  max_workers: 64", "steps:"]
+    for i in range(tasks):
+        head = i - i % 10
+        lines += [f"  - id: t{i:05d}", "    action: create", f"    server: {SERVER}", f"    key: R{i:05d}",
+                  "    fields:", f"      编码: R{i:05d}"]
+        if i != head:
+            lines.append(f"      上级: R{head:05d}")
+    return "\n".join(lines) + "\n"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn(argv: List[str], log: Path) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC), env.get("PYTHONPATH")]))
+    return subprocess.Popen([sys.executable, *argv], env=env, stdout=log.open("w"), stderr=subprocess.STDOUT)
+
+
+def run_simulation(args: argparse.Namespace) -> int:
+    import grpc
+
+    from erp_deploy_engine.rpc import common_pb2, engine_api_pb2, engine_api_pb2_grpc
+
+    work = Path(tempfile.mkdtemp(prefix="erp-cluster-"))
+    store = work / "erp"
+    store.mkdir()
+    address = f"127.0.0.1:{free_port()}"
+    print(f"工作目录 {work}，引擎 {address}，{args.nodes} 个节点 × {args.slots} 槽位，{args.tasks} 个任务")
+
+    engine = spawn(["-m", "erp_deploy_engine", "serve", "--cluster", "--address", address,
+                    "--worker-slots", str(args.nodes * args.slots), "--lease-ttl", str(args.lease_ttl),
+                    "--heartbeat-interval", str(args.lease_ttl / 4)], work / "engine.log")
+    nodes: Dict[int, subprocess.Popen] = {}
+    channel = grpc.insecure_channel(address)
+    try:
+        grpc.channel_ready_future(channel).result(timeout=30)
+        for i in range(args.nodes):
+            nodes[i] = spawn([__file__, "node", "--engine", address, "--store", str(store), "--index", str(i),
+                              "--slots", str(args.slots), "--task-seconds", str(args.task_seconds)],
+                             work / f"node-{i}.log")
+
+        stub = engine_api_pb2_grpc.EngineServiceStub(channel)
+        start = time.perf_counter()
+        job_id = stub.SubmitBlueprint(engine_api_pb2.SubmitBlueprintRequest(
+            blueprint_yaml=make_blueprint(args.tasks))).job_id
+        states: Dict[str, int] = {}
+        killed: List[int] = []
+        for event in stub.StreamJobEvents(engine_api_pb2.StreamJobEventsRequest(job_id=job_id)):
+            if event.HasField("task") and event.task.state != common_pb2.TASK_RUNNING:
+                states[event.task.task_id] = event.task.state
+            # 完成约三分之一后杀掉节点；随机延迟一段，让有的任务停在写入之前、有的停在写入之后
+            if len(killed) < args.kill and event.completed >= args.tasks // 3:
+                victim = len(killed)
+                killed.append(victim)
+                threading.Timer(random.uniform(0, args.task_seconds), nodes[victim].send_signal,
+                                (signal.SIGKILL,)).start()
+                print(f"SIGKILL 节点 {victim}（已完成 {event.completed}/{event.total}）")
+            if event.job_state in (common_pb2.JOB_COMPLETED, common_pb2.JOB_FAILED, common_pb2.JOB_CANCELLED):
+                break
+        elapsed = time.perf_counter() - start
+    finally:
+        for i, node in nodes.items():
+            if node.poll() is None:
+                node.send_signal(signal.SIGTERM)
+        for node in nodes.values():
+            node.wait(timeout=30)
+        engine.send_signal(signal.SIGINT)
+        engine.wait(timeout=30)
+        channel.close()
+
+    ops = [line.split() for line in (store / "ops.log").read_text(encoding="utf-8").splitlines()]
+    creates = Counter(key for op, key, _ in ops if op == "create")
+    verified = Counter(op for op, _, _ in ops if op.startswith("verify"))
+    succeeded = sum(1 for state in states.values() if state == common_pb2.TASK_SUCCEEDED)
+    duplicates = sorted(key for key, n in creates.items() if n > 1)
+    missing = [f"R{i:05d}" for i in range(args.tasks) if not (store / f"R{i:05d}.rec").exists()]
+
+    print(f"\n耗时 {elapsed:.1f}s，吞吐 {args.tasks / elapsed:.1f} 任务/s")
+    print(f"成功 {succeeded}/{args.tasks}，写入 {sum(creates.values())} 次，"
+          f"重新分配后确认 {sum(verified.values())} 次（已写入 {verified['verify-found']}，"
+          f"未写入 {verified['verify-missing']}）")
+    problems = []
+    if succeeded != args.tasks:
+        problems.append(f"{args.tasks - succeeded} 个任务未成功")
+    if duplicates:
+        problems.append(f"重复写入: {', '.join(duplicates[:10])}")
+    if missing:
+        problems.append(f"缺少记录: {', '.join(missing[:10])}")
+    if args.kill and not verified:
+        problems.append("被杀节点没有留下需要重新分配的租约，可增大 --task-seconds 后重试")
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ 所有任务恰好执行一次")
+    print(f"日志: {work}")
+    return 1 if problems else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="本机多进程模拟分布式适配器 worker")
+    sub = parser.add_subparsers(dest="command")
+    node = sub.add_parser("node", help="（内部使用）运行一个模拟 worker 节点")
+    node.add_argument("--engine", required=True)
+    node.add_argument("--store", required=True)
+    node.add_argument("--index", type=int, default=0)
+    node.add_argument("--slots", type=int, default=2)
+    node.add_argument("--task-seconds", type=float, default=0.5)
+
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--slots", type=int, default=2, help="每个节点的浏览器槽位数")
+    parser.add_argument("--tasks", type=int, default=120)
+    parser.add_argument("--task-seconds", type=float, default=0.5, help="每个模拟写入的耗时")
+    parser.add_argument("--kill", type=int, default=1, help="运行途中 SIGKILL 的节点数")
+    parser.add_argument("--lease-ttl", type=float, default=4.0)
+    args = parser.parse_args()
+    if args.command == "node":
+        return run_node(args)
+    if args.kill >= args.nodes:
+        parser.error("--kill 必须小于 --nodes")
+    return run_simulation(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
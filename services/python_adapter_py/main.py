@@ -1 +1,10 @@
-print("Hello, Python!")
\ No newline at end of file
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+
+from erp_deploy_engine.__main__ import main  # noqa: E402
+
+if __name__ == "__main__":
+    # 适配器节点入口：默认作为 worker 连接部署引擎，参数同 python -m erp_deploy_engine worker
+    sys.exit(main(["worker", *sys.argv[1:]]))
@@ -0,0 +1,16 @@
+# 子模块依赖 requests / selenium，按需导入
+from erp_core.lazy import lazy_exports
+
+_EXPORTS = {
+    "LLMStats": "llm_connector",
+    "OllamaConnector": "llm_connector",
+    "get_connector": "llm_connector",
+    "Decision": "decision_maker",
+    "DecisionMaker": "decision_maker",
+    "FusionLocator": "fusion_locator",
+    "Locator": "fusion_locator",
+    "LocatorCache": "fusion_locator",
+}
+
+__all__ = sorted(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence
+
+from erp_ai_core.llm_connector import OllamaConnector, get_connector
+from erp_ai_core.prompt_library.analyze_form import describe_fields
+from erp_core.exceptions import LLMError
+from erp_core.models.dom_element import DOMElement
+
+ACTIONS = ("click", "fill", "select", "wait", "done")
+
+SYSTEM_PROMPT = "你是 ERP 操作助手，根据目标和当前界面决定下一步操作，只输出 JSON。"
+
+# 字段顺序有意安排：必需字段在前、说明在最后，必需字段到齐后即可取消生成，不必等模型写完说明
+DECIDE_PROMPT = """目标：{goal}
+
+当前界面的输入控件（标签 | 类型 | name）：
+{fields}
+
+当前界面的按钮：
+{buttons}
+{history}
+请决定下一步操作，输出 JSON 对象，按以下顺序给出字段：
+{{"action": "{actions} 之一", "target": "控件标签或按钮文本", "value": "要填写的值，没有则为空字符串", "reason": "一句话说明"}}"""
+
+REQUIRED_FIELDS = ("action", "target", "value")
+
+
+@dataclass
+class Decision:
+    action: str
+    target: str
+    value: str = ""
+    reason: str = ""
+
+
+class DecisionMaker:
+    """让本地模型根据界面快照决定下一步操作；流式解析，必需字段到齐即停止生成。"""
+
+    def __init__(self, connector: Optional[OllamaConnector] = None):
+        self.connector = connector or get_connector()
+
+    def decide(self, goal: str, elements: Iterable[DOMElement], history: Sequence[str] = ()) -> Decision:
+        elements = list(elements)
+        fields = describe_fields(e for e in elements if e.tag in ("input", "textarea", "select"))
+        buttons = sorted({" ".join(e.text.split()) for e in elements
+                          if e.visible and e.text and (e.tag in ("button", "a") or e.role == "button")})
+        prompt = DECIDE_PROMPT.format(
+            goal=goal,
+            fields="\n".join(fields) or "（无）",
+            buttons="、".join(buttons) or "（无）",
+            history="\n已执行的操作：\n" + "\n".join(history) + "\n" if history else "",
+            actions=" / ".join(ACTIONS),
+        )
+        result = self.connector.generate_json(prompt, required=REQUIRED_FIELDS, system=SYSTEM_PROMPT,
+                                              options={"temperature": 0})
+        action = str(result["action"]).strip().lower()
+        if action not in ACTIONS:
+            raise LLMError(f"模型给出了未知操作 '{action}'")
+        return Decision(action, str(result["target"]), str(result.get("value") or ""),
+                        str(result.get("reason") or ""))
@@ -0,0 +1,333 @@
+import dataclasses
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from erp_core.logging import get_logger
+from erp_core.models.dom_element import DOMElement
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_PATH = Path(".cache") / "locators.sqlite3"
+
+# 看起来是框架自动生成、每次加载都会变的 id，不能作为稳定选择器
+_VOLATILE_ID = re.compile(r"(\d{4,}|[0-9a-f]{8,}|^ext-|^ember|^react|^el-id-)", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Locator:
+    """可重放的元素定位方式。frame_path 与 DOMElement.frame_path 含义相同。"""
+    by: str                      # "css" / "xpath"
+    value: str
+    frame_path: Tuple[str, ...] = ()
+
+    def to_dict(self) -> dict:
+        return {"by": self.by, "value": self.value, "frame_path": list(self.frame_path)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Locator":
+        return cls(data["by"], data["value"], tuple(data.get("frame_path", ())))
+
+
+def locators_for(element: DOMElement) -> List[Locator]:
+    """为快照中的元素生成由稳定到不稳定排列的候选定位方式。"""
+    frame = element.frame_path
+    attrs = element.attributes
+    candidates: List[Locator] = []
+    element_id = attrs.get("id")
+    if element_id and not _VOLATILE_ID.search(element_id):
+        candidates.append(Locator("css", f"{element.tag}#{_css_escape(element_id)}", frame))
+    for key in ("data-field", "data-key", "name"):
+        value = attrs.get(key)
+        if value:
+            candidates.append(Locator("css", _attribute_selector(element.tag, key, value), frame))
+    for key in ("aria-label", "placeholder", "title"):
+        value = attrs.get(key)
+        if value:
+            candidates.append(Locator("css", _attribute_selector(element.tag, key, value), frame))
+    if element_id and _VOLATILE_ID.search(element_id):
+        candidates.append(Locator("css", f"{element.tag}#{_css_escape(element_id)}", frame))
+    return candidates
+
+
+def _attribute_selector(tag: str, key: str, value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'{tag}[{key}="{escaped}"]'
+
+
+def _css_escape(value: str) -> str:
+    return re.sub(r"([^\w-])", r"\\\1", value)
+
+
+# 一次往返校验多个候选：依次进入 frame / shadow root，返回第一个唯一且可见的候选下标，没有则返回 -1
+_VERIFY_JS = r"""
+const candidates = arguments[0];
+const resolveRoot = path => {
+    let root = document;
+    for (const step of path) {
+        const sep = step.indexOf(':');
+        const kind = step.slice(0, sep), css = step.slice(sep + 1);
+        const host = root.querySelector(css);
+        if (!host) return null;
+        root = kind === 'iframe' ? (host.contentDocument || null) : host.shadowRoot;
+        if (!root) return null;
+    }
+    return root;
+};
+for (let i = 0; i < candidates.length; i++) {
+    const c = candidates[i];
+    const root = resolveRoot(c.frame_path);
+    if (!root) continue;
+    let found = [];
+    try {
+        if (c.by === 'css') found = root.querySelectorAll(c.value);
+        else {
+            const doc = root.ownerDocument || root;
+            const snap = doc.evaluate(c.value, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            for (let j = 0; j < snap.snapshotLength; j++) found.push(snap.snapshotItem(j));
+        }
+    } catch (e) { continue; }
+    if (found.length !== 1) continue;
+    const r = found[0].getBoundingClientRect();
+    if (r.width > 0 && r.height > 0) return i;
+}
+return -1;
+"""
+
+# 页面指纹：路径 + 表单/页签/iframe 标识，不含查询串和数据。
+# 不含 document.title：ERP 的标题带单据编号和页签名，同一张表单每条记录都不同，缓存就永远不会命中
+_FINGERPRINT_JS = r"""
+const ids = new Set();
+const collect = doc => {
+    doc.querySelectorAll('form[id], form[name], [data-form-id], [data-page-id], [role=tab][aria-selected=true]')
+        .forEach(el => ids.add(el.id || el.getAttribute('name') || el.getAttribute('data-form-id')
+            || el.getAttribute('data-page-id') || el.textContent.trim()));
+    doc.querySelectorAll('iframe').forEach(f => {
+        try { ids.add('iframe:' + new URL(f.src, location.href).pathname); } catch (e) {}
+        try { if (f.contentDocument) collect(f.contentDocument); } catch (e) {}
+    });
+};
+collect(document);
+return [location.pathname, Array.from(ids).sort()];
+"""
+
+
+def page_fingerprint(driver: WebDriver) -> str:
+    """计算当前页面的结构指纹，同一界面在不同数据下保持不变。"""
+    parts = driver.execute_script(_FINGERPRINT_JS)
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def verify_candidates(driver: WebDriver, candidates: Sequence[Locator]) -> int:
+    """一次脚本调用校验所有候选，返回第一个有效候选的下标，没有则返回 -1。"""
+    if not candidates:
+        return -1
+    return driver.execute_script(_VERIFY_JS, [c.to_dict() for c in candidates])
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0                # 缓存命中且首选定位通过校验
+    healed: int = 0              # 首选失效，备选定位通过校验并被提升
+    misses: int = 0              # 缓存中没有记录
+    validation_failures: int = 0  # 有记录但所有候选都失效
+    resolutions: int = 0         # 调用解析策略（DOM / 视觉 / LLM）的次数
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.healed + self.misses + self.validation_failures
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.hits + self.healed) / self.lookups if self.lookups else 0.0
+
+
+class LocatorCache:
+    """
+    按 (ERP 产品, 版本, 页面指纹, 语义字段名) 持久化定位结果的 SQLite 缓存。
+    每条记录保存首选定位和备选定位，多线程共享同一个连接。
+    """
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS locators (
+                product TEXT NOT NULL,
+                version TEXT NOT NULL,
+                page TEXT NOT NULL,
+                field TEXT NOT NULL,
+                candidates TEXT NOT NULL,
+                strategy TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                heals INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (product, version, page, field)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, product: str, version: str, page: str, field: str) -> Optional[List[Locator]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT candidates FROM locators WHERE product=? AND version=? AND page=? AND field=?",
+                (product, version, page, field),
+            ).fetchone()
+        if row is None:
+            return None
+        return [Locator.from_dict(d) for d in json.loads(row[0])]
+
+    def put(self, product: str, version: str, page: str, field: str, candidates: Sequence[Locator],
+            strategy: str) -> None:
+        payload = json.dumps([c.to_dict() for c in candidates], ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO locators (product, version, page, field, candidates, strategy, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (product, version, page, field)
+                DO UPDATE SET candidates=excluded.candidates, strategy=excluded.strategy,
+                              updated_at=excluded.updated_at
+                """,
+                (product, version, page, field, payload, strategy, time.time()),
+            )
+            self._conn.commit()
+
+    def record_hit(self, product: str, version: str, page: str, field: str, healed: bool = False) -> None:
+        column = "heals" if healed else "hits"
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE locators SET {column} = {column} + 1 WHERE product=? AND version=? AND page=? AND field=?",
+                (product, version, page, field),
+            )
+            self._conn.commit()
+
+    def delete(self, product: str, version: str, page: str, field: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM locators WHERE product=? AND version=? AND page=? AND field=?",
+                               (product, version, page, field))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LocatorStrategy(ABC):
+    """定位策略基类：把语义字段名解析为候选定位，按可信度从高到低排列。"""
+
+    name = "base"
+
+    @abstractmethod
+    def resolve(self, driver: WebDriver, field: str) -> List[Locator]:
+        """返回候选定位；无法解析时返回空列表。"""
+
+
+class DomLocatorStrategy(LocatorStrategy):
+    """基于一次性 DOM 快照和组件识别的定位，最便宜，优先使用。"""
+
+    name = "dom"
+
+    def resolve(self, driver: WebDriver, field: str) -> List[Locator]:
+        from erp_dom_analyzer.component_recognizer import ComponentRecognizer
+        from erp_dom_analyzer.dom_parser import DOMParser
+        from erp_dom_analyzer.element_index import ElementIndex
+
+        index = ElementIndex(DOMParser(driver).snapshot_table())
+        recognizer = ComponentRecognizer(index)
+        row = recognizer.find_field(field)
+        if row is None:
+            row = recognizer.find_button(field)
+        if row is None:
+            return []
+        return locators_for(index.table.element(row))
+
+
+class FusionLocator:
+    """
+    融合定位器：先查持久化缓存并用一次脚本调用校验，缓存失效时才依次调用解析策略。
+
+    策略按成本从低到高排列（DOM -> 视觉 -> LLM），第一个给出有效候选的策略胜出，
+    其结果作为首选、其余候选作为备选写回缓存；热启动时不会触发任何 LLM 调用。
+    """
+
+    def __init__(self, product: str, version: str = "default", cache: Optional[LocatorCache] = None,
+                 strategies: Optional[Sequence[LocatorStrategy]] = None):
+        self.product = product
+        self.version = version
+        self.cache = cache or LocatorCache()
+        self.strategies: List[LocatorStrategy] = list(strategies or [DomLocatorStrategy()])
+        self._stats = CacheStats()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._stats_lock:
+            return dataclasses.replace(self._stats)
+
+    def locate(self, driver: WebDriver, field: str, page: Optional[str] = None) -> Optional[Locator]:
+        """返回字段的有效定位；所有策略都失败时返回 None。"""
+        page = page or page_fingerprint(driver)
+        key = (self.product, self.version, page, field)
+
+        cached = self.cache.get(*key)
+        if cached is None:
+            self._count("misses")
+        else:
+            index = verify_candidates(driver, cached)
+            if index == 0:
+                self._count("hits")
+                self.cache.record_hit(*key)
+                return cached[0]
+            if index > 0:
+                # 自愈：把仍然有效的备选提升为首选
+                self._count("healed")
+                healed = [cached[index]] + cached[:index] + cached[index + 1:]
+                self.cache.put(*key, healed, "healed")
+                self.cache.record_hit(*key, healed=True)
+                logger.info("定位自愈: %s/%s 使用备选 %s", page, field, cached[index].value)
+                return healed[0]
+            self._count("validation_failures")
+            logger.info("缓存定位全部失效，重新解析: %s/%s", page, field)
+
+        return self._resolve(driver, key)
+
+    def invalidate(self, driver: WebDriver, field: str, page: Optional[str] = None) -> None:
+        """操作失败时调用，使下次 locate 重新解析。"""
+        self.cache.delete(self.product, self.version, page or page_fingerprint(driver), field)
+
+    def _resolve(self, driver: WebDriver, key: Tuple[str, str, str, str]) -> Optional[Locator]:
+        field = key[3]
+        for strategy in self.strategies:
+            self._count("resolutions")
+            try:
+                candidates = strategy.resolve(driver, field)
+            except Exception as e:
+                logger.warning("定位策略 %s 解析 '%s' 出错: %s", strategy.name, field, e)
+                continue
+            index = verify_candidates(driver, candidates)
+            if index < 0:
+                continue
+            ordered = [candidates[index]] + [c for i, c in enumerate(candidates) if i != index]
+            self.cache.put(*key, ordered, strategy.name)
+            return ordered[0]
+        logger.warning("所有定位策略都无法解析字段 '%s'", field)
+        return None
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            setattr(self._stats, name, getattr(self._stats, name) + 1)
@@ -0,0 +1,642 @@
+import dataclasses
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import requests
+
+from erp_core.config import LLMConfig
+from erp_core.exceptions import LLMError
+from erp_core.logging import get_logger, span, start_span, traced
+
+logger = get_logger(__name__)
+
+# 取模型版本（/api/tags）失败后，这段时间内沿用上次的版本，不再重复请求
+MODEL_VERSION_RETRY = 30.0
+
+_THINK_BLOCK = re.compile(r"<think>.*?</think>", re.DOTALL)
+_CODE_FENCE = re.compile(r"^```[\w-]*\s*|\s*```$")
+
+
+def strip_reasoning(text: str) -> str:
+    """去掉 qwen3 等模型输出的 <think> 推理块和外层代码围栏。"""
+    return _CODE_FENCE.sub("", _THINK_BLOCK.sub("", text).strip()).strip()
+
+
+class ThinkFilter:
+    """
+    流式去除 <think>...</think> 块。
+
+    推理内容边到达边丢弃，不做缓冲；只在分片边界处最多暂存一个不完整的标签前缀。
+    """
+    OPEN = "<think>"
+    CLOSE = "</think>"
+
+    def __init__(self):
+        self.inside = False
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        text, self._pending = self._pending + chunk, ""
+        out: List[str] = []
+        while text:
+            tag = self.CLOSE if self.inside else self.OPEN
+            index = text.find(tag)
+            if index >= 0:
+                if not self.inside:
+                    out.append(text[:index])
+                text = text[index + len(tag):]
+                self.inside = not self.inside
+                continue
+            keep = _partial_tag_length(text, tag)
+            if not self.inside:
+                out.append(text[:len(text) - keep])
+            self._pending = text[len(text) - keep:]
+            break
+        return "".join(out)
+
+    def flush(self) -> str:
+        text, self._pending = self._pending, ""
+        return "" if self.inside else text
+
+
+def _partial_tag_length(text: str, tag: str) -> int:
+    """text 末尾与 tag 前缀重合的最长长度（可能是被分片切开的标签）。"""
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class IncrementalJSONObject:
+    """
+    增量解析模型输出中的第一个 JSON 对象。
+
+    逐字符跟踪字符串/转义/嵌套深度，每当顶层的一个键值对结束（顶层逗号或右花括号）时
+    解析一次已收到的前缀，fields 因此总是已完整到达的顶层字段。对象前的代码围栏等内容被忽略。
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> bool:
+        """喂入一段文本，返回 fields 是否有更新。"""
+        updated = False
+        for ch in text:
+            if self.complete:
+                break
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._buffer.append(ch)
+                continue
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.complete = True
+                    updated = self._update("".join(self._buffer)) or updated
+            elif ch == "," and self._depth == 1:
+                updated = self._update("".join(self._buffer[:-1]) + "}") or updated
+        return updated
+
+    def has(self, names: Sequence[str]) -> bool:
+        return all(name in self.fields for name in names)
+
+    def _update(self, text: str) -> bool:
+        try:
+            value = json.loads(text)
+        except ValueError:
+            return False
+        if not isinstance(value, dict) or value == self.fields:
+            return False
+        self.fields = value
+        return True
+
+
+def cache_key(model_version: str, prompt: str, system: Optional[str] = None,
+              options: Optional[Dict[str, Any]] = None) -> str:
+    """内容寻址的缓存键：模型版本 + 系统提示 + 提示词 + 采样参数。"""
+    payload = json.dumps([model_version, system or "", prompt, options or {}],
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    两级响应缓存：内存 LRU + 磁盘（每个键一个 JSON 文件，按键前两位分目录）。
+    两级共用同一个 TTL；磁盘命中会回填内存。
+    """
+
+    def __init__(self, directory: Optional[Union[str, Path]] = None, ttl: float = 7 * 24 * 3600.0,
+                 memory_entries: int = 512):
+        self.directory = Path(directory) if directory else None
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    return entry[1]
+                del self._memory[key]
+        entry = self._read_disk(key)
+        if entry is None:
+            return None
+        if now - entry[0] > self.ttl:
+            self._remove_disk(key)
+            return None
+        self._remember(key, entry)
+        return entry[1]
+
+    def put(self, key: str, value: str) -> None:
+        entry = (time.time(), value)
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.directory and self.directory.exists():
+            for path in self.directory.glob("*/*.json"):
+                path.unlink(missing_ok=True)
+
+    def _remember(self, key: str, entry: Tuple[float, str]) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        if self.directory is None:
+            return None
+        try:
+            data = json.loads(self._path(key).read_text(encoding="utf-8"))
+            return data["created_at"], data["response"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key: str, entry: Tuple[float, str]) -> None:
+        if self.directory is None:
+            return
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再原子替换，多进程共享缓存目录时不会读到半个文件
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps({"created_at": entry[0], "response": entry[1]}, ensure_ascii=False),
+                           encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("写入 LLM 磁盘缓存失败: %s", e)
+
+    def _remove_disk(self, key: str) -> None:
+        if self.directory is not None:
+            self._path(key).unlink(missing_ok=True)
+
+
+class MicroBatcher:
+    """
+    把短时间内到达的小请求合并成一批交给 batch_fn 处理。
+
+    submit 立即返回 Future；后台线程在凑满 max_batch 个请求或等待超过 max_wait 秒后
+    调用 batch_fn(items)，它必须返回与 items 等长的结果列表。
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch: int = 16, max_wait: float = 0.05,
+                 name: str = "llm-batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: List[Tuple[Any, Future]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise LLMError("批处理队列已关闭")
+            self._pending.append((item, future))
+            self._cond.notify()
+        return future
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise LLMError(f"批处理返回 {len(results)} 个结果，期望 {len(items)} 个")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+@dataclass
+class LLMStats:
+    """连接器统计，stats 属性返回的是快照副本。"""
+    requests: int = 0            # 调用方发起的请求数（含分类请求）
+    cache_hits: int = 0
+    deduplicated: int = 0        # 与进行中的相同请求共享结果的次数
+    model_calls: int = 0         # 实际发给模型服务的请求数
+    batches: int = 0             # 合并后的分类批次数
+    batched_items: int = 0
+    model_seconds: float = 0.0
+    early_exits: int = 0         # 必需字段到齐后提前取消生成的次数
+
+    @property
+    def hit_rate(self) -> float:
+        return self.cache_hits / self.requests if self.requests else 0.0
+
+
+_CLASSIFY_BATCH_PROMPT = """请对下面每一条文本，从候选类别中选出最合适的一个。
+候选类别：{labels}
+
+{items}
+
+只输出一个 JSON 数组，按编号顺序给出每条文本的类别，例如 ["类别A", "类别B"]，不要输出任何解释。"""
+
+_CLASSIFY_SINGLE_PROMPT = """请从候选类别中为下面的文本选出最合适的一个。
+候选类别：{labels}
+
+文本：{text}
+
+只输出类别名称，不要输出任何解释。"""
+
+
+class OllamaConnector:
+    """
+    Ollama 本地模型服务的客户端。
+
+    - generate: 带缓存和进行中请求去重的文本生成，相同 (模型版本, 提示词, 参数) 只会调用一次模型；
+    - classify: 短文本分类，未命中缓存的请求经 MicroBatcher 合并成一次模型调用。
+
+    缓存键包含模型 digest，digest 每 config.version_ttl 秒重新查询一次，模型升级（ollama pull）后旧缓存随之失效。
+    """
+
+    def __init__(self, model: str, config: Optional[LLMConfig] = None, cache: Optional[ResponseCache] = None,
+                 session: Optional[requests.Session] = None):
+        self.model = model
+        self.config = config or LLMConfig()
+        self.base_url = self.config.url.rstrip("/")
+        self.cache = cache or ResponseCache(self.config.cache_dir, self.config.cache_ttl,
+                                            self.config.memory_entries)
+        self._http = session or requests.Session()
+        self._model_version: Optional[str] = None
+        self._version_expires = 0.0   # time.monotonic() 超过该值时重新查询 digest
+        self._version_lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._stats = LLMStats()
+        self._stats_lock = threading.Lock()
+        self._batchers: Dict[Tuple[str, ...], MicroBatcher] = {}
+        self._batchers_lock = threading.Lock()
+
+    @property
+    def stats(self) -> LLMStats:
+        with self._stats_lock:
+            return dataclasses.replace(self._stats)
+
+    @property
+    def model_version(self) -> str:
+        """
+        模型名 + digest（列表中没有该模型时为模型名），每 config.version_ttl 秒重新查询一次。
+        /api/tags 请求失败时沿用上次的版本：本进程取到过的，或者记在响应缓存里的上次运行的版本，
+        这样模型服务短暂不可用时已缓存的响应仍然可用；都没有时才退化为模型名。
+        失败后 MODEL_VERSION_RETRY 秒内不再重试，不会让每次调用都等一次请求超时。
+        """
+        with self._version_lock:
+            now = time.monotonic()
+            if self._model_version is not None and now < self._version_expires:
+                return self._model_version
+            version_key = cache_key("model-version", self.model)
+            try:
+                version = self._fetch_model_version()
+            except (requests.RequestException, ValueError) as e:
+                fallback = self._model_version or self.cache.get(version_key) or self.model
+                logger.warning("无法获取模型 %s 的版本信息，%.0f 秒内沿用 %s: %s",
+                               self.model, MODEL_VERSION_RETRY, fallback, e)
+                self._model_version = fallback
+                self._version_expires = now + MODEL_VERSION_RETRY
+                return fallback
+            if version != self._model_version:
+                if self._model_version is not None:
+                    logger.info("模型 %s 版本变为 %s，此后使用新的缓存键", self.model, version)
+                self.cache.put(version_key, version)
+            self._model_version = version
+            self._version_expires = now + self.config.version_ttl
+            return version
+
+    def _fetch_model_version(self) -> str:
+        response = self._http.get(f"{self.base_url}/api/tags", timeout=10)
+        response.raise_for_status()
+        for entry in response.json().get("models", []):
+            if entry.get("name") == self.model or entry.get("model") == self.model:
+                return f"{self.model}@{entry.get('digest', '')}"
+        return self.model
+
+    def generate(self, prompt: str, system: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+                 use_cache: bool = True) -> str:
+        """返回模型的完整原始输出（包含 <think> 块，需要时用 strip_reasoning 处理）。"""
+        self._count("requests")
+        return self._generate(prompt, system, options, use_cache)
+
+    def _generate(self, prompt: str, system: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+                  use_cache: bool = True, counted: bool = True) -> str:
+        """generate 的实现。内部调用（分类批次）传 counted=False：调用方已计过请求数，命中也不再重复计。"""
+        if not use_cache:
+            return self._call(prompt, system, options)
+        key = cache_key(self.model_version, prompt, system, options)
+        cached = self.cache.get(key)
+        if cached is not None:
+            if counted:
+                self._count("cache_hits")
+            return cached
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            if counted:
+                self._count("deduplicated")
+            return future.result()
+
+        try:
+            text = self._call(prompt, system, options)
+            self.cache.put(key, text)
+            future.set_result(text)
+            return text
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def stream(self, prompt: str, system: Optional[str] = None,
+               options: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        逐段产出模型输出，<think> 内容在到达时即被丢弃。
+
+        调用方提前停止迭代（break 或 close 生成器）会关闭 HTTP 连接，Ollama 随即停止生成。
+        """
+        payload: Dict[str, Any] = {"model": self.model, "prompt": prompt, "stream": True}
+        if system:
+            payload["system"] = system
+        if options:
+            payload["options"] = options
+        think = ThinkFilter()
+        started = time.monotonic()
+        # 生成器在 yield 处挂起，不能把 span 设为当前 span，否则调用方此间的操作会挂到它下面
+        call = start_span("llm.stream", "llm", model=self.model, prompt_chars=len(prompt))
+        error: Optional[BaseException] = None
+        try:
+            with self._http.post(f"{self.base_url}/api/generate", json=payload, stream=True,
+                                 timeout=self.config.timeout) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise LLMError(f"模型 {self.model} 返回错误: {chunk['error']}")
+                    text = think.feed(chunk.get("response", ""))
+                    if text:
+                        yield text
+                    if chunk.get("done"):
+                        break
+            tail = think.flush()
+            if tail:
+                yield tail
+        except LLMError as e:
+            error = e
+            raise
+        except (requests.RequestException, ValueError) as e:
+            error = e
+            raise LLMError(f"调用模型 {self.model} 失败: {e}") from e
+        finally:
+            call.end(error)
+            with self._stats_lock:
+                self._stats.model_calls += 1
+                self._stats.model_seconds += time.monotonic() - started
+
+    def generate_json(self, prompt: str, required: Sequence[str] = (), system: Optional[str] = None,
+                      options: Optional[Dict[str, Any]] = None, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        流式生成并增量解析 JSON 对象；required 中的字段全部到齐后立即取消生成并返回。
+        没有 required 时等对象完整结束。
+        """
+        self._count("requests")
+        key = cache_key(self.model_version, prompt, system, dict(options or {}, __required=sorted(required)))
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count("cache_hits")
+                return json.loads(cached)
+
+        parser = IncrementalJSONObject()
+        tokens = self.stream(prompt, system, options)
+        try:
+            for text in tokens:
+                parser.feed(text)
+                if parser.complete or (required and parser.has(required)):
+                    break
+        finally:
+            tokens.close()
+        if not parser.complete and required and parser.has(required):
+            self._count("early_exits")
+        if not parser.fields or not parser.has(required):
+            missing = [name for name in required if name not in parser.fields]
+            raise LLMError(f"模型输出中缺少字段 {missing or '(未找到 JSON 对象)'}")
+        if use_cache:
+            self.cache.put(key, json.dumps(parser.fields, ensure_ascii=False))
+        return parser.fields
+
+    def classify(self, text: str, labels: Sequence[str]) -> Future:
+        """把 text 归到 labels 之一，返回 Future。相同候选类别的请求会被合并成批。"""
+        labels = tuple(labels)
+        self._count("requests")
+        key = cache_key(self.model_version, _CLASSIFY_SINGLE_PROMPT.format(labels="、".join(labels), text=text))
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count("cache_hits")
+            future: Future = Future()
+            future.set_result(cached)
+            return future
+        return self._batcher(labels).submit(text)
+
+    def close(self) -> None:
+        with self._batchers_lock:
+            batchers = list(self._batchers.values())
+            self._batchers.clear()
+        for batcher in batchers:
+            batcher.close()
+        self._http.close()
+
+    # ---------------- 内部实现 ----------------
+
+    def _batcher(self, labels: Tuple[str, ...]) -> MicroBatcher:
+        with self._batchers_lock:
+            batcher = self._batchers.get(labels)
+            if batcher is None:
+                batcher = MicroBatcher(lambda texts: self._classify_batch(texts, labels),
+                                       self.config.batch_size, self.config.batch_wait)
+                self._batchers[labels] = batcher
+            return batcher
+
+    @traced("llm.classify_batch", "llm")
+    def _classify_batch(self, texts: List[str], labels: Tuple[str, ...]) -> List[str]:
+        label_text = "、".join(labels)
+        # 同一批里可能有重复文本，只问一次
+        unique = list(dict.fromkeys(texts))
+        with self._stats_lock:
+            self._stats.batches += 1
+            self._stats.batched_items += len(texts)
+
+        answers: Dict[str, str] = {}
+        if len(unique) > 1:
+            items = "\n".join(f"{i + 1}. {t}" for i, t in enumerate(unique))
+            raw = self._generate(_CLASSIFY_BATCH_PROMPT.format(labels=label_text, items=items), counted=False)
+            parsed = _parse_label_list(strip_reasoning(raw), labels, len(unique))
+            if parsed is not None:
+                answers = dict(zip(unique, parsed))
+            else:
+                logger.warning("批量分类结果无法解析，逐条重试 %d 条", len(unique))
+        for text in unique:
+            if text not in answers:
+                raw = self._generate(_CLASSIFY_SINGLE_PROMPT.format(labels=label_text, text=text), counted=False)
+                answers[text] = _match_label(strip_reasoning(raw), labels)
+
+        version = self.model_version
+        for text in unique:
+            self.cache.put(cache_key(version, _CLASSIFY_SINGLE_PROMPT.format(labels=label_text, text=text)),
+                           answers[text])
+        return [answers[t] for t in texts]
+
+    def _call(self, prompt: str, system: Optional[str], options: Optional[Dict[str, Any]]) -> str:
+        payload: Dict[str, Any] = {"model": self.model, "prompt": prompt, "stream": False}
+        if system:
+            payload["system"] = system
+        if options:
+            payload["options"] = options
+        started = time.monotonic()
+        try:
+            with span("llm.generate", "llm", model=self.model, prompt_chars=len(prompt)) as s:
+                response = self._http.post(f"{self.base_url}/api/generate", json=payload,
+                                           timeout=self.config.timeout)
+                response.raise_for_status()
+                body = response.json()
+                text = body.get("response", "")
+                s.set("eval_count", body.get("eval_count", 0))
+        except (requests.RequestException, ValueError) as e:
+            raise LLMError(f"调用模型 {self.model} 失败: {e}") from e
+        finally:
+            with self._stats_lock:
+                self._stats.model_calls += 1
+                self._stats.model_seconds += time.monotonic() - started
+        return text
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            setattr(self._stats, name, getattr(self._stats, name) + 1)
+
+
+def _match_label(answer: str, labels: Sequence[str]) -> str:
+    answer = answer.strip().strip("\"'“”。.")
+    if answer in labels:
+        return answer
+    for label in labels:
+        if label in answer:
+            return label
+    raise LLMError(f"模型返回的类别 '{answer}' 不在候选 {list(labels)} 中")
+
+
+def _parse_label_list(text: str, labels: Sequence[str], count: int) -> Optional[List[str]]:
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end < start:
+        return None
+    try:
+        values = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != count:
+        return None
+    try:
+        return [_match_label(str(v), labels) for v in values]
+    except LLMError:
+        return None
+
+
+_connector: Optional[OllamaConnector] = None
+_connector_lock = threading.Lock()
+
+
+def get_connector() -> OllamaConnector:
+    """按配置获取进程内共享的连接器（共享缓存、去重表和批处理队列）。"""
+    global _connector
+    with _connector_lock:
+        if _connector is None:
+            from erp_core.config import get_settings
+            settings = get_settings()
+            _connector = OllamaConnector(settings.ollama_model, settings.llm)
+        return _connector
@@ -0,0 +1,64 @@
+import json
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from erp_ai_core.llm_connector import OllamaConnector, get_connector, strip_reasoning
+from erp_core.exceptions import LLMError
+from erp_core.models.dom_element import DOMElement
+
+SYSTEM_PROMPT = "你是 ERP 表单分析助手，只输出 JSON，不输出任何解释。"
+
+ANALYZE_FORM_PROMPT = """下面是一个{entity}表单中的输入控件（每行：标签 | 控件类型 | name 属性）：
+{fields}
+
+请判断每个控件对应的业务字段，输出一个 JSON 对象：键是控件标签，值是字段的英文 snake_case 名称，
+例如 {{"供应商编码": "supplier_code"}}。无法判断的控件不要输出。"""
+
+FIELD_KIND_LABELS = ("文本", "数字", "日期", "下拉选择", "参照选择", "复选框")
+
+
+def describe_fields(elements: Iterable[DOMElement]) -> List[str]:
+    """
+    把表单控件规整成提示词里的一行描述。
+
+    只保留标签、控件类型和 name，不含当前值、自动生成的 id 或坐标，
+    这样同一张表单无论填了什么数据、何时打开，生成的提示词都完全相同，能命中缓存。
+    """
+    lines = []
+    for element in elements:
+        label = " ".join((element.label or element.text or "").split())
+        if not label:
+            continue
+        kind = element.attributes.get("type") or element.tag
+        lines.append(f"{label} | {kind} | {element.name or ''}")
+    return lines
+
+
+def build_prompt(fields: Sequence[str], entity: Optional[str] = None) -> str:
+    return ANALYZE_FORM_PROMPT.format(entity=entity or "", fields="\n".join(fields))
+
+
+def analyze_form(elements: Iterable[DOMElement], entity: Optional[str] = None,
+                 connector: Optional[OllamaConnector] = None) -> Dict[str, str]:
+    """返回 控件标签 -> 业务字段名 的映射。"""
+    fields = describe_fields(elements)
+    if not fields:
+        return {}
+    connector = connector or get_connector()
+    raw = connector.generate(build_prompt(fields, entity), system=SYSTEM_PROMPT, options={"temperature": 0})
+    text = strip_reasoning(raw)
+    start, end = text.find("{"), text.rfind("}")
+    try:
+        mapping = json.loads(text[start:end + 1]) if start >= 0 else None
+    except ValueError:
+        mapping = None
+    if not isinstance(mapping, dict):
+        raise LLMError(f"表单分析结果不是 JSON 对象: {text[:200]}")
+    return {str(k): str(v) for k, v in mapping.items()}
+
+
+def classify_field_kinds(labels: Sequence[str], connector: Optional[OllamaConnector] = None,
+                         kinds: Sequence[str] = FIELD_KIND_LABELS) -> Dict[str, str]:
+    """按标签猜测字段的录入方式；各标签的分类请求会被连接器合并成一次模型调用。"""
+    connector = connector or get_connector()
+    futures = {label: connector.classify(label, kinds) for label in dict.fromkeys(labels)}
+    return {label: future.result() for label, future in futures.items()}
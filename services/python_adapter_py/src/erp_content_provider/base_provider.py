@@ -0,0 +1,47 @@
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional
+
+
+@dataclass
+class ContentItem:
+    """内容提供者产出的一条结构化内容。"""
+    source: str                         # 内容来源 URL
+    data: Any                           # 已解析的内容：JSON 对象、文本或 Markdown
+    content_type: str = "application/json"
+    fetched_at: float = field(default_factory=time.time)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class BaseContentProvider(ABC):
+    """
+    内容提供者接口：从某个来源（浏览器网络流量、爬虫等）流式产出 ContentItem。
+
+    iter_content 是生成器，调用方边消费边处理，不需要先把全部内容读进内存；
+    提供者持有的连接等资源在 close 中释放，可以用 with 语句管理。
+    """
+
+    name: str = "base"
+
+    @abstractmethod
+    def iter_content(self) -> Iterator[ContentItem]:
+        """逐条产出内容，来源耗尽或被停止时结束。"""
+
+    def collect(self, limit: Optional[int] = None) -> list:
+        """把 iter_content 读成列表，主要用于调试和小数据量场景。"""
+        items = []
+        for item in self.iter_content():
+            items.append(item)
+            if limit is not None and len(items) >= limit:
+                break
+        return items
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "BaseContentProvider":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
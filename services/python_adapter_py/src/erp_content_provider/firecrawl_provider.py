@@ -0,0 +1,407 @@
+import asyncio
+import hashlib
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+import httpx
+
+from erp_content_provider.base_provider import BaseContentProvider, ContentItem
+from erp_core.logging import get_logger
+
+logger = get_logger(__name__)
+
+FIRECRAWL_SCRAPE_URL = "https://api.firecrawl.dev/v1/scrape"
+DEFAULT_STORE_PATH = Path(".cache") / "crawl"
+
+_HREF = re.compile(rb"""href\s*=\s*["']([^"'#]+)""", re.IGNORECASE)
+_TAGS = re.compile(r"<(script|style)[^>]*>.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+
+# 解析函数：(url, 原始字节) -> Markdown/纯文本
+Parser = Callable[[str, bytes], Awaitable[str]]
+
+
+class ContentStore:
+    """
+    内容寻址的抓取结果存储。
+
+    原始响应按 sha256 存为 blobs/<前两位>/<哈希>，解析结果存为同名 .md；
+    SQLite 索引记录 URL -> (ETag, Last-Modified, 内容哈希)。不同 URL 内容相同时只存一份、只解析一次。
+    """
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_STORE_PATH):
+        self.root = Path(root)
+        (self.root / "blobs").mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                content_type TEXT,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def validators(self, url: str) -> Optional[Tuple[Optional[str], Optional[str], str]]:
+        """返回 (ETag, Last-Modified, 内容哈希)，没抓过返回 None。"""
+        with self._lock:
+            return self._conn.execute("SELECT etag, last_modified, content_hash FROM pages WHERE url=?",
+                                      (url,)).fetchone()
+
+    def record(self, url: str, content_hash: str, etag: Optional[str], last_modified: Optional[str],
+               content_type: Optional[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO pages (url, etag, last_modified, content_hash, content_type, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET etag=excluded.etag, last_modified=excluded.last_modified,
+                    content_hash=excluded.content_hash, content_type=excluded.content_type,
+                    fetched_at=excluded.fetched_at
+                """,
+                (url, etag, last_modified, content_hash, content_type, time.time()),
+            )
+            self._conn.commit()
+
+    def touch(self, url: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at=? WHERE url=?", (time.time(), url))
+            self._conn.commit()
+
+    def put_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            self._write(path, data)
+        return digest
+
+    def get_blob(self, digest: str) -> bytes:
+        return self._blob_path(digest).read_bytes()
+
+    def has_parsed(self, digest: str) -> bool:
+        return self._blob_path(digest).with_suffix(".md").exists()
+
+    def get_parsed(self, digest: str) -> str:
+        return self._blob_path(digest).with_suffix(".md").read_text(encoding="utf-8")
+
+    def put_parsed(self, digest: str, text: str) -> None:
+        self._write(self._blob_path(digest).with_suffix(".md"), text.encode("utf-8"))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / digest
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+
+
+class HostRateLimiter:
+    """每个主机一个令牌桶（rate 次/秒，容量 burst）加并发上限。"""
+
+    def __init__(self, rate: float = 2.0, burst: int = 4, per_host_concurrency: int = 4):
+        self.rate = rate
+        self.burst = burst
+        self._tokens: Dict[str, float] = defaultdict(lambda: float(burst))
+        self._updated: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._slots: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(per_host_concurrency))
+
+    def slot(self, host: str) -> asyncio.Semaphore:
+        return self._slots[host]
+
+    async def acquire(self, host: str) -> None:
+        async with self._locks[host]:
+            while True:
+                now = time.monotonic()
+                elapsed = now - self._updated.get(host, now)
+                self._updated[host] = now
+                self._tokens[host] = min(self.burst, self._tokens[host] + elapsed * self.rate)
+                if self._tokens[host] >= 1:
+                    self._tokens[host] -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens[host]) / self.rate)
+
+
+@dataclass
+class CrawlStats:
+    fetched: int = 0          # 下载了新内容
+    not_modified: int = 0     # 服务器返回 304
+    unchanged: int = 0        # 200 但内容哈希未变
+    parsed: int = 0           # 实际调用解析器的次数
+    failed: int = 0
+    bytes_downloaded: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+
+async def strip_html(url: str, data: bytes) -> str:
+    """不调用 Firecrawl 时的本地解析：去掉脚本、样式和标签，保留文本。"""
+    text = _TAGS.sub(" ", data.decode("utf-8", errors="replace"))
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class FirecrawlParser:
+    """用 Firecrawl scrape 接口把页面转成 Markdown，只对内容发生变化的页面调用。"""
+
+    def __init__(self, api_key: str, client: httpx.AsyncClient, endpoint: str = FIRECRAWL_SCRAPE_URL):
+        self.api_key = api_key
+        self.client = client
+        self.endpoint = endpoint
+
+    async def __call__(self, url: str, data: bytes) -> str:
+        response = await self.client.post(
+            self.endpoint, json={"url": url, "formats": ["markdown"]},
+            headers={"Authorization": f"Bearer {self.api_key}"}, timeout=120)
+        response.raise_for_status()
+        return response.json().get("data", {}).get("markdown", "")
+
+
+class Crawler:
+    """
+    有界并发的 asyncio 爬虫。
+
+    max_concurrency 个工作协程共享一个连接池化的 httpx.AsyncClient，每个主机另有令牌桶限速和并发上限。
+    已抓过的 URL 带上 If-None-Match / If-Modified-Since 条件请求，304 或内容哈希不变时
+    直接复用存储中的解析结果，既不重新下载也不重新解析。
+    """
+
+    def __init__(self, store: ContentStore, parser: Optional[Parser] = None, max_concurrency: int = 16,
+                 limiter: Optional[HostRateLimiter] = None, max_pages: int = 1000, follow_links: bool = True,
+                 allowed_prefixes: Sequence[str] = (), timeout: float = 30.0, client: Optional[httpx.AsyncClient] = None):
+        self.store = store
+        self.parser = parser or strip_html
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter or HostRateLimiter()
+        self.max_pages = max_pages
+        self.follow_links = follow_links
+        self.allowed_prefixes = tuple(allowed_prefixes)
+        self.timeout = timeout
+        self._client = client
+        self.stats = CrawlStats()
+
+    async def crawl(self, seeds: Iterable[str], on_item: Callable[[ContentItem], Awaitable[None]]) -> CrawlStats:
+        """从 seeds 开始抓取，每得到一个页面 await 一次 on_item（调用方可借此施加背压）。"""
+        seeds = [urldefrag(s)[0] for s in seeds]
+        prefixes = self.allowed_prefixes or tuple(f"{urlsplit(s).scheme}://{urlsplit(s).netloc}/" for s in seeds)
+        seen: Set[str] = set(seeds)
+        todo: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        for url in seeds:
+            todo.put_nowait(url)
+
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        client = self._client or httpx.AsyncClient(limits=limits, timeout=self.timeout, follow_redirects=True)
+
+        closing = False
+
+        async def worker() -> None:
+            while not closing:
+                url = await todo.get()
+                if url is None:
+                    todo.task_done()
+                    return
+                try:
+                    item, links = await self._fetch(client, url)
+                    if item is not None:
+                        await on_item(item)
+                    for link in links:
+                        if len(seen) >= self.max_pages:
+                            break
+                        if link not in seen and link.startswith(prefixes):
+                            seen.add(link)
+                            todo.put_nowait(link)
+                except Exception as e:
+                    self.stats.failed += 1
+                    logger.warning("抓取 %s 失败: %s", url, e)
+                finally:
+                    todo.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrency)]
+        try:
+            await todo.join()
+        finally:
+            # 除了取消，还给每个工作协程放一个 None 并置结束标志：httpx 在请求中途被取消时
+            # 可能把 CancelledError 转成普通异常被上面吞掉，工作协程随后会卡在 todo.get() 上
+            closing = True
+            for task in workers:
+                task.cancel()
+                todo.put_nowait(None)
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self._client is None:
+                await client.aclose()
+        return self.stats
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str) -> Tuple[Optional[ContentItem], List[str]]:
+        host = urlsplit(url).netloc
+        known = self.store.validators(url)
+        headers = {}
+        if known is not None:
+            etag, last_modified, _ = known
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        async with self.limiter.slot(host):
+            await self.limiter.acquire(host)
+            response = await client.get(url, headers=headers)
+
+        if response.status_code == 304 and known is not None:
+            self.stats.not_modified += 1
+            self.store.touch(url)
+            digest = known[2]
+            data = self.store.get_blob(digest) if self.follow_links else b""
+            return await self._item(url, digest, data, "not_modified"), self._links(url, data)
+        response.raise_for_status()
+
+        data = response.content
+        self.stats.bytes_downloaded += len(data)
+        digest = self.store.put_blob(data)
+        status = "unchanged" if known is not None and known[2] == digest else "fetched"
+        item = await self._item(url, digest, data, status)
+        # 解析成功后才记录 ETag 和内容哈希：解析失败的页面下次重新完整抓取，而不是拿到 304 却没有解析结果
+        self.store.record(url, digest, response.headers.get("etag"), response.headers.get("last-modified"),
+                          response.headers.get("content-type"))
+        if status == "unchanged":
+            self.stats.unchanged += 1
+        else:
+            self.stats.fetched += 1
+        return item, self._links(url, data)
+
+    async def _item(self, url: str, digest: str, data: bytes, status: str) -> ContentItem:
+        if self.store.has_parsed(digest):
+            text = self.store.get_parsed(digest)
+        else:
+            text = await self.parser(url, data)
+            self.store.put_parsed(digest, text)
+            self.stats.parsed += 1
+        return ContentItem(url, text, "text/markdown", metadata={"content_hash": digest, "status": status})
+
+    def _links(self, url: str, data: bytes) -> List[str]:
+        if not self.follow_links or not data:
+            return []
+        links = []
+        for match in _HREF.finditer(data):
+            href = match.group(1).decode("utf-8", errors="ignore").strip()
+            if href.startswith(("mailto:", "javascript:")):
+                continue
+            links.append(urldefrag(urljoin(url, href))[0])
+        return links
+
+
+class FirecrawlContentProvider(BaseContentProvider):
+    """
+    抓取 ERP 帮助文档和配置说明页面。
+
+    爬虫在后台线程的事件循环中运行，抓到的页面经有界队列交给 iter_content 的调用方，
+    消费慢时爬虫会自然背压。没有 API Key 时用本地 HTML 去标签解析代替 Firecrawl。
+    """
+
+    name = "firecrawl"
+
+    def __init__(self, seeds: Sequence[str], api_key: Optional[str] = None, store: Optional[ContentStore] = None,
+                 max_concurrency: int = 16, rate_per_host: float = 2.0, max_pages: int = 1000,
+                 follow_links: bool = True, allowed_prefixes: Sequence[str] = (), queue_size: int = 256):
+        self.seeds = list(seeds)
+        self.api_key = api_key
+        self.store = store or ContentStore()
+        self.max_concurrency = max_concurrency
+        self.rate_per_host = rate_per_host
+        self.max_pages = max_pages
+        self.follow_links = follow_links
+        self.allowed_prefixes = allowed_prefixes
+        self.queue_size = queue_size
+        self.stats: Optional[CrawlStats] = None
+
+    def iter_content(self) -> Iterator[ContentItem]:
+        """
+        逐条产出抓到的页面。调用方提前停止迭代（break、collect(limit=...)）时，
+        生成器关闭会通知后台线程取消爬取，并等它退出后才返回。
+        """
+        items: "queue.Queue" = queue.Queue(self.queue_size)
+        done = object()
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        def offer(item: object) -> bool:
+            # 队列满时分段等待，期间检查停止标志，消费方已经离开时放弃
+            while not stop.is_set():
+                try:
+                    items.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        async def run() -> None:
+            async with httpx.AsyncClient(timeout=30.0) as api_client:
+                parser = FirecrawlParser(self.api_key, api_client) if self.api_key else None
+                crawler = Crawler(self.store, parser, self.max_concurrency,
+                                  HostRateLimiter(self.rate_per_host, per_host_concurrency=self.max_concurrency),
+                                  self.max_pages, self.follow_links, self.allowed_prefixes)
+                self.stats = crawler.stats
+                loop = asyncio.get_running_loop()
+
+                async def put(item: ContentItem) -> None:
+                    # 队列满时在线程池里阻塞等待，不卡住事件循环；已停止时丢弃，爬取随后被取消
+                    await loop.run_in_executor(None, offer, item)
+
+                crawl = asyncio.ensure_future(crawler.crawl(self.seeds, put))
+                while not crawl.done():
+                    await asyncio.wait({crawl}, timeout=0.1)
+                    if stop.is_set():
+                        crawl.cancel()
+                        await asyncio.gather(crawl, return_exceptions=True)
+                        return
+                crawl.result()
+
+        def target() -> None:
+            try:
+                asyncio.run(run())
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                offer(done)
+
+        thread = threading.Thread(target=target, name="firecrawl-crawler", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    break
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        self.store.close()
+
+
+def get_provider(seeds: Sequence[str], **kwargs) -> FirecrawlContentProvider:
+    """按配置中的 firecrawl_api_key 创建提供者。"""
+    from erp_core.config import get_settings
+    settings = get_settings()
+    return FirecrawlContentProvider(seeds, api_key=settings.firecrawl_api_key, **kwargs)
@@ -0,0 +1,234 @@
+import base64
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Pattern, Sequence, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from erp_content_provider.base_provider import BaseContentProvider, ContentItem
+from erp_core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 只关心这几类网络事件，其余性能日志直接丢弃
+_EVENTS = ("Network.requestWillBeSent", "Network.responseReceived", "Network.loadingFinished",
+           "Network.loadingFailed")
+
+_FETCH_JS = """
+const [url, method, body, headers] = arguments;
+const callback = arguments[arguments.length - 1];
+fetch(url, {method, body, headers, credentials: 'include'})
+    .then(r => r.text().then(text => callback({status: r.status, type: r.headers.get('content-type') || '', text})))
+    .catch(e => callback({status: 0, type: '', text: String(e)}));
+"""
+
+
+@dataclass
+class _PendingResponse:
+    url: str
+    method: str = "GET"
+    post_data: Optional[str] = None
+    status: int = 0
+    mime_type: str = ""
+    request_headers: Optional[Dict[str, str]] = None
+    # 最近一次收到该请求网络事件的时间，用于清理丢失了 loadingFinished 的请求
+    seen_at: float = field(default_factory=time.monotonic)
+
+
+class SeleniumContentProvider(BaseContentProvider):
+    """
+    通过 Chrome DevTools Protocol 网络事件直接捕获 ERP 的 JSON 接口响应。
+
+    浏览器需要开启性能日志（SessionPoolConfig.network_capture，对应 goog:loggingPrefs），
+    iter_content 轮询性能日志，对 URL 匹配 patterns 的请求在加载完成后用
+    Network.getResponseBody 取回响应体并解析，作为 ContentItem 流式产出。
+    列表类接口可以再用 replay_pages 在页面上下文中直接翻页请求，完全跳过表格 DOM 和翻页点击。
+
+    Selenium 驱动不是线程安全的，迭代要在使用该浏览器的同一线程中进行。
+    """
+
+    name = "selenium"
+
+    def __init__(self, driver: WebDriver, patterns: Sequence[Union[str, Pattern]],
+                 poll_interval: float = 0.2, idle_timeout: float = 5.0, max_body_bytes: int = 32 * 1024 * 1024):
+        self.driver = driver
+        self.patterns = [re.compile(p) if isinstance(p, str) else p for p in patterns]
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.max_body_bytes = max_body_bytes
+        self._pending: Dict[str, _PendingResponse] = {}
+        self._stopped = False
+        self.captured = 0
+        self.skipped = 0
+        try:
+            driver.execute_cdp_cmd("Network.enable", {"maxPostDataSize": 65536})
+        except WebDriverException as e:
+            logger.warning("无法启用 CDP Network 域，网络捕获不可用: %s", e)
+
+    def matches(self, url: str) -> bool:
+        return any(p.search(url) for p in self.patterns)
+
+    def stop(self) -> None:
+        """让正在进行的 iter_content 在下一次轮询后结束。"""
+        self._stopped = True
+
+    def iter_content(self) -> Iterator[ContentItem]:
+        """
+        产出捕获到的响应，直到 stop() 被调用或连续 idle_timeout 秒没有新的匹配响应。
+        调用方可以在两次 next() 之间驱动页面（打开菜单、查询），新请求会被继续捕获。
+        未完成的匹配请求会推迟结束，但超过 idle_timeout 秒没有任何事件的请求视为丢失并丢弃。
+        """
+        self._stopped = False
+        last_activity = time.monotonic()
+        while not self._stopped:
+            produced = False
+            for item in self._drain():
+                produced = True
+                yield item
+            now = time.monotonic()
+            self._expire_pending(now)
+            if produced or self._pending:
+                last_activity = now
+            elif now - last_activity >= self.idle_timeout:
+                return
+            if not produced:
+                time.sleep(self.poll_interval)
+
+    def replay_pages(self, item: ContentItem, page_key: str, start: int = 1, max_pages: int = 1000,
+                     has_more: Optional[Callable[[Any], bool]] = None) -> Iterator[ContentItem]:
+        """
+        以捕获到的请求为模板，修改分页参数后在页面上下文中直接 fetch（带登录 Cookie），逐页产出。
+
+        分页参数优先改 JSON 请求体中的同名键，其次改查询串；has_more 判断某页之后是否还有数据，
+        默认是“响应中含有非空列表”。
+        """
+        has_more = has_more or _has_rows
+        method = item.metadata.get("method", "GET")
+        headers = {k: v for k, v in (item.metadata.get("request_headers") or {}).items()
+                   if k.lower() in ("content-type", "accept", "x-requested-with")}
+        # 浏览器来自共享会话池，重放结束（含中途放弃迭代）后恢复原来的异步脚本超时
+        previous_timeout = self.driver.timeouts.script
+        self.driver.set_script_timeout(60.0)
+        try:
+            for page in range(start, start + max_pages):
+                url, body = _with_page(item.source, item.metadata.get("post_data"), page_key, page)
+                result = self.driver.execute_async_script(_FETCH_JS, url, method, body, headers)
+                if result["status"] >= 400 or result["status"] == 0:
+                    raise WebDriverException(f"重放请求 {url} 失败: HTTP {result['status']} {result['text'][:200]}")
+                data = _parse_body(result["text"], result["type"])
+                yield ContentItem(url, data, result["type"] or "application/json",
+                                  metadata={"method": method, "page": page, "replayed": True})
+                if not has_more(data):
+                    return
+        finally:
+            self.driver.set_script_timeout(previous_timeout)
+
+    # ---------------- 内部实现 ----------------
+
+    def _expire_pending(self, now: float) -> None:
+        expired = [rid for rid, pending in self._pending.items() if now - pending.seen_at >= self.idle_timeout]
+        for request_id in expired:
+            logger.debug("请求 %s 超过 %.1f 秒没有网络事件，放弃捕获", self._pending[request_id].url, self.idle_timeout)
+            del self._pending[request_id]
+        self.skipped += len(expired)
+
+    def _drain(self) -> List[ContentItem]:
+        items: List[ContentItem] = []
+        try:
+            entries = self.driver.get_log("performance")
+        except WebDriverException as e:
+            logger.warning("读取性能日志失败（浏览器是否开启了 network_capture？）: %s", e)
+            self._stopped = True
+            return items
+        for entry in entries:
+            message = json.loads(entry["message"])["message"]
+            method = message.get("method")
+            if method not in _EVENTS:
+                continue
+            params = message["params"]
+            request_id = params.get("requestId")
+            if method == "Network.requestWillBeSent":
+                request = params["request"]
+                if self.matches(request["url"]):
+                    self._pending[request_id] = _PendingResponse(
+                        request["url"], request.get("method", "GET"), request.get("postData"),
+                        request_headers=request.get("headers"))
+            elif method == "Network.responseReceived":
+                pending = self._pending.get(request_id)
+                if pending is not None:
+                    pending.seen_at = time.monotonic()
+                    pending.status = params["response"].get("status", 0)
+                    pending.mime_type = params["response"].get("mimeType", "")
+            elif method == "Network.loadingFailed":
+                self._pending.pop(request_id, None)
+            else:
+                pending = self._pending.pop(request_id, None)
+                if pending is None:
+                    continue
+                if params.get("encodedDataLength", 0) > self.max_body_bytes or pending.status >= 400:
+                    self.skipped += 1
+                    continue
+                item = self._fetch_body(request_id, pending)
+                if item is not None:
+                    self.captured += 1
+                    items.append(item)
+        return items
+
+    def _fetch_body(self, request_id: str, pending: _PendingResponse) -> Optional[ContentItem]:
+        try:
+            body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        except WebDriverException as e:
+            # 响应体可能已被浏览器回收（页面跳转后），跳过即可
+            logger.debug("取不到 %s 的响应体: %s", pending.url, e)
+            self.skipped += 1
+            return None
+        text = body.get("body", "")
+        if body.get("base64Encoded"):
+            text = base64.b64decode(text).decode("utf-8", errors="replace")
+        return ContentItem(pending.url, _parse_body(text, pending.mime_type), pending.mime_type or "text/plain",
+                           metadata={"method": pending.method, "status": pending.status,
+                                     "post_data": pending.post_data, "request_headers": pending.request_headers})
+
+
+def _parse_body(text: str, mime_type: str) -> Any:
+    if "json" in mime_type or text[:1] in ("{", "["):
+        try:
+            return json.loads(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _has_rows(data: Any) -> bool:
+    """响应中是否有非空列表（递归查找前两层）。"""
+    def walk(value: Any, depth: int) -> bool:
+        if isinstance(value, list):
+            return len(value) > 0
+        if isinstance(value, dict) and depth < 2:
+            return any(walk(v, depth + 1) for v in value.values())
+        return False
+    return walk(data, 0)
+
+
+def _with_page(url: str, post_data: Optional[str], page_key: str, page: int) -> Tuple[str, Optional[str]]:
+    """把分页参数写进 JSON 请求体或查询串，返回 (url, body)。"""
+    if post_data:
+        try:
+            body = json.loads(post_data)
+        except ValueError:
+            body = None
+        if isinstance(body, dict) and page_key in body:
+            body[page_key] = page
+            return url, json.dumps(body, ensure_ascii=False)
+        if body is None and f"{page_key}=" in post_data:
+            form = dict(parse_qsl(post_data, keep_blank_values=True))
+            form[page_key] = str(page)
+            return url, urlencode(form)
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    query[page_key] = str(page)
+    return urlunsplit(parts._replace(query=urlencode(query))), post_data
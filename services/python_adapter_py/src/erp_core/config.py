@@ -1,5 +1,16 @@
-from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Dict
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from pydantic_settings import BaseSettings, PydanticBaseSettingsSource, SettingsConfigDict, YamlConfigSettingsSource
+
+from erp_core.exceptions import ConfigError
+
+# 通用配置文件（服务器地址、编码前缀等不含密钥的配置），可用环境变量 ERP_CONFIG_FILE 指定其他路径
+CONFIG_FILE_ENV = "ERP_CONFIG_FILE"
+DEFAULT_CONFIG_FILE = "config.yml"
 
 
 class ServerConfig(BaseSettings):
@@ -8,23 +19,91 @@ class ServerConfig(BaseSettings):
     password: str
 
 
+class SessionPoolConfig(BaseModel):
+    """浏览器会话池参数，每个服务器一个池。"""
+    size: int = 2                      # 每个服务器常驻的已登录会话数
+    max_uses: int = 50                 # 单个会话借出次数上限，超过后回收重建
+    max_memory_growth_mb: int = 256    # JS 堆相对登录后基线的增长上限
+    acquire_timeout: float = 120.0     # 借会话的默认等待时间（秒）
+    health_check_interval: float = 30.0  # 空闲超过该秒数的会话借出前先做健康检查
+    headless: bool = False
+    user_data_dir: Optional[str] = None  # 每个会话会在其下使用独立子目录
+    network_capture: bool = False        # 开启 Chrome 性能日志，供 SeleniumContentProvider 捕获接口响应
+
+
+class LLMConfig(BaseModel):
+    """本地 Ollama 模型服务及其响应缓存、批处理参数。"""
+    url: str = "http://localhost:11434"
+    timeout: float = 300.0
+    cache_dir: Optional[str] = ".cache/llm"  # 磁盘缓存目录，None 表示只用内存缓存
+    cache_ttl: float = 7 * 24 * 3600.0       # 缓存条目有效期（秒）
+    memory_entries: int = 512                # 内存 LRU 缓存条目数
+    batch_size: int = 16                     # 单次合并的分类请求数上限
+    batch_wait: float = 0.05                 # 凑批的最长等待时间（秒）
+    version_ttl: float = 300.0               # 模型 digest 的重新查询间隔（秒），ollama pull 后最迟这么久切换缓存键
+
+
 class Settings(BaseSettings):
+    """
+    平台配置。来源优先级从高到低：初始化参数、环境变量、.env、config.yml。
+    嵌套字段逐层合并：例如 config.yml 中写服务器 url，.env 的 SERVERS 中只写账号密码。
+    """
     model_config = SettingsConfigDict(
         env_file='.env',
         env_file_encoding='utf-8',
-        # 你还可以添加从 YAML 加载的逻辑
+        extra='ignore',             # config.yml 中还有其他模块使用的键（如 supplier_prefix）
     )
 
     servers: Dict[str, ServerConfig]
     firecrawl_api_key: str
     ollama_model: str = "qwen3:latest"
+    session_pool: SessionPoolConfig = SessionPoolConfig()
+    llm: LLMConfig = LLMConfig()
+
+    @classmethod
+    def settings_customise_sources(
+        cls,
+        settings_cls: Type[BaseSettings],
+        init_settings: PydanticBaseSettingsSource,
+        env_settings: PydanticBaseSettingsSource,
+        dotenv_settings: PydanticBaseSettingsSource,
+        file_secret_settings: PydanticBaseSettingsSource,
+    ) -> Tuple[PydanticBaseSettingsSource, ...]:
+        config_file = os.environ.get(CONFIG_FILE_ENV, DEFAULT_CONFIG_FILE)
+        yaml_settings = YamlConfigSettingsSource(settings_cls, yaml_file=config_file, yaml_file_encoding="utf-8")
+        return init_settings, env_settings, dotenv_settings, file_secret_settings, yaml_settings
+
+
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """
+    返回进程内的配置快照，首次调用时才读取环境变量、.env 和 config.yml 并校验。
+    只需要数据模型或 dry-run 的命令不会因为缺少账号配置而失败；配置缺失时抛出 ConfigError。
+    """
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                try:
+                    _settings = Settings()
+                except Exception as e:
+                    config_file = Path(os.environ.get(CONFIG_FILE_ENV, DEFAULT_CONFIG_FILE)).resolve()
+                    raise ConfigError(f"配置加载失败（环境变量 / .env / {config_file}）: {e}") from e
+    return _settings
+
 
+def reset_settings() -> None:
+    """丢弃配置快照，下一次 get_settings() 重新加载（修改环境变量或配置文件后使用）。"""
+    global _settings
+    with _settings_lock:
+        _settings = None
 
-# 在项目入口处加载
-try:
-    settings = Settings()
-except Exception as e:
-    print(f"❌ 配置加载失败: {e}")
-    exit(1)
 
-# 在其他模块中，直接 from erp_core.config import settings 来使用
\ No newline at end of file
+def __getattr__(name: str) -> Any:
+    # 兼容 from erp_core.config import settings：访问时才加载
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
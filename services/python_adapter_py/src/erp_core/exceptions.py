@@ -0,0 +1,46 @@
+class ErpPlatformError(Exception):
+    """平台所有自定义异常的基类。"""
+
+
+class ConfigError(ErpPlatformError):
+    """配置缺失或格式错误。"""
+
+
+class SessionPoolError(ErpPlatformError):
+    """浏览器会话池相关错误。"""
+
+
+class SessionPoolTimeout(SessionPoolError):
+    """在超时时间内没有借到空闲会话。"""
+
+
+class ErpLoginError(ErpPlatformError):
+    """ERP 登录失败。"""
+
+
+class BlueprintError(ErpPlatformError):
+    """蓝图内容非法：重复任务、未知依赖或依赖成环等。"""
+
+
+class TaskExecutionError(ErpPlatformError):
+    """单个蓝图任务执行失败。"""
+
+
+class EngineBusyError(ErpPlatformError):
+    """引擎作业队列已满，拒绝新的提交。"""
+
+
+class JobNotFoundError(ErpPlatformError):
+    """指定的作业不存在。"""
+
+
+class FormValidationError(ErpPlatformError):
+    """表单保存后 ERP 提示了字段校验错误。"""
+
+
+class LLMError(ErpPlatformError):
+    """调用本地模型服务失败或返回内容无法解析。"""
+
+
+class MacroCheckpointError(ErpPlatformError):
+    """回放录制的操作宏时页面与录制时不一致，需要回退完整流程。"""
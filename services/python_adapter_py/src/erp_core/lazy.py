@@ -0,0 +1,25 @@
+import importlib
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    为包生成 PEP 562 的 __getattr__ / __dir__：exports 是 导出名 -> 子模块（相对包名），
+    首次访问导出名时才导入对应子模块，之后写回包的命名空间，不再经过 __getattr__。
+
+    用法（在包的 __init__.py 中）：
+        __getattr__, __dir__ = lazy_exports(__name__, {"KingdeeAdapter": "adapters.kingdee_adapter"})
+    """
+    def __getattr__(name: str) -> Any:
+        module_name = exports.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(f"{package}.{module_name}"), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__
@@ -0,0 +1,347 @@
+import atexit
+import contextvars
+import dataclasses
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+# 设置了该环境变量时 setup_logging 会开启链路追踪，worker 子进程随环境变量继承
+TRACE_FILE_ENV = "ERP_TRACE_FILE"
+TRACE_SAMPLE_ENV = "ERP_TRACE_SAMPLE"
+TRACE_FORMAT_ENV = "ERP_TRACE_FORMAT"
+
+# span 类别：trace 报告按类别拆分耗时，回答"慢在浏览器、等待还是模型"
+SPAN_KINDS = ("task", "adapter", "pool", "webdriver", "wait", "vision", "llm", "internal")
+
+_configured = False
+
+
+def setup_logging(level: int = logging.INFO) -> None:
+    """配置根日志记录器，只在首次调用时生效。环境变量 ERP_TRACE_FILE 存在时同时开启链路追踪。"""
+    global _configured
+    if _configured:
+        return
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    _configured = True
+    path = os.environ.get(TRACE_FILE_ENV)
+    if path and _tracer is None:
+        configure_tracing(path, sample_rate=float(os.environ.get(TRACE_SAMPLE_ENV, "1.0")),
+                          fmt=os.environ.get(TRACE_FORMAT_ENV, "jsonl"))
+
+
+def get_logger(name: Optional[str] = None) -> logging.Logger:
+    """获取平台统一命名空间下的日志记录器。"""
+    return logging.getLogger(f"erp.{name}" if name else "erp")
+
+
+# ---------------- 链路追踪 ----------------
+
+class Span:
+    """
+    一次计时的操作。父子关系通过 contextvars 在同一线程/协程内自动建立；
+    跨线程池时子线程中的 span 成为新的根，这与任务在线程池中逐个执行的粒度一致。
+    """
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "attributes", "start_ns", "end_ns",
+                 "error", "thread", "_token")
+
+    def __init__(self, name: str, kind: str, trace_id: int, parent_id: Optional[int],
+                 attributes: Optional[Dict[str, Any]]):
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self.thread = threading.current_thread().name
+        self._token: Optional[contextvars.Token] = None
+
+    @property
+    def recording(self) -> bool:
+        return True
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        """标记失败但不抛异常的操作（例如捕获异常后返回 FAILED 结果的任务）。"""
+        self.error = message
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        tracer = _tracer
+        if tracer is not None:
+            tracer.export(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current_span.reset(self._token)
+        self.end(exc)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": f"{self.trace_id:032x}",
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": f"{self.parent_id:016x}" if self.parent_id is not None else None,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "attributes": self.attributes,
+            "error": self.error,
+            "thread": self.thread,
+        }
+
+
+class _NoopSpan:
+    """未开启追踪或未被采样时返回的空 span，所有操作都不做事。"""
+
+    __slots__ = ("_token",)
+
+    recording = False
+
+    def __init__(self):
+        self._token: Optional[contextvars.Token] = None
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+class _UnsampledRoot(_NoopSpan):
+    """未被采样的根 span：进入时标记当前上下文，让其下的子 span 不再各自抽样。"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_UnsampledRoot":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current_span.reset(self._token)
+
+
+_NOOP = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar("erp_current_span", default=None)
+
+
+@dataclass
+class TracerStats:
+    roots: int = 0          # 根 span 数（抽样前）
+    sampled: int = 0        # 被采样的根 span 数
+    exported: int = 0       # 已写出的 span 数
+    flushes: int = 0
+
+
+class Tracer:
+    """
+    按根 span 抽样（sample_rate），被采样的链路记录其下全部 span，未被采样的链路几乎没有开销。
+    span 结束后进入内存缓冲，攒够 batch_size 条或调用 flush 时追加写入文件：
+    fmt="jsonl" 每行一个 span；fmt="otlp" 每行一个 OTLP/JSON ExportTraceServiceRequest，
+    可以直接交给 OpenTelemetry Collector 的 otlpjsonfile 接收器。
+    """
+
+    def __init__(self, path: str, sample_rate: float = 1.0, fmt: str = "jsonl", batch_size: int = 512,
+                 service_name: str = "erp-platform"):
+        if fmt not in ("jsonl", "otlp"):
+            raise ValueError(f"不支持的追踪导出格式: {fmt}")
+        self.path = path
+        self.sample_rate = sample_rate
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.service_name = service_name
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        self._stats = TracerStats()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def stats(self) -> TracerStats:
+        with self._lock:
+            return dataclasses.replace(self._stats)
+
+    def sample(self) -> bool:
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        with self._lock:
+            self._stats.roots += 1
+            self._stats.sampled += sampled
+        return sampled
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._buffer.append(span)
+            if len(self._buffer) < self.batch_size:
+                return
+            batch, self._buffer = self._buffer, []
+            self._write(batch)
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Span]) -> None:
+        # 持有 _lock 时调用，保证多线程写出的行不交错
+        if self.fmt == "otlp":
+            lines = [json.dumps(_otlp_request(batch, self.service_name), ensure_ascii=False, default=str)]
+        else:
+            lines = [json.dumps(span.to_dict(), ensure_ascii=False, default=str) for span in batch]
+        # 一次 O_APPEND 写入整批：多个 worker 进程共用一个追踪文件时行不会交错
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, ("\n".join(lines) + "\n").encode("utf-8"))
+        finally:
+            os.close(fd)
+        self._stats.exported += len(batch)
+        self._stats.flushes += 1
+
+
+_tracer: Optional[Tracer] = None
+
+
+def configure_tracing(path: str, sample_rate: float = 1.0, fmt: str = "jsonl", **kwargs: Any) -> Tracer:
+    """开启链路追踪，之后结束的 span 写入 path。重复调用会先写出并替换原来的 tracer。"""
+    global _tracer
+    shutdown_tracing()
+    _tracer = Tracer(path, sample_rate, fmt, **kwargs)
+    get_logger(__name__).info("链路追踪已开启: %s (%s, 采样率 %.2f)", path, fmt, sample_rate)
+    return _tracer
+
+
+@atexit.register
+def shutdown_tracing() -> None:
+    """写出缓冲中的 span 并关闭追踪，进程退出时自动调用。"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.flush()
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def start_span(name: str, kind: str = "internal", **attributes: Any):
+    """
+    创建以当前 span 为父的 span 但不把它设为当前 span，需要手动 end()。
+    用于跨越 yield 的操作（如流式模型输出），避免调用方的 span 被挂到它下面。
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+    parent = _current_span.get()
+    if parent is None:
+        return Span(name, kind, random.getrandbits(128), None, attributes) if tracer.sample() else _NOOP
+    if not parent.recording:
+        return _NOOP
+    return Span(name, kind, parent.trace_id, parent.span_id, attributes)
+
+
+def span(name: str, kind: str = "internal", **attributes: Any):
+    """
+    计时上下文管理器：with span("adapter.create_record", "adapter", menu=...) as s: ...
+    异常会记录在 span 上并照常抛出。未开启追踪时返回共享的空 span。
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+    parent = _current_span.get()
+    if parent is None:
+        if not tracer.sample():
+            return _UnsampledRoot()
+        return Span(name, kind, random.getrandbits(128), None, attributes)
+    if not parent.recording:
+        return _NOOP
+    return Span(name, kind, parent.trace_id, parent.span_id, attributes)
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def traced(name: Optional[str] = None, kind: str = "internal") -> Callable[[F], F]:
+    """把函数调用包在 span 中的装饰器，name 默认为函数的 __qualname__。"""
+    def decorator(func: F) -> F:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def _otlp_request(batch: List[Span], service_name: str) -> Dict[str, Any]:
+    spans = []
+    for s in batch:
+        item = {
+            "traceId": f"{s.trace_id:032x}",
+            "spanId": f"{s.span_id:016x}",
+            "name": s.name,
+            "kind": 3 if s.kind in ("webdriver", "llm") else 1,   # CLIENT / INTERNAL
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": _otlp_attributes({"erp.kind": s.kind, **s.attributes}),
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id is not None:
+            item["parentSpanId"] = f"{s.parent_id:016x}"
+        spans.append(item)
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": service_name, "process.pid": os.getpid()})},
+        "scopeSpans": [{"scope": {"name": "erp"}, "spans": spans}],
+    }]}
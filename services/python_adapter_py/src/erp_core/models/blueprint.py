@@ -0,0 +1,65 @@
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import yaml
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from erp_core.models.task import Task
+
+
+class ConcurrencyConfig(BaseModel):
+    """蓝图执行的并发限制。"""
+    max_workers: int = Field(4, ge=1)                           # 同时执行的任务数（浏览器会话数）
+    level_limits: Dict[int, int] = Field(default_factory=dict)  # 拓扑层号 -> 该层同时运行上限
+    default_level_limit: Optional[int] = Field(None, ge=1)
+
+    @field_validator("level_limits")
+    @classmethod
+    def _check_level_limits(cls, value: Dict[int, int]) -> Dict[int, int]:
+        # 上限为 0 的层永远无法调度，执行会卡住而不是报错
+        invalid = {level: limit for level, limit in value.items() if limit < 1}
+        if invalid:
+            raise ValueError(f"level_limits 的上限必须 >= 1: {invalid}")
+        return value
+
+
+class Blueprint(BaseModel):
+    """一次公司初始化部署的完整描述。"""
+    name: str
+    company: str = ""
+    erp_type: str = "kingdee"   # kingdee / yonbip
+    concurrency: ConcurrencyConfig = Field(default_factory=ConcurrencyConfig)
+    steps: List[Task]
+
+    @model_validator(mode="after")
+    def _check_step_ids(self) -> "Blueprint":
+        ids = set()
+        for step in self.steps:
+            if step.id in ids:
+                raise ValueError(f"任务 id 重复: {step.id}")
+            ids.add(step.id)
+        for step in self.steps:
+            unknown = [d for d in step.depends_on if d not in ids]
+            if unknown:
+                raise ValueError(f"任务 {step.id} 依赖了不存在的任务: {unknown}")
+        return self
+
+    def digest(self) -> str:
+        """蓝图内容摘要，内容不变时跨进程、跨 YAML/编译格式保持一致。"""
+        return hashlib.sha256(self.model_dump_json().encode("utf-8")).hexdigest()[:16]
+
+
+# libyaml 的 C 实现比纯 Python 解析器快一个数量级，大型生成蓝图的解析时间主要花在这里
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def parse_blueprint(text: str) -> Blueprint:
+    """从 YAML 文本解析并校验蓝图。"""
+    return Blueprint.model_validate(yaml.load(text, Loader=_YamlLoader))
+
+
+def load_blueprint(path: Union[str, Path]) -> Blueprint:
+    """从 YAML 文件加载并校验蓝图。"""
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_blueprint(f.read())
@@ -0,0 +1,198 @@
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# frame_path 各段拼接成一个字符串时使用的分隔符
+FRAME_SEPARATOR = " >> "
+
+
+class BoundingBox:
+    """元素在顶层视口中的位置（已叠加所在 iframe 的偏移）。"""
+    __slots__ = ("x", "y", "width", "height")
+
+    def __init__(self, x: float, y: float, width: float, height: float):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    @property
+    def right(self) -> float:
+        return self.x + self.width
+
+    @property
+    def bottom(self) -> float:
+        return self.y + self.height
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        return self.x + self.width / 2, self.y + self.height / 2
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BoundingBox) and \
+            (self.x, self.y, self.width, self.height) == (other.x, other.y, other.width, other.height)
+
+    def __repr__(self) -> str:
+        return f"BoundingBox(x={self.x}, y={self.y}, width={self.width}, height={self.height})"
+
+
+class DOMElement:
+    """
+    页面快照中的一个可交互元素。
+
+    使用 __slots__，大表格页面上万个节点时没有每实例 __dict__ 的开销；
+    标签名、属性名和属性值在解码时已 intern，相同字符串只保存一份。
+
+    frame_path 描述从顶层文档到元素所在文档/影子树的路径，每段形如
+    "iframe:<css>" 或 "shadow:<css>"，<css> 是宿主元素在其所在文档中的选择器。
+    """
+    __slots__ = ("node_id", "tag", "attributes", "rect", "visible", "text", "frame_path", "parent_id")
+
+    def __init__(
+            self,
+            node_id: int,
+            tag: str,
+            attributes: Optional[Dict[str, str]] = None,
+            rect: Optional[BoundingBox] = None,
+            visible: bool = False,
+            text: str = "",
+            frame_path: Tuple[str, ...] = (),
+            parent_id: Optional[int] = None,
+    ):
+        self.node_id = node_id
+        self.tag = tag
+        self.attributes = attributes if attributes is not None else {}
+        self.rect = rect if rect is not None else BoundingBox(0, 0, 0, 0)
+        self.visible = visible
+        self.text = text
+        self.frame_path = frame_path
+        self.parent_id = parent_id
+
+    @property
+    def element_id(self) -> Optional[str]:
+        return self.attributes.get("id")
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.attributes.get("name")
+
+    @property
+    def role(self) -> Optional[str]:
+        return self.attributes.get("role")
+
+    @property
+    def label(self) -> Optional[str]:
+        """关联的标签文本：<label for>、aria-label 或 placeholder，由快照脚本计算。"""
+        return self.attributes.get("__label")
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, DOMElement) and all(
+            getattr(self, s) == getattr(other, s) for s in self.__slots__)
+
+    def __repr__(self) -> str:
+        return (f"DOMElement(node_id={self.node_id}, tag={self.tag!r}, attributes={self.attributes!r}, "
+                f"visible={self.visible}, text={self.text!r}, frame_path={self.frame_path!r})")
+
+
+class ElementTable:
+    """
+    列式（struct-of-arrays）元素表，适合一次分析数万节点的大表格页面。
+
+    数值列存放在 array 中，字符串列只存共享字符串表的下标；
+    DOMElement 只在按行访问时才构造，索引和空间查询都直接使用行号。
+    """
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._string_index: Dict[str, int] = {}
+        self.node_ids = array("q")
+        self.parent_ids = array("q")      # 0 表示没有父节点
+        self.tags = array("I")
+        self.texts = array("I")
+        self.frames = array("I")
+        self.visible = array("b")
+        self.rects = array("d")           # 每行 4 个值: x, y, width, height
+        self.attr_offsets = array("I", [0])  # 第 i 行属性位于 attr_pairs[offsets[i]:offsets[i+1]]
+        self.attr_pairs = array("I")      # 名称下标、值下标交替
+        self._row_of: Dict[int, int] = {}
+
+    @classmethod
+    def from_elements(cls, elements: Iterable[DOMElement]) -> "ElementTable":
+        table = cls()
+        for e in elements:
+            table.append(e.node_id, e.tag, e.attributes, (e.rect.x, e.rect.y, e.rect.width, e.rect.height),
+                         e.visible, e.text, FRAME_SEPARATOR.join(e.frame_path), e.parent_id)
+        return table
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def intern(self, value: str) -> int:
+        index = self._string_index.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(sys.intern(value))
+            self._string_index[value] = index
+        return index
+
+    def append(self, node_id: int, tag: str, attributes: Dict[str, str], rect: Sequence[float],
+               visible: bool, text: str = "", frame: str = "", parent_id: Optional[int] = None) -> int:
+        row = len(self.node_ids)
+        self.node_ids.append(node_id)
+        self.parent_ids.append(parent_id or 0)
+        self.tags.append(self.intern(tag))
+        self.texts.append(self.intern(text))
+        self.frames.append(self.intern(frame))
+        self.visible.append(1 if visible else 0)
+        self.rects.extend(rect)
+        for key, value in attributes.items():
+            self.attr_pairs.append(self.intern(key))
+            self.attr_pairs.append(self.intern(value))
+        self.attr_offsets.append(len(self.attr_pairs))
+        self._row_of[node_id] = row
+        return row
+
+    def row_of(self, node_id: int) -> Optional[int]:
+        return self._row_of.get(node_id)
+
+    def tag(self, row: int) -> str:
+        return self.strings[self.tags[row]]
+
+    def text(self, row: int) -> str:
+        return self.strings[self.texts[row]]
+
+    def attribute(self, row: int, name: str) -> Optional[str]:
+        key = self._string_index.get(name)
+        if key is None:
+            return None
+        pairs = self.attr_pairs
+        for i in range(self.attr_offsets[row], self.attr_offsets[row + 1], 2):
+            if pairs[i] == key:
+                return self.strings[pairs[i + 1]]
+        return None
+
+    def attributes(self, row: int) -> Dict[str, str]:
+        s, pairs = self.strings, self.attr_pairs
+        return {s[pairs[i]]: s[pairs[i + 1]] for i in range(self.attr_offsets[row], self.attr_offsets[row + 1], 2)}
+
+    def rect(self, row: int) -> Tuple[float, float, float, float]:
+        base = 4 * row
+        return self.rects[base], self.rects[base + 1], self.rects[base + 2], self.rects[base + 3]
+
+    def element(self, row: int) -> DOMElement:
+        """按行构造 DOMElement 视图。"""
+        frame = self.strings[self.frames[row]]
+        return DOMElement(
+            node_id=self.node_ids[row],
+            tag=self.tag(row),
+            attributes=self.attributes(row),
+            rect=BoundingBox(*self.rect(row)),
+            visible=bool(self.visible[row]),
+            text=self.text(row),
+            frame_path=tuple(frame.split(FRAME_SEPARATOR)) if frame else (),
+            parent_id=self.parent_ids[row] or None,
+        )
+
+    def __iter__(self) -> Iterator[DOMElement]:
+        for row in range(len(self)):
+            yield self.element(row)
@@ -0,0 +1,39 @@
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class TaskStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    SKIPPED = "skipped"  # 上游任务失败，未执行
+    CANCELLED = "cancelled"  # 作业被取消时尚未执行
+
+
+class Task(BaseModel):
+    """蓝图中的一个步骤：在某个服务器上对一条业务记录执行一个动作。"""
+    id: str
+    name: str = ""
+    action: str = "create"              # create / update / 自定义动作名
+    entity: str = ""                    # supplier / material / purchase_order ...
+    server: str = "BBB"
+    menu: List[str] = Field(default_factory=list)       # 导航菜单路径
+    fields: Dict[str, Any] = Field(default_factory=dict)  # 表单标签 -> 值
+    key: Optional[str] = None           # 业务主键，如供应商编码 GYS0001
+    depends_on: List[str] = Field(default_factory=list)
+    estimated_seconds: float = 30.0     # 用于关键路径排序和 dry-run 估算
+
+    def referenced_values(self) -> Iterator[str]:
+        """遍历字段中出现的所有字符串值（含列表中的值），用于推断依赖。"""
+        stack: List[Any] = list(self.fields.values())
+        while stack:
+            value = stack.pop()
+            if isinstance(value, str):
+                yield value
+            elif isinstance(value, (list, tuple)):
+                stack.extend(value)
+            elif isinstance(value, dict):
+                stack.extend(value.values())
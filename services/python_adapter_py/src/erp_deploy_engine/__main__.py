@@ -0,0 +1,138 @@
+import argparse
+import sys
+from pathlib import Path
+
+from erp_core.exceptions import ConfigError, ErpPlatformError
+from erp_core.logging import configure_tracing, setup_logging
+from erp_deploy_engine.compiled import COMPILED_SUFFIX, compile_file, open_blueprint
+from erp_deploy_engine.journal import RunJournal
+from erp_deploy_engine.orchestrator import Orchestrator
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="erp_deploy_engine", description="ERP 蓝图部署引擎")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    tracing = argparse.ArgumentParser(add_help=False)
+    tracing.add_argument("--trace", default=None, metavar="PATH",
+                         help="把链路追踪 span 写入该文件（也可用环境变量 ERP_TRACE_FILE）")
+    tracing.add_argument("--trace-sample", type=float, default=1.0, help="按任务抽样的比例，默认全部记录")
+    tracing.add_argument("--trace-format", choices=("jsonl", "otlp"), default="jsonl")
+
+    run = sub.add_parser("run", help="执行蓝图", parents=[tracing])
+    run.add_argument("blueprint", help="蓝图 YAML 或编译蓝图 (.bpc) 文件路径")
+    run.add_argument("--dry-run", action="store_true", help="只打印调度计划，不执行")
+    run.add_argument("--workers", type=int, default=None, help="覆盖蓝图中的 max_workers")
+    run.add_argument("--journal", default=None, help="运行日志路径；日志已存在时从中断处续跑")
+    run.add_argument("--restart", action="store_true", help="清空已有运行日志，从头执行")
+    run.add_argument("--resolved", action="append", default=[], metavar="TASK_ID",
+                     help="人工确认该任务上次中断时并未写入 ERP，续跑时正常重跑（可重复）")
+
+    compile_ = sub.add_parser("compile", help="校验蓝图并编译为可内存映射的二进制格式")
+    compile_.add_argument("blueprint", help="蓝图 YAML 文件路径")
+    compile_.add_argument("-o", "--output", default=None, help=f"输出路径，默认与 YAML 同名的 {COMPILED_SUFFIX} 文件")
+
+    serve = sub.add_parser("serve", help="启动 gRPC 部署引擎服务", parents=[tracing])
+    serve.add_argument("--address", default="[::]:50051")
+    serve.add_argument("--worker-slots", type=int, default=8, help="全局并发任务数（浏览器会话数）")
+    serve.add_argument("--max-active-jobs", type=int, default=4)
+    serve.add_argument("--max-queued-jobs", type=int, default=16)
+    serve.add_argument("--cluster", action="store_true",
+                       help="任务分发给注册到本服务的远程适配器 worker 执行，本机不启动浏览器")
+    serve.add_argument("--lease-ttl", type=float, default=30.0, help="任务租约有效期（秒），worker 超时未心跳即判定失联")
+    serve.add_argument("--heartbeat-interval", type=float, default=5.0, help="建议 worker 使用的心跳间隔（秒）")
+    serve.add_argument("--blueprint-dir", default="blueprints",
+                       help="客户端按 blueprint_path 提交时允许读取的蓝图目录，路径不能超出该目录")
+
+    worker = sub.add_parser("worker", help="启动适配器 worker，向 --cluster 模式的部署引擎领取任务",
+                            parents=[tracing])
+    worker.add_argument("--engine", default="localhost:50051", help="部署引擎 gRPC 地址")
+    worker.add_argument("--slots", type=int, default=4, help="本机浏览器会话数")
+    worker.add_argument("--erp-type", action="append", dest="erp_types", default=None,
+                        help="本机可执行的 ERP 类型（可重复），默认全部")
+
+    trace = sub.add_parser("trace", help="汇总链路追踪文件：各步骤耗时按浏览器/等待/视觉/模型拆分")
+    trace.add_argument("files", nargs="+", help="--trace 写出的文件（JSONL 或 OTLP/JSON），可以有多个")
+    trace.add_argument("--top", type=int, default=20, help="列出最慢的步骤数")
+    trace.add_argument("--step", action="append", default=[], metavar="TASK_ID", help="输出该步骤的火焰摘要（可重复）")
+    trace.add_argument("--flame", action="store_true", help="输出全部步骤合并后的火焰摘要")
+    trace.add_argument("--min-percent", type=float, default=1.0, help="火焰摘要中省略占比低于该值的分支")
+    trace.add_argument("--folded", default=None, metavar="PATH", help="写出折叠栈文件，供 flamegraph.pl / speedscope 使用")
+
+    args = parser.parse_args(argv)
+    setup_logging()
+    if getattr(args, "trace", None):
+        configure_tracing(args.trace, args.trace_sample, args.trace_format)
+    try:
+        return _dispatch(parser, args)
+    except ConfigError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+
+def _dispatch(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    if args.command == "run":
+        blueprint = open_blueprint(args.blueprint, compile_missing=not args.dry_run)
+        orchestrator = Orchestrator(max_workers=args.workers)
+        if args.journal is None or args.dry_run:
+            report = orchestrator.run(blueprint, dry_run=args.dry_run)
+        else:
+            with RunJournal(args.journal, fresh=args.restart) as journal:
+                for task_id in args.resolved:
+                    task = next((t for t in blueprint.steps if t.id == task_id), None)
+                    if task is None:
+                        parser.error(f"--resolved: 蓝图中没有任务 {task_id}")
+                    journal.resolve(task)
+                report = orchestrator.run(blueprint, journal=journal)
+        if report is not None and not report.succeeded:
+            return 1
+    elif args.command == "compile":
+        output = args.output or str(Path(args.blueprint).with_suffix(COMPILED_SUFFIX))
+        content_hash = compile_file(args.blueprint, output)
+        print(f"{output} sha256={content_hash}")
+    elif args.command == "serve":
+        # 延迟导入：只有服务模式才需要 grpc 和生成的 rpc 代码
+        from erp_deploy_engine.server import run_server
+        run_server(address=args.address, worker_slots=args.worker_slots,
+                   max_active_jobs=args.max_active_jobs, max_queued_jobs=args.max_queued_jobs,
+                   cluster=args.cluster, lease_ttl=args.lease_ttl, heartbeat_interval=args.heartbeat_interval,
+                   blueprint_dir=args.blueprint_dir)
+    elif args.command == "worker":
+        from erp_deploy_engine.task_executor import ADAPTER_TYPES
+        from erp_deploy_engine.worker import run_worker
+        run_worker(args.engine, args.slots, args.erp_types or list(ADAPTER_TYPES))
+    elif args.command == "trace":
+        return _trace_report(args)
+    return 0
+
+
+def _trace_report(args: argparse.Namespace) -> int:
+    from erp_deploy_engine import trace_report
+
+    try:
+        roots = trace_report.build_trees(trace_report.load_spans(args.files))
+    except (OSError, ErpPlatformError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(trace_report.format_summary(roots, args.top))
+    if args.flame:
+        print("\n全部步骤:")
+        print(trace_report.format_flame(trace_report.merge(roots), args.min_percent))
+    for task_id in args.step:
+        runs = trace_report.find_task(roots, task_id)
+        if not runs:
+            print(f"\n追踪文件中没有步骤 {task_id}（可能未被抽样）")
+            continue
+        print(f"\n步骤 {task_id}（{len(runs)} 次执行）:")
+        print(trace_report.format_flame(trace_report.merge(runs, task_id), args.min_percent))
+    if args.folded:
+        with open(args.folded, "w", encoding="utf-8") as f:
+            for path, micros in sorted(trace_report.folded_stacks(roots).items()):
+                if micros:
+                    f.write(f"{path} {micros}\n")
+        print(f"\n折叠栈已写入 {args.folded}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+import asyncio
+import dataclasses
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from erp_core.logging import get_logger
+from erp_core.models.task import Task, TaskStatus
+from erp_deploy_engine.task_executor import TaskResult
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class WorkerInfo:
+    worker_id: str
+    hostname: str
+    erp_types: Tuple[str, ...]
+    total_slots: int
+    free_slots: int
+    last_seen: float
+    leases: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class _Pending:
+    job_id: str
+    erp_type: str
+    task: Task
+    future: "asyncio.Future[TaskResult]"
+    attempt: int = 1
+
+
+@dataclass
+class Lease:
+    lease_id: str
+    worker_id: str
+    expires_at: float
+    item: _Pending
+
+    @property
+    def task(self) -> Task:
+        return self.item.task
+
+
+@dataclass
+class ClusterStats:
+    registered: int = 0
+    lost_workers: int = 0        # 心跳超时被判定失联的 worker
+    leases: int = 0
+    completed: int = 0
+    released: int = 0            # 因 worker 失联/下线/租约过期而重新排队的任务
+    stale_results: int = 0       # 租约已失效后才到达、被丢弃的结果
+    exhausted: int = 0           # 超过最大尝试次数而失败的任务
+
+
+class LeaseManager:
+    """
+    把任务以租约形式分发给远程适配器 worker（见 proto/adapter_api.proto）。
+
+    引擎侧调用 submit 提交任务并等待结果；worker 通过 acquire 长轮询领取与自身 ERP 类型匹配的任务，
+    每次心跳续约手中全部租约。worker 超过 lease_ttl 未心跳即判定失联，其租约上的任务带着
+    attempt + 1 回到队首，由下一个 worker 先确认 ERP 中是否已写入再执行；超过 max_attempts 次后任务失败。
+
+    所有方法都在引擎的事件循环线程中调用，不需要加锁。
+    """
+
+    def __init__(self, lease_ttl: float = 30.0, heartbeat_interval: float = 5.0, max_attempts: int = 3,
+                 clock: Callable[[], float] = time.monotonic):
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._workers: Dict[str, WorkerInfo] = {}
+        self._pending: Dict[str, Deque[_Pending]] = {}
+        self._leases: Dict[str, Lease] = {}
+        self._cancelled_jobs: Set[str] = set()
+        self._changed: Optional[asyncio.Condition] = None
+        self._stats = ClusterStats()
+
+    @property
+    def stats(self) -> ClusterStats:
+        return dataclasses.replace(self._stats)
+
+    def workers(self) -> List[WorkerInfo]:
+        return [dataclasses.replace(w, leases=set(w.leases)) for w in self._workers.values()]
+
+    def capacity(self, erp_type: Optional[str] = None) -> int:
+        """在线 worker 的总槽位数，可按 ERP 类型过滤。"""
+        return sum(w.total_slots for w in self._workers.values() if erp_type is None or erp_type in w.erp_types)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._pending.values())
+
+    # ---------------- 引擎侧 ----------------
+
+    async def submit(self, job_id: str, erp_type: str, task: Task) -> TaskResult:
+        """排队等待 worker 执行任务，返回其结果。"""
+        future: "asyncio.Future[TaskResult]" = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(erp_type, deque()).append(_Pending(job_id, erp_type, task, future))
+        await self._notify()
+        return await future
+
+    def cancel_job(self, job_id: str) -> int:
+        """取消作业尚未被领取的任务（记为 CANCELLED）；已被领取的任务照常等待 worker 完成，不再重新排队。"""
+        self._cancelled_jobs.add(job_id)
+        cancelled = 0
+        for erp_type, queue in self._pending.items():
+            keep: Deque[_Pending] = deque()
+            for item in queue:
+                if item.job_id == job_id:
+                    _resolve(item, TaskResult(item.task.id, TaskStatus.CANCELLED))
+                    cancelled += 1
+                else:
+                    keep.append(item)
+            self._pending[erp_type] = keep
+        return cancelled
+
+    async def reap_forever(self) -> None:
+        """定期回收失联 worker 和过期租约，在引擎事件循环中作为后台任务运行。"""
+        while True:
+            await asyncio.sleep(min(self.heartbeat_interval, self.lease_ttl / 2))
+            if self.reap():
+                await self._notify()
+
+    def reap(self) -> int:
+        """回收一次，返回重新排队的任务数。"""
+        now = self._clock()
+        released = 0
+        for worker in list(self._workers.values()):
+            if now - worker.last_seen > self.lease_ttl:
+                logger.warning("worker %s (%s) %.0fs 未心跳，判定失联", worker.worker_id, worker.hostname,
+                               now - worker.last_seen)
+                self._stats.lost_workers += 1
+                released += self._drop_worker(worker.worker_id)
+        for lease in list(self._leases.values()):
+            if lease.expires_at < now:
+                released += self._release(lease, "租约过期")
+        return released
+
+    # ---------------- worker 侧 ----------------
+
+    def register(self, hostname: str, erp_types: Sequence[str], total_slots: int, free_slots: int,
+                 worker_id: str = "") -> str:
+        worker_id = worker_id or f"{hostname}-{uuid.uuid4().hex[:8]}"
+        previous = self._workers.get(worker_id)
+        self._workers[worker_id] = WorkerInfo(worker_id, hostname, tuple(erp_types), total_slots, free_slots,
+                                              self._clock(), previous.leases if previous else set())
+        self._stats.registered += 1
+        logger.info("worker %s 注册: %s, %d 个槽位", worker_id, "/".join(erp_types), total_slots)
+        return worker_id
+
+    def heartbeat(self, worker_id: str, free_slots: int, lease_ids: Sequence[str]) -> Tuple[bool, List[str]]:
+        """
+        续约 worker 上报的租约。返回 (是否已注册, 失效的租约 id)。
+        引擎认为属于该 worker 但它没有上报的租约不续约，到期后由 reap 重新排队：
+        刚发出的租约可能还没来得及出现在并发的心跳里，不能立即收回。
+        """
+        worker = self._workers.get(worker_id)
+        if worker is None:
+            return False, list(lease_ids)
+        now = self._clock()
+        worker.last_seen = now
+        worker.free_slots = free_slots
+        reported = set(lease_ids)
+        revoked = [lease_id for lease_id in reported if lease_id not in worker.leases]
+        for lease_id in reported & worker.leases:
+            self._leases[lease_id].expires_at = now + self.lease_ttl
+        return True, revoked
+
+    async def acquire(self, worker_id: str, max_tasks: int, wait: float) -> Optional[List[Lease]]:
+        """领取最多 max_tasks 个任务，没有任务时最多等待 wait 秒；worker 未注册时返回 None。"""
+        worker = self._workers.get(worker_id)
+        if worker is None:
+            return None
+        deadline = self._clock() + wait
+        changed = self._condition()
+        async with changed:
+            while True:
+                worker = self._workers.get(worker_id)
+                if worker is None:
+                    return None
+                worker.last_seen = self._clock()
+                leases = self._take(worker, max_tasks)
+                remaining = deadline - self._clock()
+                if leases or remaining <= 0:
+                    return leases
+                try:
+                    await asyncio.wait_for(changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+    def complete(self, worker_id: str, lease_id: str, job_id: str, result: TaskResult) -> bool:
+        """
+        提交任务结果。租约已失效时，如果任务还在队列中没有被其他 worker 领取，仍然采纳该结果；
+        已被重新领取的任务以新租约的结果为准，返回 False。
+        """
+        lease = self._leases.get(lease_id)
+        if lease is not None and lease.worker_id == worker_id:
+            del self._leases[lease_id]
+            worker = self._workers.get(worker_id)
+            if worker is not None:
+                worker.leases.discard(lease_id)
+            self._stats.completed += 1
+            _resolve(lease.item, result)
+            return True
+        for queue in self._pending.values():
+            for item in queue:
+                if item.job_id == job_id and item.task.id == result.task_id:
+                    queue.remove(item)
+                    self._stats.completed += 1
+                    _resolve(item, result)
+                    return True
+        self._stats.stale_results += 1
+        logger.info("丢弃 worker %s 迟到的任务 %s 结果（租约已转交）", worker_id, result.task_id)
+        return False
+
+    async def deregister(self, worker_id: str) -> int:
+        released = self._drop_worker(worker_id)
+        if released:
+            await self._notify()
+        return released
+
+    # ---------------- 内部实现 ----------------
+
+    def _condition(self) -> asyncio.Condition:
+        # 条件变量要在事件循环中创建
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    async def _notify(self) -> None:
+        changed = self._condition()
+        async with changed:
+            changed.notify_all()
+
+    def _take(self, worker: WorkerInfo, max_tasks: int) -> List[Lease]:
+        leases: List[Lease] = []
+        now = self._clock()
+        for erp_type in worker.erp_types:
+            queue = self._pending.get(erp_type)
+            while queue and len(leases) < max_tasks:
+                item = queue.popleft()
+                if item.future.done():
+                    continue
+                lease = Lease(uuid.uuid4().hex, worker.worker_id, now + self.lease_ttl, item)
+                self._leases[lease.lease_id] = lease
+                worker.leases.add(lease.lease_id)
+                leases.append(lease)
+        self._stats.leases += len(leases)
+        return leases
+
+    def _drop_worker(self, worker_id: str) -> int:
+        worker = self._workers.pop(worker_id, None)
+        if worker is None:
+            return 0
+        released = 0
+        for lease_id in list(worker.leases):
+            lease = self._leases.get(lease_id)
+            if lease is not None:
+                released += self._release(lease, f"worker {worker_id} 下线")
+        return released
+
+    def _release(self, lease: Lease, reason: str) -> int:
+        self._leases.pop(lease.lease_id, None)
+        worker = self._workers.get(lease.worker_id)
+        if worker is not None:
+            worker.leases.discard(lease.lease_id)
+        item = lease.item
+        if item.future.done():
+            return 0
+        if item.job_id in self._cancelled_jobs:
+            _resolve(item, TaskResult(item.task.id, TaskStatus.CANCELLED))
+            return 0
+        if item.attempt >= self.max_attempts:
+            self._stats.exhausted += 1
+            _resolve(item, TaskResult(item.task.id, TaskStatus.FAILED,
+                                      error=f"租约已 {item.attempt} 次未完成（{reason}），放弃重试"))
+            return 0
+        item.attempt += 1
+        # 放回队首：它在调度顺序上本就先于队列中的任务
+        self._pending.setdefault(item.erp_type, deque()).appendleft(item)
+        self._stats.released += 1
+        logger.warning("任务 %s 重新排队（%s），第 %d 次尝试", item.task.id, reason, item.attempt)
+        return 1
+
+
+def _resolve(item: _Pending, result: TaskResult) -> None:
+    if not item.future.done():
+        item.future.set_result(result)
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+from erp_core.exceptions import BlueprintError
+from erp_core.logging import get_logger
+from erp_core.models.blueprint import Blueprint, ConcurrencyConfig, parse_blueprint
+from erp_core.models.task import Task
+from erp_deploy_engine.scheduler import TaskGraph
+
+logger = get_logger(__name__)
+
+COMPILED_SUFFIX = ".bpc"
+# 相对路径按蓝图文件所在目录解析，编译缓存与蓝图放在一起，不随进程的工作目录变化
+DEFAULT_CACHE_DIR = ".cache/blueprints"
+
+# 文件头：魔数、格式版本、编码方式、内容哈希 (sha256, 覆盖文件头之后的全部字节)、
+# 源 YAML 哈希、元数据长度、任务数。之后依次是元数据、任务偏移表 (task_count + 1 个 u64) 和任务记录。
+_MAGIC = b"ERPBP\x00"
+_VERSION = 1
+_HEADER = struct.Struct("<6sHBx32s32sQQ")
+_OFFSET = struct.Struct("<Q")
+
+_CODEC_JSON = 0
+_CODEC_MSGPACK = 1
+
+
+def _codec(codec: int) -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    if codec == _CODEC_MSGPACK:
+        import msgpack
+        return (lambda obj: msgpack.packb(obj, use_bin_type=True, default=str),
+                lambda data: msgpack.unpackb(data, raw=False))
+    return (lambda obj: json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"),
+            json.loads)
+
+
+def _default_codec() -> int:
+    # msgpack 可选（pip install .[compiled]），没有安装时用紧凑 JSON，读取时按文件头选择解码方式
+    try:
+        import msgpack  # noqa: F401
+        return _CODEC_MSGPACK
+    except ImportError:
+        return _CODEC_JSON
+
+
+def compile_blueprint(blueprint: Blueprint, path: Union[str, Path], source_hash: str = "") -> str:
+    """
+    把已校验的蓝图连同编译好的依赖图写成紧凑二进制文件，返回内容哈希。
+
+    依赖推断、分层和关键路径 rank 在这里一次算好存入元数据；每个任务单独编码，
+    加载时通过偏移表按需解码，不需要重新解析 YAML 和 pydantic 校验。
+    """
+    graph = TaskGraph.from_blueprint(blueprint)
+    codec = _default_codec()
+    encode, _ = _codec(codec)
+    index = {task_id: i for i, task_id in enumerate(graph.order)}
+    meta = encode({
+        "name": blueprint.name,
+        "company": blueprint.company,
+        "erp_type": blueprint.erp_type,
+        "concurrency": blueprint.concurrency.model_dump(mode="json"),
+        "digest": blueprint.digest(),
+        "order": graph.order,
+        "deps": [sorted(index[d] for d in graph.deps[t]) for t in graph.order],
+        "levels": [graph.levels[t] for t in graph.order],
+        "rank": [graph.rank[t] for t in graph.order],
+    })
+    records = [encode(graph.tasks[t].model_dump(mode="json", exclude_defaults=True)) for t in graph.order]
+    offsets = [0]
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+
+    body = hashlib.sha256()
+    parts = [meta, struct.pack(f"<{len(offsets)}Q", *offsets)] + records
+    for part in parts:
+        body.update(part)
+    content_hash = body.hexdigest()
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, codec, bytes.fromhex(content_hash),
+                                 bytes.fromhex(source_hash) if source_hash else b"\0" * 32,
+                                 len(meta), len(records)))
+            for part in parts:
+                f.write(part)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    logger.info("蓝图 %s 已编译到 %s: %d 个任务, %.1f MB", blueprint.name, path, len(records),
+                path.stat().st_size / 1e6)
+    return content_hash
+
+
+class _LazyTasks(Mapping[str, Task]):
+    """任务 id -> Task 的只读映射，首次访问时从内存映射中解码并构造（不再校验），之后缓存。"""
+
+    def __init__(self, compiled: "CompiledBlueprint"):
+        self._compiled = compiled
+        self._cache: Dict[str, Task] = {}
+
+    def __getitem__(self, task_id: str) -> Task:
+        task = self._cache.get(task_id)
+        if task is None:
+            task = self._cache[task_id] = self._compiled.task_at(self._compiled.index[task_id])
+        return task
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._compiled.order)
+
+    def __len__(self) -> int:
+        return len(self._compiled.order)
+
+    def __contains__(self, task_id: object) -> bool:
+        return task_id in self._compiled.index
+
+    @property
+    def materialized(self) -> int:
+        return len(self._cache)
+
+
+class _LazySteps(Sequence[Task]):
+    """与 Blueprint.steps 兼容的惰性任务序列。"""
+
+    def __init__(self, tasks: _LazyTasks, order: List[str]):
+        self._tasks = tasks
+        self._order = order
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._tasks[t] for t in self._order[i]]
+        return self._tasks[self._order[i]]
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+
+class CompiledBlueprint:
+    """
+    内存映射的编译蓝图，可以代替 Blueprint 交给 Orchestrator / AsyncEngine 执行。
+
+    打开时只读文件头和元数据（任务 id、依赖、分层、rank），任务对象在调度器取出时才解码，
+    用 Task.model_construct 构造、跳过校验（编译时已校验过）。多个进程打开同一文件时共享页缓存。
+    """
+
+    def __init__(self, path: Union[str, Path], verify: bool = False):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            raise BlueprintError(f"{self.path} 不是编译蓝图文件")
+        magic, version, codec, content_hash, source_hash, meta_len, count = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            raise BlueprintError(f"{self.path} 不是编译蓝图文件")
+        if version != _VERSION:
+            raise BlueprintError(f"{self.path} 的格式版本 {version} 不受支持，请重新编译")
+        self.content_hash = content_hash.hex()
+        self.source_hash = source_hash.hex()
+        if verify and hashlib.sha256(self._mmap[_HEADER.size:]).hexdigest() != self.content_hash:
+            raise BlueprintError(f"{self.path} 内容哈希不匹配，文件已损坏")
+
+        _, self._decode = _codec(codec)
+        meta = self._decode(self._mmap[_HEADER.size:_HEADER.size + meta_len])
+        self._offsets_at = _HEADER.size + meta_len
+        self._records_at = self._offsets_at + (count + 1) * _OFFSET.size
+        self.name: str = meta["name"]
+        self.company: str = meta["company"]
+        self.erp_type: str = meta["erp_type"]
+        self.concurrency = ConcurrencyConfig.model_validate(meta["concurrency"])
+        self.order: List[str] = meta["order"]
+        self.index: Dict[str, int] = {task_id: i for i, task_id in enumerate(self.order)}
+        self._digest: str = meta["digest"]
+        self._deps: List[List[int]] = meta["deps"]
+        self._levels: List[int] = meta["levels"]
+        self._rank: List[float] = meta["rank"]
+        self.tasks = _LazyTasks(self)
+        self.steps = _LazySteps(self.tasks, self.order)
+
+    def digest(self) -> str:
+        """与源蓝图 Blueprint.digest() 相同，运行日志据此识别同一份蓝图。"""
+        return self._digest
+
+    def position(self, task_id: str) -> int:
+        try:
+            return self.index[task_id]
+        except KeyError:
+            raise BlueprintError(f"蓝图 {self.name} 中没有任务 {task_id}") from None
+
+    def task_at(self, position: int) -> Task:
+        start, end = (_OFFSET.unpack_from(self._mmap, self._offsets_at + (position + i) * _OFFSET.size)[0]
+                      for i in (0, 1))
+        data = self._decode(self._mmap[self._records_at + start:self._records_at + end])
+        return Task.model_construct(**data)
+
+    def graph(self) -> TaskGraph:
+        order = self.order
+        return TaskGraph.restore(
+            order, self.tasks,
+            deps={task_id: {order[d] for d in deps} for task_id, deps in zip(order, self._deps)},
+            levels=dict(zip(order, self._levels)),
+            rank=dict(zip(order, self._rank)),
+        )
+
+    def close(self) -> None:
+        self._mmap.close()
+
+
+BlueprintLike = Union[Blueprint, CompiledBlueprint]
+
+
+def build_graph(blueprint: BlueprintLike) -> TaskGraph:
+    if isinstance(blueprint, CompiledBlueprint):
+        return blueprint.graph()
+    return TaskGraph.from_blueprint(blueprint)
+
+
+def compile_file(source: Union[str, Path], output: Union[str, Path]) -> str:
+    """校验并编译 YAML 蓝图文件，记录源文件哈希，返回内容哈希。"""
+    data = Path(source).read_bytes()
+    return compile_blueprint(parse_blueprint(data.decode("utf-8")), output, hashlib.sha256(data).hexdigest())
+
+
+def open_blueprint(path: Union[str, Path], cache_dir: Optional[Union[str, Path]] = DEFAULT_CACHE_DIR,
+                   compile_missing: bool = True) -> BlueprintLike:
+    """
+    打开蓝图：.bpc 直接内存映射；YAML 按源文件哈希查找编译缓存，没有时校验、编译后再映射。
+    相对的 cache_dir 按蓝图文件所在目录解析；cache_dir=None 时不使用缓存，直接返回校验过的 Blueprint。
+    compile_missing=False（dry-run）时只使用已有的缓存，没有缓存也不写文件，直接返回校验过的 Blueprint。
+    """
+    path = Path(path)
+    if path.suffix == COMPILED_SUFFIX:
+        return CompiledBlueprint(path)
+    source = path.read_bytes()
+    if cache_dir is None:
+        return parse_blueprint(source.decode("utf-8"))
+    source_hash = hashlib.sha256(source).hexdigest()
+    cached = path.parent / cache_dir / f"{path.stem}-{source_hash[:16]}{COMPILED_SUFFIX}"
+    if cached.exists():
+        try:
+            compiled = CompiledBlueprint(cached)
+            if compiled.source_hash == source_hash:
+                return compiled
+            compiled.close()
+        except (BlueprintError, ValueError, KeyError) as e:
+            logger.warning("编译缓存 %s 无法使用，重新编译: %s", cached, e)
+    if not compile_missing:
+        return parse_blueprint(source.decode("utf-8"))
+    compile_blueprint(parse_blueprint(source.decode("utf-8")), cached, source_hash)
+    return CompiledBlueprint(cached)
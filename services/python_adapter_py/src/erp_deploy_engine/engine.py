@@ -0,0 +1,298 @@
+import asyncio
+import itertools
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Set
+
+from erp_core.exceptions import EngineBusyError, JobNotFoundError
+from erp_core.logging import get_logger
+from erp_core.models.task import Task, TaskStatus
+from erp_deploy_engine.cluster import LeaseManager
+from erp_deploy_engine.compiled import BlueprintLike, build_graph
+from erp_deploy_engine.scheduler import Scheduler
+from erp_deploy_engine.task_executor import TaskExecutor, TaskResult
+
+logger = get_logger(__name__)
+
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class JobEvent:
+    job_id: str
+    sequence: int
+    job_state: JobState
+    completed: int
+    total: int
+    timestamp: float = field(default_factory=time.time)
+    task_id: Optional[str] = None
+    task_state: Optional[TaskStatus] = None
+    error: Optional[str] = None
+    duration: float = 0.0
+    output: Dict[str, str] = field(default_factory=dict)
+
+
+class Job:
+    """一次蓝图执行。事件保存在历史列表中，订阅者各自按序号读取，慢订阅者不会拖慢执行。"""
+
+    def __init__(self, job_id: str, blueprint: BlueprintLike, max_workers: int):
+        self.id = job_id
+        self.blueprint = blueprint
+        self.max_workers = max_workers
+        self.graph = build_graph(blueprint)
+        self.scheduler = Scheduler(self.graph, blueprint.concurrency)
+        self.state = JobState.QUEUED
+        self.results: Dict[str, TaskResult] = {}
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._events: List[JobEvent] = []
+        self._seq = itertools.count(1)
+        self._changed = asyncio.Condition()
+        self._cancel = asyncio.Event()
+
+    @property
+    def status(self) -> Dict[str, TaskStatus]:
+        return self.scheduler.status
+
+    @property
+    def done(self) -> bool:
+        return self.state in (JobState.COMPLETED, JobState.FAILED, JobState.CANCELLED)
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def count(self, status: TaskStatus) -> int:
+        return sum(1 for s in self.status.values() if s == status)
+
+    def request_cancel(self) -> None:
+        self._cancel.set()
+
+    async def wait_cancelled(self) -> None:
+        await self._cancel.wait()
+
+    async def publish(self, task_id: Optional[str] = None, task_state: Optional[TaskStatus] = None,
+                      result: Optional[TaskResult] = None) -> None:
+        event = JobEvent(
+            job_id=self.id,
+            sequence=next(self._seq),
+            job_state=self.state,
+            completed=sum(1 for s in self.status.values()
+                          if s not in (TaskStatus.PENDING, TaskStatus.RUNNING)),
+            total=len(self.status),
+            task_id=task_id,
+            task_state=task_state,
+        )
+        if result is not None:
+            event.error = result.error
+            event.duration = result.duration
+            event.output = {k: str(v) for k, v in result.output.items()}
+        async with self._changed:
+            self._events.append(event)
+            self._changed.notify_all()
+
+    async def events(self, after_sequence: int = 0) -> AsyncIterator[JobEvent]:
+        """先回放 after_sequence 之后的历史事件，再持续推送新事件，作业结束后停止。"""
+        index = after_sequence
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self._events) > index or self.done)
+                pending = self._events[index:]
+                finished = self.done
+            for event in pending:
+                yield event
+            index += len(pending)
+            if finished and index >= len(self._events):
+                return
+
+
+class AsyncEngine:
+    """
+    asyncio 原生的作业引擎。
+
+    一个事件循环协调所有作业；阻塞的浏览器/LLM 调用统一放进共享线程池，
+    线程数即全局 worker 槽位（浏览器会话数）。超过 max_active_jobs 的作业排队，
+    排队数达到 max_queued_jobs 时拒绝提交（EngineBusyError）。
+    结束的作业（含事件历史）保留 finished_job_ttl 秒供查询，最多保留 max_finished_jobs 个，超出的从最早结束的开始清除。
+
+    传入 leases 时任务不在本机执行，而是以租约形式分发给注册到引擎的远程适配器 worker，
+    worker_slots 此时是全局同时在途的任务数上限。
+    """
+
+    def __init__(
+            self,
+            worker_slots: int = 8,
+            max_active_jobs: int = 4,
+            max_queued_jobs: int = 16,
+            executor_factory: Callable[[str], TaskExecutor] = TaskExecutor,
+            leases: Optional[LeaseManager] = None,
+            finished_job_ttl: float = 3600.0,
+            max_finished_jobs: int = 256,
+    ):
+        self.worker_slots = worker_slots
+        self.max_active_jobs = max_active_jobs
+        self.max_queued_jobs = max_queued_jobs
+        self.finished_job_ttl = finished_job_ttl
+        self.max_finished_jobs = max_finished_jobs
+        self._executor_factory = executor_factory
+        self.leases = leases
+        self._executors: Dict[str, TaskExecutor] = {}
+        self._threads = ThreadPoolExecutor(max_workers=worker_slots, thread_name_prefix="engine-worker")
+        self._slots = asyncio.Semaphore(worker_slots)
+        self._jobs: Dict[str, Job] = {}
+        self._finished: Deque[Job] = deque()   # 已结束的作业，按结束时间排序
+        self._queue: Deque[Job] = deque()
+        self._active: Set[str] = set()
+        self._runners: Set[asyncio.Task] = set()
+
+    @property
+    def saturated(self) -> bool:
+        return len(self._queue) >= self.max_queued_jobs
+
+    def get_job(self, job_id: str) -> Job:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise JobNotFoundError(f"作业不存在: {job_id}")
+        return job
+
+    async def submit(self, blueprint: BlueprintLike, max_workers: Optional[int] = None) -> Job:
+        """提交蓝图，立即返回作业；队列已满时抛出 EngineBusyError。"""
+        if self.saturated:
+            raise EngineBusyError(f"排队作业已达上限 {self.max_queued_jobs}")
+        self._prune_finished()
+        workers = min(max_workers or blueprint.concurrency.max_workers, self.worker_slots)
+        job = Job(uuid.uuid4().hex[:12], blueprint, max(1, workers))
+        self._jobs[job.id] = job
+        self._queue.append(job)
+        await job.publish()
+        self._admit()
+        return job
+
+    async def cancel(self, job_id: str) -> bool:
+        """请求取消作业：未开始的任务记为 CANCELLED，已在浏览器中执行的任务会等待其结束。"""
+        job = self.get_job(job_id)
+        if job.done:
+            return False
+        job.request_cancel()
+        if self.leases is not None:
+            self.leases.cancel_job(job_id)
+        if job in self._queue:
+            self._queue.remove(job)
+            await self._finish_cancelled(job)
+            self._retire(job)
+        return True
+
+    async def shutdown(self) -> None:
+        for job in list(self._jobs.values()):
+            if not job.done:
+                job.request_cancel()
+                if self.leases is not None:
+                    self.leases.cancel_job(job.id)
+        if self._runners:
+            await asyncio.gather(*self._runners, return_exceptions=True)
+        self._threads.shutdown(wait=True)
+
+    # ---------------- 内部实现 ----------------
+
+    def _admit(self) -> None:
+        while self._queue and len(self._active) < self.max_active_jobs:
+            job = self._queue.popleft()
+            self._active.add(job.id)
+            runner = asyncio.create_task(self._run_job(job))
+            self._runners.add(runner)
+            runner.add_done_callback(self._runners.discard)
+
+    def _executor_for(self, erp_type: str) -> TaskExecutor:
+        executor = self._executors.get(erp_type)
+        if executor is None:
+            executor = self._executors[erp_type] = self._executor_factory(erp_type)
+        return executor
+
+    async def _run_task(self, job: Job, task: Task) -> TaskResult:
+        async with self._slots:
+            if job.cancel_requested:
+                return TaskResult(task.id, TaskStatus.CANCELLED)
+            await job.publish(task.id, TaskStatus.RUNNING)
+            if self.leases is not None:
+                return await self.leases.submit(job.id, job.blueprint.erp_type, task)
+            loop = asyncio.get_running_loop()
+            executor = self._executor_for(job.blueprint.erp_type)
+            return await loop.run_in_executor(self._threads, executor.execute, task)
+
+    async def _run_job(self, job: Job) -> None:
+        job.state = JobState.RUNNING
+        await job.publish()
+        running: Dict[asyncio.Task, str] = {}
+        cancel_waiter = asyncio.ensure_future(job.wait_cancelled())
+        try:
+            while not job.scheduler.finished:
+                while not job.cancel_requested and len(running) < job.max_workers:
+                    task = job.scheduler.next_task()
+                    if task is None:
+                        break
+                    running[asyncio.create_task(self._run_task(job, task))] = task.id
+                if not running:
+                    break
+                waiters = set(running)
+                if not cancel_waiter.done():
+                    waiters.add(cancel_waiter)
+                done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    if finished is cancel_waiter:
+                        continue
+                    task_id = running.pop(finished)
+                    result = finished.result()
+                    job.results[task_id] = result
+                    if result.status == TaskStatus.CANCELLED:
+                        for cancelled_id in [task_id] + job.scheduler.mark_done(task_id, False):
+                            job.status[cancelled_id] = TaskStatus.CANCELLED
+                        continue
+                    skipped = job.scheduler.mark_done(task_id, result.status == TaskStatus.SUCCEEDED)
+                    await job.publish(task_id, result.status, result)
+                    for skipped_id in skipped:
+                        await job.publish(skipped_id, TaskStatus.SKIPPED)
+        except Exception as e:
+            logger.exception("作业 %s 调度异常: %s", job.id, e)
+            job.request_cancel()
+        finally:
+            cancel_waiter.cancel()
+
+        if job.cancel_requested:
+            await self._finish_cancelled(job)
+        else:
+            job.state = JobState.COMPLETED if job.count(TaskStatus.SUCCEEDED) == len(job.status) \
+                else JobState.FAILED
+            await job.publish()
+        logger.info("作业 %s (%s) 结束: %s", job.id, job.blueprint.name, job.state.value)
+        self._active.discard(job.id)
+        self._retire(job)
+        self._admit()
+
+    def _retire(self, job: Job) -> None:
+        job.finished_at = time.time()
+        self._finished.append(job)
+        self._prune_finished()
+
+    def _prune_finished(self) -> None:
+        """清除超过保留期或超出保留数的已结束作业；正在订阅其事件的客户端持有引用，不受影响。"""
+        expired_before = time.time() - self.finished_job_ttl
+        while self._finished and (len(self._finished) > self.max_finished_jobs
+                                  or self._finished[0].finished_at < expired_before):
+            self._jobs.pop(self._finished.popleft().id, None)
+
+    async def _finish_cancelled(self, job: Job) -> None:
+        for task_id, status in job.status.items():
+            if status == TaskStatus.PENDING:
+                job.status[task_id] = TaskStatus.CANCELLED
+        job.state = JobState.CANCELLED
+        await job.publish()
@@ -0,0 +1,231 @@
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from erp_core.logging import get_logger
+from erp_core.models.task import Task
+from erp_deploy_engine.compiled import BlueprintLike
+
+logger = get_logger(__name__)
+
+# 日志记录类型
+RUN = "run"              # 一次（续）跑开始
+STARTED = "started"      # 任务即将对 ERP 写入，写入前必须已落盘
+SUCCEEDED = "succeeded"  # 任务成功，附带产出（如生成的单据编号）
+FAILED = "failed"
+RESOLVED = "resolved"    # 人工确认过的“写入状态不明”任务，之后按未执行处理
+
+
+def idempotency_key(task: Task) -> str:
+    """
+    任务的幂等键：任务 id 加上会影响 ERP 写入结果的全部内容。
+    蓝图修改了任务内容时幂等键随之变化，旧的完成记录不会被误用。
+    """
+    payload = {"id": task.id, "action": task.action, "entity": task.entity, "server": task.server,
+               "menu": task.menu, "key": task.key, "fields": task.fields}
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class JournalState:
+    """从日志回放得到的状态，均以幂等键索引。"""
+    completed: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # 幂等键 -> 任务产出
+    in_doubt: Dict[str, str] = field(default_factory=dict)              # 幂等键 -> 任务 id，已开始写入但未成功
+    failed: Dict[str, str] = field(default_factory=dict)                # 幂等键 -> 错误信息
+    runs: int = 0
+    records: int = 0
+    digest: Optional[str] = None                                        # 最近一次运行的蓝图摘要
+
+    def apply(self, record: Dict[str, Any]) -> None:
+        self.records += 1
+        event = record.get("event")
+        if event == RUN:
+            self.runs += 1
+            self.digest = record.get("digest")
+            return
+        ikey = record["ikey"]
+        if event == STARTED:
+            self.in_doubt[ikey] = record["task"]
+            self.completed.pop(ikey, None)
+        elif event == SUCCEEDED:
+            self.completed[ikey] = record.get("output") or {}
+            self.in_doubt.pop(ikey, None)
+            self.failed.pop(ikey, None)
+        elif event == FAILED:
+            # 失败不清除“状态不明”：任务可能在保存之后才出错，续跑时仍需先确认
+            self.failed[ikey] = record.get("error") or ""
+        elif event == RESOLVED:
+            self.in_doubt.pop(ikey, None)
+
+
+@dataclass
+class JournalStats:
+    records: int = 0
+    fsyncs: int = 0
+
+
+class RunJournal:
+    """
+    蓝图运行日志：只追加的 JSON Lines 文件，记录每个任务的状态变化和产出。
+
+    任务开始写 ERP 之前追加一条 STARTED 并等待其落盘；成功/失败记录只写入缓冲，
+    距上次落盘超过 sync_interval 秒或下一次需要落盘时批量 fsync。多个 worker 同时等待落盘时
+    由其中一个线程执行 fsync，其余线程等它完成（组提交），一次 fsync 覆盖所有已写入的记录。
+
+    进程崩溃后重新打开同一日志即可续跑：幂等键已成功的任务直接跳过；
+    有 STARTED 而没有成功记录的任务（中断或失败）处于“写入状态不明”，由执行器先确认 ERP 中
+    是否已生效再决定是否重跑。丢失的成功记录同样表现为状态不明，经确认后恢复，不会重复写入。
+    """
+
+    def __init__(self, path: str, sync_interval: float = 1.0, fresh: bool = False):
+        self.path = path
+        self.sync_interval = sync_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if fresh and os.path.exists(path):
+            os.remove(path)
+        self.state = self._replay()
+        self._file = open(path, "ab")
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._seq = 0
+        self._durable_seq = 0
+        self._syncing = False
+        self._last_sync = time.monotonic()
+        self._stats = JournalStats()
+
+    @property
+    def stats(self) -> JournalStats:
+        with self._lock:
+            return dataclasses.replace(self._stats)
+
+    @property
+    def resuming(self) -> bool:
+        return self.state.runs > 0
+
+    def begin(self, blueprint: BlueprintLike) -> None:
+        digest = blueprint.digest()
+        if self.state.digest is not None and self.state.digest != digest:
+            logger.warning("蓝图 %s 与日志 %s 中上次运行的版本不同，只复用内容未变的已完成任务",
+                           blueprint.name, self.path)
+        self._append({"event": RUN, "blueprint": blueprint.name, "digest": digest, "tasks": len(blueprint.steps)},
+                     durable=True)
+
+    def completed_output(self, task: Task) -> Optional[Dict[str, Any]]:
+        """任务已在之前的运行中成功时返回其产出，否则返回 None。"""
+        return self.state.completed.get(idempotency_key(task))
+
+    def in_doubt(self, task: Task) -> bool:
+        return idempotency_key(task) in self.state.in_doubt
+
+    def started(self, task: Task) -> None:
+        """任务即将写入 ERP。返回时记录已落盘。"""
+        ikey = idempotency_key(task)
+        self._append({"event": STARTED, "task": task.id, "ikey": ikey}, durable=True)
+        with self._lock:
+            self.state.in_doubt[ikey] = task.id
+
+    def succeeded(self, task: Task, output: Dict[str, Any]) -> None:
+        ikey = idempotency_key(task)
+        self._append({"event": SUCCEEDED, "task": task.id, "ikey": ikey, "output": output})
+        with self._lock:
+            self.state.in_doubt.pop(ikey, None)
+            self.state.completed[ikey] = output
+
+    def failed(self, task: Task, error: str) -> None:
+        self._append({"event": FAILED, "task": task.id, "ikey": idempotency_key(task), "error": error})
+
+    def resolve(self, task: Task) -> None:
+        """人工确认状态不明的任务在 ERP 中并未写入，之后续跑时按未执行处理。"""
+        ikey = idempotency_key(task)
+        self._append({"event": RESOLVED, "task": task.id, "ikey": ikey}, durable=True)
+        with self._lock:
+            self.state.in_doubt.pop(ikey, None)
+
+    def sync(self) -> None:
+        """把已追加的全部记录落盘。"""
+        with self._lock:
+            seq = self._seq
+        self._wait_durable(seq)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
+
+    def __enter__(self) -> "RunJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---------------- 内部实现 ----------------
+
+    def _append(self, record: Dict[str, Any], durable: bool = False) -> None:
+        record["ts"] = round(time.time(), 3)
+        line = json.dumps(record, ensure_ascii=False, default=str, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line.encode("utf-8"))
+            self._seq += 1
+            self._stats.records += 1
+            seq = self._seq
+            if not durable and time.monotonic() - self._last_sync < self.sync_interval:
+                return
+        self._wait_durable(seq)
+
+    def _wait_durable(self, seq: int) -> None:
+        with self._lock:
+            while self._durable_seq < seq:
+                if self._syncing:
+                    self._synced.wait()
+                    continue
+                # 成为本轮提交者：把缓冲写到内核后在锁外 fsync，期间其他线程可以继续追加
+                self._syncing = True
+                target = self._seq
+                self._file.flush()
+                fd = self._file.fileno()
+                self._lock.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    self._lock.acquire()
+                    self._syncing = False
+                    self._synced.notify_all()
+                self._durable_seq = max(self._durable_seq, target)
+                self._last_sync = time.monotonic()
+                self._stats.fsyncs += 1
+
+    def _replay(self) -> JournalState:
+        """回放已有日志。崩溃时写了一半的末行会被截掉，之后的追加从完整行开始。"""
+        state = JournalState()
+        if not os.path.exists(self.path):
+            return state
+        valid = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                state.apply(record)
+                valid += len(line)
+            size = f.seek(0, os.SEEK_END)
+        if valid < size:
+            logger.warning("运行日志 %s 末尾有 %d 字节不完整记录，已截断", self.path, size - valid)
+            with open(self.path, "r+b") as f:
+                f.truncate(valid)
+        if state.runs:
+            logger.info("运行日志 %s: 已完成 %d 个任务, 状态不明 %d 个", self.path,
+                        len(state.completed), len(state.in_doubt))
+        return state
+
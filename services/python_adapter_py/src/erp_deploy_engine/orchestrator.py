@@ -0,0 +1,142 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from erp_core.logging import get_logger
+from erp_core.models.task import TaskStatus
+from erp_deploy_engine.compiled import BlueprintLike, build_graph
+from erp_deploy_engine.journal import RunJournal
+from erp_deploy_engine.scheduler import Scheduler, TaskGraph, simulate_schedule
+from erp_deploy_engine.task_executor import TaskExecutor, TaskResult
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class RunReport:
+    blueprint: str
+    status: Dict[str, TaskStatus]
+    results: Dict[str, TaskResult] = field(default_factory=dict)
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+    def count(self, status: TaskStatus) -> int:
+        return sum(1 for s in self.status.values() if s == status)
+
+    @property
+    def succeeded(self) -> bool:
+        return all(s == TaskStatus.SUCCEEDED for s in self.status.values())
+
+
+class Orchestrator:
+    """
+    蓝图编排器：把蓝图编译成 DAG，在线程池中并行执行互不依赖的任务。
+
+    线程数即同时占用的浏览器会话数，取蓝图 concurrency.max_workers 与 max_workers 参数的较小值。
+    """
+
+    def __init__(self, executor: Optional[TaskExecutor] = None, max_workers: Optional[int] = None):
+        self.executor = executor
+        self.max_workers = max_workers
+
+    @staticmethod
+    def compile(blueprint: BlueprintLike) -> TaskGraph:
+        return build_graph(blueprint)
+
+    def worker_count(self, blueprint: BlueprintLike) -> int:
+        workers = blueprint.concurrency.max_workers
+        if self.max_workers is not None:
+            workers = min(workers, self.max_workers)
+        return max(1, workers)
+
+    def format_schedule(self, blueprint: BlueprintLike) -> str:
+        """生成 dry-run 调度计划文本：分层、关键路径和按预估耗时模拟的执行时间线。"""
+        graph = self.compile(blueprint)
+        concurrency = blueprint.concurrency.model_copy(update={"max_workers": self.worker_count(blueprint)})
+        scheduler = Scheduler(graph, concurrency)
+        lines: List[str] = [
+            f"📋 蓝图: {blueprint.name} ({len(graph.order)} 个任务, {graph.level_count} 层)",
+            f"⚙️  并发: workers={concurrency.max_workers}, 层上限={concurrency.level_limits or '无'}, "
+            f"默认层上限={concurrency.default_level_limit or '无'}",
+        ]
+        for level, task_ids in enumerate(graph.tasks_by_level()):
+            limit = scheduler.level_limit(level)
+            lines.append(f"--- 第 {level} 层: {len(task_ids)} 个任务, 上限 {limit or '-'} ---")
+            for task_id in sorted(task_ids, key=lambda t: -graph.rank[t]):
+                task = graph.tasks[task_id]
+                deps = ", ".join(sorted(graph.deps[task_id])) or "-"
+                lines.append(f"  [{task_id}] {task.action} {task.entity} {task.key or ''} "
+                             f"(rank={graph.rank[task_id]:.0f}s, 依赖: {deps})")
+
+        path = graph.critical_path()
+        path_seconds = sum(graph.tasks[t].estimated_seconds for t in path)
+        lines.append(f"🔥 关键路径 ({path_seconds:.0f}s): {' -> '.join(path)}")
+
+        timeline = simulate_schedule(graph, concurrency)
+        makespan = max((end for _, end, _, _ in timeline), default=0.0)
+        serial = sum(t.estimated_seconds for t in graph.tasks.values())
+        speedup = serial / makespan if makespan else 1.0
+        lines.append(f"⏱️  预计总耗时 {makespan:.0f}s (串行 {serial:.0f}s, 加速比 {speedup:.1f}x)")
+        for start, end, worker, task_id in timeline:
+            lines.append(f"  worker {worker}: {start:8.0f}s - {end:8.0f}s  {task_id}")
+        return "\n".join(lines)
+
+    def dry_run(self, blueprint: BlueprintLike) -> str:
+        text = self.format_schedule(blueprint)
+        print(text)
+        return text
+
+    def run(self, blueprint: BlueprintLike, dry_run: bool = False,
+            journal: Optional[RunJournal] = None) -> Optional[RunReport]:
+        """
+        执行蓝图；dry_run=True 时只打印调度计划。
+
+        传入运行日志时从中断处续跑：日志中已成功且内容未变的任务不再执行，
+        它们的产出照常出现在报告中，下游任务直接就绪。
+        """
+        if dry_run:
+            self.dry_run(blueprint)
+            return None
+
+        executor = self.executor or TaskExecutor(blueprint.erp_type)
+        graph = self.compile(blueprint)
+        workers = self.worker_count(blueprint)
+        scheduler = Scheduler(graph, blueprint.concurrency)
+        report = RunReport(blueprint.name, scheduler.status, started_at=time.time())
+        if journal is not None:
+            journal.begin(blueprint)
+            # 全新日志没有已完成任务，不必逐个计算幂等键（编译蓝图会因此构造全部任务）
+            for task_id in (graph.order if journal.state.completed else ()):
+                output = journal.completed_output(graph.tasks[task_id])
+                if output is not None:
+                    scheduler.mark_completed_without_running(task_id)
+                    report.results[task_id] = TaskResult(task_id, TaskStatus.SUCCEEDED, output=output, resumed=True)
+            if report.results:
+                logger.info("从运行日志 %s 续跑: 跳过 %d 个已完成任务", journal.path, len(report.results))
+        logger.info("开始执行蓝图 %s: %d 个任务, %d 个 worker", blueprint.name, len(graph.order), workers)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blueprint") as pool:
+            running: Dict[Future, str] = {}
+            while not scheduler.finished:
+                while len(running) < workers:
+                    task = scheduler.next_task()
+                    if task is None:
+                        break
+                    running[pool.submit(executor.execute, task, journal)] = task.id
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_id = running.pop(future)
+                    result = future.result()
+                    report.results[task_id] = result
+                    skipped = scheduler.mark_done(task_id, result.status == TaskStatus.SUCCEEDED)
+                    if skipped:
+                        logger.warning("任务 %s 失败，跳过 %d 个下游任务", task_id, len(skipped))
+
+        report.finished_at = time.time()
+        logger.info("蓝图 %s 完成: 成功 %d, 失败 %d, 跳过 %d, 用时 %.1fs", blueprint.name,
+                    report.count(TaskStatus.SUCCEEDED), report.count(TaskStatus.FAILED),
+                    report.count(TaskStatus.SKIPPED), report.finished_at - report.started_at)
+        return report
@@ -0,0 +1,310 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from erp_content_provider.base_provider import BaseContentProvider
+from erp_core.logging import get_logger
+from erp_core.models.blueprint import Blueprint
+from erp_core.models.task import Task
+
+logger = get_logger(__name__)
+
+Record = Dict[str, Any]
+
+
+class ChangeType(str, Enum):
+    INSERT = "insert"   # 源服务器有、目标服务器没有
+    UPDATE = "update"   # 两边都有，比较字段不同
+    DELETE = "delete"   # 目标服务器有、源服务器没有
+
+
+@dataclass
+class Change:
+    type: ChangeType
+    key: str
+    record: Record                                   # INSERT/UPDATE 为源记录，DELETE 为目标记录
+    changed: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)  # 字段 -> (目标值, 源值)，仅 UPDATE
+
+
+@dataclass
+class DiffStats:
+    source_records: int = 0
+    target_records: int = 0
+    inserts: int = 0
+    updates: int = 0
+    deletes: int = 0
+    unchanged: int = 0
+    skipped: int = 0          # 没有业务主键或不匹配主键前缀的记录
+    duplicates: int = 0       # 同一侧重复出现的主键，只保留第一条
+    partitions: int = 0       # 0 表示全部在内存中完成
+
+
+def extract_rows(data: Any, rows_key: Optional[str] = None) -> List[Record]:
+    """从接口响应中取出记录列表：指定 rows_key 时按键取，否则找前两层中的第一个字典列表。"""
+    if rows_key is not None and isinstance(data, Mapping):
+        data = data.get(rows_key, [])
+    if isinstance(data, list):
+        return [row for row in data if isinstance(row, dict)]
+    if isinstance(data, Mapping):
+        for value in data.values():
+            if isinstance(value, list) and value and isinstance(value[0], dict):
+                return value
+        for value in data.values():
+            if isinstance(value, Mapping):
+                rows = extract_rows(value)
+                if rows:
+                    return rows
+    return []
+
+
+def records_from(provider: BaseContentProvider, rows_key: Optional[str] = None) -> Iterator[Record]:
+    """把内容提供者产出的接口响应展开为记录流。"""
+    for item in provider.iter_content():
+        yield from extract_rows(item.data, rows_key)
+
+
+class RecordDiff:
+    """
+    按业务主键比较源服务器 (AAA) 与目标服务器 (BBB) 的主数据，产出插入/更新/删除变更集。
+
+    两侧记录都以流的方式读入，每条记录只保留 主键 -> (比较字段哈希, 记录)。
+    目标侧记录数不超过 memory_records 时直接在内存哈希索引中比较；超过后切换为
+    分区哈希连接：两侧记录按主键哈希写入 partitions 个临时分区文件，再逐个分区建索引比较，
+    内存占用约为 目标记录数 / partitions。
+    """
+
+    def __init__(self, key_fields: Sequence[str], compare_fields: Optional[Sequence[str]] = None,
+                 ignore_fields: Sequence[str] = (), key_prefix: Optional[str] = None,
+                 memory_records: int = 100_000, partitions: int = 64, spill_dir: Optional[str] = None):
+        self.key_fields = tuple(key_fields)
+        self.compare_fields = tuple(compare_fields) if compare_fields else None
+        self.ignore_fields = frozenset(ignore_fields)
+        self.key_prefix = key_prefix
+        self.memory_records = memory_records
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.stats = DiffStats()
+
+    def key_of(self, record: Mapping[str, Any]) -> Optional[str]:
+        parts = [record.get(f) for f in self.key_fields]
+        if any(p is None or p == "" for p in parts):
+            return None
+        key = "|".join(str(p).strip() for p in parts)
+        if self.key_prefix and not key.startswith(self.key_prefix):
+            return None
+        return key
+
+    def fingerprint(self, record: Mapping[str, Any]) -> str:
+        return hashlib.blake2b(_canonical(self._compared(record)).encode("utf-8"), digest_size=16).hexdigest()
+
+    def diff(self, source: Iterable[Record], target: Iterable[Record]) -> Iterator[Change]:
+        """流式产出变更。先完整读入目标侧（在内存或分区文件中），再流式比较源侧。"""
+        self.stats = DiffStats()
+        index: Dict[str, Tuple[str, Record]] = {}
+        target_iter = iter(target)
+        for record in target_iter:
+            if not self._add(index, record):
+                continue
+            if len(index) > self.memory_records:
+                yield from self._diff_partitioned(index, target_iter, iter(source), set())
+                return
+        yield from self._diff_in_memory(index, iter(source))
+
+    # ---------------- 内部实现 ----------------
+
+    def _add(self, index: Dict[str, Tuple[str, Record]], record: Record) -> bool:
+        key = self.key_of(record)
+        if key is None:
+            self.stats.skipped += 1
+            return False
+        self.stats.target_records += 1
+        if key in index:
+            self.stats.duplicates += 1
+            return False
+        index[key] = (self.fingerprint(record), record)
+        return True
+
+    def _diff_in_memory(self, index: Dict[str, Tuple[str, Record]], source: Iterator[Record]) -> Iterator[Change]:
+        seen = set()
+        for record in source:
+            key = self.key_of(record)
+            if key is None:
+                self.stats.skipped += 1
+                continue
+            self.stats.source_records += 1
+            if key in seen:
+                self.stats.duplicates += 1
+                continue
+            seen.add(key)
+            change = self._compare(key, record, index.pop(key, None))
+            if change is not None:
+                yield change
+            if len(seen) > self.memory_records:
+                # 源侧已处理的主键太多（例如目标为空的首次迁移），剩余部分转为分区处理
+                yield from self._diff_partitioned(index, iter(()), source, seen)
+                return
+        for key, (_, record) in index.items():
+            self.stats.deletes += 1
+            yield Change(ChangeType.DELETE, key, record)
+
+    def _diff_partitioned(self, index: Dict[str, Tuple[str, Record]], target_rest: Iterator[Record],
+                          source_rest: Iterator[Record], seen: set) -> Iterator[Change]:
+        """
+        分区哈希连接。index 是尚未匹配的目标记录，seen 是已经比较过的源主键：
+        它们作为占位记录先写入源分区，保证之后出现的重复主键仍能被识别。
+        """
+        directory = tempfile.mkdtemp(prefix="record-diff-", dir=self.spill_dir)
+        self.stats.partitions = self.partitions
+        logger.info("记录数超过 %d 条，按主键哈希分区到 %s", self.memory_records, directory)
+        try:
+            with _PartitionWriter(directory, "target", self.partitions) as writer:
+                for key, (digest, record) in index.items():
+                    writer.write(key, digest, record)
+                index.clear()
+                for record in target_rest:
+                    key = self.key_of(record)
+                    if key is None:
+                        self.stats.skipped += 1
+                        continue
+                    self.stats.target_records += 1
+                    writer.write(key, self.fingerprint(record), record)
+            with _PartitionWriter(directory, "source", self.partitions) as writer:
+                for key in seen:
+                    writer.write(key, "", None)
+                seen.clear()
+                for record in source_rest:
+                    key = self.key_of(record)
+                    if key is None:
+                        self.stats.skipped += 1
+                        continue
+                    self.stats.source_records += 1
+                    writer.write(key, "", record)
+
+            for partition in range(self.partitions):
+                targets: Dict[str, Tuple[str, Record]] = {}
+                for key, digest, record in _read_partition(directory, "target", partition):
+                    if key in targets:
+                        self.stats.duplicates += 1
+                    else:
+                        targets[key] = (digest, record)
+                processed = set()
+                for key, _, record in _read_partition(directory, "source", partition):
+                    if key in processed:
+                        self.stats.duplicates += 1
+                        continue
+                    processed.add(key)
+                    if record is None:
+                        continue
+                    change = self._compare(key, record, targets.pop(key, None))
+                    if change is not None:
+                        yield change
+                for key, (_, record) in targets.items():
+                    self.stats.deletes += 1
+                    yield Change(ChangeType.DELETE, key, record)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _compare(self, key: str, record: Record, existing: Optional[Tuple[str, Record]]) -> Optional[Change]:
+        if existing is None:
+            self.stats.inserts += 1
+            return Change(ChangeType.INSERT, key, record)
+        digest, target = existing
+        if digest == self.fingerprint(record):
+            self.stats.unchanged += 1
+            return None
+        ours, theirs = self._compared(record), self._compared(target)
+        changed = {name: (theirs.get(name), value) for name, value in ours.items() if theirs.get(name) != value}
+        changed.update({name: (value, None) for name, value in theirs.items() if name not in ours})
+        self.stats.updates += 1
+        return Change(ChangeType.UPDATE, key, record, changed)
+
+    def _compared(self, record: Mapping[str, Any]) -> Dict[str, Any]:
+        names = self.compare_fields if self.compare_fields is not None else record.keys()
+        return {n: record.get(n) for n in names if n not in self.ignore_fields}
+
+
+class _PartitionWriter:
+    """把 (主键, 哈希, 记录) 按主键哈希追加写入分区文件（JSON Lines）。"""
+
+    def __init__(self, directory: str, side: str, partitions: int):
+        self._files = [open(os.path.join(directory, f"{side}-{i:03d}.jsonl"), "w", encoding="utf-8",
+                            buffering=1024 * 1024)
+                       for i in range(partitions)]
+
+    def write(self, key: str, digest: str, record: Optional[Record]) -> None:
+        partition = _partition_of(key, len(self._files))
+        self._files[partition].write(json.dumps([key, digest, record], ensure_ascii=False, default=str) + "\n")
+
+    def __enter__(self) -> "_PartitionWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for f in self._files:
+            f.close()
+
+
+def _read_partition(directory: str, side: str, partition: int) -> Iterator[Tuple[str, str, Optional[Record]]]:
+    with open(os.path.join(directory, f"{side}-{partition:03d}.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            key, digest, record = json.loads(line)
+            yield key, digest, record
+
+
+def _partition_of(key: str, partitions: int) -> int:
+    # 用稳定哈希而不是内置 hash()（后者每个进程随机化），分区结果可复现，便于排查
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=4).digest(), "little") % partitions
+
+
+def _canonical(values: Mapping[str, Any]) -> str:
+    return json.dumps(values, ensure_ascii=False, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def changes_to_tasks(changes: Iterable[Change], entity: str, menu: Sequence[str], server: str = "BBB",
+                     include_deletes: bool = False, differ: Optional[RecordDiff] = None,
+                     field_map: Optional[Mapping[str, str]] = None) -> List[Task]:
+    """
+    把变更集转成蓝图任务：插入 -> create（全部比较字段），更新 -> update（只带变化的字段，
+    源侧被清空的字段值为 None，录入时清空）。删除默认只统计不生成任务，需要时生成 action 为 delete 的任务，
+    由注册了该动作的适配器处理。
+
+    Task.fields 是 表单标签 -> 值：传入产生变更集的 differ 时，插入任务按它的 compare_fields / ignore_fields
+    过滤字段（去掉内部 ID、时间戳等）；field_map 把接口字段名映射为表单标签，给出时只保留映射中的字段。
+    映射后没有可录入字段的更新不生成任务。
+    """
+    def to_form(values: Mapping[str, Any]) -> Dict[str, Any]:
+        if field_map is None:
+            return dict(values)
+        return {field_map[name]: value for name, value in values.items() if name in field_map}
+
+    tasks: List[Task] = []
+    for change in changes:
+        task_id = f"{entity}-{change.type.value}-{change.key}"
+        if change.type == ChangeType.INSERT:
+            record = differ._compared(change.record) if differ is not None else change.record
+            tasks.append(Task(id=task_id, action="create", entity=entity, server=server, menu=list(menu),
+                              fields=to_form(record), key=change.key))
+        elif change.type == ChangeType.UPDATE:
+            fields = to_form({name: new for name, (_, new) in change.changed.items()})
+            if not fields:
+                logger.debug("%s 的变化字段都不在 field_map 中，不生成更新任务", change.key)
+                continue
+            tasks.append(Task(id=task_id, action="update", entity=entity, server=server, menu=list(menu),
+                              fields=fields, key=change.key))
+        elif include_deletes:
+            tasks.append(Task(id=task_id, action="delete", entity=entity, server=server, menu=list(menu),
+                              key=change.key))
+    return tasks
+
+
+def build_sync_blueprint(name: str, changes: Iterable[Change], entity: str, menu: Sequence[str],
+                         server: str = "BBB", erp_type: str = "kingdee", include_deletes: bool = False,
+                         differ: Optional[RecordDiff] = None,
+                         field_map: Optional[Mapping[str, str]] = None) -> Blueprint:
+    """生成只包含差异记录的同步蓝图，可直接交给 Orchestrator 执行。"""
+    return Blueprint(name=name, erp_type=erp_type,
+                     steps=changes_to_tasks(changes, entity, menu, server, include_deletes, differ, field_map))
@@ -0,0 +1 @@
+# 本包中的 *_pb2.py / *_pb2_grpc.py 由 scripts/compile_protos.py 从 proto/ 生成，不要手动修改。
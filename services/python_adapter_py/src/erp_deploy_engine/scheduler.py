@@ -0,0 +1,274 @@
+import heapq
+from collections import Counter, deque
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+from erp_core.exceptions import BlueprintError
+from erp_core.models.blueprint import Blueprint, ConcurrencyConfig
+from erp_core.models.task import Task, TaskStatus
+
+
+class TaskGraph:
+    """
+    由蓝图编译出的任务依赖图 (DAG)。
+
+    依赖来源有三种：
+      1. 任务显式声明的 depends_on；
+      2. 字段值引用了其他任务产出的业务主键（如采购订单引用 GYS 开头的供应商编码）；
+      3. 多个任务操作同一个业务主键时，按蓝图中的先后顺序串行。
+    """
+
+    def __init__(self, tasks: List[Task]):
+        self.order: List[str] = [t.id for t in tasks]
+        self.tasks: Dict[str, Task] = {t.id: t for t in tasks}
+        if len(self.tasks) != len(tasks):
+            raise BlueprintError("任务 id 重复")
+        self.deps: Dict[str, Set[str]] = {t.id: set() for t in tasks}
+        self.dependents: Dict[str, Set[str]] = {t.id: set() for t in tasks}
+        self.levels: Dict[str, int] = {}
+        self.rank: Dict[str, float] = {}
+
+        self._add_explicit_edges()
+        self._add_inferred_edges()
+        self._topo = self._topological_order()
+        self._compute_levels_and_rank()
+
+    @classmethod
+    def from_blueprint(cls, blueprint: Blueprint) -> "TaskGraph":
+        return cls(blueprint.steps)
+
+    @classmethod
+    def restore(cls, order: List[str], tasks: Mapping[str, Task], deps: Dict[str, Set[str]],
+                levels: Dict[str, int], rank: Dict[str, float]) -> "TaskGraph":
+        """
+        用预先算好的依赖、分层和 rank 直接构造（见 erp_deploy_engine.compiled），
+        不推断依赖，也不访问任务对象，tasks 可以是按需构造任务的惰性映射。
+        """
+        graph = cls.__new__(cls)
+        graph.order = order
+        graph.tasks = tasks
+        graph.deps = deps
+        graph.dependents = {t: set() for t in order}
+        for task_id, before in deps.items():
+            for dep in before:
+                graph.dependents[dep].add(task_id)
+        graph.levels = levels
+        graph.rank = rank
+        # 按层号稳定排序即是一个合法的拓扑序
+        graph._topo = sorted(order, key=levels.__getitem__)
+        return graph
+
+    def add_edge(self, before: str, after: str) -> None:
+        if before == after:
+            return
+        self.deps[after].add(before)
+        self.dependents[before].add(after)
+
+    @property
+    def level_count(self) -> int:
+        return max(self.levels.values(), default=-1) + 1
+
+    def tasks_by_level(self) -> List[List[str]]:
+        result: List[List[str]] = [[] for _ in range(self.level_count)]
+        for task_id in self._topo:
+            result[self.levels[task_id]].append(task_id)
+        return result
+
+    def critical_path(self) -> List[str]:
+        """按预估耗时计算的最长路径。"""
+        if not self.tasks:
+            return []
+        roots = [t for t in self.order if not self.deps[t]]
+        current = max(roots, key=lambda t: self.rank[t])
+        path = [current]
+        while self.dependents[current]:
+            current = max(self.dependents[current], key=lambda t: self.rank[t])
+            path.append(current)
+        return path
+
+    def descendants(self, task_id: str) -> Set[str]:
+        seen: Set[str] = set()
+        queue = deque(self.dependents[task_id])
+        while queue:
+            current = queue.popleft()
+            if current not in seen:
+                seen.add(current)
+                queue.extend(self.dependents[current])
+        return seen
+
+    # ---------------- 内部实现 ----------------
+
+    def _add_explicit_edges(self) -> None:
+        for task in self.tasks.values():
+            for dep in task.depends_on:
+                if dep not in self.tasks:
+                    raise BlueprintError(f"任务 {task.id} 依赖了不存在的任务: {dep}")
+                self.add_edge(dep, task.id)
+
+    def _add_inferred_edges(self) -> None:
+        producers: Dict[str, str] = {}
+        last_writer: Dict[str, str] = {}
+        for task_id in self.order:
+            task = self.tasks[task_id]
+            if task.key:
+                if task.key in last_writer:
+                    self.add_edge(last_writer[task.key], task_id)
+                last_writer[task.key] = task_id
+                producers.setdefault(task.key, task_id)
+
+        for task_id in self.order:
+            for value in self.tasks[task_id].referenced_values():
+                producer = producers.get(value)
+                if producer is not None:
+                    self.add_edge(producer, task_id)
+
+    def _topological_order(self) -> List[str]:
+        indegree = {t: len(d) for t, d in self.deps.items()}
+        queue = deque(t for t in self.order if indegree[t] == 0)
+        result: List[str] = []
+        while queue:
+            current = queue.popleft()
+            result.append(current)
+            for nxt in self.dependents[current]:
+                indegree[nxt] -= 1
+                if indegree[nxt] == 0:
+                    queue.append(nxt)
+        if len(result) != len(self.order):
+            cyclic = sorted(t for t, n in indegree.items() if n > 0)
+            raise BlueprintError(f"任务依赖存在环: {cyclic[:10]}")
+        return result
+
+    def _compute_levels_and_rank(self) -> None:
+        for task_id in self._topo:
+            self.levels[task_id] = max((self.levels[d] + 1 for d in self.deps[task_id]), default=0)
+        # rank = 自身耗时 + 后继中最长的 rank，即从该任务出发到结束的最长路径
+        for task_id in reversed(self._topo):
+            tail = max((self.rank[d] for d in self.dependents[task_id]), default=0.0)
+            self.rank[task_id] = self.tasks[task_id].estimated_seconds + tail
+
+
+class Scheduler:
+    """
+    任务调度状态机，不负责真正执行。
+
+    就绪任务按 rank 降序（关键路径优先）出队，同时遵守每个拓扑层的并发上限。
+    同步的 Orchestrator、dry-run 模拟和异步引擎共用这一份调度逻辑。
+    """
+
+    def __init__(self, graph: TaskGraph, concurrency: Optional[ConcurrencyConfig] = None):
+        self.graph = graph
+        self.concurrency = concurrency or ConcurrencyConfig()
+        self.status: Dict[str, TaskStatus] = {t: TaskStatus.PENDING for t in graph.order}
+        self._waiting = {t: len(d) for t, d in graph.deps.items()}
+        self._position = {t: i for i, t in enumerate(graph.order)}
+        self._ready: List[Tuple[float, int, str]] = []
+        self._running_per_level: Counter = Counter()
+        self._running = 0
+        self._done = 0
+        for task_id in graph.order:
+            if self._waiting[task_id] == 0:
+                self._push(task_id)
+
+    @property
+    def finished(self) -> bool:
+        return self._done == len(self.graph.order)
+
+    @property
+    def running_count(self) -> int:
+        return self._running
+
+    def level_limit(self, level: int) -> Optional[int]:
+        return self.concurrency.level_limits.get(level, self.concurrency.default_level_limit)
+
+    def next_task(self) -> Optional[Task]:
+        """取出下一个可运行的任务；没有可运行任务时返回 None。"""
+        blocked: List[Tuple[float, int, str]] = []
+        chosen: Optional[str] = None
+        while self._ready:
+            item = heapq.heappop(self._ready)
+            if self.status[item[2]] != TaskStatus.PENDING:
+                continue  # 入队后被 mark_completed_without_running 标记完成
+            level = self.graph.levels[item[2]]
+            limit = self.level_limit(level)
+            if limit is not None and self._running_per_level[level] >= limit:
+                blocked.append(item)
+                continue
+            chosen = item[2]
+            break
+        for item in blocked:
+            heapq.heappush(self._ready, item)
+        if chosen is None:
+            return None
+
+        self.status[chosen] = TaskStatus.RUNNING
+        self._running_per_level[self.graph.levels[chosen]] += 1
+        self._running += 1
+        return self.graph.tasks[chosen]
+
+    def mark_done(self, task_id: str, succeeded: bool) -> List[str]:
+        """
+        标记任务完成。成功时释放后继任务；失败时将所有下游任务标记为 SKIPPED。
+        返回被跳过的任务 id。
+        """
+        self._running -= 1
+        self._running_per_level[self.graph.levels[task_id]] -= 1
+        self._done += 1
+        if succeeded:
+            self.status[task_id] = TaskStatus.SUCCEEDED
+            self._release(task_id)
+            return []
+
+        self.status[task_id] = TaskStatus.FAILED
+        skipped = []
+        for nxt in self.graph.descendants(task_id):
+            if self.status[nxt] == TaskStatus.PENDING:
+                self.status[nxt] = TaskStatus.SKIPPED
+                self._done += 1
+                skipped.append(nxt)
+        return skipped
+
+    def mark_completed_without_running(self, task_id: str) -> None:
+        """
+        把尚未运行的任务直接标记为成功并释放后继任务，用于续跑时跳过运行日志中已完成的任务。
+        不要求其上游已完成：上游在本次运行中失败时，它照样保持成功，不会被标记为 SKIPPED。
+        """
+        if self.status[task_id] != TaskStatus.PENDING:
+            return
+        self.status[task_id] = TaskStatus.SUCCEEDED
+        self._done += 1
+        self._release(task_id)
+
+    def _release(self, task_id: str) -> None:
+        for nxt in self.graph.dependents[task_id]:
+            self._waiting[nxt] -= 1
+            if self._waiting[nxt] == 0 and self.status[nxt] == TaskStatus.PENDING:
+                self._push(nxt)
+
+    def _push(self, task_id: str) -> None:
+        heapq.heappush(self._ready, (-self.graph.rank[task_id], self._position[task_id], task_id))
+
+
+def simulate_schedule(graph: TaskGraph, concurrency: ConcurrencyConfig) -> List[Tuple[float, float, int, str]]:
+    """
+    用预估耗时模拟调度，返回 (开始时间, 结束时间, worker 编号, 任务 id) 列表，用于 dry-run。
+    """
+    scheduler = Scheduler(graph, concurrency)
+    free_workers = list(range(concurrency.max_workers))
+    running: List[Tuple[float, int, str]] = []
+    timeline: List[Tuple[float, float, int, str]] = []
+    clock = 0.0
+    while not scheduler.finished:
+        while free_workers:
+            task = scheduler.next_task()
+            if task is None:
+                break
+            worker = free_workers.pop(0)
+            end = clock + task.estimated_seconds
+            heapq.heappush(running, (end, worker, task.id))
+            timeline.append((clock, end, worker, task.id))
+        if not running:
+            break
+        clock, worker, task_id = heapq.heappop(running)
+        scheduler.mark_done(task_id, True)
+        free_workers.append(worker)
+        free_workers.sort()
+    return timeline
@@ -0,0 +1,218 @@
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple, Union
+
+import grpc
+
+from erp_core.exceptions import EngineBusyError, JobNotFoundError
+from erp_core.logging import get_logger
+from erp_core.models.blueprint import parse_blueprint
+from erp_core.models.task import TaskStatus
+from erp_deploy_engine.cluster import LeaseManager
+from erp_deploy_engine.compiled import BlueprintLike, open_blueprint
+from erp_deploy_engine.engine import AsyncEngine, JobEvent, JobState
+from erp_deploy_engine.orchestrator import Orchestrator
+from erp_deploy_engine.rpc import (adapter_api_pb2, adapter_api_pb2_grpc, common_pb2, engine_api_pb2,
+                                   engine_api_pb2_grpc)
+from erp_deploy_engine.task_executor import TaskResult
+
+logger = get_logger(__name__)
+
+_TASK_STATES = {
+    TaskStatus.PENDING: common_pb2.TASK_PENDING,
+    TaskStatus.RUNNING: common_pb2.TASK_RUNNING,
+    TaskStatus.SUCCEEDED: common_pb2.TASK_SUCCEEDED,
+    TaskStatus.FAILED: common_pb2.TASK_FAILED,
+    TaskStatus.SKIPPED: common_pb2.TASK_SKIPPED,
+    TaskStatus.CANCELLED: common_pb2.TASK_CANCELLED,
+}
+
+_TASK_STATUSES = {state: status for status, state in _TASK_STATES.items()}
+
+_JOB_STATES = {
+    JobState.QUEUED: common_pb2.JOB_QUEUED,
+    JobState.RUNNING: common_pb2.JOB_RUNNING,
+    JobState.COMPLETED: common_pb2.JOB_COMPLETED,
+    JobState.FAILED: common_pb2.JOB_FAILED,
+    JobState.CANCELLED: common_pb2.JOB_CANCELLED,
+}
+
+
+def _event_to_proto(event: JobEvent) -> engine_api_pb2.JobEvent:
+    message = engine_api_pb2.JobEvent(
+        job_id=event.job_id,
+        sequence=event.sequence,
+        timestamp=event.timestamp,
+        job_state=_JOB_STATES[event.job_state],
+        completed=event.completed,
+        total=event.total,
+    )
+    if event.task_id is not None:
+        message.task.task_id = event.task_id
+        message.task.state = _TASK_STATES[event.task_state]
+        message.task.error = event.error or ""
+        message.task.duration_seconds = event.duration
+        message.task.output.update(event.output)
+    return message
+
+
+class EngineServicer(engine_api_pb2_grpc.EngineServiceServicer):
+    """
+    engine_api.proto 中 EngineService 的 grpc.aio 实现。
+
+    blueprint_path 只能指向 blueprint_dir 内的文件（相对路径按该目录解析），blueprint_dir 为 None 时只接受 blueprint_yaml。
+    蓝图的读取、校验和 dry-run 排程可能耗时数秒（大蓝图），放到线程池执行，不阻塞事件循环上的其他流和 worker 心跳。
+    """
+
+    def __init__(self, engine: AsyncEngine, blueprint_dir: Optional[Union[str, Path]] = None):
+        self.engine = engine
+        self.blueprint_dir = Path(blueprint_dir).resolve() if blueprint_dir is not None else None
+
+    async def SubmitBlueprint(self, request, context):
+        if request.WhichOneof("source") == "blueprint_path":
+            try:
+                source: Union[Path, str] = self._blueprint_file(request.blueprint_path)
+            except PermissionError as e:
+                await context.abort(grpc.StatusCode.PERMISSION_DENIED, str(e))
+        else:
+            source = request.blueprint_yaml
+
+        max_workers = request.max_workers or None
+        loop = asyncio.get_running_loop()
+        try:
+            blueprint, schedule = await loop.run_in_executor(None, self._load, source, request.dry_run, max_workers)
+        except Exception as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"蓝图无效: {e}")
+        if request.dry_run:
+            return engine_api_pb2.SubmitBlueprintResponse(task_count=len(blueprint.steps), schedule=schedule)
+
+        try:
+            job = await self.engine.submit(blueprint, max_workers)
+        except EngineBusyError as e:
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(e))
+        return engine_api_pb2.SubmitBlueprintResponse(job_id=job.id, task_count=len(blueprint.steps))
+
+    def _blueprint_file(self, blueprint_path: str) -> Path:
+        if self.blueprint_dir is None:
+            raise PermissionError("服务未配置蓝图目录，请用 blueprint_yaml 提交蓝图内容")
+        path = (self.blueprint_dir / blueprint_path).resolve()
+        if self.blueprint_dir not in path.parents:
+            raise PermissionError(f"蓝图路径不在蓝图目录 {self.blueprint_dir} 内: {blueprint_path}")
+        return path
+
+    @staticmethod
+    def _load(source: Union[Path, str], dry_run: bool,
+              max_workers: Optional[int]) -> Tuple[BlueprintLike, Optional[str]]:
+        if isinstance(source, Path):
+            blueprint = open_blueprint(source, compile_missing=not dry_run)
+        else:
+            blueprint = parse_blueprint(source)
+        schedule = Orchestrator(max_workers=max_workers).format_schedule(blueprint) if dry_run else None
+        return blueprint, schedule
+
+    async def StreamJobEvents(self, request, context) -> AsyncIterator[engine_api_pb2.JobEvent]:
+        try:
+            job = self.engine.get_job(request.job_id)
+        except JobNotFoundError as e:
+            await context.abort(grpc.StatusCode.NOT_FOUND, str(e))
+        async for event in job.events(request.after_sequence):
+            yield _event_to_proto(event)
+
+    async def CancelJob(self, request, context):
+        try:
+            cancelled = await self.engine.cancel(request.job_id)
+        except JobNotFoundError as e:
+            await context.abort(grpc.StatusCode.NOT_FOUND, str(e))
+        return engine_api_pb2.CancelJobResponse(cancelled=cancelled)
+
+    async def GetJob(self, request, context):
+        try:
+            job = self.engine.get_job(request.job_id)
+        except JobNotFoundError as e:
+            await context.abort(grpc.StatusCode.NOT_FOUND, str(e))
+        return engine_api_pb2.JobSummary(
+            job_id=job.id,
+            blueprint=job.blueprint.name,
+            state=_JOB_STATES[job.state],
+            total=len(job.status),
+            succeeded=job.count(TaskStatus.SUCCEEDED),
+            failed=job.count(TaskStatus.FAILED),
+            skipped=job.count(TaskStatus.SKIPPED),
+            cancelled=job.count(TaskStatus.CANCELLED),
+        )
+
+
+class AdapterServicer(adapter_api_pb2_grpc.AdapterServiceServicer):
+    """adapter_api.proto 中 AdapterService 的实现：远程适配器 worker 的注册、心跳和任务租约。"""
+
+    def __init__(self, leases: LeaseManager):
+        self.leases = leases
+
+    async def RegisterWorker(self, request, context):
+        capacity = request.capacity
+        worker_id = self.leases.register(request.hostname, list(capacity.erp_types), capacity.total_slots,
+                                         capacity.free_slots, request.worker_id)
+        return adapter_api_pb2.RegisterWorkerResponse(worker_id=worker_id,
+                                                      heartbeat_interval=self.leases.heartbeat_interval,
+                                                      lease_ttl=self.leases.lease_ttl)
+
+    async def Heartbeat(self, request, context):
+        known, revoked = self.leases.heartbeat(request.worker_id, request.capacity.free_slots,
+                                               list(request.lease_ids))
+        return adapter_api_pb2.HeartbeatResponse(reregister=not known, revoked_lease_ids=revoked)
+
+    async def AcquireTasks(self, request, context):
+        wait = min(max(request.wait_seconds, 0.0), self.leases.lease_ttl / 2)
+        leases = await self.leases.acquire(request.worker_id, max(request.max_tasks, 0), wait)
+        if leases is None:
+            return adapter_api_pb2.AcquireTasksResponse(reregister=True)
+        return adapter_api_pb2.AcquireTasksResponse(leases=[
+            adapter_api_pb2.TaskLease(lease_id=lease.lease_id, job_id=lease.item.job_id, erp_type=lease.item.erp_type,
+                                      task_json=lease.task.model_dump_json(), attempt=lease.item.attempt,
+                                      lease_ttl=self.leases.lease_ttl)
+            for lease in leases
+        ])
+
+    async def CompleteTask(self, request, context):
+        result = TaskResult(request.task_id, _TASK_STATUSES.get(request.state, TaskStatus.FAILED),
+                            started_at=request.started_at, finished_at=request.finished_at,
+                            error=request.error or None, output=dict(request.output))
+        accepted = self.leases.complete(request.worker_id, request.lease_id, request.job_id, result)
+        return adapter_api_pb2.CompleteTaskResponse(accepted=accepted)
+
+    async def DeregisterWorker(self, request, context):
+        released = await self.leases.deregister(request.worker_id)
+        return adapter_api_pb2.DeregisterWorkerResponse(released_leases=released)
+
+
+async def serve(address: str = "[::]:50051", worker_slots: int = 8, max_active_jobs: int = 4,
+                max_queued_jobs: int = 16, cluster: bool = False, lease_ttl: float = 30.0,
+                heartbeat_interval: float = 5.0, blueprint_dir: Optional[str] = "blueprints") -> None:
+    """
+    启动 gRPC 服务并阻塞直到进程被终止。
+    cluster=True 时任务由注册到本服务的远程适配器 worker 执行，引擎本机不启动浏览器。
+    blueprint_dir 是客户端按路径提交蓝图时允许读取的目录，None 表示不接受按路径提交。
+    """
+    leases = LeaseManager(lease_ttl, heartbeat_interval) if cluster else None
+    engine = AsyncEngine(worker_slots, max_active_jobs, max_queued_jobs, leases=leases)
+    server = grpc.aio.server()
+    engine_api_pb2_grpc.add_EngineServiceServicer_to_server(EngineServicer(engine, blueprint_dir), server)
+    reaper = None
+    if leases is not None:
+        adapter_api_pb2_grpc.add_AdapterServiceServicer_to_server(AdapterServicer(leases), server)
+        reaper = asyncio.create_task(leases.reap_forever())
+    server.add_insecure_port(address)
+    await server.start()
+    logger.info("部署引擎已启动: %s (%s, 在途任务上限 %d)", address,
+                "分布式 worker" if cluster else "本机执行", worker_slots)
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(grace=5)
+        await engine.shutdown()
+        if reaper is not None:
+            reaper.cancel()
+
+
+def run_server(**kwargs) -> None:
+    asyncio.run(serve(**kwargs))
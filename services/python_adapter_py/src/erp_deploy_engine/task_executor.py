@@ -0,0 +1,190 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Set, Type
+
+import erp_ui_adapter
+from erp_core.exceptions import TaskExecutionError
+from erp_core.logging import get_logger, span
+from erp_core.models.task import Task, TaskStatus
+from erp_deploy_engine.journal import RunJournal
+
+if TYPE_CHECKING:
+    # 适配器和 selenium 只在真正执行任务时才导入，dry-run、编译等命令不必为此付出启动时间
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+    from erp_ui_adapter.adapters.base_adapter import BaseErpAdapter
+
+logger = get_logger(__name__)
+
+# 动作处理函数：在借到的浏览器会话中执行任务，返回任务产出（如生成的单据编号）
+ActionHandler = Callable[["BaseErpAdapter", "WebDriver", Task], Optional[Dict[str, Any]]]
+# 写入确认函数：检查中断的任务是否已在 ERP 中生效，已生效返回任务产出，未生效返回 None，无法判断时抛异常
+ActionVerifier = Callable[["BaseErpAdapter", "WebDriver", Task], Optional[Dict[str, Any]]]
+
+# ERP 类型 -> erp_ui_adapter 中导出的适配器类名
+ADAPTER_TYPES: Dict[str, str] = {
+    "kingdee": "KingdeeAdapter",
+    "yonbip": "YonbipAdapter",
+}
+
+
+def adapter_class(erp_type: str) -> Type["BaseErpAdapter"]:
+    return getattr(erp_ui_adapter, ADAPTER_TYPES[erp_type])
+
+
+_ACTION_HANDLERS: Dict[str, ActionHandler] = {}
+_ACTION_VERIFIERS: Dict[str, ActionVerifier] = {}
+# 重复执行结果不变的动作，中断后可以直接重跑
+_IDEMPOTENT_ACTIONS: Set[str] = set()
+
+
+def register_action(name: str, idempotent: bool = False) -> Callable[[ActionHandler], ActionHandler]:
+    """注册蓝图动作处理函数的装饰器。"""
+    def decorator(func: ActionHandler) -> ActionHandler:
+        _ACTION_HANDLERS[name] = func
+        if idempotent:
+            _IDEMPOTENT_ACTIONS.add(name)
+        return func
+    return decorator
+
+
+def register_verifier(name: str) -> Callable[[ActionVerifier], ActionVerifier]:
+    """注册动作的写入确认函数，续跑时用来判断上次中断的任务是否已经写入 ERP。"""
+    def decorator(func: ActionVerifier) -> ActionVerifier:
+        _ACTION_VERIFIERS[name] = func
+        return func
+    return decorator
+
+
+@register_action("create")
+def _create(adapter: "BaseErpAdapter", driver: "WebDriver", task: Task) -> Dict[str, Any]:
+    adapter.create_record(driver, task.menu, task.fields)
+    return {"key": task.key} if task.key else {}
+
+
+@register_verifier("create")
+def _verify_create(adapter: "BaseErpAdapter", driver: "WebDriver", task: Task) -> Optional[Dict[str, Any]]:
+    if not task.key:
+        raise TaskExecutionError(f"create 任务 {task.id} 缺少 key，无法确认上次中断的写入是否已生效")
+    return {"key": task.key} if adapter.record_exists(driver, task.menu, task.key) else None
+
+
+@register_action("update", idempotent=True)
+def _update(adapter: "BaseErpAdapter", driver: "WebDriver", task: Task) -> Dict[str, Any]:
+    if not task.key:
+        raise TaskExecutionError(f"update 任务 {task.id} 缺少 key")
+    adapter.update_record(driver, task.menu, task.key, task.fields)
+    return {"key": task.key}
+
+
+@register_action("bulk_create")
+def _bulk_create(adapter: "BaseErpAdapter", driver: "WebDriver", task: Task) -> Dict[str, Any]:
+    """fields.rows 为多行记录，走表格粘贴/导入的批量录入。"""
+    report = adapter.bulk_create(driver, task.menu, task.fields.get("rows", []))
+    failed = report.failed_rows
+    if failed:
+        details = "; ".join(f"第 {r.index + 1} 行: {r.error}" for r in failed[:5])
+        raise TaskExecutionError(f"{len(failed)} 行录入失败 - {details}")
+    return {"mode": report.mode.value, "rows": len(report.rows), "rows_per_minute": round(report.rows_per_minute)}
+
+
+@dataclass
+class TaskResult:
+    task_id: str
+    status: TaskStatus
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    error: Optional[str] = None
+    output: Dict[str, Any] = field(default_factory=dict)
+    resumed: bool = False       # 之前的运行已完成（或确认已写入），本次没有执行
+
+    @property
+    def duration(self) -> float:
+        return self.finished_at - self.started_at
+
+
+class TaskExecutor:
+    """
+    执行单个蓝图任务。线程安全，可被多个调度线程同时调用；
+    每次执行从任务所在服务器的会话池借用一个浏览器。
+    """
+
+    def __init__(self, erp_type: str, adapters: Optional[Dict[str, "BaseErpAdapter"]] = None):
+        if erp_type not in ADAPTER_TYPES:
+            raise TaskExecutionError(f"不支持的 ERP 类型: {erp_type}")
+        self.erp_type = erp_type
+        self._adapters: Dict[str, "BaseErpAdapter"] = dict(adapters or {})
+        self._lock = threading.Lock()
+
+    def adapter_for(self, server_name: str) -> "BaseErpAdapter":
+        with self._lock:
+            adapter = self._adapters.get(server_name)
+            if adapter is None:
+                adapter = adapter_class(self.erp_type)(server_name)
+                self._adapters[server_name] = adapter
+            return adapter
+
+    def execute(self, task: Task, journal: Optional[RunJournal] = None, in_doubt: bool = False) -> TaskResult:
+        """
+        执行任务并返回结果，异常会被捕获并记录为 FAILED。
+
+        传入运行日志时，写入 ERP 前先记录 STARTED 并落盘，结束后记录结果；
+        日志显示上次执行在写入途中中断的任务，先确认 ERP 中是否已生效，已生效则不再重复写入。
+        in_doubt=True 时（例如从失联 worker 收回重新分配的任务）同样先确认再执行。
+        """
+        with span("task.execute", "task", task=task.id, action=task.action, entity=task.entity,
+                  server=task.server) as s:
+            result = self._execute(task, journal, in_doubt)
+            s.set("status", result.status.value)
+            if result.resumed:
+                s.set("resumed", True)
+            if result.error:
+                s.set_error(result.error)
+        return result
+
+    def _execute(self, task: Task, journal: Optional[RunJournal], in_doubt: bool) -> TaskResult:
+        result = TaskResult(task.id, TaskStatus.RUNNING, started_at=time.time())
+        try:
+            handler = _ACTION_HANDLERS.get(task.action)
+            if handler is None:
+                raise TaskExecutionError(f"未知动作: {task.action}")
+            adapter = self.adapter_for(task.server)
+            with adapter.session() as driver:
+                recovered = None
+                if in_doubt or (journal is not None and journal.in_doubt(task)):
+                    recovered = self._verify(adapter, driver, task)
+                if recovered is not None:
+                    result.output = recovered
+                    result.resumed = True
+                else:
+                    if journal is not None:
+                        journal.started(task)
+                    result.output = handler(adapter, driver, task) or {}
+            result.status = TaskStatus.SUCCEEDED
+        except Exception as e:
+            logger.error("任务 %s 执行失败: %s", task.id, e)
+            result.status = TaskStatus.FAILED
+            result.error = f"{type(e).__name__}: {e}"
+        result.finished_at = time.time()
+        if journal is not None:
+            if result.status == TaskStatus.SUCCEEDED:
+                journal.succeeded(task, result.output)
+            else:
+                journal.failed(task, result.error or "")
+        return result
+
+    @staticmethod
+    def _verify(adapter: "BaseErpAdapter", driver: "WebDriver", task: Task) -> Optional[Dict[str, Any]]:
+        """确认上次中断的写入：已生效返回产出；未生效或动作可安全重跑返回 None。"""
+        verifier = _ACTION_VERIFIERS.get(task.action)
+        if verifier is not None:
+            output = verifier(adapter, driver, task)
+            if output is not None:
+                logger.info("任务 %s 上次中断前已写入 ERP，不再重复执行", task.id)
+            return output
+        if task.action in _IDEMPOTENT_ACTIONS:
+            return None
+        raise TaskExecutionError(
+            f"任务 {task.id} 上次在写入 ERP 时中断，动作 {task.action} 无法自动确认是否已生效；"
+            f"请人工核对后用 --resolved {task.id} 续跑")
@@ -0,0 +1,198 @@
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from erp_core.exceptions import ErpPlatformError
+
+# 这些类别的 span 下面的全部耗时都归到该类别：等待期间的轮询命令算等待，截图算视觉
+_ABSORBING_KINDS = ("wait", "pool", "vision", "llm")
+# 报告中的列顺序，webdriver 显示为"浏览器"
+CATEGORIES = ("webdriver", "wait", "pool", "vision", "llm", "adapter", "task", "internal")
+_CATEGORY_LABELS = {
+    "webdriver": "浏览器", "wait": "等待", "pool": "借会话", "vision": "视觉", "llm": "模型",
+    "adapter": "适配器", "task": "任务", "internal": "其他",
+}
+
+
+@dataclass
+class SpanNode:
+    span_id: str
+    parent_id: Optional[str]
+    trace_id: str
+    name: str
+    kind: str
+    start_ns: int
+    end_ns: int
+    attributes: Dict = field(default_factory=dict)
+    error: Optional[str] = None
+    children: List["SpanNode"] = field(default_factory=list)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    @property
+    def self_ms(self) -> float:
+        return max(self.duration_ms - sum(c.duration_ms for c in self.children), 0.0)
+
+
+def _from_otlp(request: Dict) -> Iterator[SpanNode]:
+    for resource_spans in request.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for s in scope_spans.get("spans", []):
+                attributes = {a["key"]: next(iter(a["value"].values()), None) for a in s.get("attributes", [])}
+                status = s.get("status", {})
+                yield SpanNode(s["spanId"], s.get("parentSpanId") or None, s["traceId"], s["name"],
+                               attributes.pop("erp.kind", "internal"), int(s["startTimeUnixNano"]),
+                               int(s["endTimeUnixNano"]), attributes,
+                               status.get("message") if status.get("code") == 2 else None)
+
+
+def load_spans(paths: Iterable[Union[str, Path]]) -> List[SpanNode]:
+    """读取 JSONL 或 OTLP/JSON 格式的追踪文件（可以是多个 worker 各自的文件），忽略写到一半的末行。"""
+    spans: List[SpanNode] = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "resourceSpans" in record:
+                    spans.extend(_from_otlp(record))
+                else:
+                    spans.append(SpanNode(record["span_id"], record.get("parent_id"), record["trace_id"],
+                                          record["name"], record.get("kind", "internal"), record["start_ns"],
+                                          record["end_ns"], record.get("attributes") or {}, record.get("error")))
+    if not spans:
+        raise ErpPlatformError("追踪文件中没有 span")
+    return spans
+
+
+def build_trees(spans: List[SpanNode]) -> List[SpanNode]:
+    """连接父子 span，返回按开始时间排序的根 span。父 span 不在文件中（未写出）的 span 视为根。"""
+    by_id = {s.span_id: s for s in spans}
+    roots = []
+    for s in spans:
+        parent = by_id.get(s.parent_id) if s.parent_id else None
+        if parent is None:
+            roots.append(s)
+        else:
+            parent.children.append(s)
+    for s in spans:
+        s.children.sort(key=lambda c: c.start_ns)
+    return sorted(roots, key=lambda s: s.start_ns)
+
+
+def breakdown(root: SpanNode) -> Dict[str, float]:
+    """按类别统计子树的自身耗时（毫秒），各类别之和等于根 span 的耗时。"""
+    totals: Dict[str, float] = defaultdict(float)
+    stack: List[Tuple[SpanNode, Optional[str]]] = [(root, None)]
+    while stack:
+        node, inherited = stack.pop()
+        category = inherited or (node.kind if node.kind in _ABSORBING_KINDS else None)
+        totals[category or (node.kind if node.kind in CATEGORIES else "internal")] += node.self_ms
+        stack.extend((child, category) for child in node.children)
+    return totals
+
+
+@dataclass
+class FlameNode:
+    """把同一父路径下同名的 span 合并后的调用树节点。"""
+    name: str
+    count: int = 0
+    total_ms: float = 0.0
+    self_ms: float = 0.0
+    children: Dict[str, "FlameNode"] = field(default_factory=dict)
+
+
+def merge(roots: Iterable[SpanNode], name: str = "(all)") -> FlameNode:
+    merged = FlameNode(name)
+    stack: List[Tuple[SpanNode, FlameNode]] = [(root, merged) for root in roots]
+    while stack:
+        node, parent = stack.pop()
+        target = parent.children.get(node.name)
+        if target is None:
+            target = parent.children[node.name] = FlameNode(node.name)
+        target.count += 1
+        target.total_ms += node.duration_ms
+        target.self_ms += node.self_ms
+        stack.extend((child, target) for child in node.children)
+    merged.total_ms = sum(c.total_ms for c in merged.children.values())
+    return merged
+
+
+def folded_stacks(roots: Iterable[SpanNode]) -> Dict[str, int]:
+    """flamegraph.pl / speedscope 使用的折叠栈格式：调用路径 -> 自身耗时（微秒）。"""
+    folded: Dict[str, int] = defaultdict(int)
+    stack: List[Tuple[SpanNode, str]] = [(root, root.name) for root in roots]
+    while stack:
+        node, path = stack.pop()
+        folded[path] += int(node.self_ms * 1000)
+        stack.extend((child, f"{path};{child.name}") for child in node.children)
+    return folded
+
+
+def _percent(part: float, whole: float) -> str:
+    return f"{part / whole * 100:5.1f}%" if whole else "    -"
+
+
+def format_summary(roots: List[SpanNode], top: int = 20) -> str:
+    """总体按类别的耗时占比，以及最慢的 top 个蓝图步骤各自的耗时拆分。"""
+    tasks = [r for r in roots if r.kind == "task"]
+    others = [r for r in roots if r.kind != "task"]
+    overall: Dict[str, float] = defaultdict(float)
+    for root in roots:
+        for category, ms in breakdown(root).items():
+            overall[category] += ms
+    total = sum(overall.values())
+
+    lines = [f"{len(tasks)} 个任务, {len(others)} 个其他根 span, 合计 {total / 1000:.1f}s（各线程耗时之和）", ""]
+    lines.append(f"{'类别':<8} {'耗时(s)':>9} {'占比':>7}")
+    for category in CATEGORIES:
+        if overall.get(category):
+            lines.append(f"{_CATEGORY_LABELS[category]:<8} {overall[category] / 1000:>9.2f} "
+                         f"{_percent(overall[category], total):>7}")
+
+    if tasks:
+        columns = [c for c in CATEGORIES if overall.get(c)]
+        lines += ["", f"最慢的 {min(top, len(tasks))} 个步骤（各类别占该步骤耗时的比例）:"]
+        lines.append(f"{'任务':<24} {'动作':<12} {'状态':<10} {'耗时(s)':>8} "
+                     + " ".join(f"{_CATEGORY_LABELS[c]:>6}" for c in columns))
+        for root in sorted(tasks, key=lambda r: -r.duration_ms)[:top]:
+            parts = breakdown(root)
+            lines.append(f"{str(root.attributes.get('task', root.name))[:24]:<24} "
+                         f"{str(root.attributes.get('action', ''))[:12]:<12} "
+                         f"{str(root.attributes.get('status', 'error' if root.error else ''))[:10]:<10} "
+                         f"{root.duration_ms / 1000:>8.2f} "
+                         + " ".join(f"{_percent(parts.get(c, 0.0), root.duration_ms):>6}" for c in columns))
+    return "\n".join(lines)
+
+
+def format_flame(node: FlameNode, min_percent: float = 1.0, width: int = 30) -> str:
+    """缩进的合并调用树：次数、总耗时、自身耗时和占根节点比例的条形图，低于 min_percent 的分支省略。"""
+    lines = [f"{'调用':<48} {'次数':>6} {'总计(ms)':>10} {'自身(ms)':>10}"]
+    whole = node.total_ms or 1.0
+
+    def walk(current: FlameNode, depth: int) -> None:
+        for child in sorted(current.children.values(), key=lambda c: -c.total_ms):
+            share = child.total_ms / whole
+            if share * 100 < min_percent:
+                continue
+            label = ("  " * depth + child.name)[:48]
+            bar = "█" * max(1, round(share * width))
+            lines.append(f"{label:<48} {child.count:>6} {child.total_ms:>10.0f} {child.self_ms:>10.0f}  {bar}")
+            walk(child, depth + 1)
+
+    walk(node, 0)
+    return "\n".join(lines)
+
+
+def find_task(roots: List[SpanNode], task_id: str) -> List[SpanNode]:
+    """某个蓝图步骤的全部执行（重试或续跑时可能有多次）。"""
+    return [r for r in roots if r.kind == "task" and r.attributes.get("task") == task_id]
@@ -0,0 +1,187 @@
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Sequence
+
+import grpc
+
+from erp_core.logging import get_logger
+from erp_core.models.task import Task, TaskStatus
+from erp_deploy_engine.rpc import adapter_api_pb2, adapter_api_pb2_grpc, common_pb2
+from erp_deploy_engine.task_executor import TaskExecutor, TaskResult
+
+logger = get_logger(__name__)
+
+_TASK_STATES = {
+    TaskStatus.SUCCEEDED: common_pb2.TASK_SUCCEEDED,
+    TaskStatus.FAILED: common_pb2.TASK_FAILED,
+    TaskStatus.CANCELLED: common_pb2.TASK_CANCELLED,
+}
+
+
+class AdapterWorker:
+    """
+    适配器 worker：向部署引擎注册本机的浏览器槽位，领取任务租约并在本机会话池中执行。
+
+    三类线程：主线程长轮询领取任务（只在有空闲槽位时领取），slots 个执行线程跑 TaskExecutor，
+    一个心跳线程定期上报空闲槽位并续约手中的租约。引擎重启或判定本 worker 失联后，
+    心跳会收到 reregister，worker 用原 id 重新注册；已被引擎收回的租约，其结果提交时会被拒绝。
+    """
+
+    def __init__(self, engine_address: str, slots: int, erp_types: Sequence[str],
+                 executor_factory: Callable[[str], TaskExecutor] = TaskExecutor,
+                 hostname: Optional[str] = None, poll_seconds: float = 10.0):
+        self.engine_address = engine_address
+        self.slots = slots
+        self.erp_types = list(erp_types)
+        self.hostname = hostname or socket.gethostname()
+        self.poll_seconds = poll_seconds
+        self.worker_id = ""
+        self.heartbeat_interval = 5.0
+        self.completed = 0
+        self.rejected = 0
+        self._executors: Dict[str, TaskExecutor] = {t: executor_factory(t) for t in self.erp_types}
+        self._channel = grpc.insecure_channel(engine_address)
+        self._stub = adapter_api_pb2_grpc.AdapterServiceStub(self._channel)
+        self._pool = ThreadPoolExecutor(max_workers=slots, thread_name_prefix="adapter-slot")
+        self._active: Dict[str, Task] = {}
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._stopping = threading.Event()     # 停止领取新任务
+        self._closed = threading.Event()       # 在途任务已结束，停止心跳
+
+    @property
+    def free_slots(self) -> int:
+        with self._lock:
+            return self.slots - len(self._active)
+
+    def run(self) -> None:
+        """阻塞运行，直到 stop() 被调用；退出前等待在途任务完成并注销。"""
+        self.register()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="adapter-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            while not self._stopping.is_set():
+                with self._lock:
+                    while len(self._active) >= self.slots and not self._stopping.is_set():
+                        self._slot_freed.wait(1.0)
+                    free = self.slots - len(self._active)
+                if self._stopping.is_set():
+                    break
+                self._acquire(free)
+        finally:
+            self._stopping.set()
+            # 等待在途任务完成，期间心跳照常续约
+            self._pool.shutdown(wait=True)
+            self._closed.set()
+            self._deregister()
+            self._channel.close()
+
+    def stop(self) -> None:
+        """请求停止，可在信号处理函数中调用（不加锁，主循环最多 1 秒内察觉）。"""
+        self._stopping.set()
+
+    def register(self) -> None:
+        response = self._stub.RegisterWorker(adapter_api_pb2.RegisterWorkerRequest(
+            worker_id=self.worker_id, hostname=self.hostname, capacity=self._capacity()))
+        self.worker_id = response.worker_id
+        self.heartbeat_interval = response.heartbeat_interval or self.heartbeat_interval
+        logger.info("已向引擎 %s 注册为 %s (%d 个槽位, 心跳 %.0fs, 租约 %.0fs)", self.engine_address,
+                    self.worker_id, self.slots, self.heartbeat_interval, response.lease_ttl)
+
+    # ---------------- 内部实现 ----------------
+
+    def _capacity(self) -> adapter_api_pb2.WorkerCapacity:
+        return adapter_api_pb2.WorkerCapacity(erp_types=self.erp_types, total_slots=self.slots,
+                                              free_slots=self.free_slots)
+
+    def _acquire(self, free: int) -> None:
+        try:
+            response = self._stub.AcquireTasks(adapter_api_pb2.AcquireTasksRequest(
+                worker_id=self.worker_id, max_tasks=free, wait_seconds=self.poll_seconds),
+                timeout=self.poll_seconds + 30)
+        except grpc.RpcError as e:
+            logger.warning("领取任务失败，稍后重试: %s", e.code())
+            self._stopping.wait(self.heartbeat_interval)
+            return
+        if response.reregister:
+            self.register()
+            return
+        for lease in response.leases:
+            task = Task.model_validate_json(lease.task_json)
+            with self._lock:
+                self._active[lease.lease_id] = task
+            self._pool.submit(self._execute, lease, task)
+
+    def _execute(self, lease: adapter_api_pb2.TaskLease, task: Task) -> None:
+        try:
+            # attempt > 1：上一个 worker 在执行途中失联，可能已部分写入，先确认再执行
+            result = self._executors[lease.erp_type].execute(task, in_doubt=lease.attempt > 1)
+        except Exception as e:  # execute 本身不抛异常，这里防御未知错误，避免槽位泄漏
+            result = TaskResult(task.id, TaskStatus.FAILED, error=f"{type(e).__name__}: {e}")
+        try:
+            self._complete(lease, result)
+        finally:
+            with self._lock:
+                self._active.pop(lease.lease_id, None)
+                self._slot_freed.notify_all()
+
+    def _complete(self, lease: adapter_api_pb2.TaskLease, result: TaskResult) -> None:
+        request = adapter_api_pb2.CompleteTaskRequest(
+            worker_id=self.worker_id, lease_id=lease.lease_id, job_id=lease.job_id, task_id=result.task_id,
+            state=_TASK_STATES.get(result.status, common_pb2.TASK_FAILED), error=result.error or "",
+            output={k: str(v) for k, v in result.output.items()},
+            started_at=result.started_at, finished_at=result.finished_at)
+        for attempt in range(3):
+            try:
+                accepted = self._stub.CompleteTask(request, timeout=30).accepted
+                break
+            except grpc.RpcError as e:
+                logger.warning("提交任务 %s 结果失败 (%s)，重试", result.task_id, e.code())
+                self._closed.wait(self.heartbeat_interval * (attempt + 1))
+        else:
+            # 结果交不上去时租约会过期，任务由其他 worker 确认后接手
+            logger.error("任务 %s 的结果无法提交给引擎", result.task_id)
+            return
+        if accepted:
+            self.completed += 1
+        else:
+            self.rejected += 1
+            logger.warning("任务 %s 的租约已被引擎收回，结果未被采纳", result.task_id)
+
+    def _heartbeat_loop(self) -> None:
+        while not self._closed.wait(self.heartbeat_interval):
+            with self._lock:
+                lease_ids = list(self._active)
+            try:
+                response = self._stub.Heartbeat(adapter_api_pb2.HeartbeatRequest(
+                    worker_id=self.worker_id, capacity=self._capacity(), lease_ids=lease_ids),
+                    timeout=self.heartbeat_interval)
+            except grpc.RpcError as e:
+                logger.warning("心跳失败: %s", e.code())
+                continue
+            if response.reregister:
+                logger.warning("引擎要求重新注册")
+                try:
+                    self.register()
+                except grpc.RpcError as e:
+                    logger.warning("重新注册失败: %s", e.code())
+            elif response.revoked_lease_ids:
+                logger.warning("%d 个租约已被引擎收回", len(response.revoked_lease_ids))
+
+    def _deregister(self) -> None:
+        if not self.worker_id:
+            return
+        try:
+            self._stub.DeregisterWorker(adapter_api_pb2.WorkerRef(worker_id=self.worker_id), timeout=5)
+        except grpc.RpcError as e:
+            logger.warning("注销 worker 失败: %s", e.code())
+
+
+def run_worker(engine_address: str, slots: int, erp_types: Sequence[str], **kwargs) -> None:
+    """运行 worker 直到收到 SIGINT / SIGTERM，收到后不再领取新任务，等在途任务完成后注销退出。"""
+    worker = AdapterWorker(engine_address, slots, erp_types, **kwargs)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: worker.stop())
+    worker.run()
@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional
+
+from erp_dom_analyzer.element_index import ElementIndex, normalize_text
+
+FIELD_TAGS = ("input", "textarea", "select")
+BUTTON_ROLES = ("button", "menuitem", "tab")
+
+# 标签与输入框的常见排布：输入框在标签右侧同一行，或在标签正下方
+RIGHT_SEARCH_WIDTH = 480.0
+BELOW_SEARCH_HEIGHT = 80.0
+
+
+class ComponentRecognizer:
+    """基于 ElementIndex 识别表单字段、按钮等组件，所有查找都走索引而不是线性扫描。"""
+
+    def __init__(self, index: ElementIndex):
+        self.index = index
+        self.table = index.table
+
+    def is_field(self, row: int) -> bool:
+        return self.table.tag(row) in FIELD_TAGS and self.table.attribute(row, "type") != "hidden"
+
+    def find_field(self, label: str) -> Optional[int]:
+        """按标签文本找到对应输入控件的行号。"""
+        fallback = None
+        for row in self.index.find_by_label(label):
+            if self.is_field(row):
+                if self.table.visible[row]:
+                    return row
+                fallback = row if fallback is None else fallback
+        if fallback is not None:
+            return fallback
+        for label_row in self.index.find_by_text(label):
+            if self.is_field(label_row):
+                continue
+            row = self._field_near(label_row)
+            if row is not None:
+                return row
+        return None
+
+    def find_button(self, text: str) -> Optional[int]:
+        rows = [r for r in self.index.find_by_text(text)
+                if self.table.tag(r) in ("button", "a") or self.table.attribute(r, "role") in BUTTON_ROLES]
+        return self._prefer_visible(rows) if rows else None
+
+    def form_fields(self) -> Dict[str, int]:
+        """页面上所有可识别的 标签文本 -> 输入控件行号。"""
+        fields: Dict[str, int] = {}
+        for label, rows in self.index.by_label.items():
+            field_rows = [r for r in rows if self.is_field(r)]
+            if field_rows:
+                fields[label] = self._prefer_visible(field_rows)
+        for tag in ("label", "span", "div", "td"):
+            for row in self.index.by_tag.get(tag, []):
+                label = normalize_text(self.table.text(row))
+                if label and label not in fields:
+                    field = self._field_near(row)
+                    if field is not None:
+                        fields[label] = field
+        return fields
+
+    def _field_near(self, label_row: int) -> Optional[int]:
+        x, y, w, h = self.table.rect(label_row)
+        if w <= 0 or h <= 0:
+            return None
+        right = [r for r in self.index.in_rect(x + w, y - h / 2, x + w + RIGHT_SEARCH_WIDTH, y + h * 1.5)
+                 if self.is_field(r)]
+        below = [r for r in self.index.in_rect(x - 20, y + h, x + w + RIGHT_SEARCH_WIDTH / 2,
+                                                y + h + BELOW_SEARCH_HEIGHT)
+                 if self.is_field(r)]
+        candidates = right or below
+        if not candidates:
+            return None
+        cx, cy = x + w, y + h / 2
+        return min(candidates, key=lambda r: _distance_to(self.table.rect(r), cx, cy))
+
+    def _prefer_visible(self, rows: List[int]) -> int:
+        for row in rows:
+            if self.table.visible[row]:
+                return row
+        return rows[0]
+
+
+def _distance_to(rect, x: float, y: float) -> float:
+    rx, ry, rw, rh = rect
+    dx = max(rx - x, 0.0, x - (rx + rw))
+    dy = max(ry - y, 0.0, y - (ry + rh))
+    return dx * dx + dy * dy
@@ -0,0 +1,307 @@
+import sys
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from erp_core.logging import get_logger
+from erp_core.models.dom_element import FRAME_SEPARATOR, BoundingBox, DOMElement, ElementTable
+from erp_dom_analyzer.element_index import ElementIndex
+
+logger = get_logger(__name__)
+
+# 快照中保留的属性；其余属性对定位没有帮助，只会增大传输量
+DEFAULT_ATTRIBUTES: Tuple[str, ...] = (
+    "id", "name", "class", "type", "role", "placeholder", "title", "value", "href", "for",
+    "aria-label", "aria-labelledby", "data-field", "data-key", "data-col", "disabled", "readonly",
+)
+
+# 单次 execute_script 完成遍历：同源 iframe、open shadow root 都会递归进入。
+# 返回列式结构，字符串通过 strings 表去重，attrs 为 [名称下标, 值下标, ...] 扁平数组。
+# incremental=true 时只遍历 MutationObserver 记录的变更子树，并返回已失效的节点 id。
+_SNAPSHOT_JS = r"""
+const opts = arguments[0];
+const INTERACTIVE = 'input,select,textarea,button,a[href],label,option,[role],[onclick],' +
+    '[contenteditable="true"],[tabindex],[title],[data-field]';
+let state = window.__erpDomSnap;
+const reset = !state || !opts.incremental;
+if (reset) {
+    if (state && state.observers) state.observers.forEach(o => o.disconnect());
+    state = window.__erpDomSnap = {ids: new WeakMap(), nextId: 1, observers: [], observed: new WeakSet(),
+                                   dirty: new Set(), emitted: new Map()};
+}
+const strings = [], stringIndex = new Map();
+const S = s => {
+    s = s == null ? '' : String(s);
+    let i = stringIndex.get(s);
+    if (i === undefined) { i = strings.length; strings.push(s); stringIndex.set(s, i); }
+    return i;
+};
+const idOf = el => {
+    let id = state.ids.get(el);
+    if (id === undefined) { id = state.nextId++; state.ids.set(el, id); }
+    return id;
+};
+const cssOf = el => {
+    if (el.id) return el.tagName.toLowerCase() + '#' + CSS.escape(el.id);
+    const name = el.getAttribute('name');
+    if (name) return el.tagName.toLowerCase() + '[name="' + name + '"]';
+    let i = 1, sib = el;
+    while ((sib = sib.previousElementSibling)) if (sib.tagName === el.tagName) i++;
+    return (el.parentElement ? cssOf(el.parentElement) + ' > ' : '') + el.tagName.toLowerCase() + ':nth-of-type(' + i + ')';
+};
+const observe = root => {
+    if (state.observed.has(root)) return;
+    state.observed.add(root);
+    const obs = new MutationObserver(records => {
+        for (const r of records) {
+            const t = r.target.nodeType === 1 ? r.target : r.target.parentElement;
+            if (t) state.dirty.add(t);
+        }
+    });
+    obs.observe(root, {subtree: true, childList: true, attributes: true, characterData: true});
+    state.observers.push(obs);
+};
+const labelOf = (el, doc) => {
+    if (el.labels && el.labels.length) return el.labels[0].textContent.trim();
+    const by = el.getAttribute('aria-labelledby');
+    if (by) { const l = doc.getElementById(by); if (l) return l.textContent.trim(); }
+    return el.getAttribute('aria-label') || el.getAttribute('placeholder') || '';
+};
+const cols = {id: [], parent: [], tag: [], attrs: [], rect: [], visible: [], text: [], frame: []};
+const seen = new Set();
+const emit = (el, parentId, framePath, dx, dy, doc) => {
+    const id = idOf(el);
+    if (seen.has(id)) return id;
+    seen.add(id);
+    const r = el.getBoundingClientRect();
+    const visible = r.width > 0 && r.height > 0 &&
+        (el.checkVisibility ? el.checkVisibility({checkOpacity: true, checkVisibilityCSS: true}) : true);
+    const attrs = [];
+    for (const a of opts.attributes) {
+        const v = el.getAttribute(a);
+        if (v !== null) attrs.push(S(a), S(v));
+    }
+    const label = labelOf(el, doc);
+    if (label) attrs.push(S('__label'), S(label));
+    const isField = el.tagName === 'INPUT' || el.tagName === 'TEXTAREA' || el.tagName === 'SELECT';
+    const text = (isField ? (el.value || '') : (el.textContent || '')).trim().slice(0, opts.maxText);
+    cols.id.push(id); cols.parent.push(parentId); cols.tag.push(S(el.tagName.toLowerCase()));
+    cols.attrs.push(attrs); cols.rect.push(r.x + dx, r.y + dy, r.width, r.height);
+    cols.visible.push(visible ? 1 : 0); cols.text.push(S(text)); cols.frame.push(S(framePath.join(opts.sep)));
+    state.emitted.set(id, new WeakRef(el));
+    return id;
+};
+const walk = (root, parentId, framePath, dx, dy, doc) => {
+    const stack = [[root, parentId]];
+    while (stack.length) {
+        const [node, pid] = stack.pop();
+        let current = pid;
+        if (node.nodeType === 1) {
+            if (node.matches(INTERACTIVE)) current = emit(node, pid, framePath, dx, dy, doc);
+            if (node.shadowRoot) {
+                observe(node.shadowRoot);
+                walk(node.shadowRoot, current, framePath.concat('shadow:' + cssOf(node)), dx, dy, doc);
+            }
+            if (node.tagName === 'IFRAME' || node.tagName === 'FRAME') {
+                let inner = null;
+                try { inner = node.contentDocument; } catch (e) { inner = null; }
+                if (inner && inner.documentElement) {
+                    observe(inner);
+                    const fr = node.getBoundingClientRect();
+                    walk(inner.documentElement, current, framePath.concat('iframe:' + cssOf(node)),
+                         dx + fr.x + node.clientLeft, dy + fr.y + node.clientTop, inner);
+                }
+            }
+        }
+        const children = node.children || [];
+        for (let i = children.length - 1; i >= 0; i--) stack.push([children[i], current]);
+    }
+};
+// 重新定位某个变更子树在 frame / shadow 中的上下文
+const contextOf = el => {
+    const path = [];
+    let dx = 0, dy = 0, node = el, pid = 0;
+    for (let p = el.parentElement; p; p = p.parentElement) {
+        const pidCand = state.ids.get(p);
+        if (pidCand !== undefined && state.emitted.has(pidCand)) { pid = pidCand; break; }
+    }
+    while (node) {
+        const root = node.getRootNode();
+        if (root instanceof ShadowRoot) { path.unshift('shadow:' + cssOf(root.host)); node = root.host; continue; }
+        const win = root.defaultView;
+        if (win && win.frameElement) {
+            const fe = win.frameElement, fr = fe.getBoundingClientRect();
+            path.unshift('iframe:' + cssOf(fe));
+            dx += fr.x + fe.clientLeft; dy += fr.y + fe.clientTop;
+            node = fe;
+            continue;
+        }
+        break;
+    }
+    return [pid, path, dx, dy, el.ownerDocument];
+};
+
+const removedIds = [];
+let roots = [];
+if (reset) {
+    observe(document);
+    walk(document.documentElement, 0, [], 0, 0, document);
+} else {
+    roots = Array.from(state.dirty).filter(el => el.isConnected);
+    roots = roots.filter(el => !roots.some(other => other !== el && other.contains(el)));
+    state.dirty.clear();
+    for (const el of roots) {
+        const [pid, path, dx, dy, doc] = contextOf(el);
+        walk(el, pid, path, dx, dy, doc);
+    }
+    for (const [id, ref] of state.emitted) {
+        if (seen.has(id)) continue;
+        const el = ref.deref();
+        if (!el || !el.isConnected || roots.some(root => root.contains(el))) {
+            removedIds.push(id);
+            state.emitted.delete(id);
+        }
+    }
+}
+return {full: reset, strings: strings, cols: cols, removed: removedIds};
+"""
+
+
+def decode_payload(payload: Dict[str, Any]) -> List[DOMElement]:
+    """把快照脚本返回的列式数据解码为 DOMElement 列表，字符串统一 intern。"""
+    strings: List[str] = [sys.intern(s) for s in payload["strings"]]
+    cols = payload["cols"]
+    rects = cols["rect"]
+    elements: List[DOMElement] = []
+    frame_cache: Dict[int, Tuple[str, ...]] = {}
+    for i, node_id in enumerate(cols["id"]):
+        flat = cols["attrs"][i]
+        attributes = {strings[flat[j]]: strings[flat[j + 1]] for j in range(0, len(flat), 2)}
+        frame_index = cols["frame"][i]
+        frame_path = frame_cache.get(frame_index)
+        if frame_path is None:
+            raw = strings[frame_index]
+            frame_path = frame_cache[frame_index] = tuple(raw.split(FRAME_SEPARATOR)) if raw else ()
+        parent = cols["parent"][i]
+        elements.append(DOMElement(
+            node_id=node_id,
+            tag=strings[cols["tag"][i]],
+            attributes=attributes,
+            rect=BoundingBox(rects[4 * i], rects[4 * i + 1], rects[4 * i + 2], rects[4 * i + 3]),
+            visible=bool(cols["visible"][i]),
+            text=strings[cols["text"][i]],
+            frame_path=frame_path,
+            parent_id=parent or None,
+        ))
+    return elements
+
+
+def decode_table(payload: Dict[str, Any]) -> ElementTable:
+    """把快照脚本返回的列式数据直接解码为 ElementTable，不构造逐节点对象。"""
+    strings: List[str] = payload["strings"]
+    cols = payload["cols"]
+    rects = cols["rect"]
+    table = ElementTable()
+    for i, node_id in enumerate(cols["id"]):
+        flat = cols["attrs"][i]
+        table.append(
+            node_id=node_id,
+            tag=strings[cols["tag"][i]],
+            attributes={strings[flat[j]]: strings[flat[j + 1]] for j in range(0, len(flat), 2)},
+            rect=rects[4 * i:4 * i + 4],
+            visible=bool(cols["visible"][i]),
+            text=strings[cols["text"][i]],
+            frame=strings[cols["frame"][i]],
+            parent_id=cols["parent"][i],
+        )
+    return table
+
+
+class DOMSnapshot:
+    """页面可交互元素的快照，支持按增量结果原地更新。"""
+
+    def __init__(self, elements: Iterable[DOMElement] = ()):
+        self.elements: Dict[int, DOMElement] = {}
+        self._children: Dict[int, Set[int]] = defaultdict(set)
+        self.update(elements)
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    def __iter__(self) -> Iterator[DOMElement]:
+        return iter(self.elements.values())
+
+    def build_index(self, visible_only: bool = False) -> ElementIndex:
+        """为当前快照构建 id / 标签 / 空间等二级索引。"""
+        return ElementIndex.from_elements(self.elements.values(), visible_only)
+
+    def get(self, node_id: int) -> Optional[DOMElement]:
+        return self.elements.get(node_id)
+
+    def children(self, node_id: int) -> List[DOMElement]:
+        return [self.elements[c] for c in self._children.get(node_id, ()) if c in self.elements]
+
+    def update(self, elements: Iterable[DOMElement]) -> None:
+        for element in elements:
+            old = self.elements.get(element.node_id)
+            if old is not None and old.parent_id != element.parent_id:
+                self._children[old.parent_id or 0].discard(element.node_id)
+            self.elements[element.node_id] = element
+            self._children[element.parent_id or 0].add(element.node_id)
+
+    def remove(self, node_ids: Sequence[int]) -> None:
+        for node_id in node_ids:
+            element = self.elements.pop(node_id, None)
+            if element is not None:
+                self._children[element.parent_id or 0].discard(node_id)
+            self._children.pop(node_id, None)
+
+
+class DOMParser:
+    """
+    通过单次 execute_script 抽取整页可交互元素树，替代逐个 find_element 的多次往返。
+
+    第一次 snapshot() 做全量抽取并在页面中安装 MutationObserver；之后 refresh() 只回传变更子树。
+    页面跳转后脚本状态丢失，refresh() 会自动退化为全量抽取。
+    """
+
+    def __init__(self, driver: WebDriver, attributes: Sequence[str] = DEFAULT_ATTRIBUTES, max_text: int = 200):
+        self.driver = driver
+        self.attributes = list(attributes)
+        self.max_text = max_text
+        self.current: Optional[DOMSnapshot] = None
+
+    def snapshot(self) -> DOMSnapshot:
+        """全量抽取。"""
+        payload = self._run(incremental=False)
+        self.current = DOMSnapshot(decode_payload(payload))
+        logger.debug("全量 DOM 快照: %d 个元素", len(self.current))
+        return self.current
+
+    def snapshot_table(self) -> ElementTable:
+        """全量抽取为列式 ElementTable，用于数万节点的大表格页面。"""
+        return decode_table(self._run(incremental=False))
+
+    def refresh(self) -> DOMSnapshot:
+        """增量更新当前快照；尚无快照或页面已跳转时做全量抽取。"""
+        if self.current is None:
+            return self.snapshot()
+        payload = self._run(incremental=True)
+        elements = decode_payload(payload)
+        if payload["full"]:
+            self.current = DOMSnapshot(elements)
+        else:
+            self.current.remove(payload["removed"])
+            self.current.update(elements)
+        logger.debug("增量 DOM 快照: 更新 %d, 删除 %d", len(elements), len(payload["removed"]))
+        return self.current
+
+    def _run(self, incremental: bool) -> Dict[str, Any]:
+        options = {
+            "incremental": incremental,
+            "attributes": self.attributes,
+            "maxText": self.max_text,
+            "sep": FRAME_SEPARATOR,
+        }
+        return self.driver.execute_script(_SNAPSHOT_JS, options)
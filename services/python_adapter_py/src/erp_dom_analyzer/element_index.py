@@ -0,0 +1,214 @@
+import heapq
+import math
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from erp_core.models.dom_element import ElementTable
+
+Rect = Tuple[float, float, float, float]  # x0, y0, x1, y1
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """标签文本归一化：去掉空白、全角冒号和星号（必填标记），统一小写。"""
+    if not text:
+        return ""
+    return "".join(text.split()).rstrip(":：").lstrip("*").lower()
+
+
+class RTree:
+    """
+    静态 R 树（STR 批量装载），用于按矩形/点/最近邻查询元素包围盒。
+
+    每层节点的包围盒存放在 array 中，节点 i 的孩子是下一层的 [start[i], end[i]) 区间，
+    叶子层的孩子是条目下标。构建 O(n log n)，查询 O(log n + k)。
+    """
+
+    def __init__(self, boxes: Sequence[Rect], node_size: int = 16):
+        self.node_size = node_size
+        self._boxes = list(boxes)
+        # 叶子条目（boxes 下标）按 STR 排序后的顺序
+        self._order = self._sort_tile(list(range(len(self._boxes))))
+        self._levels: List[Tuple[array, array, array, array, array, array]] = []
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def search(self, rect: Rect) -> List[int]:
+        """返回包围盒与 rect 相交的所有条目。"""
+        if not self._levels:
+            return []
+        qx0, qy0, qx1, qy1 = rect
+        result: List[int] = []
+        top = len(self._levels) - 1
+        stack = [(top, i) for i in range(len(self._levels[top][0]))]
+        while stack:
+            level, node = stack.pop()
+            x0, y0, x1, y1, start, end = self._levels[level]
+            if x0[node] > qx1 or x1[node] < qx0 or y0[node] > qy1 or y1[node] < qy0:
+                continue
+            if level == 0:
+                for pos in range(start[node], end[node]):
+                    item = self._order[pos]
+                    bx0, by0, bx1, by1 = self._boxes[item]
+                    if not (bx0 > qx1 or bx1 < qx0 or by0 > qy1 or by1 < qy0):
+                        result.append(item)
+            else:
+                stack.extend((level - 1, child) for child in range(start[node], end[node]))
+        return result
+
+    def at_point(self, x: float, y: float) -> List[int]:
+        return self.search((x, y, x, y))
+
+    def nearest(self, x: float, y: float, k: int = 1, max_distance: float = math.inf) -> List[int]:
+        """按到包围盒的距离返回最近的 k 个条目（best-first 搜索）。"""
+        if not self._levels:
+            return []
+        heap: List[Tuple[float, int, int, int]] = []  # (距离, 节点所在层号+1，0 表示条目, 节点/条目下标, 序号)
+        counter = 0
+        top = len(self._levels) - 1
+        x0, y0, x1, y1, _, _ = self._levels[top]
+        for node in range(len(x0)):
+            heapq.heappush(heap, (_distance(x, y, x0[node], y0[node], x1[node], y1[node]), top + 1, node, counter))
+            counter += 1
+        result: List[int] = []
+        while heap and len(result) < k:
+            dist, level, node, _ = heapq.heappop(heap)
+            if dist > max_distance:
+                break
+            if level == 0:
+                result.append(node)
+                continue
+            node_level = level - 1
+            start, end = self._levels[node_level][4], self._levels[node_level][5]
+            if node_level == 0:
+                for pos in range(start[node], end[node]):
+                    item = self._order[pos]
+                    bx0, by0, bx1, by1 = self._boxes[item]
+                    heapq.heappush(heap, (_distance(x, y, bx0, by0, bx1, by1), 0, item, counter))
+                    counter += 1
+            else:
+                cx0, cy0, cx1, cy1, _, _ = self._levels[node_level - 1]
+                for child in range(start[node], end[node]):
+                    heapq.heappush(heap, (_distance(x, y, cx0[child], cy0[child], cx1[child], cy1[child]),
+                                          node_level, child, counter))
+                    counter += 1
+        return result
+
+    # ---------------- 内部实现 ----------------
+
+    def _sort_tile(self, items: List[int]) -> List[int]:
+        if not items:
+            return []
+        boxes = self._boxes
+        leaf_count = math.ceil(len(items) / self.node_size)
+        slab_count = math.ceil(math.sqrt(leaf_count))
+        slab_size = slab_count * self.node_size
+        items.sort(key=lambda i: boxes[i][0] + boxes[i][2])
+        ordered: List[int] = []
+        for start in range(0, len(items), slab_size):
+            slab = items[start:start + slab_size]
+            slab.sort(key=lambda i: boxes[i][1] + boxes[i][3])
+            ordered.extend(slab)
+        return ordered
+
+    def _build(self) -> None:
+        # 叶子层：按顺序每 node_size 个条目一个节点
+        count = len(self._order)
+        if count == 0:
+            return
+        boxes = [self._boxes[i] for i in self._order]
+        while True:
+            x0, y0, x1, y1 = array("d"), array("d"), array("d"), array("d")
+            start, end = array("I"), array("I")
+            for s in range(0, count, self.node_size):
+                e = min(s + self.node_size, count)
+                chunk = boxes[s:e]
+                x0.append(min(b[0] for b in chunk))
+                y0.append(min(b[1] for b in chunk))
+                x1.append(max(b[2] for b in chunk))
+                y1.append(max(b[3] for b in chunk))
+                start.append(s)
+                end.append(e)
+            self._levels.append((x0, y0, x1, y1, start, end))
+            count = len(x0)
+            if count == 1:
+                return
+            # 上一层节点按已有顺序继续打包（STR 排序已保证相邻节点空间接近）
+            boxes = list(zip(x0, y0, x1, y1))
+
+
+def _distance(x: float, y: float, x0: float, y0: float, x1: float, y1: float) -> float:
+    dx = x0 - x if x < x0 else (x - x1 if x > x1 else 0.0)
+    dy = y0 - y if y < y0 else (y - y1 if y > y1 else 0.0)
+    return math.hypot(dx, dy)
+
+
+class ElementIndex:
+    """
+    ElementTable 上的二级索引：按 id / name / role / 标签文本 / 文本的哈希索引，
+    以及包围盒的 R 树空间索引。所有查询返回行号，需要对象时再用 table.element(row) 构造。
+    """
+
+    def __init__(self, table: ElementTable, visible_only: bool = False):
+        self.table = table
+        self.by_id: Dict[str, List[int]] = defaultdict(list)
+        self.by_name: Dict[str, List[int]] = defaultdict(list)
+        self.by_role: Dict[str, List[int]] = defaultdict(list)
+        self.by_label: Dict[str, List[int]] = defaultdict(list)
+        self.by_text: Dict[str, List[int]] = defaultdict(list)
+        self.by_tag: Dict[str, List[int]] = defaultdict(list)
+
+        rows: List[int] = []
+        boxes: List[Rect] = []
+        for row in range(len(table)):
+            if visible_only and not table.visible[row]:
+                continue
+            attrs = table.attributes(row)
+            for key, bucket in (("id", self.by_id), ("name", self.by_name), ("role", self.by_role)):
+                value = attrs.get(key)
+                if value:
+                    bucket[value].append(row)
+            label = normalize_text(attrs.get("__label"))
+            if label:
+                self.by_label[label].append(row)
+            text = normalize_text(table.text(row))
+            if text:
+                self.by_text[text].append(row)
+            self.by_tag[table.tag(row)].append(row)
+            x, y, w, h = table.rect(row)
+            if w > 0 and h > 0:
+                rows.append(row)
+                boxes.append((x, y, x + w, y + h))
+        # R 树条目是 boxes 的下标，查询结果再经 _spatial_rows 映射回行号
+        self._spatial_rows = rows
+        self.spatial = RTree(boxes)
+
+    @classmethod
+    def from_elements(cls, elements: Iterable, visible_only: bool = False) -> "ElementIndex":
+        return cls(ElementTable.from_elements(elements), visible_only)
+
+    def find_by_id(self, value: str) -> List[int]:
+        return self.by_id.get(value, [])
+
+    def find_by_name(self, value: str) -> List[int]:
+        return self.by_name.get(value, [])
+
+    def find_by_role(self, value: str) -> List[int]:
+        return self.by_role.get(value, [])
+
+    def find_by_label(self, text: str) -> List[int]:
+        return self.by_label.get(normalize_text(text), [])
+
+    def find_by_text(self, text: str) -> List[int]:
+        return self.by_text.get(normalize_text(text), [])
+
+    def in_rect(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        return [self._spatial_rows[i] for i in self.spatial.search((x0, y0, x1, y1))]
+
+    def at_point(self, x: float, y: float) -> List[int]:
+        return [self._spatial_rows[i] for i in self.spatial.at_point(x, y)]
+
+    def nearest(self, x: float, y: float, k: int = 1, max_distance: float = math.inf) -> List[int]:
+        return [self._spatial_rows[i] for i in self.spatial.nearest(x, y, k, max_distance)]
@@ -0,0 +1,27 @@
+# 子模块依赖 selenium，按需导入：import erp_ui_adapter 本身不加载浏览器驱动相关代码
+from erp_core.lazy import lazy_exports
+
+_EXPORTS = {
+    "BaseErpAdapter": "adapters.base_adapter",
+    "KingdeeAdapter": "adapters.kingdee_adapter",
+    "YonbipAdapter": "adapters.yonbip_adapter",
+    "MacroLibrary": "operations.macro",
+    "GridExporter": "operations.export",
+    "export_grid": "operations.export",
+    "fill_form": "operations.form",
+    "submit_form": "operations.form",
+    "click_text": "operations.navigation",
+    "open_menu": "operations.navigation",
+    "wait_engine": "operations.navigation",
+    "wait_for_ready": "operations.navigation",
+    "BulkEntry": "operations.table",
+    "GridSpec": "operations.table",
+    "FrameContext": "utils.driver_utils",
+    "SessionPool": "utils.driver_utils",
+    "close_all_pools": "utils.driver_utils",
+    "frame_context": "utils.driver_utils",
+    "get_session_pool": "utils.driver_utils",
+}
+
+__all__ = sorted(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,178 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Mapping, Optional, Sequence
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from erp_core.config import ServerConfig
+from erp_core.exceptions import ErpLoginError
+from erp_core.logging import traced
+from erp_ui_adapter.operations.export import ExportReport, GridExporter
+from erp_ui_adapter.operations.form import check_form_errors, fill_form, submit_form
+from erp_ui_adapter.operations.macro import MacroLibrary
+from erp_ui_adapter.operations.navigation import click_text, open_menu, wait_engine, wait_for_ready
+from erp_ui_adapter.operations.table import BulkEntry, BulkReport, GridSpec, Row
+from erp_ui_adapter.utils.driver_utils import SessionPool, frame_context, get_session_pool, xpath_literal
+
+if TYPE_CHECKING:
+    from erp_ai_core.fusion_locator import FusionLocator
+
+
+class BaseErpAdapter(ABC):
+    """
+    ERP 适配器基类。
+
+    适配器不自己创建浏览器，而是从所在服务器的共享会话池中借用已登录的会话。
+    子类只需声明登录页的选择器。
+    """
+
+    erp_type: str = ""
+
+    # 登录页选择器 (CSS)，由子类覆盖
+    USERNAME_INPUT: str = ""
+    PASSWORD_INPUT: str = ""
+    LOGIN_BUTTON: str = ""
+    # 登录成功后才会出现的元素，用于确认登录完成
+    HOME_MARKER: str = ""
+
+    # 单据/资料界面通用元素
+    NEW_BUTTON_TEXT: str = "新增"
+    SAVE_BUTTON_TEXT: str = "保存"
+    SEARCH_INPUT: str = "input[placeholder*='搜索'], input[placeholder*='查询']"
+    # 列表/分录表格结构，用于批量录入
+    GRID: Optional[GridSpec] = None
+
+    LOGIN_TIMEOUT: float = 30.0
+    ACTION_TIMEOUT: float = 20.0
+
+    # 录制 - 回放快速路径：重复的菜单导航和新增流程录制成宏后直接回放
+    RECORD_MACROS: bool = True
+    # 匹配页面自动生成、每次渲染都会变的 id，录制定位时不使用这类 id
+    VOLATILE_ID_PATTERN: Optional[str] = r"\d{4,}"
+    # 标签定位找不到字段时改用融合定位器（按页面指纹持久化缓存定位结果）
+    FUSION_LOCATOR: bool = True
+
+    def __init__(self, server_name: str, pool: Optional[SessionPool] = None):
+        self.server_name = server_name
+        self.pool = pool or get_session_pool(server_name, self.login)
+        self.macros = MacroLibrary(self.VOLATILE_ID_PATTERN, self.ACTION_TIMEOUT)
+        self._locator: Optional["FusionLocator"] = None
+
+    @property
+    def locator(self) -> Optional["FusionLocator"]:
+        """融合定位器，第一次使用时创建，定位缓存按 ERP 产品区分。"""
+        if not self.FUSION_LOCATOR:
+            return None
+        if self._locator is None:
+            from erp_ai_core.fusion_locator import FusionLocator
+            self._locator = FusionLocator(self.erp_type)
+        return self._locator
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None) -> Iterator[WebDriver]:
+        """从会话池借用一个已登录的浏览器。"""
+        with self.pool.session(timeout) as driver:
+            yield driver
+
+    @traced("adapter.login", "adapter")
+    def login(self, driver: WebDriver, server: ServerConfig) -> None:
+        """在新浏览器中打开登录页并完成登录，由会话池在创建会话时调用。"""
+        wait_engine.install(driver)
+        driver.get(server.url)
+        frame_context(driver).forget()
+        wait = WebDriverWait(driver, self.LOGIN_TIMEOUT)
+        try:
+            wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, self.USERNAME_INPUT))).send_keys(server.username)
+            driver.find_element(By.CSS_SELECTOR, self.PASSWORD_INPUT).send_keys(server.password)
+            driver.find_element(By.CSS_SELECTOR, self.LOGIN_BUTTON).click()
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, self.HOME_MARKER)))
+        except TimeoutException as e:
+            raise ErpLoginError(f"{self.erp_type} 登录 {server.url} 超时") from e
+        self.after_login(driver)
+
+    @abstractmethod
+    def after_login(self, driver: WebDriver) -> None:
+        """登录后的产品特定处理（关闭公告弹窗、选择组织等）。"""
+
+    def _run_macro(self, driver: WebDriver, key: tuple, params: Mapping[str, Any], full: Callable[[], None],
+                   verify: Optional[Callable[[], None]] = None) -> None:
+        if self.RECORD_MACROS:
+            self.macros.run(driver, (self.erp_type, self.server_name, *key), params, full, verify)
+        else:
+            full()
+
+    def open_menu(self, driver: WebDriver, menu: Sequence[str]) -> None:
+        """按菜单路径导航，重复的路径走录制的宏。"""
+        self._run_macro(driver, ("menu", tuple(menu)), {},
+                        lambda: open_menu(driver, menu, self.ACTION_TIMEOUT))
+
+    @traced("adapter.create_record", "adapter")
+    def create_record(self, driver: WebDriver, menu: Sequence[str], fields: Mapping[str, Any]) -> None:
+        """
+        打开菜单，新增一条记录，填写字段并保存；保存后出现字段校验错误时抛出 FormValidationError。
+        同一菜单、同一组字段第一次成功后录制成宏，之后的记录回放宏，检查点不符时回退本流程。
+        """
+        def full() -> None:
+            open_menu(driver, menu, self.ACTION_TIMEOUT)
+            click_text(driver, self.NEW_BUTTON_TEXT, self.ACTION_TIMEOUT)
+            submit_form(driver, fields, self.SAVE_BUTTON_TEXT, self.ACTION_TIMEOUT, locator=self.locator)
+
+        self._run_macro(driver, ("create", tuple(menu), tuple(fields)), fields, full,
+                        lambda: check_form_errors(driver))
+
+    @traced("adapter.update_record", "adapter")
+    def update_record(self, driver: WebDriver, menu: Sequence[str], key: str, fields: Mapping[str, Any]) -> None:
+        """打开菜单，按业务主键搜索并打开记录，修改字段并保存。"""
+        self.open_menu(driver, menu)
+        self.open_record(driver, key)
+        fill_form(driver, fields, self.ACTION_TIMEOUT, self.locator)
+        click_text(driver, self.SAVE_BUTTON_TEXT, self.ACTION_TIMEOUT)
+
+    @traced("adapter.open_record", "adapter")
+    def open_record(self, driver: WebDriver, key: str) -> None:
+        """在列表界面按主键搜索，双击结果行打开记录。"""
+        self._search(driver, key)
+        cell = frame_context(driver).wait_for(By.XPATH, f"//td[normalize-space(.)={xpath_literal(key)}]",
+                                              self.ACTION_TIMEOUT)
+        ActionChains(driver).double_click(cell).perform()
+        wait_for_ready(driver, self.ACTION_TIMEOUT)
+
+    @traced("adapter.record_exists", "adapter")
+    def record_exists(self, driver: WebDriver, menu: Sequence[str], key: str) -> bool:
+        """打开菜单并按主键搜索，判断记录是否已存在。用于确认中断的写入是否已生效。"""
+        self.open_menu(driver, menu)
+        self._search(driver, key)
+        # 搜索框所在 frame 就是结果列表所在 frame，只在其中查找
+        with frame_context(driver).batch() as frames:
+            return frames.find(By.XPATH, f"//td[normalize-space(.)={xpath_literal(key)}]", clickable=True) is not None
+
+    def _search(self, driver: WebDriver, key: str) -> None:
+        search = frame_context(driver).wait_for(By.CSS_SELECTOR, self.SEARCH_INPUT, self.ACTION_TIMEOUT)
+        search.clear()
+        search.send_keys(key, Keys.ENTER)
+        wait_for_ready(driver, self.ACTION_TIMEOUT)
+
+    @traced("adapter.bulk_create", "adapter")
+    def bulk_create(self, driver: WebDriver, menu: Sequence[str], rows: Sequence[Row],
+                    batch_size: int = 200) -> BulkReport:
+        """
+        批量新增分录并保存单据：表格支持粘贴或导入时按批录入，校验失败的行在同一表格中逐格重录，
+        仍失败的行清空后不随单据提交。报告中的行只有在单据保存成功后才算成功。
+        """
+        self.open_menu(driver, menu)
+        spec = self.GRID or GridSpec(root="table", save_button_text=self.SAVE_BUTTON_TEXT)
+        return BulkEntry(driver, spec, batch_size, timeout=self.ACTION_TIMEOUT).fill(rows)
+
+    @traced("adapter.export_report", "adapter")
+    def export_report(self, driver: WebDriver, menu: Sequence[str], path: str,
+                      fmt: Optional[str] = None) -> ExportReport:
+        """打开报表菜单，从第一页起逐页导出表格到 path（Parquet 或 CSV，见 GridExporter）。"""
+        self.open_menu(driver, menu)
+        spec = self.GRID or GridSpec(root="table")
+        return GridExporter(driver, spec, self.ACTION_TIMEOUT).export(path, fmt)
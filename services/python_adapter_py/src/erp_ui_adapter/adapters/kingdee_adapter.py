@@ -0,0 +1,34 @@
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from erp_ui_adapter.adapters.base_adapter import BaseErpAdapter
+from erp_ui_adapter.operations.table import GridSpec
+
+
+class KingdeeAdapter(BaseErpAdapter):
+    """金蝶云星空适配器。"""
+
+    erp_type = "kingdee"
+
+    USERNAME_INPUT = "#user"
+    PASSWORD_INPUT = "#password"
+    LOGIN_BUTTON = "#btnLogin"
+    HOME_MARKER = ".kd-mainframe, #mainPage"
+
+    GRID = GridSpec(
+        root=".kd-grid, .k-grid",
+        header_cell=".kd-grid-header td, thead th",
+        body_row=".kd-grid-body tr, tbody tr",
+        row_error=".kd-grid-error, .error, [aria-invalid='true']",
+        import_button_text="引入",
+        import_confirm_text="引入",
+        import_result=".kd-import-result, .k-dialog-content",
+        next_page=".kd-pager-next, .k-pager-next",
+        save_error=".kd-save-error, .k-message-error",
+    )
+
+    def after_login(self, driver: WebDriver) -> None:
+        # 登录后可能弹出系统公告，关闭它以免遮挡菜单
+        for button in driver.find_elements(By.CSS_SELECTOR, ".kd-notice .close, .k-dialog-close"):
+            if button.is_displayed():
+                button.click()
@@ -0,0 +1,35 @@
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from erp_ui_adapter.adapters.base_adapter import BaseErpAdapter
+from erp_ui_adapter.operations.table import GridSpec
+
+
+class YonbipAdapter(BaseErpAdapter):
+    """用友 YonBIP 适配器。"""
+
+    erp_type = "yonbip"
+
+    USERNAME_INPUT = "#username"
+    PASSWORD_INPUT = "#password"
+    LOGIN_BUTTON = "#submit_btn_login, button[type=submit]"
+    HOME_MARKER = "#workbench, .yonbip-workbench"
+    # React 组件库自动生成的 rc- / rc_ 前缀 id 每次渲染都会变，录制宏时不能用作定位
+    VOLATILE_ID_PATTERN = r"^rc[-_]|\d{4,}"
+
+    GRID = GridSpec(
+        root=".wui-table, .u-table",
+        header_cell=".wui-table-thead th, thead th",
+        body_row=".wui-table-tbody tr, tbody tr",
+        row_error=".wui-table-cell-error, .error, [aria-invalid='true']",
+        import_button_text="导入",
+        import_result=".wui-modal-body",
+        next_page=".wui-pagination-next, .u-pagination-next",
+        save_error=".wui-message-error, .u-message-error",
+    )
+
+    def after_login(self, driver: WebDriver) -> None:
+        # 首次登录的引导遮罩会拦截点击
+        for mask in driver.find_elements(By.CSS_SELECTOR, ".guide-mask .skip, .wui-modal-close"):
+            if mask.is_displayed():
+                mask.click()
@@ -0,0 +1,252 @@
+import csv
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support.ui import WebDriverWait
+
+from erp_core.logging import get_logger, span
+from erp_ui_adapter.operations.navigation import wait_for_ready
+from erp_ui_adapter.operations.table import GridSpec
+from erp_ui_adapter.utils.driver_utils import frame_context
+
+logger = get_logger(__name__)
+
+# 一次调用读出当前页：按列返回单元格文本（输入框取 value），跳过空行（可编辑表格末尾的空白行）。
+# signature 由行数和首尾行内容组成，翻页后用来确认表格已换成下一页的数据。
+_READ_PAGE_JS = r"""
+const spec = arguments[0];
+const root = document.querySelector(spec.root);
+if (!root) return null;
+const headers = Array.from(root.querySelectorAll(spec.header_cell)).map(h => h.innerText.trim());
+const columns = headers.map(() => []);
+const text = cell => {
+    if (!cell) return '';
+    const input = cell.querySelector('input, textarea, select');
+    return (input ? input.value : cell.innerText).trim();
+};
+let first = '', last = '', count = 0;
+for (const row of root.querySelectorAll(spec.body_row)) {
+    const cells = row.querySelectorAll(spec.cell);
+    if (!cells.length) continue;
+    const values = headers.map((_, c) => text(cells[c]));
+    if (values.every(v => !v)) continue;
+    values.forEach((v, c) => columns[c].push(v));
+    const joined = values.join('\t');
+    if (!count) first = joined;
+    last = joined;
+    count++;
+}
+return {headers: headers, columns: columns, rows: count, signature: count + '\n' + first + '\n' + last};
+"""
+
+# 点击分页器的“下一页”；按钮不存在或已禁用（最后一页）时返回 false
+_NEXT_PAGE_JS = r"""
+const button = document.querySelector(arguments[0].next_page);
+if (!button) return false;
+const disabled = button.disabled || button.getAttribute('aria-disabled') === 'true'
+    || /(^|[\s-])disabled(\s|$)/.test(button.className);
+if (disabled) return false;
+button.click();
+return true;
+"""
+
+FORMATS = ("parquet", "csv")
+
+
+@dataclass
+class ExportReport:
+    """表格导出结果。"""
+    path: str
+    format: str
+    columns: List[str] = field(default_factory=list)
+    rows: int = 0
+    pages: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float = 0.0
+
+    @property
+    def rows_per_minute(self) -> float:
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.rows * 60.0 / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.format}: {self.pages} 页 {self.rows} 行 {len(self.columns)} 列 -> {self.path}, "
+                f"{self.rows_per_minute:.0f} 行/分钟")
+
+
+class _CsvSink:
+    """逐页追加写 UTF-8 BOM 的 CSV（Excel 直接打开不乱码），与导入文件的编码一致。"""
+
+    def __init__(self, path: Path, columns: Sequence[str]):
+        self._file = open(path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, columns: Sequence[Sequence[str]], rows: int) -> None:
+        self._writer.writerows(zip(*columns))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ParquetSink:
+    """
+    每页转成一个 Arrow RecordBatch，攒够 row_group_rows 行写成一个 Parquet 行组。
+    内存中最多保留一个行组的数据；所有列按字符串存储，类型转换留给下游。
+    """
+
+    def __init__(self, path: Path, columns: Sequence[str], row_group_rows: int, compression: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([(name, pa.string()) for name in columns])
+        self._writer = pq.ParquetWriter(str(path), self._schema, compression=compression)
+        self._row_group_rows = row_group_rows
+        self._batches: List[Any] = []
+        self._buffered = 0
+
+    def write(self, columns: Sequence[Sequence[str]], rows: int) -> None:
+        pa = self._pa
+        arrays = [pa.array(values, type=pa.string()) for values in columns]
+        self._batches.append(pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+        self._buffered += rows
+        if self._buffered >= self._row_group_rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._batches:
+            self._writer.write_table(self._pa.Table.from_batches(self._batches, schema=self._schema),
+                                     row_group_size=self._buffered)
+            self._batches, self._buffered = [], 0
+
+    def close(self) -> None:
+        try:
+            self._flush()
+        finally:
+            self._writer.close()
+
+
+def _has_pyarrow() -> bool:
+    # pyarrow 可选（pip install .[export]），没有安装时导出为 CSV
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def resolve_format(path: Union[str, Path], fmt: Optional[str] = None) -> Tuple[str, Path]:
+    """确定输出格式和路径：fmt 默认按扩展名判断；要求 Parquet 但未安装 pyarrow 时改写同名 .csv。"""
+    path = Path(path)
+    fmt = (fmt or ("parquet" if path.suffix.lower() == ".parquet" else "csv")).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式 {fmt}，可选: {', '.join(FORMATS)}")
+    if fmt == "parquet" and not _has_pyarrow():
+        logger.warning("未安装 pyarrow，%s 改为导出 CSV", path)
+        fmt, path = "csv", path.with_suffix(".csv")
+    return fmt, path
+
+
+def unique_columns(headers: Sequence[str]) -> List[str]:
+    """表头去重、补全：空表头记为“列N”，重名的依次加 _2、_3 后缀。"""
+    names: List[str] = []
+    seen: Dict[str, int] = {}
+    for i, header in enumerate(headers):
+        name = header or f"列{i + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        seen.setdefault(name, 1)
+        names.append(name)
+    return names
+
+
+class GridExporter:
+    """
+    流式导出分页报表表格。
+
+    每页只用一次脚本调用按列读出全部单元格，交给后台线程编码写入（Parquet 或 CSV）；
+    编码的同时浏览器已经在加载下一页。后台同一时间只编码一页，读取端等它写完才提交下一页，
+    所以内存中最多有两页数据加一个未写出的 Parquet 行组，与报表总行数无关。
+    """
+
+    def __init__(self, driver: WebDriver, spec: GridSpec, timeout: float = 30.0,
+                 row_group_rows: int = 50_000, compression: str = "zstd"):
+        self.driver = driver
+        self.spec = spec
+        self.timeout = timeout
+        self.row_group_rows = row_group_rows
+        self.compression = compression
+
+    def export(self, path: Union[str, Path], fmt: Optional[str] = None,
+               max_pages: Optional[int] = None) -> ExportReport:
+        """从当前页开始逐页导出到 path，直到最后一页（或 max_pages 页）。返回导出报告。"""
+        fmt, path = resolve_format(path, fmt)
+        report = ExportReport(str(path), fmt)
+        # 表格可能在 iframe 中：先切到表格所在 frame，之后的脚本都在这个 frame 内执行
+        frame_context(self.driver).wait_for(By.CSS_SELECTOR, self.spec.root, self.timeout, clickable=False)
+        page = self._read_page()
+        report.columns = unique_columns(page["headers"])
+        width = len(report.columns)
+        logger.info("导出表格到 %s (%s)，%d 列", report.path, report.format, width)
+
+        with span("table.export", "adapter", format=report.format, columns=width) as s:
+            sink = self._open_sink(path, fmt, report.columns)
+            try:
+                with ThreadPoolExecutor(1, thread_name_prefix="grid-export") as encoder:
+                    pending: Optional[Future] = None
+                    while page is not None:
+                        if len(page["headers"]) != width:
+                            raise ValueError(f"第 {report.pages + 1} 页列数 {len(page['headers'])} 与首页 {width} 不一致")
+                        if pending is not None:
+                            pending.result()
+                        pending = encoder.submit(sink.write, page["columns"], page["rows"])
+                        report.pages += 1
+                        report.rows += page["rows"]
+                        if max_pages is not None and report.pages >= max_pages:
+                            break
+                        page = self._next_page(page["signature"])
+                    if pending is not None:
+                        pending.result()
+            finally:
+                sink.close()
+            s.set("rows", report.rows)
+            s.set("pages", report.pages)
+
+        report.finished_at = time.monotonic()
+        logger.info("导出完成 - %s", report.summary())
+        return report
+
+    def _open_sink(self, path: Path, fmt: str, columns: Sequence[str]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == "parquet":
+            return _ParquetSink(path, columns, self.row_group_rows, self.compression)
+        return _CsvSink(path, columns)
+
+    def _read_page(self) -> Optional[Dict[str, Any]]:
+        return self.driver.execute_script(_READ_PAGE_JS, self.spec.__dict__)
+
+    def _next_page(self, signature: str) -> Optional[Dict[str, Any]]:
+        """翻到下一页并返回其内容；没有分页器或已是最后一页时返回 None。"""
+        if not self.spec.next_page or not self.driver.execute_script(_NEXT_PAGE_JS, self.spec.__dict__):
+            return None
+        wait_for_ready(self.driver, self.timeout)
+
+        def loaded(_):
+            page = self._read_page()
+            return page if page is not None and page["signature"] != signature else None
+
+        return WebDriverWait(self.driver, self.timeout, ignored_exceptions=(StaleElementReferenceException,)).until(
+            loaded, f"{self.timeout:.0f}s 内表格未翻到下一页")
+
+
+def export_grid(driver: WebDriver, spec: GridSpec, path: Union[str, Path], fmt: Optional[str] = None,
+                timeout: float = 30.0, max_pages: Optional[int] = None) -> ExportReport:
+    return GridExporter(driver, spec, timeout).export(path, fmt, max_pages)
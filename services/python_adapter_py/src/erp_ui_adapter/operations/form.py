@@ -0,0 +1,99 @@
+from typing import TYPE_CHECKING, Any, List, Mapping, Optional
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+from erp_core.exceptions import FormValidationError
+from erp_ui_adapter.operations.navigation import click_text
+from erp_ui_adapter.operations.recording import current_recorder
+from erp_ui_adapter.utils.driver_utils import FrameContext, frame_context, xpath_literal
+
+if TYPE_CHECKING:
+    from erp_ai_core.fusion_locator import FusionLocator
+
+DEFAULT_TIMEOUT = 20.0
+
+# 金蝶 / YonBIP 表单字段校验提示的常见样式
+FIELD_ERROR_SELECTOR = ".kd-error-tip, .error-tip, .wui-form-item-explain-error, .u-form-error, .validate-error"
+
+_VISIBLE_ERRORS_JS = """
+return Array.from(document.querySelectorAll(arguments[0]))
+    .filter(el => el.offsetParent !== null && el.innerText.trim())
+    .map(el => el.innerText.trim());
+"""
+
+
+def find_field(driver: WebDriver, label: str, timeout: float = DEFAULT_TIMEOUT,
+               locator: Optional["FusionLocator"] = None) -> WebElement:
+    """
+    按表单标签文本定位其后的第一个输入控件。表单可以嵌在多层 iframe 中：
+    定位结果和所在 frame 由 FrameContext 缓存，同一表单的后续字段不再重复切换 frame。
+
+    传入 locator 时，标签后找不到输入控件（金蝶表单的标签常在单独的表头或 placeholder 里）
+    立即改用 FusionLocator 按字段语义定位，其结果按页面持久化缓存；都找不到时再等待标签出现。
+    """
+    literal = xpath_literal(label)
+    xpath = (
+        f"//*[self::label or self::span or self::div][normalize-space(text())={literal}]"
+        f"/following::*[self::input or self::textarea or self::select][not(@type='hidden')][1]"
+    )
+    frames = frame_context(driver)
+    if locator is not None:
+        element = frames.find(By.XPATH, xpath) or _fusion_find(driver, frames, locator, label)
+        if element is not None:
+            return element
+    return frames.wait_for(By.XPATH, xpath, timeout)
+
+
+def _fusion_find(driver: WebDriver, frames: FrameContext, locator: "FusionLocator",
+                 label: str) -> Optional[WebElement]:
+    # 融合定位器的指纹和校验脚本从顶层文档出发，结果中的 frame 路径与 FrameContext 相同
+    frames.switch(())
+    found = locator.locate(driver, label)
+    if found is None or any(not step.startswith("iframe:") for step in found.frame_path):
+        return None  # shadow root 内的元素无法切换 frame 后直接查找，交给标签定位
+    frames.switch(found.frame_path)
+    return frames.find(By.CSS_SELECTOR if found.by == "css" else By.XPATH, found.value)
+
+
+def set_field_value(element: WebElement, value: Any) -> None:
+    """清空并输入字段值（None 表示清空字段），Tab 离开以触发 ERP 的字段校验和联动。"""
+    element.send_keys(Keys.CONTROL, "a")
+    element.send_keys(Keys.DELETE)
+    if value is not None:
+        element.send_keys(str(value))
+    element.send_keys(Keys.TAB)
+
+
+def fill_form(driver: WebDriver, fields: Mapping[str, Any], timeout: float = DEFAULT_TIMEOUT,
+              locator: Optional["FusionLocator"] = None) -> None:
+    """逐字段填写表单，fields 为 标签 -> 值。locator 见 find_field。"""
+    recorder = current_recorder()
+    for label, value in fields.items():
+        element = find_field(driver, label, timeout, locator)
+        if recorder is not None:
+            recorder.fill(driver, element, label)
+        set_field_value(element, value)
+
+
+def form_errors(driver: WebDriver, selector: str = FIELD_ERROR_SELECTOR) -> List[str]:
+    """一次脚本调用读取当前 frame（即刚填写的表单所在 frame）中所有可见的字段校验错误文本。"""
+    return driver.execute_script(_VISIBLE_ERRORS_JS, selector) or []
+
+
+def check_form_errors(driver: WebDriver, selector: str = FIELD_ERROR_SELECTOR) -> None:
+    """保存后检查当前 frame 中的字段校验错误，有则抛出 FormValidationError。"""
+    errors = form_errors(driver, selector)
+    if errors:
+        raise FormValidationError("; ".join(errors))
+
+
+def submit_form(driver: WebDriver, fields: Mapping[str, Any], save_text: str = "保存",
+                timeout: float = DEFAULT_TIMEOUT, error_selector: str = FIELD_ERROR_SELECTOR,
+                locator: Optional["FusionLocator"] = None) -> None:
+    """填写并保存表单，保存后出现校验错误时抛出 FormValidationError。"""
+    fill_form(driver, fields, timeout, locator)
+    click_text(driver, save_text, timeout)
+    check_form_errors(driver, error_selector)
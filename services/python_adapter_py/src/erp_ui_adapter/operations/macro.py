@@ -0,0 +1,174 @@
+import dataclasses
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from erp_core.exceptions import MacroCheckpointError
+from erp_core.logging import get_logger, span
+from erp_ui_adapter.operations.form import set_field_value
+from erp_ui_adapter.operations.navigation import DEFAULT_TIMEOUT, wait_for_ready
+from erp_ui_adapter.operations.recording import Macro, MacroRecorder, MacroStep, current_recorder, recording
+from erp_ui_adapter.utils.driver_utils import frame_context
+
+logger = get_logger(__name__)
+
+# 检查点：一次调用按录制的 CSS 解析一段内的全部元素，并核对标签、name、可见文本和可见性。
+# 返回元素列表；某一步不符时返回 {failed: 下标, reason: 原因}。
+_RESOLVE_JS = r"""
+const steps = arguments[0];
+const elements = [];
+for (let i = 0; i < steps.length; i++) {
+    const s = steps[i];
+    const el = document.querySelector(s.css);
+    if (!el) return {failed: i, reason: '元素不存在'};
+    const r = el.getBoundingClientRect();
+    if (r.width === 0 || r.height === 0 || el.disabled) return {failed: i, reason: '元素不可见或不可用'};
+    if (el.tagName.toLowerCase() !== s.tag || (el.getAttribute('name') || '') !== s.name) {
+        return {failed: i, reason: '元素类型不符'};
+    }
+    if (s.action === 'click' && (el.innerText || '').replace(/\s+/g, ' ').trim().slice(0, 200) !== s.text) {
+        return {failed: i, reason: '文本不符'};
+    }
+    elements.push(el);
+}
+return elements;
+"""
+
+
+@dataclass
+class MacroStats:
+    recorded: int = 0      # 录制成功的宏数
+    replayed: int = 0      # 回放成功次数
+    fallbacks: int = 0     # 检查点不符后回退完整流程的次数
+    steps_replayed: int = 0
+
+
+class MacroLibrary:
+    """
+    录制 - 回放快速路径。
+
+    同一菜单、同一组字段的流程第一次走完整路径（按标签文本逐个定位、等待可点击）时被录制成宏：
+    解析出的 CSS 定位、点击后的就绪等待和操作顺序，字段值按字段名参数化。
+    之后的记录直接回放宏：每段页面只用一次脚本调用解析并核对全部元素，不再逐个搜索和轮询；
+    检查点不符时丢弃该宏，回退完整流程并重新录制。
+    """
+
+    def __init__(self, volatile_id: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT):
+        self.volatile_id = volatile_id
+        self.timeout = timeout
+        self._macros: Dict[Hashable, Macro] = {}
+        self._lock = threading.Lock()
+        self._stats = MacroStats()
+
+    @property
+    def stats(self) -> MacroStats:
+        with self._lock:
+            return dataclasses.replace(self._stats)
+
+    def get(self, key: Hashable) -> Optional[Macro]:
+        with self._lock:
+            return self._macros.get(key)
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._macros.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._macros.clear()
+
+    def run(self, driver: WebDriver, key: Hashable, params: Mapping[str, Any], full: Callable[[], None],
+            verify: Optional[Callable[[], None]] = None) -> None:
+        """
+        有宏时回放，否则（或检查点不符时）执行 full 并把它录制成宏。已在录制中时直接执行 full。
+        verify 在回放成功后调用，做 full 自身在结尾做的检查（如保存后的表单校验错误）。
+        """
+        if current_recorder() is not None:
+            full()
+            return
+        macro = self.get(key)
+        if macro is not None:
+            try:
+                self.replay(driver, macro, params)
+                if verify is not None:
+                    verify()
+                return
+            except MacroCheckpointError as e:
+                logger.info("宏 %s 检查点不符，回退完整流程并重新录制: %s", _describe_key(key), e)
+                self.discard(key)
+                with self._lock:
+                    self._stats.fallbacks += 1
+
+        recorder = MacroRecorder(self.volatile_id)
+        with recording(recorder):
+            full()
+        macro = recorder.finish(key)
+        if macro is not None and all(s.param in params for s in macro.steps if s.action == "fill"):
+            with self._lock:
+                self._macros[key] = macro
+                self._stats.recorded += 1
+            logger.debug("录制宏 %s: %d 步", _describe_key(key), len(macro.steps))
+
+    def replay(self, driver: WebDriver, macro: Macro, params: Mapping[str, Any]) -> None:
+        """
+        按段回放。检查点在每段开始时核对，失败时抛出 MacroCheckpointError。
+        保存按钮在最后一段，检查点失败时保存尚未点击；但之前的段可能已经打开了新单据、填了部分字段，
+        这时先刷新页面丢弃未保存的半张表单，再交给调用方回退完整流程。
+        """
+        segments = macro.segments()
+        frames = frame_context(driver)
+        performed = False
+        with span("macro.replay", "adapter", steps=len(macro.steps), segments=len(segments)):
+            try:
+                for number, segment in enumerate(segments):
+                    # 同一段的步骤在同一 frame 内，先切到录制时的 frame 再一次解析
+                    try:
+                        frames.switch(segment[0].frame)
+                    except WebDriverException as e:
+                        raise MacroCheckpointError(f"第 {number + 1} 段 frame 不存在: {e.msg or e}") from e
+                    elements = driver.execute_script(_RESOLVE_JS, [dataclasses.asdict(s) for s in segment])
+                    if isinstance(elements, dict):
+                        step = segment[elements["failed"]]
+                        raise MacroCheckpointError(
+                            f"第 {number + 1} 段 {step.action} {step.text or step.param or step.css}: {elements['reason']}")
+                    last = number == len(segments) - 1
+                    performed = True
+                    try:
+                        self._perform(driver, segment, elements, params)
+                    except WebDriverException as e:
+                        # 中间段的操作失败（元素被重新渲染等）同样视为检查点不符；最后一段可能已点了保存，照常抛出
+                        if last:
+                            raise
+                        raise MacroCheckpointError(f"第 {number + 1} 段操作失败: {e.msg or e}") from e
+            except MacroCheckpointError:
+                if performed:
+                    self._reset_page(driver)
+                raise
+        with self._lock:
+            macro.replays += 1
+            self._stats.replayed += 1
+            self._stats.steps_replayed += len(macro.steps)
+
+    def _reset_page(self, driver: WebDriver) -> None:
+        """刷新页面丢弃回放到一半的表单；刷新后驱动回到顶层，缓存的 frame 和元素一并清除。"""
+        logger.debug("宏回放中断，刷新页面后回退完整流程")
+        driver.refresh()
+        frame_context(driver).forget()
+        wait_for_ready(driver, self.timeout)
+
+    def _perform(self, driver: WebDriver, segment: List[MacroStep], elements: List[Any],
+                 params: Mapping[str, Any]) -> None:
+        for step, element in zip(segment, elements):
+            if step.action == "fill":
+                set_field_value(element, params[step.param])
+            else:
+                element.click()
+                if step.wait:
+                    wait_for_ready(driver, self.timeout, step.page_type)
+
+
+def _describe_key(key: Hashable) -> str:
+    return "/".join(map(str, key)) if isinstance(key, tuple) else str(key)
@@ -0,0 +1,252 @@
+import bisect
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from erp_core.logging import get_logger, span
+from erp_ui_adapter.operations.recording import current_recorder
+from erp_ui_adapter.utils.driver_utils import frame_context, xpath_literal
+
+logger = get_logger(__name__)
+
+DEFAULT_TIMEOUT = 20.0
+
+# 金蝶 / YonBIP 以及常见组件库的加载遮罩
+DEFAULT_LOADING_MASK = (
+    ".kd-loading, .kd-mask-loading, .k-loading-mask, "
+    ".wui-spin-spinning, .u-loading, .yonui-loading, "
+    ".el-loading-mask, .ant-spin-spinning, .loading-mask"
+)
+
+# 页面就绪探针：统计未完成的 XHR/fetch，记录最后一次 DOM 变更时间。
+# 通过 CDP 在每个新文档（含 iframe）创建时注入，保证页面最早发出的请求也被计数；
+# 不支持 CDP 时由等待脚本在当前文档及同源 iframe 中补装。
+_PROBE_JS = r"""
+(function (w) {
+    if (w.__erpWait) return;
+    const state = w.__erpWait = {pending: 0, lastMutation: performance.now()};
+    const done = () => { state.pending = Math.max(0, state.pending - 1); };
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        state.pending++;
+        this.addEventListener('loadend', done, {once: true});
+        try { return send.apply(this, arguments); } catch (e) { done(); throw e; }
+    };
+    if (w.fetch) {
+        const fetch = w.fetch;
+        w.fetch = function () {
+            state.pending++;
+            return fetch.apply(this, arguments).finally(done);
+        };
+    }
+    const observe = () => new MutationObserver(() => { state.lastMutation = performance.now(); })
+        .observe(w.document, {subtree: true, childList: true, attributes: true, characterData: true});
+    if (w.document.documentElement) observe();
+    else w.document.addEventListener('DOMContentLoaded', observe, {once: true});
+})(window);
+"""
+
+# 轮询直到：所有同源文档 readyState=complete、无未完成请求、无可见加载遮罩、DOM 静默 quietMs 毫秒。
+_WAIT_READY_JS = r"""
+const [maskSelector, quietMs, timeoutMs, pollMs, probe] = arguments;
+const callback = arguments[arguments.length - 1];
+const started = performance.now();
+// 驱动可能停在某个 iframe 中，从同源的顶层窗口开始检查整页
+const top = (() => { try { window.top.document; return window.top; } catch (e) { return window; } })();
+const windows = () => {
+    const result = [];
+    const visit = w => {
+        try { w.document; } catch (e) { return; }
+        result.push(w);
+        for (let i = 0; i < w.frames.length; i++) visit(w.frames[i]);
+    };
+    visit(top);
+    return result;
+};
+const pageType = () => {
+    const tab = top.document.querySelector('[role=tab][aria-selected=true], .kd-tab-active, .tab-active, .active-tab');
+    const text = tab && tab.innerText.trim();
+    return text || (top.location.pathname + top.location.hash.split('?')[0]);
+};
+const check = () => {
+    let pending = 0, masks = 0, loading = 0, sinceMutation = Infinity;
+    const now = performance.now();
+    for (const w of windows()) {
+        if (!w.__erpWait) { try { w.eval(probe); } catch (e) {} }
+        const state = w.__erpWait;
+        if (w.document.readyState !== 'complete') loading++;
+        if (state) {
+            pending += state.pending;
+            // 各 iframe 的 performance.now() 起点不同，换算成各自文档内的经过时间
+            sinceMutation = Math.min(sinceMutation, w.performance.now() - state.lastMutation);
+        }
+        for (const el of w.document.querySelectorAll(maskSelector)) {
+            const r = el.getBoundingClientRect();
+            const style = w.getComputedStyle(el);
+            if (r.width > 0 && r.height > 0 && style.visibility !== 'hidden' && style.display !== 'none') masks++;
+        }
+    }
+    const waited = now - started;
+    const ready = !loading && !pending && !masks && sinceMutation >= quietMs;
+    if (ready || waited >= timeoutMs) {
+        callback({ready, waited, pending, masks, loading, sinceMutation: Math.min(sinceMutation, 1e9), page: pageType()});
+    } else {
+        setTimeout(check, pollMs);
+    }
+};
+check();
+"""
+
+# 直方图桶上界（毫秒），最后一个桶收集所有更长的等待
+HISTOGRAM_BOUNDS_MS = (50, 100, 250, 500, 1000, 2000, 5000, 10000)
+
+
+@dataclass
+class WaitHistogram:
+    """某一类页面的就绪等待时间分布。"""
+    counts: List[int] = field(default_factory=lambda: [0] * (len(HISTOGRAM_BOUNDS_MS) + 1))
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    timeouts: int = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    def add(self, waited_ms: float, timed_out: bool = False) -> None:
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, waited_ms)] += 1
+        self.total_ms += waited_ms
+        self.max_ms = max(self.max_ms, waited_ms)
+        if timed_out:
+            self.timeouts += 1
+
+    def percentile(self, q: float) -> float:
+        """按桶上界估算分位数（毫秒）。"""
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                return min(HISTOGRAM_BOUNDS_MS[i], self.max_ms) if i < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+        return 0.0
+
+
+class WaitEngine:
+    """
+    基于页面内探针的就绪等待，取代固定 sleep 和隐式等待。
+
+    每次等待只发一条 execute_async_script，在浏览器内轮询网络请求、加载遮罩和 DOM 静默，
+    页面真正就绪时立即返回；等待时间按页面类型（当前激活页签标题，缺省为 URL 路径）记入直方图。
+    """
+
+    def __init__(self, mask_selector: str = DEFAULT_LOADING_MASK, quiet_ms: int = 150, poll_ms: int = 25):
+        self.mask_selector = mask_selector
+        self.quiet_ms = quiet_ms
+        self.poll_ms = poll_ms
+        self._histograms: Dict[str, WaitHistogram] = {}
+        self._lock = threading.Lock()
+        self._prepared: "weakref.WeakKeyDictionary[WebDriver, float]" = weakref.WeakKeyDictionary()
+
+    def install(self, driver: WebDriver) -> None:
+        """通过 CDP 让探针在之后每个新文档创建时自动注入（仅 Chrome，其他浏览器由等待脚本补装）。"""
+        execute_cdp = getattr(driver, "execute_cdp_cmd", None)
+        if execute_cdp is None:
+            return
+        try:
+            execute_cdp("Page.addScriptToEvaluateOnNewDocument", {"source": _PROBE_JS})
+        except WebDriverException as e:
+            logger.debug("无法通过 CDP 注入就绪探针: %s", e)
+        driver.execute_script(_PROBE_JS)
+
+    def wait_ready(self, driver: WebDriver, timeout: float = DEFAULT_TIMEOUT, page_type: Optional[str] = None,
+                   mask_selector: Optional[str] = None) -> float:
+        """等待页面就绪，返回等待秒数；超时抛出 TimeoutException。"""
+        self._prepare(driver, timeout)
+        started = time.monotonic()
+        with span("wait.ready", "wait") as s:
+            try:
+                result = driver.execute_async_script(
+                    _WAIT_READY_JS, mask_selector or self.mask_selector, self.quiet_ms, int(timeout * 1000),
+                    self.poll_ms, _PROBE_JS)
+            except TimeoutException:
+                result = {"ready": False, "waited": (time.monotonic() - started) * 1000, "page": None}
+            page = page_type or result.get("page") or "unknown"
+            s.set("page", page)
+            s.set("ready", bool(result.get("ready")))
+        waited_ms = float(result.get("waited") or 0.0)
+        self._record(page, waited_ms, not result.get("ready"))
+        if not result.get("ready"):
+            raise TimeoutException(
+                f"页面 {timeout:.0f}s 内未就绪: 请求 {result.get('pending')} 个未完成, "
+                f"加载遮罩 {result.get('masks')} 个, 加载中文档 {result.get('loading')} 个")
+        return waited_ms / 1000.0
+
+    def histograms(self) -> Dict[str, WaitHistogram]:
+        with self._lock:
+            return {page: WaitHistogram(list(h.counts), h.total_ms, h.max_ms, h.timeouts)
+                    for page, h in self._histograms.items()}
+
+    def report(self) -> str:
+        """按总等待时间降序输出各页面类型的等待统计。"""
+        lines = [f"{'页面':<24} {'次数':>6} {'总计(s)':>9} {'平均(ms)':>9} {'P90(ms)':>8} {'最大(ms)':>9} {'超时':>5}"]
+        for page, h in sorted(self.histograms().items(), key=lambda item: -item[1].total_ms):
+            lines.append(f"{page[:24]:<24} {h.count:>6} {h.total_ms / 1000:>9.1f} {h.mean_ms:>9.0f} "
+                         f"{h.percentile(0.9):>8.0f} {h.max_ms:>9.0f} {h.timeouts:>5}")
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def _prepare(self, driver: WebDriver, timeout: float) -> None:
+        # 异步脚本超时只需在变大时设置一次，避免每次等待多一次往返
+        script_timeout = timeout + 5.0
+        if self._prepared.get(driver, 0.0) < script_timeout:
+            driver.set_script_timeout(script_timeout)
+            self._prepared[driver] = script_timeout
+
+    def _record(self, page: str, waited_ms: float, timed_out: bool) -> None:
+        with self._lock:
+            histogram = self._histograms.get(page)
+            if histogram is None:
+                histogram = self._histograms[page] = WaitHistogram()
+            histogram.add(waited_ms, timed_out)
+
+
+# 进程内共享的等待引擎，直方图汇总所有会话的等待
+wait_engine = WaitEngine()
+
+
+def wait_for_ready(driver: WebDriver, timeout: float = DEFAULT_TIMEOUT, page_type: Optional[str] = None) -> float:
+    return wait_engine.wait_ready(driver, timeout, page_type)
+
+
+def click_text(driver: WebDriver, text: str, timeout: float = DEFAULT_TIMEOUT, wait: bool = True,
+               page_type: Optional[str] = None) -> None:
+    """点击第一个可见文本等于 text 的可点击元素（菜单项、按钮、页签，可以在 iframe 中），然后等待页面就绪。"""
+    xpath = f"//*[normalize-space(text())={xpath_literal(text)}]"
+    with span("wait.clickable", "wait", text=text):
+        element = frame_context(driver).wait_for(By.XPATH, xpath, timeout)
+    recorder = current_recorder()
+    if recorder is not None:
+        recorder.click(driver, element, wait, page_type)
+    element.click()
+    if wait:
+        wait_for_ready(driver, timeout, page_type)
+
+
+def open_menu(driver: WebDriver, menu_path: Sequence[str], timeout: float = DEFAULT_TIMEOUT) -> None:
+    """按菜单路径逐级点击，例如 ["基础管理", "基础资料", "供应商"]。"""
+    with span("navigation.open_menu", "adapter", menu="/".join(menu_path)):
+        for label in menu_path:
+            click_text(driver, label, timeout)
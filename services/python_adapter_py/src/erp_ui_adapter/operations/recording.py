@@ -0,0 +1,100 @@
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+from erp_ui_adapter.utils.driver_utils import frame_context
+
+# 为录制到的元素生成稳定的 CSS 定位：优先用唯一且不像自动生成的 id，
+# 否则从最近的这种祖先（或 body）开始按 nth-of-type 逐级定位。同时返回回放时用于校验的元素特征。
+_DESCRIBE_JS = r"""
+const el = arguments[0], volatile = arguments[1] ? new RegExp(arguments[1]) : null;
+const stableId = n => n.id && !(volatile && volatile.test(n.id))
+    && document.querySelectorAll('#' + CSS.escape(n.id)).length === 1;
+const parts = [];
+for (let n = el; n && n.nodeType === 1 && n !== document.documentElement; n = n.parentElement) {
+    if (stableId(n)) { parts.unshift('#' + CSS.escape(n.id)); break; }
+    let i = 1;
+    for (let s = n.previousElementSibling; s; s = s.previousElementSibling) if (s.tagName === n.tagName) i++;
+    parts.unshift(n.tagName.toLowerCase() + ':nth-of-type(' + i + ')');
+}
+return {css: parts.join(' > '), tag: el.tagName.toLowerCase(), name: el.getAttribute('name') || '',
+        text: (el.innerText || '').replace(/\s+/g, ' ').trim().slice(0, 200)};
+"""
+
+
+@dataclass(frozen=True)
+class MacroStep:
+    """宏中的一步：点击或按字段填写。css 是录制时解析出的定位，tag/name/text 是回放时的检查点。"""
+    action: str                      # "click" | "fill"
+    css: str
+    tag: str
+    name: str = ""
+    text: str = ""                   # 点击目标的可见文本
+    param: Optional[str] = None      # fill 的值取自记录的哪个字段
+    wait: bool = False               # 点击后是否等待页面就绪
+    page_type: Optional[str] = None
+    frame: Tuple[str, ...] = ()      # 元素所在的 frame 路径
+
+
+@dataclass
+class Macro:
+    key: Tuple[Any, ...]
+    steps: List[MacroStep] = field(default_factory=list)
+    replays: int = 0
+
+    def segments(self) -> List[List[MacroStep]]:
+        """按页面切换（点击后等待就绪）和 frame 切换分段，同一段内的元素可以一次脚本调用全部解析。"""
+        segments: List[List[MacroStep]] = [[]]
+        for step in self.steps:
+            if segments[-1] and segments[-1][-1].frame != step.frame:
+                segments.append([])
+            segments[-1].append(step)
+            if step.action == "click" and step.wait:
+                segments.append([])
+        return [s for s in segments if s]
+
+
+class MacroRecorder:
+    """录制一次成功的流程：click_text / fill_form 在录制期间把解析到的元素报告给它。"""
+
+    def __init__(self, volatile_id: Optional[str] = None):
+        self.volatile_id = volatile_id
+        self.steps: List[MacroStep] = []
+
+    def _describe(self, driver: WebDriver, element: WebElement) -> Dict[str, str]:
+        return driver.execute_script(_DESCRIBE_JS, element, self.volatile_id)
+
+    def click(self, driver: WebDriver, element: WebElement, wait: bool, page_type: Optional[str]) -> None:
+        info = self._describe(driver, element)
+        self.steps.append(MacroStep("click", info["css"], info["tag"], info["name"], info["text"],
+                                    wait=wait, page_type=page_type, frame=frame_context(driver).path))
+
+    def fill(self, driver: WebDriver, element: WebElement, param: str) -> None:
+        info = self._describe(driver, element)
+        self.steps.append(MacroStep("fill", info["css"], info["tag"], info["name"], param=param,
+                                    frame=frame_context(driver).path))
+
+    def finish(self, key: Tuple[Any, ...]) -> Optional[Macro]:
+        return Macro(key, list(self.steps)) if self.steps else None
+
+
+_recorder: contextvars.ContextVar[Optional[MacroRecorder]] = contextvars.ContextVar("erp_macro_recorder",
+                                                                                    default=None)
+
+
+def current_recorder() -> Optional[MacroRecorder]:
+    return _recorder.get()
+
+
+@contextmanager
+def recording(recorder: MacroRecorder) -> Iterator[MacroRecorder]:
+    """在当前线程/协程内录制，期间的 click_text / fill_form 都记入 recorder。"""
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
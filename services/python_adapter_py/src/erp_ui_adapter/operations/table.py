@@ -0,0 +1,438 @@
+import csv
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+from selenium.common.exceptions import StaleElementReferenceException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from erp_core.logging import get_logger
+from erp_ui_adapter.operations.navigation import click_text, wait_for_ready
+from erp_ui_adapter.utils.driver_utils import frame_context, xpath_literal
+
+logger = get_logger(__name__)
+
+Row = Mapping[str, Any]
+# 单行回退录入函数：逐字段录入一行，失败时抛异常
+RowFallback = Callable[[WebDriver, int, Row], None]
+
+
+@dataclass
+class GridSpec:
+    """ERP 表格控件的 DOM 结构描述，由各适配器提供。"""
+    root: str                       # 表格根节点 CSS
+    header_cell: str = "thead th"   # 相对 root 的表头单元格
+    body_row: str = "tbody tr"      # 相对 root 的数据行
+    cell: str = "td"                # 相对行的单元格
+    row_error: str = ".error, .invalid, .has-error, [aria-invalid='true']"  # 行内校验失败标记
+    import_button_text: Optional[str] = None   # 工具栏上的 Excel 导入按钮文本
+    import_file_input: str = "input[type=file]"
+    import_confirm_text: str = "确定"
+    import_result: str = ".import-result, .k-dialog-content, .wui-modal-body"
+    import_close_text: str = "关闭"              # 关闭导入结果对话框的按钮文本
+    import_first_row: int = 2                   # 导入结果“第 N 行”中第一条数据的 N：按 Excel 行号（表头为第 1 行）为 2
+    next_page: Optional[str] = None             # 分页器“下一页”按钮 CSS，导出分页报表时使用
+    save_button_text: Optional[str] = "保存"     # 提交整张单据（含分录）的按钮文本；None 表示表格即时提交
+    save_error: str = ".k-message-error, .wui-message-error, .error-message"  # 保存失败时出现的提示
+
+
+class EntryMode(str, Enum):
+    PASTE = "paste"     # 剪贴板 TSV 粘贴进表格
+    IMPORT = "import"   # ERP 的 Excel 导入对话框
+    PER_ROW = "per_row"  # 逐行逐字段录入
+
+
+class RowStatus(str, Enum):
+    # 除 FAILED 外的状态都表示该行已随单据保存成功（保存失败时整批标为 FAILED）
+    PASTED = "pasted"
+    IMPORTED = "imported"
+    FALLBACK = "fallback"  # 批量失败后在同一表格中逐格重录成功
+    FAILED = "failed"      # 录入失败（该行已清空，不随单据提交）或单据保存失败
+
+
+@dataclass
+class RowResult:
+    index: int
+    status: RowStatus
+    error: Optional[str] = None
+
+
+@dataclass
+class BulkReport:
+    """批量录入的行级结果报告。"""
+    mode: EntryMode
+    rows: List[RowResult] = field(default_factory=list)
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float = 0.0
+    committed: bool = False   # 单据已保存（或表格无需保存）
+
+    def count(self, status: RowStatus) -> int:
+        return sum(1 for r in self.rows if r.status == status)
+
+    @property
+    def failed_rows(self) -> List[RowResult]:
+        return [r for r in self.rows if r.status == RowStatus.FAILED]
+
+    @property
+    def rows_per_minute(self) -> float:
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        succeeded = len(self.rows) - len(self.failed_rows)
+        return succeeded * 60.0 / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.mode.value}: 共 {len(self.rows)} 行, 批量 "
+                f"{self.count(RowStatus.PASTED) + self.count(RowStatus.IMPORTED)}, "
+                f"回退 {self.count(RowStatus.FALLBACK)}, 失败 {self.count(RowStatus.FAILED)}, "
+                f"{self.rows_per_minute:.0f} 行/分钟")
+
+
+# 一次调用探测表格能力：是否可编辑、是否处理 paste 事件、列头、现有行数
+_PROBE_GRID_JS = """
+const spec = arguments[0];
+const root = document.querySelector(spec.root);
+if (!root) return {found: false};
+const headers = Array.from(root.querySelectorAll(spec.header_cell)).map(th => th.innerText.trim());
+const rows = root.querySelectorAll(spec.body_row);
+const editable = !!root.querySelector('input, textarea, [contenteditable="true"]')
+    || root.getAttribute('contenteditable') === 'true';
+// 最后一个非空行之后的位置：新行从这里开始录入（可编辑表格末尾通常留有空白行）
+const filled = cell => {
+    const input = cell.querySelector('input, textarea, select');
+    return !!(input ? input.value : cell.textContent).trim();
+};
+let dataRows = 0;
+rows.forEach((row, i) => {
+    if (Array.from(row.querySelectorAll(spec.cell)).some(filled)) dataRows = i + 1;
+});
+// 表格或其祖先上注册了 onpaste，或者是已知支持粘贴的表格组件
+let pasteAware = false;
+for (let el = root; el && !pasteAware; el = el.parentElement) {
+    pasteAware = typeof el.onpaste === 'function' || el.hasAttribute('data-paste');
+}
+pasteAware = pasteAware || /(kd-grid|wui-table|u-table|handsontable|ag-root)/.test(root.className);
+return {found: true, headers: headers, rowCount: rows.length, dataRows: dataRows, editable: editable,
+        paste: editable && pasteAware};
+"""
+
+# 把 TSV 文本作为 paste 事件派发到起始行第一个单元格，不依赖系统剪贴板。起始行不存在时（表格末尾没有空白行）
+# 派发到表格本身，由表格追加新行。返回粘贴实际落在的首行下标：按内容找到与 TSV 首末行一致的连续行，
+# 优先从 startRow 往后找；找不到返回 -1。
+_PASTE_TSV_JS = r"""
+const spec = arguments[0], startRow = arguments[1], tsv = arguments[2];
+const root = document.querySelector(spec.root);
+const rows = root.querySelectorAll(spec.body_row);
+const row = rows[startRow];
+const cell = row ? row.querySelector(spec.cell) : null;
+if (cell) cell.click();
+const target = cell && document.activeElement && root.contains(document.activeElement)
+    ? document.activeElement : (cell || root);
+const data = new DataTransfer();
+data.setData('text/plain', tsv);
+const event = new ClipboardEvent('paste', {clipboardData: data, bubbles: true, cancelable: true});
+target.dispatchEvent(event);
+
+const lines = tsv.split('\n');
+const after = root.querySelectorAll(spec.body_row);
+const text = r => Array.from(r.querySelectorAll(spec.cell)).map(c => {
+    const input = c.querySelector('input, textarea, select');
+    return (input ? input.value : c.textContent).trim();
+});
+const matches = (r, line) => {
+    const values = text(r), expected = line.split('\t');
+    return expected.every((v, j) => (values[j] || '') === v.trim());
+};
+const landed = i => i + lines.length <= after.length && matches(after[i], lines[0])
+    && matches(after[i + lines.length - 1], lines[lines.length - 1]);
+for (let i = Math.max(startRow, 0); i < after.length; i++) if (landed(i)) return i;
+for (let i = Math.min(startRow, after.length) - 1; i >= 0; i--) if (landed(i)) return i;
+return -1;
+"""
+
+# 读取 [start, start+count) 行的校验结果，返回失败行的 {offset: 错误文本}
+_ROW_ERRORS_JS = """
+const spec = arguments[0], start = arguments[1], count = arguments[2];
+const rows = document.querySelector(spec.root).querySelectorAll(spec.body_row);
+const errors = {};
+for (let i = 0; i < count; i++) {
+    const row = rows[start + i];
+    if (!row) { errors[i] = '粘贴后该行不存在'; continue; }
+    const marked = row.matches(spec.row_error) ? row : row.querySelector(spec.row_error);
+    if (marked) errors[i] = (marked.getAttribute('title') || marked.innerText || '校验失败').trim();
+}
+return errors;
+"""
+
+# 清空一行的全部单元格并触发 input / change 事件，让失败行不随单据提交（空行保存时被忽略）
+_CLEAR_ROW_JS = """
+const spec = arguments[0], index = arguments[1];
+const row = document.querySelector(spec.root).querySelectorAll(spec.body_row)[index];
+if (!row) return false;
+for (const cell of row.querySelectorAll(spec.cell)) {
+    const input = cell.querySelector('input, textarea');
+    const target = input || cell;
+    if (input) input.value = ''; else if (cell.isContentEditable) cell.textContent = ''; else continue;
+    target.dispatchEvent(new Event('input', {bubbles: true}));
+    target.dispatchEvent(new Event('change', {bubbles: true}));
+}
+return true;
+"""
+
+# 保存后读取可见的保存失败提示和仍带校验标记的行
+_SAVE_RESULT_JS = """
+const spec = arguments[0];
+const visible = el => el.getClientRects().length > 0;
+const messages = Array.from(document.querySelectorAll(spec.save_error))
+    .filter(visible).map(el => el.innerText.trim()).filter(Boolean);
+const root = document.querySelector(spec.root);
+const rows = root ? Array.from(root.querySelectorAll(spec.body_row)) : [];
+const invalid = rows.filter(r => r.matches(spec.row_error) || r.querySelector(spec.row_error)).length;
+return {messages: messages, invalid: invalid};
+"""
+
+
+def probe_grid(driver: WebDriver, spec: GridSpec) -> Dict[str, Any]:
+    return driver.execute_script(_PROBE_GRID_JS, spec.__dict__)
+
+
+def to_tsv(rows: Sequence[Row], columns: Sequence[str]) -> str:
+    """按列顺序生成 TSV，去掉值里会破坏行列结构的制表符和换行。"""
+    def clean(value: Any) -> str:
+        return "" if value is None else re.sub(r"[\t\r\n]+", " ", str(value))
+    return "\n".join("\t".join(clean(row.get(col)) for col in columns) for row in rows)
+
+
+def fill_grid_row(driver: WebDriver, spec: GridSpec, row_index: int, row: Row, columns: Sequence[str]) -> None:
+    """逐单元格录入一行：点击单元格、输入、Tab 到下一格。批量失败时的默认回退方式。"""
+    root = driver.find_element(By.CSS_SELECTOR, spec.root)
+    rows = root.find_elements(By.CSS_SELECTOR, spec.body_row)
+    if row_index >= len(rows):
+        raise IndexError(f"表格只有 {len(rows)} 行，无法录入第 {row_index + 1} 行")
+    target = rows[row_index]
+    target.find_element(By.CSS_SELECTOR, spec.cell).click()
+    active = driver.switch_to.active_element
+    for col in columns:
+        value = row.get(col)
+        active.send_keys(Keys.CONTROL, "a")
+        active.send_keys("" if value is None else str(value), Keys.TAB)
+        active = driver.switch_to.active_element
+
+
+class BulkEntry:
+    """
+    表格批量录入。
+
+    自动探测表格能力：支持粘贴时每批 batch_size 行一次粘贴，否则若有 Excel 导入按钮则整体导入，
+    都不支持时逐行录入。批量录入后读取行级校验结果，粘贴失败的行在同一表格的原位置用 fallback 逐格重录；
+    导入被拒的行不会进入表格，关闭结果对话框后追加到最后一个数据行之后重录。仍失败的行清空后标为失败。
+    最后点击保存提交整张单据，只有保存成功时各行才算录入成功。
+    """
+
+    def __init__(self, driver: WebDriver, spec: GridSpec, batch_size: int = 200,
+                 fallback: Optional[RowFallback] = None, timeout: float = 30.0):
+        self.driver = driver
+        self.spec = spec
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._fallback = fallback
+
+    def detect_mode(self) -> EntryMode:
+        info = probe_grid(self.driver, self.spec)
+        if info.get("found") and info.get("paste"):
+            return EntryMode.PASTE
+        if self.spec.import_button_text and self.driver.find_elements(
+                By.XPATH, f"//*[normalize-space(text())={xpath_literal(self.spec.import_button_text)}]"):
+            return EntryMode.IMPORT
+        return EntryMode.PER_ROW
+
+    def fill(self, rows: Sequence[Row], columns: Optional[Sequence[str]] = None,
+             mode: Optional[EntryMode] = None) -> BulkReport:
+        """录入所有行、保存单据并返回行级报告。columns 默认取第一行的键顺序。"""
+        columns = list(columns or (rows[0].keys() if rows else []))
+        # 表格可能在 iframe 中：先切到表格所在 frame，之后的脚本和查找都在这个 frame 内进行
+        frame_context(self.driver).find(By.CSS_SELECTOR, self.spec.root)
+        mode = mode or self.detect_mode()
+        # 新行从最后一个非空行之后开始录入（表格末尾的空白行不算现有行）
+        start_row = probe_grid(self.driver, self.spec).get("dataRows", 0)
+        report = BulkReport(mode)
+        logger.info("批量录入 %d 行，模式 %s", len(rows), mode.value)
+
+        if mode == EntryMode.PASTE:
+            grid_row = start_row
+            for offset in range(0, len(rows), self.batch_size):
+                batch = rows[offset:offset + self.batch_size]
+                grid_row = self._paste_batch(report, batch, columns, offset, grid_row)
+        elif mode == EntryMode.IMPORT:
+            self._import_all(report, rows, columns)
+        else:
+            for index, row in enumerate(rows):
+                report.rows.append(self._fill_one(start_row + index, row, columns, RowStatus.FALLBACK, index))
+
+        self._commit(report)
+        report.rows.sort(key=lambda r: r.index)
+        report.finished_at = time.monotonic()
+        logger.info("批量录入完成 - %s", report.summary())
+        return report
+
+    # ---------------- 内部实现 ----------------
+
+    def _paste_batch(self, report: BulkReport, batch: Sequence[Row], columns: Sequence[str],
+                     offset: int, grid_row: int) -> int:
+        """粘贴一批并处理失败行，返回下一批的起始行。"""
+        try:
+            landed = self.driver.execute_script(_PASTE_TSV_JS, self.spec.__dict__, grid_row, to_tsv(batch, columns))
+            if landed < 0:
+                raise ValueError("粘贴后在表格中找不到粘贴的行")
+            errors = self.driver.execute_script(_ROW_ERRORS_JS, self.spec.__dict__, landed, len(batch))
+        except (WebDriverException, ValueError) as e:
+            # 不知道粘贴落在哪里时不能按行回退，否则会覆盖其他行：整批标为失败
+            logger.warning("粘贴第 %d-%d 行失败: %s", offset, offset + len(batch) - 1, e)
+            report.rows.extend(RowResult(offset + i, RowStatus.FAILED, f"{type(e).__name__}: {e}")
+                               for i in range(len(batch)))
+            return probe_grid(self.driver, self.spec).get("dataRows", grid_row)
+
+        for i, row in enumerate(batch):
+            error = errors.get(str(i))
+            if error is None:
+                report.rows.append(RowResult(offset + i, RowStatus.PASTED))
+            else:
+                logger.debug("第 %d 行粘贴校验失败(%s)，逐格回退", offset + i, error)
+                report.rows.append(self._fill_one(landed + i, row, columns, RowStatus.FALLBACK, offset + i))
+        return landed + len(batch)
+
+    def _import_all(self, report: BulkReport, rows: Sequence[Row], columns: Sequence[str]) -> None:
+        path = write_import_file(rows, columns)
+        wait = WebDriverWait(self.driver, self.timeout)
+        try:
+            click_text(self.driver, self.spec.import_button_text, self.timeout)
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, self.spec.import_file_input))) \
+                .send_keys(path)
+            # 确认按钮可能与工具栏的导入按钮同名（金蝶都叫“引入”），点对话框里的那个
+            self._click_dialog_button(self.spec.import_confirm_text)
+            result_text = wait.until(
+                EC.visibility_of_element_located((By.CSS_SELECTOR, self.spec.import_result))).text
+        finally:
+            os.unlink(path)
+        # 先关掉结果对话框，否则它会挡住后面的逐格录入和保存
+        self._click_dialog_button(self.spec.import_close_text)
+        wait.until(EC.invisibility_of_element_located((By.CSS_SELECTOR, self.spec.import_result)))
+
+        failed = parse_import_failures(result_text, self.spec.import_first_row)
+        if failed is None or any(not 0 <= index < len(rows) for index in failed):
+            # 结果里既没有成功提示也没有可对应的行号：导入失败或无法识别，整批标为失败
+            logger.warning("无法识别导入结果，整批 %d 行标为失败: %s", len(rows), result_text[:200])
+            report.rows.extend(RowResult(index, RowStatus.FAILED, f"导入结果无法识别: {result_text[:200]}")
+                               for index in range(len(rows)))
+            return
+        for index in range(len(rows)):
+            if index not in failed:
+                report.rows.append(RowResult(index, RowStatus.IMPORTED))
+        # 被拒的行不在表格里，其余行在表格中的位置也随之前移：逐行追加到最后一个数据行之后，不覆盖已导入的行
+        for index in sorted(failed):
+            logger.debug("第 %d 行导入失败(%s)，追加到表格末尾逐格录入", index, failed[index])
+            grid_row = probe_grid(self.driver, self.spec).get("dataRows", 0)
+            report.rows.append(self._fill_one(grid_row, rows[index], columns, RowStatus.FALLBACK, index))
+
+    def _click_dialog_button(self, text: str) -> None:
+        """点击最后一个文本为 text 的可见元素：对话框渲染在页面末尾，同名的工具栏按钮排在它前面。"""
+        xpath = f"//*[normalize-space(text())={xpath_literal(text)}]"
+
+        def last_visible(driver: WebDriver):
+            visible = [e for e in driver.find_elements(By.XPATH, xpath) if e.is_displayed() and e.is_enabled()]
+            return visible[-1] if visible else False
+
+        WebDriverWait(self.driver, self.timeout, ignored_exceptions=(StaleElementReferenceException,)).until(
+            last_visible, f"{self.timeout:.0f}s 内未找到可点击的“{text}”").click()
+        wait_for_ready(self.driver, self.timeout)
+
+    def _fill_one(self, grid_row: int, row: Row, columns: Sequence[str], status: RowStatus,
+                  index: Optional[int] = None) -> RowResult:
+        index = grid_row if index is None else index
+        try:
+            if self._fallback is not None:
+                self._fallback(self.driver, grid_row, row)
+            else:
+                fill_grid_row(self.driver, self.spec, grid_row, row, columns)
+            errors = self.driver.execute_script(_ROW_ERRORS_JS, self.spec.__dict__, grid_row, 1)
+            if errors:
+                raise ValueError(next(iter(errors.values())))
+        except Exception as e:
+            # 清空失败行，避免它阻止整张单据保存或以错误数据提交
+            try:
+                self.driver.execute_script(_CLEAR_ROW_JS, self.spec.__dict__, grid_row)
+            except WebDriverException as clear_error:
+                logger.warning("清空第 %d 行失败: %s", grid_row, clear_error)
+            return RowResult(index, RowStatus.FAILED, f"{type(e).__name__}: {e}")
+        return RowResult(index, status)
+
+    def _commit(self, report: BulkReport) -> None:
+        """点击保存提交整张单据；保存失败时所有未失败的行都改为失败。"""
+        if not self.spec.save_button_text:
+            report.committed = True
+            return
+        if all(r.status == RowStatus.FAILED for r in report.rows):
+            return
+        try:
+            click_text(self.driver, self.spec.save_button_text, self.timeout)
+            result = self.driver.execute_script(_SAVE_RESULT_JS, self.spec.__dict__)
+            if result["messages"] or result["invalid"]:
+                raise ValueError("; ".join(result["messages"]) or f"{result['invalid']} 行仍有校验错误")
+        except Exception as e:
+            error = f"单据保存失败: {type(e).__name__}: {e}"
+            logger.warning("批量录入%s", error)
+            report.rows = [r if r.status == RowStatus.FAILED else RowResult(r.index, RowStatus.FAILED, error)
+                           for r in report.rows]
+            return
+        report.committed = True
+
+
+def write_import_file(rows: Sequence[Row], columns: Sequence[str]) -> str:
+    """生成导入用的临时文件：装了 openpyxl 时写 xlsx，否则写 UTF-8 BOM 的 csv。"""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        Workbook = None
+
+    if Workbook is not None:
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(list(columns))
+        for row in rows:
+            sheet.append([row.get(col) for col in columns])
+        workbook.save(path)
+        return path
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([row.get(col, "") for col in columns])
+    return path
+
+
+def parse_import_failures(result_text: str, first_row: int = 2) -> Optional[Dict[int, str]]:
+    """
+    从导入结果文本中解析失败行，返回 数据行下标（从 0 开始）-> 原因。ERP 一般按 “第 N 行: 原因” 报告，
+    N 是 Excel 行号，表头占第 1 行，所以第一条数据是第 2 行；按数据行计数的 ERP 传 first_row=1。
+    没有行号时，只有明确的成功提示（且没有失败字样）才返回空字典；导入失败或无法识别返回 None。
+    """
+    failures: Dict[int, str] = {}
+    for match in re.finditer(r"第\s*(\d+)\s*行[:：]?\s*([^\n]*)", result_text):
+        failures[int(match.group(1)) - first_row] = match.group(2).strip()
+    if failures:
+        return failures
+    # “失败 0 条”之类的统计不算失败字样
+    text = re.sub(r"失败\s*[:：]?\s*0\s*(行|条)?", "", result_text)
+    if re.search(r"失败|错误|异常", text) or not re.search(r"成功|完成", text):
+        return None
+    return failures
@@ -0,0 +1,595 @@
+import atexit
+import dataclasses
+import itertools
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from selenium import webdriver
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    NoSuchFrameException,
+    StaleElementReferenceException,
+    WebDriverException,
+)
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support.ui import WebDriverWait
+
+from erp_core.config import ServerConfig, SessionPoolConfig
+from erp_core.exceptions import SessionPoolError, SessionPoolTimeout
+from erp_core.logging import get_logger, get_tracer, span
+
+logger = get_logger(__name__)
+
+# 登录函数：拿到一个全新的浏览器，把它登录到指定服务器
+LoginFn = Callable[[WebDriver, ServerConfig], None]
+DriverFactory = Callable[[SessionPoolConfig, Optional[str]], WebDriver]
+
+_MB = 1024 * 1024
+
+
+@lru_cache(maxsize=1)
+def chromedriver_path() -> str:
+    """解析 chromedriver 路径，整个进程只做一次 webdriver-manager 的下载检查。"""
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+
+def create_chrome_driver(config: SessionPoolConfig, user_data_dir: Optional[str] = None) -> WebDriver:
+    """按会话池配置创建一个 Chrome 实例。"""
+    options = webdriver.ChromeOptions()
+    if config.headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-first-run")
+    options.add_argument("--disable-dev-shm-usage")
+    if user_data_dir:
+        options.add_argument(f"--user-data-dir={user_data_dir}")
+    if config.network_capture:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return webdriver.Chrome(service=Service(chromedriver_path()), options=options)
+
+
+def instrument_driver(driver: WebDriver) -> WebDriver:
+    """
+    让驱动的每条 WebDriver 命令（findElement、executeScript、clickElement ...）都记录一个 span。
+    WebElement 的操作也经由 driver.execute 发出，因此同样被记录。未开启追踪时只多一次函数调用。
+    """
+    execute = driver.execute
+
+    def traced_execute(driver_command: str, params: Optional[dict] = None):
+        if get_tracer() is None:
+            return execute(driver_command, params)
+        with span(f"webdriver.{driver_command}", "webdriver"):
+            return execute(driver_command, params)
+
+    driver.execute = traced_execute
+    return driver
+
+
+@dataclass
+class PoolMetrics:
+    """会话池统计，metrics 属性返回的是快照副本。"""
+    acquisitions: int = 0
+    waits: int = 0                  # 没有空闲会话、需要排队的借出次数
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    timeouts: int = 0
+    created: int = 0
+    recycled_by_uses: int = 0
+    recycled_by_memory: int = 0
+    health_failures: int = 0
+
+    @property
+    def avg_wait_seconds(self) -> float:
+        return self.total_wait_seconds / self.acquisitions if self.acquisitions else 0.0
+
+
+class PooledSession:
+    """池中的一个已登录浏览器会话。"""
+
+    def __init__(self, driver: WebDriver, server_name: str, session_id: int):
+        self.driver = driver
+        self.server_name = server_name
+        self.session_id = session_id
+        self.use_count = 0
+        self.created_at = time.monotonic()
+        self.last_checked_at = self.created_at
+        self.baseline_heap: Optional[int] = None
+
+    def js_heap_bytes(self) -> Optional[int]:
+        """读取页面 JS 堆占用（仅 Chrome 支持），读不到时返回 None。"""
+        try:
+            value = self.driver.execute_script(
+                "return window.performance && performance.memory ? performance.memory.usedJSHeapSize : null;"
+            )
+        except WebDriverException:
+            return None
+        return int(value) if value is not None else None
+
+    def is_healthy(self) -> bool:
+        """用一次最便宜的脚本调用确认浏览器和驱动都还活着。"""
+        try:
+            self.driver.execute_script("return document.readyState;")
+        except WebDriverException:
+            return False
+        self.last_checked_at = time.monotonic()
+        return True
+
+    def quit(self) -> None:
+        try:
+            self.driver.quit()
+        except WebDriverException as e:
+            logger.warning("关闭会话 %s#%s 失败: %s", self.server_name, self.session_id, e)
+
+
+class SessionPool:
+    """
+    单个服务器的有界、线程安全浏览器会话池。
+
+    会话在借出前按需做健康检查，归还时若借出次数或 JS 堆增长超限则回收，
+    并在后台补充新会话以保持池子常热。
+    """
+
+    def __init__(
+            self,
+            server_name: str,
+            server: ServerConfig,
+            login: LoginFn,
+            config: Optional[SessionPoolConfig] = None,
+            driver_factory: DriverFactory = create_chrome_driver,
+    ):
+        self.server_name = server_name
+        self.server = server
+        self.config = config or SessionPoolConfig()
+        self._login = login
+        self._driver_factory = driver_factory
+        self._idle: Deque[PooledSession] = deque()
+        self._total = 0  # 空闲 + 借出 + 正在创建
+        self._closed = False
+        self._cond = threading.Condition()
+        self._ids = itertools.count(1)
+        self._metrics = PoolMetrics()
+
+    @property
+    def metrics(self) -> PoolMetrics:
+        with self._cond:
+            return dataclasses.replace(self._metrics)
+
+    @property
+    def idle_count(self) -> int:
+        with self._cond:
+            return len(self._idle)
+
+    def warm_up(self, count: Optional[int] = None) -> None:
+        """预先创建并登录会话，直到池中达到 count（默认 size）个。"""
+        target = min(count or self.config.size, self.config.size)
+        while True:
+            with self._cond:
+                if self._closed or self._total >= target:
+                    return
+                self._total += 1
+            self._add_new_session()
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledSession:
+        """借出一个健康的会话，池满时阻塞等待，超时抛出 SessionPoolTimeout。"""
+        timeout = self.config.acquire_timeout if timeout is None else timeout
+        with span("pool.acquire", "pool", server=self.server_name) as s:
+            session = self._acquire(timeout)
+            s.set("session", session.session_id)
+            return session
+
+    def _acquire(self, timeout: float) -> PooledSession:
+        deadline = time.monotonic() + timeout
+        started = time.monotonic()
+        waited = False
+
+        while True:
+            session = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise SessionPoolError(f"会话池 {self.server_name} 已关闭")
+                    if self._idle:
+                        session = self._idle.popleft()
+                        break
+                    if self._total < self.config.size:
+                        self._total += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics.timeouts += 1
+                        raise SessionPoolTimeout(
+                            f"{timeout:.1f}s 内未能从 {self.server_name} 会话池借到会话"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if session is None:
+                session = self._create_session()
+            elif time.monotonic() - session.last_checked_at > self.config.health_check_interval \
+                    and not session.is_healthy():
+                logger.warning("会话 %s#%s 健康检查失败，丢弃重建", self.server_name, session.session_id)
+                with self._cond:
+                    self._metrics.health_failures += 1
+                self._discard(session)
+                continue
+
+            session.use_count += 1
+            self._record_acquisition(time.monotonic() - started, waited)
+            return session
+
+    def release(self, session: PooledSession, discard: bool = False) -> None:
+        """归还会话；discard=True 或达到回收条件时销毁并在后台补充。"""
+        reason = "broken" if discard else self._recycle_reason(session)
+        if reason is None:
+            with self._cond:
+                if not self._closed:
+                    self._idle.append(session)
+                    self._cond.notify()
+                    return
+            self._discard(session)
+            return
+
+        logger.info("回收会话 %s#%s (%s, 已用 %d 次)", self.server_name, session.session_id, reason,
+                    session.use_count)
+        with self._cond:
+            if reason == "uses":
+                self._metrics.recycled_by_uses += 1
+            elif reason == "memory":
+                self._metrics.recycled_by_memory += 1
+        self._discard(session)
+        self._replenish_async()
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None) -> Iterator[WebDriver]:
+        """借用会话的上下文管理器，发生 WebDriver 异常时该会话会被丢弃。"""
+        pooled = self.acquire(timeout)
+        broken = False
+        try:
+            yield pooled.driver
+        except WebDriverException:
+            broken = not pooled.is_healthy()
+            raise
+        finally:
+            self.release(pooled, discard=broken)
+
+    def close(self) -> None:
+        """关闭池并退出所有空闲会话；借出中的会话在归还时退出。"""
+        with self._cond:
+            self._closed = True
+            idle: List[PooledSession] = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for session in idle:
+            session.quit()
+
+    # ---------------- 内部实现 ----------------
+
+    def _create_session(self) -> PooledSession:
+        """创建并登录一个新会话，调用前必须已为其占用 _total 名额。"""
+        session_id = next(self._ids)
+        user_data_dir = None
+        if self.config.user_data_dir:
+            # Chrome 不允许多个实例共用同一个用户目录
+            user_data_dir = os.path.join(self.config.user_data_dir, f"{self.server_name}-{session_id}")
+        driver = None
+        try:
+            driver = instrument_driver(self._driver_factory(self.config, user_data_dir))
+            self._login(driver, self.server)
+        except Exception:
+            if driver is not None:
+                try:
+                    driver.quit()
+                except WebDriverException:
+                    pass
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+        session = PooledSession(driver, self.server_name, session_id)
+        session.baseline_heap = session.js_heap_bytes()
+        with self._cond:
+            self._metrics.created += 1
+        logger.info("已创建会话 %s#%s", self.server_name, session_id)
+        return session
+
+    def _add_new_session(self) -> None:
+        session = self._create_session()
+        with self._cond:
+            if self._closed:
+                self._total -= 1
+            else:
+                self._idle.append(session)
+                self._cond.notify()
+                return
+        session.quit()
+
+    def _discard(self, session: PooledSession) -> None:
+        session.quit()
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def _replenish_async(self) -> None:
+        def worker():
+            try:
+                self.warm_up()
+            except Exception as e:
+                logger.warning("补充 %s 会话失败: %s", self.server_name, e)
+
+        threading.Thread(target=worker, name=f"pool-refill-{self.server_name}", daemon=True).start()
+
+    def _recycle_reason(self, session: PooledSession) -> Optional[str]:
+        if session.use_count >= self.config.max_uses:
+            return "uses"
+        if session.baseline_heap is not None:
+            heap = session.js_heap_bytes()
+            if heap is not None and heap - session.baseline_heap > self.config.max_memory_growth_mb * _MB:
+                return "memory"
+        return None
+
+    def _record_acquisition(self, wait_seconds: float, waited: bool) -> None:
+        with self._cond:
+            m = self._metrics
+            m.acquisitions += 1
+            if waited:
+                m.waits += 1
+            m.total_wait_seconds += wait_seconds
+            m.max_wait_seconds = max(m.max_wait_seconds, wait_seconds)
+
+
+_pools: Dict[str, SessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_session_pool(server_name: str, login: LoginFn) -> SessionPool:
+    """按 config.yml 中的服务器名获取（或创建）进程内共享的会话池。"""
+    with _pools_lock:
+        pool = _pools.get(server_name)
+        if pool is None:
+            from erp_core.config import get_settings
+            settings = get_settings()
+            if server_name not in settings.servers:
+                raise SessionPoolError(f"配置中不存在服务器 '{server_name}'")
+            pool = SessionPool(server_name, settings.servers[server_name], login, settings.session_pool)
+            _pools[server_name] = pool
+        return pool
+
+
+@atexit.register
+def close_all_pools() -> None:
+    """关闭所有会话池，进程退出时自动调用。"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def xpath_literal(text: str) -> str:
+    """把任意字符串转成合法的 XPath 字符串字面量（处理同时含单双引号的情况）。"""
+    if "'" not in text:
+        return f"'{text}'"
+    if '"' not in text:
+        return f'"{text}"'
+    parts = text.split("'")
+    return "concat(" + ", \"'\", ".join(f"'{p}'" for p in parts) + ")"
+
+
+# ---------------- iframe 上下文 ----------------
+
+# frame 路径与 DOMElement.frame_path 相同：("iframe:<css>", ...)，<css> 是 iframe 在其父文档中的选择器。
+# 从当前文档出发，一次调用列出全部同源 iframe 的相对路径（深度优先）。
+_FRAME_PATHS_JS = r"""
+const cssOf = el => {
+    if (el.id) return el.tagName.toLowerCase() + '#' + CSS.escape(el.id);
+    const name = el.getAttribute('name');
+    if (name) return el.tagName.toLowerCase() + '[name="' + name + '"]';
+    let i = 1, sib = el;
+    while ((sib = sib.previousElementSibling)) if (sib.tagName === el.tagName) i++;
+    return (el.parentElement ? cssOf(el.parentElement) + ' > ' : '') + el.tagName.toLowerCase() + ':nth-of-type(' + i + ')';
+};
+const paths = [];
+const visit = (doc, path) => {
+    for (const frame of doc.querySelectorAll('iframe, frame')) {
+        let inner;
+        try { inner = frame.contentDocument; } catch (e) { continue; }
+        if (!inner) continue;
+        const next = path.concat('iframe:' + cssOf(frame));
+        paths.push(next);
+        visit(inner, next);
+    }
+};
+visit(document, []);
+return paths;
+"""
+
+FramePath = Tuple[str, ...]
+Locator = Tuple[str, str]
+
+
+@dataclass
+class FrameStats:
+    switches: int = 0           # 实际发出的 frame 切换命令数
+    switches_skipped: int = 0   # 已在目标 frame 中而省去的切换
+    element_hits: int = 0       # 直接使用缓存元素引用的次数
+    stale: int = 0              # 缓存的元素或 frame 已失效、重新查找的次数
+    frame_searches: int = 0     # 在所有 frame 中搜索定位器的次数
+
+
+class FrameContext:
+    """
+    跟踪驱动当前所在的 frame 路径，缓存 iframe 元素和定位结果，让同一 frame 内的连续操作不再重复切换和查找。
+
+    - switch(path) 只在路径不同时切换：先退到公共前缀（parent_frame 与回到顶层取较少的往返），再逐级进入；
+    - find 优先用缓存的元素引用，失效（StaleElementReferenceException）时丢弃并重新查找；
+      定位器第一次出现时在当前 frame、上次命中的 frame、其余所有同源 iframe 中依次查找并记住所在 frame；
+    - batch(path) 在一段操作前切换一次，块内的查找只在该 frame 中进行。
+
+    每个驱动一个实例（frame_context(driver)），与驱动一样只能由借用它的线程使用。
+    顶层页面跳转后驱动会回到顶层文档，调用 forget() 清除状态。
+    """
+
+    def __init__(self, driver: WebDriver):
+        self.driver = driver
+        self.path: FramePath = ()
+        self._frames: Dict[FramePath, WebElement] = {}
+        self._elements: Dict[Locator, Tuple[FramePath, WebElement]] = {}
+        self._pinned: Optional[FramePath] = None
+        self._stats = FrameStats()
+
+    @property
+    def stats(self) -> FrameStats:
+        return dataclasses.replace(self._stats)
+
+    def forget(self) -> None:
+        """页面跳转后调用：驱动已回到顶层，缓存的 frame 和元素都已失效。"""
+        self.path = ()
+        self._frames.clear()
+        self._elements.clear()
+
+    def reset(self) -> None:
+        """回到顶层文档并清除缓存。"""
+        self.driver.switch_to.default_content()
+        self._stats.switches += 1
+        self.forget()
+
+    def switch(self, path: FramePath) -> None:
+        path = tuple(path)
+        if path == self.path:
+            self._stats.switches_skipped += 1
+            return
+        common = 0
+        while common < min(len(path), len(self.path)) and path[common] == self.path[common]:
+            common += 1
+        up = len(self.path) - common
+        # 已在顶层时直接向下进入，不必再回到顶层
+        if self.path and (common == 0 or up > common + 1):
+            self.driver.switch_to.default_content()
+            self._stats.switches += 1
+            self.path = ()
+        else:
+            for _ in range(up):
+                self.driver.switch_to.parent_frame()
+                self._stats.switches += 1
+            self.path = self.path[:common]
+        try:
+            for depth in range(len(self.path), len(path)):
+                self._enter(path[:depth + 1])
+        except (NoSuchFrameException, NoSuchElementException, StaleElementReferenceException):
+            # 缓存的 iframe 已被替换：从顶层重新进入一次
+            self._stats.stale += 1
+            self.reset()
+            for depth in range(len(path)):
+                self._enter(path[:depth + 1])
+
+    def _enter(self, path: FramePath) -> None:
+        frame = self._frames.get(path)
+        if frame is None:
+            kind, _, css = path[-1].partition(":")
+            if kind != "iframe":
+                raise NoSuchFrameException(f"不支持的 frame 路径段: {path[-1]}")
+            frame = self._frames[path] = self.driver.find_element(By.CSS_SELECTOR, css)
+        try:
+            self.driver.switch_to.frame(frame)
+        except (NoSuchFrameException, StaleElementReferenceException):
+            self._frames.pop(path, None)
+            raise
+        self._stats.switches += 1
+        self.path = path
+
+    @contextmanager
+    def batch(self, path: Optional[FramePath] = None) -> Iterator["FrameContext"]:
+        """切换到 path（默认当前 frame）后执行一段操作，块内的 find 不再跨 frame 搜索。"""
+        if path is not None:
+            self.switch(path)
+        previous, self._pinned = self._pinned, self.path
+        try:
+            yield self
+        finally:
+            self._pinned = previous
+
+    def find(self, by: str, value: str, clickable: bool = False) -> Optional[WebElement]:
+        """在元素所在的 frame 中查找并切换过去；clickable=True 时只返回可见且可用的元素。找不到返回 None。"""
+        key = (by, value)
+        cached = self._elements.get(key)
+        if cached is not None and (self._pinned is None or cached[0] == self._pinned):
+            path, element = cached
+            try:
+                self.switch(path)
+                if not clickable or (element.is_displayed() and element.is_enabled()):
+                    self._stats.element_hits += 1
+                    return element
+            except (StaleElementReferenceException, NoSuchFrameException, NoSuchElementException):
+                self._stats.stale += 1
+                del self._elements[key]
+
+        candidates: List[FramePath] = [self._pinned] if self._pinned is not None else \
+            [self.path] + ([cached[0]] if cached is not None and cached[0] != self.path else [])
+        for path in candidates:
+            element = self._find_in(path, by, value, clickable)
+            if element is not None:
+                return element
+        if self._pinned is not None:
+            return None
+
+        # 慢路径：从顶层列出所有同源 iframe 逐个查找
+        self._stats.frame_searches += 1
+        self.switch(())
+        frames: List[FramePath] = [()] + [tuple(p) for p in self.driver.execute_script(_FRAME_PATHS_JS)]
+        for path in frames:
+            if path in candidates:
+                continue
+            try:
+                element = self._find_in(path, by, value, clickable)
+            except (NoSuchFrameException, NoSuchElementException, StaleElementReferenceException):
+                continue
+            if element is not None:
+                return element
+        return None
+
+    def _find_in(self, path: FramePath, by: str, value: str, clickable: bool) -> Optional[WebElement]:
+        self.switch(path)
+        for element in self.driver.find_elements(by, value):
+            try:
+                if clickable and not (element.is_displayed() and element.is_enabled()):
+                    continue
+            except StaleElementReferenceException:
+                continue
+            self._elements[(by, value)] = (self.path, element)
+            return element
+        return None
+
+    def wait_for(self, by: str, value: str, timeout: float, clickable: bool = True) -> WebElement:
+        """等待元素出现（默认要求可点击），跨 frame 查找；超时抛出 TimeoutException。"""
+        return WebDriverWait(self.driver, timeout, ignored_exceptions=(StaleElementReferenceException,)).until(
+            lambda _: self.find(by, value, clickable), f"{timeout:.0f}s 内未找到 {value}")
+
+    def execute_script(self, script: str, *args: Any, path: Optional[FramePath] = None) -> Any:
+        """在指定 frame（默认当前 frame）中执行脚本。"""
+        if path is not None:
+            self.switch(path)
+        return self.driver.execute_script(script, *args)
+
+
+_frame_contexts: "weakref.WeakKeyDictionary[WebDriver, FrameContext]" = weakref.WeakKeyDictionary()
+
+
+def frame_context(driver: WebDriver) -> FrameContext:
+    """取驱动对应的 FrameContext。所有 frame 切换都应经过它，否则它记录的当前路径会与驱动不一致。"""
+    context = _frame_contexts.get(driver)
+    if context is None:
+        context = _frame_contexts[driver] = FrameContext(driver)
+    return context
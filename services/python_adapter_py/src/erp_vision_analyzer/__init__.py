@@ -0,0 +1,15 @@
+# 子模块依赖 numpy / opencv（可选依赖组 vision），按需导入
+from erp_core.lazy import lazy_exports
+
+_EXPORTS = {
+    "Detection": "screenshot_analyzer",
+    "ScreenshotAnalyzer": "screenshot_analyzer",
+    "Match": "visual_matcher",
+    "Template": "visual_matcher",
+    "VisualMatcher": "visual_matcher",
+    "load_templates": "visual_matcher",
+    "ElementLocator": "element_locator",
+}
+
+__all__ = sorted(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
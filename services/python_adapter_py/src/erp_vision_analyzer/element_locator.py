@@ -0,0 +1,64 @@
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+from erp_core.logging import get_logger, traced
+from erp_vision_analyzer.screenshot_analyzer import grab_frame
+from erp_vision_analyzer.visual_matcher import DEFAULT_SCALES, Match, Template, VisualMatcher, load_templates
+
+logger = get_logger(__name__)
+
+# 截图像素坐标 -> CSS 坐标，并取该点最上层的元素
+_ELEMENT_AT_POINT_JS = """
+const ratio = window.devicePixelRatio || 1;
+return document.elementFromPoint(arguments[0] / ratio, arguments[1] / ratio);
+"""
+
+
+class ElementLocator:
+    """
+    基于图标模板定位界面元素，用于没有可用文本/属性的工具栏图标按钮。
+
+    所有模板在构造时交给 VisualMatcher 预处理；一次截图可以同时查找多个图标。
+    workers > 1 时匹配在进程池中并行。
+    """
+
+    def __init__(self, templates: Union[Sequence[Template], str, Path], scales: Sequence[float] = DEFAULT_SCALES,
+                 threshold: float = 0.85, workers: int = 1):
+        if isinstance(templates, (str, Path)):
+            templates = load_templates(templates)
+        self.threshold = threshold
+        self.matcher = VisualMatcher(templates, scales=scales, workers=workers)
+
+    @traced("vision.find", "vision")
+    def find(self, driver: WebDriver, names: Optional[Iterable[str]] = None, top_k: int = 5,
+             screenshot: Optional[np.ndarray] = None) -> List[Match]:
+        """在当前视口中查找模板，未给出截图时现场截取。"""
+        frame = screenshot if screenshot is not None else grab_frame(driver)
+        return self.matcher.match(frame, names=names, threshold=self.threshold, top_k=top_k)
+
+    def locate(self, driver: WebDriver, name: str, screenshot: Optional[np.ndarray] = None) -> Optional[Match]:
+        matches = self.find(driver, [name], top_k=1, screenshot=screenshot)
+        return matches[0] if matches else None
+
+    def element_at(self, driver: WebDriver, match: Match) -> Optional[WebElement]:
+        x, y = match.center
+        return driver.execute_script(_ELEMENT_AT_POINT_JS, x, y)
+
+    def click(self, driver: WebDriver, name: str) -> Tuple[int, int]:
+        """点击图标中心，返回点击的截图坐标；找不到时抛出 LookupError。"""
+        match = self.locate(driver, name)
+        if match is None:
+            raise LookupError(f"截图中没有找到图标 '{name}'")
+        element = self.element_at(driver, match)
+        if element is None:
+            raise LookupError(f"图标 '{name}' 所在位置没有可点击元素")
+        logger.debug("点击图标 %s (%.3f) @ %s", name, match.score, match.center)
+        element.click()
+        return match.center
+
+    def close(self) -> None:
+        self.matcher.close()
@@ -0,0 +1,242 @@
+import dataclasses
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, List, Optional, Tuple
+
+import numpy as np
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from erp_core.logging import get_logger, traced
+
+logger = get_logger(__name__)
+
+HASH_SIZE = 32          # 计算 pHash 前把窗口缩到 32x32
+HASH_BITS_SIDE = 8      # 取 DCT 左上 8x8 低频系数，得到 64 位哈希
+
+
+@dataclass
+class Detection:
+    """截图上的一个识别结果，坐标为整页截图坐标。"""
+    x: int
+    y: int
+    width: int
+    height: int
+    label: str
+    score: float = 1.0
+
+    def shifted(self, dx: int, dy: int) -> "Detection":
+        return dataclasses.replace(self, x=self.x + dx, y=self.y + dy)
+
+
+# 分块检测函数：输入一个灰度窗口，返回窗口坐标系下的检测结果
+TileDetector = Callable[[np.ndarray], List[Detection]]
+
+
+@traced("vision.grab_frame", "vision")
+def grab_frame(driver: WebDriver) -> np.ndarray:
+    """截取当前视口并解码为灰度 uint8 数组；之后整个流水线都只处理数组，不再编解码图片。"""
+    png = np.frombuffer(driver.get_screenshot_as_png(), dtype=np.uint8)
+    try:
+        import cv2
+        return cv2.imdecode(png, cv2.IMREAD_GRAYSCALE)
+    except ImportError:
+        import io
+        from PIL import Image
+        return np.asarray(Image.open(io.BytesIO(png.tobytes())).convert("L"))
+
+
+def to_gray(frame: np.ndarray) -> np.ndarray:
+    if frame.ndim == 2:
+        return frame
+    # ITU-R BT.601 亮度，忽略 alpha 通道
+    rgb = frame[..., :3].astype(np.float32)
+    return (rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)).astype(np.uint8)
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+
+_DCT = _dct_matrix(HASH_SIZE)
+_BIT_WEIGHTS = (np.uint64(1) << np.arange(HASH_BITS_SIDE * HASH_BITS_SIDE, dtype=np.uint64))
+
+
+def phash_windows(windows: np.ndarray) -> np.ndarray:
+    """
+    批量计算感知哈希。windows 形如 (N, S, S)，返回 N 个 uint64。
+
+    每个窗口先按块均值缩到 32x32，再做二维 DCT，取左上 8x8（去掉直流分量参与中位数）
+    与中位数比较得到 64 位；所有窗口在一次矩阵运算里完成。
+    """
+    count, height, width = windows.shape
+    rows = np.linspace(0, height, HASH_SIZE + 1).astype(np.intp)[:-1]
+    cols = np.linspace(0, width, HASH_SIZE + 1).astype(np.intp)[:-1]
+    pooled = np.add.reduceat(np.add.reduceat(windows.astype(np.float32), rows, axis=1), cols, axis=2)
+    counts = np.outer(np.diff(np.append(rows, height)), np.diff(np.append(cols, width))).astype(np.float32)
+    small = pooled / counts
+    coeffs = np.einsum("ij,njk,lk->nil", _DCT, small, _DCT, optimize=True)
+    low = coeffs[:, :HASH_BITS_SIDE, :HASH_BITS_SIDE].reshape(count, -1)
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    bits = (low > median).astype(np.uint64)
+    return (bits * _BIT_WEIGHTS).sum(axis=1, dtype=np.uint64)
+
+
+def hamming(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """逐元素计算两组 uint64 哈希的汉明距离。"""
+    x = np.bitwise_xor(a, b)
+    return np.unpackbits(x.view(np.uint8).reshape(*x.shape, 8), axis=-1).sum(axis=-1)
+
+
+class TileCache:
+    """按 (检测器, 窗口哈希) 缓存检测结果的 LRU，线程安全。"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, int], List[Detection]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[Hashable, int]) -> Optional[List[Detection]]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Tuple[Hashable, int], value: List[Detection]) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@dataclass
+class AnalyzerStats:
+    frames: int = 0
+    tiles: int = 0
+    unchanged: int = 0       # 与上一帧哈希相同，直接沿用上一帧结果
+    cache_hits: int = 0      # 哈希变了但命中 LRU（例如页面切回之前的状态）
+    analyzed: int = 0        # 实际调用检测器的块数
+
+    @property
+    def analyzed_ratio(self) -> float:
+        return self.analyzed / self.tiles if self.tiles else 0.0
+
+
+class ScreenshotAnalyzer:
+    """
+    分块增量分析截图。
+
+    截图按 tile_size 切成网格，每块向右下扩展 overlap 像素作为检测窗口，
+    保证尺寸不超过 overlap 的目标总能完整落在某个窗口内；检测结果只保留左上角落在块内的，
+    避免相邻窗口重复。每帧批量计算所有窗口的 pHash，与上一帧相同的块直接沿用结果，
+    其余块先查 LRU，仍未命中才调用检测器。
+
+    max_distance 为判定“未变化”的汉明距离上限，默认 0，即任何哈希位变化都重新分析。
+    """
+
+    def __init__(self, tile_size: int = 128, overlap: int = 64, cache: Optional[TileCache] = None,
+                 max_distance: int = 0):
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.cache = cache or TileCache()
+        self.max_distance = max_distance
+        self._previous: dict = {}     # 检测器 -> (上一帧哈希网格, 上一帧每块结果)
+        self._stats = AnalyzerStats()
+
+    @property
+    def stats(self) -> AnalyzerStats:
+        return dataclasses.replace(self._stats)
+
+    def windows(self, frame: np.ndarray) -> np.ndarray:
+        """返回形如 (rows, cols, S, S) 的窗口视图（不复制数据），S = tile_size + overlap。"""
+        gray = to_gray(frame)
+        ts, size = self.tile_size, self.tile_size + self.overlap
+        rows = -(-gray.shape[0] // ts)
+        cols = -(-gray.shape[1] // ts)
+        padded = np.pad(gray, ((0, rows * ts + self.overlap - gray.shape[0]),
+                               (0, cols * ts + self.overlap - gray.shape[1])), mode="edge")
+        s0, s1 = padded.strides
+        return np.lib.stride_tricks.as_strided(padded, shape=(rows, cols, size, size),
+                                               strides=(s0 * ts, s1 * ts, s0, s1), writeable=False)
+
+    def hashes(self, frame: np.ndarray) -> np.ndarray:
+        windows = self.windows(frame)
+        rows, cols, size, _ = windows.shape
+        return phash_windows(windows.reshape(rows * cols, size, size)).reshape(rows, cols)
+
+    def changed_regions(self, previous: np.ndarray, current: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        """比较两帧，返回变化块合并后的矩形列表 (x, y, width, height)，同一行相邻的变化块合并为一个矩形。"""
+        hp, hc = self.hashes(previous), self.hashes(current)
+        if hp.shape != hc.shape:
+            return [(0, 0, current.shape[1], current.shape[0])]
+        changed = hamming(hp, hc) > self.max_distance
+        ts = self.tile_size
+        regions = []
+        for r, row in enumerate(changed):
+            c = 0
+            while c < len(row):
+                if not row[c]:
+                    c += 1
+                    continue
+                start = c
+                while c < len(row) and row[c]:
+                    c += 1
+                regions.append((start * ts, r * ts, (c - start) * ts, ts))
+        return regions
+
+    @traced("vision.analyze", "vision")
+    def analyze(self, frame: np.ndarray, detector: TileDetector, key: Optional[Hashable] = None) -> List[Detection]:
+        """
+        对整帧运行检测器并返回整页坐标的结果。key 标识检测器（默认取其 cache_key 属性或限定名），
+        检测器配置变化时应换 key，否则会读到旧结果。
+        """
+        key = key if key is not None else getattr(detector, "cache_key", getattr(detector, "__qualname__", id(detector)))
+        windows = self.windows(frame)
+        rows, cols, size, _ = windows.shape
+        hashes = phash_windows(windows.reshape(rows * cols, size, size)).reshape(rows, cols)
+
+        previous = self._previous.get(key)
+        if previous is not None and previous[0].shape == hashes.shape:
+            unchanged = hamming(previous[0], hashes) <= self.max_distance
+        else:
+            unchanged = np.zeros(hashes.shape, dtype=bool)
+
+        ts = self.tile_size
+        tile_results: List[List[List[Detection]]] = []
+        results: List[Detection] = []
+        self._stats.frames += 1
+        self._stats.tiles += rows * cols
+        for r in range(rows):
+            row_results = []
+            for c in range(cols):
+                if unchanged[r, c]:
+                    local = previous[1][r][c]
+                    self._stats.unchanged += 1
+                else:
+                    cache_key = (key, int(hashes[r, c]))
+                    local = self.cache.get(cache_key)
+                    if local is None:
+                        local = [d for d in detector(windows[r, c]) if d.x < ts and d.y < ts]
+                        self.cache.put(cache_key, local)
+                        self._stats.analyzed += 1
+                    else:
+                        self._stats.cache_hits += 1
+                row_results.append(local)
+                results.extend(d.shifted(c * ts, r * ts) for d in local)
+            tile_results.append(row_results)
+        self._previous[key] = (hashes, tile_results)
+        height, width = frame.shape[:2]
+        return [d for d in results if d.x < width and d.y < height]
+
+    def reset(self) -> None:
+        """页面跳转后调用，丢弃上一帧状态（LRU 缓存保留）。"""
+        self._previous.clear()
@@ -0,0 +1,292 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from erp_core.logging import get_logger, traced
+from erp_vision_analyzer.screenshot_analyzer import to_gray
+
+logger = get_logger(__name__)
+
+try:
+    # scipy.fft 支持 float32 和多线程，没有安装时退回 numpy.fft
+    from scipy import fft as _fft
+except ImportError:
+    _fft = np.fft
+
+DEFAULT_SCALES = (1.0, 1.25, 1.5, 2.0)   # 常见的 Windows 显示缩放比例
+
+
+@dataclass(frozen=True)
+class Template:
+    """一个图标/按钮模板；同一 name 可以有多个 variant（如浅色/深色主题）。"""
+    name: str
+    image: np.ndarray
+    variant: str = "default"
+
+
+@dataclass(frozen=True)
+class Match:
+    name: str
+    variant: str
+    x: int
+    y: int
+    width: int
+    height: int
+    score: float
+    scale: float
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        return self.x + self.width // 2, self.y + self.height // 2
+
+
+def load_templates(directory: Union[str, Path]) -> List[Template]:
+    """从目录加载模板：<name>.png 或 <name>@<variant>.png。"""
+    import cv2
+    templates = []
+    for path in sorted(Path(directory).glob("*.png")):
+        name, _, variant = path.stem.partition("@")
+        image = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            logger.warning("无法读取模板图片 %s", path)
+            continue
+        templates.append(Template(name, image, variant or "default"))
+    return templates
+
+
+def resize(image: np.ndarray, scale: float) -> np.ndarray:
+    """双线性缩放（纯 NumPy，避免对 OpenCV 的硬依赖）。"""
+    if scale == 1.0:
+        return image.astype(np.float32)
+    height, width = image.shape
+    new_h, new_w = max(1, round(height * scale)), max(1, round(width * scale))
+    ys = np.clip((np.arange(new_h) + 0.5) / scale - 0.5, 0, height - 1)
+    xs = np.clip((np.arange(new_w) + 0.5) / scale - 0.5, 0, width - 1)
+    y0, x0 = np.floor(ys).astype(np.intp), np.floor(xs).astype(np.intp)
+    y1, x1 = np.minimum(y0 + 1, height - 1), np.minimum(x0 + 1, width - 1)
+    wy, wx = (ys - y0)[:, None], (xs - x0)[None, :]
+    img = image.astype(np.float32)
+    top = img[y0][:, x0] * (1 - wx) + img[y0][:, x1] * wx
+    bottom = img[y1][:, x0] * (1 - wx) + img[y1][:, x1] * wx
+    return top * (1 - wy) + bottom * wy
+
+
+def next_fast_length(n: int) -> int:
+    """不小于 n 的 2^a·3^b·5^c，FFT 在这些长度上最快。"""
+    best = 1 << (n - 1).bit_length()
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            p = p35
+            while p < n:
+                p *= 2
+            best = min(best, p)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+class _Pyramid:
+    """
+    所有模板在所有尺度上的零均值版本，以及它们在固定块尺寸下的频谱（构造时计算一次）。
+    模板按左上角对齐补零到 block x block，频谱取共轭，直接与截图块频谱相乘即得互相关。
+    """
+
+    def __init__(self, templates: Sequence[Template], scales: Sequence[float], block_size: Optional[int] = None):
+        self.entries: List[Tuple[str, str, float, Tuple[int, int], float]] = []  # name, variant, scale, (th, tw), 范数
+        arrays: List[np.ndarray] = []
+        for template in templates:
+            gray = to_gray(template.image)
+            for scale in scales:
+                scaled = resize(gray, scale)
+                zero_mean = scaled - scaled.mean()
+                norm = float(np.sqrt((zero_mean ** 2).sum()))
+                if norm < 1e-6:
+                    logger.warning("模板 %s@%s 在缩放 %.2f 下没有纹理，已忽略", template.name, template.variant, scale)
+                    continue
+                self.entries.append((template.name, template.variant, scale, zero_mean.shape, norm))
+                arrays.append(zero_mean)
+        largest = max((max(a.shape) for a in arrays), default=1)
+        # 块越大，每块有效输出占比 (block - largest + 1) / block 越高，但模板频谱占用内存越多
+        self.block = block_size or next_fast_length(max(4 * largest, 128))
+        if largest >= self.block:
+            raise ValueError(f"模板尺寸 {largest} 超过块尺寸 {self.block}")
+        self.largest = largest
+        padded = np.zeros((len(arrays), self.block, self.block), dtype=np.float32)
+        for row, array in enumerate(arrays):
+            padded[row, :array.shape[0], :array.shape[1]] = array
+        self.spectra = np.conj(_fft.rfft2(padded)).astype(np.complex64)
+
+
+class _ImageContext:
+    """
+    单张截图按重叠块切分后的频谱（overlap-save）以及积分图，供所有模板分组复用。
+
+    块步长 stride = block - largest + 1，保证任一模板在块内的合法位置都不会发生循环卷绕；
+    每块只取左上 stride x stride 的相关值，拼起来就是整图的相关图。
+    """
+
+    def __init__(self, image: np.ndarray, pyramid: _Pyramid):
+        self.image = image
+        self.block = pyramid.block
+        self.stride = pyramid.block - pyramid.largest + 1
+        height, width = image.shape
+        self.rows = -(-height // self.stride)
+        self.cols = -(-width // self.stride)
+        padded = np.zeros(((self.rows - 1) * self.stride + self.block, (self.cols - 1) * self.stride + self.block),
+                          dtype=np.float32)
+        padded[:height, :width] = image
+        s0, s1 = padded.strides
+        blocks = np.lib.stride_tricks.as_strided(
+            padded, shape=(self.rows, self.cols, self.block, self.block),
+            strides=(s0 * self.stride, s1 * self.stride, s0, s1))
+        self.spectra = _fft.rfft2(blocks.reshape(-1, self.block, self.block)).astype(np.complex64)
+
+        integral_input = np.pad(image.astype(np.float64), ((1, 0), (1, 0)))
+        self.integral = integral_input.cumsum(0).cumsum(1)
+        self.integral_sq = (integral_input ** 2).cumsum(0).cumsum(1)
+
+    def correlate(self, template_spectra: np.ndarray) -> np.ndarray:
+        """一次批量逆 FFT 得到一组模板的整图相关图，形如 (n, rows * stride, cols * stride)。"""
+        n = template_spectra.shape[0]
+        products = self.spectra[:, None] * template_spectra[None]
+        blocks = _fft.irfft2(products, s=(self.block, self.block))[..., :self.stride, :self.stride]
+        blocks = blocks.reshape(self.rows, self.cols, n, self.stride, self.stride)
+        return blocks.transpose(2, 0, 3, 1, 4).reshape(n, self.rows * self.stride, self.cols * self.stride)
+
+    def window_std(self, th: int, tw: int) -> np.ndarray:
+        """每个合法位置上 th x tw 窗口的 sqrt(Σ(I - mean)²)。"""
+        def window_sum(s: np.ndarray) -> np.ndarray:
+            return s[th:, tw:] - s[:-th, tw:] - s[th:, :-tw] + s[:-th, :-tw]
+        n = th * tw
+        total, total_sq = window_sum(self.integral), window_sum(self.integral_sq)
+        return np.sqrt(np.maximum(total_sq - total * total / n, 0.0))
+
+
+# 单次批量逆 FFT 的元素上限（块数 x 模板数 x block²），约束峰值内存
+_BATCH_ELEMENTS = 16 * 1024 * 1024
+
+
+class VisualMatcher:
+    """
+    批量多尺度模板匹配（归一化互相关）。
+
+    模板在构造时按所有尺度缩放、去均值并计算好固定块尺寸下的频谱；每张截图只切块做一次 FFT，
+    随后每组模板用一次广播乘法 + 批量逆 FFT 得到全部相关图，再用积分图求窗口方差完成归一化。
+    结果经阈值、每模板 top-k 和跨模板 NMS 后返回。
+
+    workers > 1 时模板被平均分给进程池中的工作进程，每个进程只在启动时接收一次模板。
+    """
+
+    def __init__(self, templates: Sequence[Template], scales: Sequence[float] = DEFAULT_SCALES,
+                 block_size: Optional[int] = None, workers: int = 1):
+        self.scales = tuple(scales)
+        self.workers = workers
+        self._templates = list(templates)
+        self._pyramid = _Pyramid(self._templates, self.scales, block_size)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __len__(self) -> int:
+        return len(self._pyramid.entries)
+
+    @traced("vision.match", "vision")
+    def match(self, screenshot: np.ndarray, names: Optional[Iterable[str]] = None, threshold: float = 0.85,
+              top_k: int = 5, iou_threshold: float = 0.3) -> List[Match]:
+        """在截图中查找模板；names 为空表示全部模板。返回按得分降序、已做 NMS 的结果。"""
+        wanted = set(names) if names is not None else None
+        image = to_gray(screenshot).astype(np.float32)
+        indices = [i for i, (name, _, _, (th, tw), _) in enumerate(self._pyramid.entries)
+                   if (wanted is None or name in wanted) and th <= image.shape[0] and tw <= image.shape[1]]
+        if not indices:
+            return []
+
+        if self.workers > 1 and len(indices) > 1:
+            groups = [indices[i::self.workers] for i in range(self.workers)]
+            parts = self._get_pool().map(_match_in_worker, [(image, g, threshold, top_k) for g in groups if g])
+            candidates = [m for part in parts for m in part]
+        else:
+            candidates = _match_indices(self._pyramid, image, indices, threshold, top_k)
+        return non_max_suppression(candidates, iou_threshold)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=min(self.workers, os.cpu_count() or 1),
+                                             initializer=_init_worker,
+                                             initargs=(self._templates, self.scales, self._pyramid.block))
+        return self._pool
+
+
+def _match_indices(pyramid: _Pyramid, image: np.ndarray, indices: Sequence[int], threshold: float,
+                   top_k: int) -> List[Match]:
+    context = _ImageContext(image, pyramid)
+    per_batch = max(1, _BATCH_ELEMENTS // (context.spectra.shape[0] * pyramid.block * pyramid.block))
+    height, width = image.shape
+    std_cache: Dict[Tuple[int, int], np.ndarray] = {}
+    matches: List[Match] = []
+    for start in range(0, len(indices), per_batch):
+        batch = list(indices[start:start + per_batch])
+        correlations = context.correlate(pyramid.spectra[batch])
+        for row, index in enumerate(batch):
+            name, variant, scale, (th, tw), norm = pyramid.entries[index]
+            std = std_cache.get((th, tw))
+            if std is None:
+                std = std_cache[(th, tw)] = context.window_std(th, tw)
+            valid = correlations[row, :height - th + 1, :width - tw + 1]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores = np.where(std > 1e-3, valid / (std * norm), 0.0)
+            flat = scores.ravel()
+            # 先取最多 top_k * 8 个高分点，避免峰值附近的大量相邻点进入 NMS
+            limit = min(flat.size, top_k * 8)
+            best = np.argpartition(flat, flat.size - limit)[flat.size - limit:]
+            best = best[flat[best] >= threshold]
+            found = [Match(name, variant, int(p % scores.shape[1]), int(p // scores.shape[1]), tw, th,
+                           float(flat[p]), scale) for p in best]
+            matches.extend(non_max_suppression(found, 0.3)[:top_k])
+    return matches
+
+
+def non_max_suppression(matches: Sequence[Match], iou_threshold: float = 0.3) -> List[Match]:
+    """按得分降序贪心保留，与已保留框 IoU 超过阈值的丢弃（不区分模板，同一位置只留最像的）。"""
+    if not matches:
+        return []
+    ordered = sorted(matches, key=lambda m: -m.score)
+    boxes = np.array([(m.x, m.y, m.x + m.width, m.y + m.height) for m in ordered], dtype=np.float32)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    suppressed = np.zeros(len(ordered), dtype=bool)
+    kept: List[Match] = []
+    for i, m in enumerate(ordered):
+        if suppressed[i]:
+            continue
+        kept.append(m)
+        x0 = np.maximum(boxes[i, 0], boxes[:, 0])
+        y0 = np.maximum(boxes[i, 1], boxes[:, 1])
+        x1 = np.minimum(boxes[i, 2], boxes[:, 2])
+        y1 = np.minimum(boxes[i, 3], boxes[:, 3])
+        inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+        suppressed |= inter / (areas[i] + areas - inter) > iou_threshold
+    return kept
+
+
+# ---------------- 进程池工作函数 ----------------
+
+_worker_pyramid: Optional[_Pyramid] = None
+
+
+def _init_worker(templates: Sequence[Template], scales: Sequence[float], block_size: int) -> None:
+    global _worker_pyramid
+    _worker_pyramid = _Pyramid(templates, scales, block_size)
+
+
+def _match_in_worker(args) -> List[Match]:
+    image, indices, threshold, top_k = args
+    return _match_indices(_worker_pyramid, image, indices, threshold, top_k)
@@ -0,0 +1,223 @@
+"""erp_content_provider.firecrawl_provider 的测试：在本地 http.server 上验证条件请求、内容寻址存储和限速。"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from erp_content_provider.firecrawl_provider import (  # noqa: E402
+    ContentStore,
+    Crawler,
+    FirecrawlContentProvider,
+    HostRateLimiter,
+)
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+SHARED = b"<html><body><p>shared body</p></body></html>"
+PAGES = {
+    "/index.html": b'<html><body><a href="/a.html">a</a> <a href="/dup1.html">1</a> '
+                   b'<a href="/dup2.html">2</a></body></html>',
+    "/a.html": b"<html><body><h1>A</h1><p>page a</p></body></html>",
+    "/dup1.html": SHARED,
+    "/dup2.html": SHARED,
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):  # noqa: A002 - 覆盖基类方法
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.conditional_requests += bool(self.headers.get("If-None-Match"))
+        try:
+            time.sleep(server.delay)
+            path = urlsplit(self.path).path
+            body = f"<p>{path}</p>".encode() if path.startswith("/page/") else PAGES.get(path)
+            if body is None:
+                self.send_error(404)
+                return
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+            if server.conditional and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def site():
+    """本地站点：支持 ETag / Last-Modified，conditional=False 时忽略条件请求头总是返回 200。"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.in_flight = server.max_in_flight = server.conditional_requests = 0
+    server.delay = 0.0
+    server.conditional = True
+    server.url = "http://127.0.0.1:%d" % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ContentStore(tmp_path / "crawl")
+    yield store
+    store.close()
+
+
+class CountingParser:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, url, data):
+        self.calls.append(url)
+        return data.decode("utf-8")
+
+
+def crawl(store, seeds, parser=None, **kwargs):
+    items = []
+
+    async def on_item(item):
+        items.append(item)
+
+    kwargs.setdefault("limiter", HostRateLimiter(rate=1000, burst=100, per_host_concurrency=8))
+    crawler = Crawler(store, parser or CountingParser(), max_concurrency=8, **kwargs)
+    stats = asyncio.run(crawler.crawl(seeds, on_item))
+    return stats, {item.source: item for item in items}
+
+
+def blob_count(store):
+    return sum(1 for p in (store.root / "blobs").rglob("*") if p.is_file() and p.suffix != ".md")
+
+
+def test_first_crawl_fetches_and_follows_links(site, store):
+    parser = CountingParser()
+    stats, items = crawl(store, [site.url + "/index.html"], parser)
+
+    assert set(items) == {site.url + p for p in PAGES}
+    assert stats.fetched == 4 and stats.not_modified == 0 and stats.unchanged == 0
+    assert all(item.metadata["status"] == "fetched" for item in items.values())
+    # dup1 / dup2 内容相同，只解析一次
+    assert stats.parsed == 3 and len(parser.calls) == 3
+    assert site.conditional_requests == 0
+
+
+def test_recrawl_gets_304_without_reparse(site, store):
+    crawl(store, [site.url + "/index.html"])
+    parser = CountingParser()
+    stats, items = crawl(store, [site.url + "/index.html"], parser)
+
+    assert stats.not_modified == 4 and stats.fetched == 0
+    assert stats.parsed == 0 and parser.calls == []
+    assert stats.bytes_downloaded == 0
+    assert site.conditional_requests == 4
+    # 304 时仍从存储中取回链接和解析结果
+    assert set(items) == {site.url + p for p in PAGES}
+    assert items[site.url + "/a.html"].data == PAGES["/a.html"].decode()
+
+
+def test_200_with_same_hash_counts_as_unchanged(site, store):
+    crawl(store, [site.url + "/index.html"])
+    site.conditional = False
+    parser = CountingParser()
+    stats, items = crawl(store, [site.url + "/index.html"], parser)
+
+    assert stats.unchanged == 4 and stats.fetched == 0 and stats.not_modified == 0
+    assert stats.parsed == 0 and parser.calls == []
+    assert stats.bytes_downloaded > 0
+    assert all(item.metadata["status"] == "unchanged" for item in items.values())
+
+
+def test_parser_failure_is_refetched_next_crawl(site, store):
+    class FailingParser(CountingParser):
+        async def __call__(self, url, data):
+            raise ValueError("parse failed")
+
+    url = site.url + "/a.html"
+    stats, items = crawl(store, [url], FailingParser(), follow_links=False)
+    assert items == {} and stats.failed == 1
+    assert store.validators(url) is None
+
+    parser = CountingParser()
+    stats, items = crawl(store, [url], parser, follow_links=False)
+    assert stats.fetched == 1 and stats.not_modified == 0
+    assert parser.calls == [url]
+    assert items[url].data == PAGES["/a.html"].decode()
+
+
+def test_identical_bodies_share_one_blob(site, store):
+    stats, items = crawl(store, [site.url + "/dup1.html", site.url + "/dup2.html"], follow_links=False)
+
+    first = store.validators(site.url + "/dup1.html")
+    second = store.validators(site.url + "/dup2.html")
+    assert first[2] == second[2] == hashlib.sha256(SHARED).hexdigest()
+    assert blob_count(store) == 1
+    assert stats.fetched == 2 and stats.parsed == 1
+
+
+def test_per_host_concurrency_and_rate_cap(site, store):
+    site.delay = 0.05
+    pages = [f"{site.url}/page/{i}" for i in range(12)]
+    limiter = HostRateLimiter(rate=20, burst=2, per_host_concurrency=2)
+
+    started = time.monotonic()
+    stats, items = crawl(store, pages, follow_links=False, limiter=limiter)
+    elapsed = time.monotonic() - started
+
+    assert len(items) == 12 and stats.failed == 0
+    assert site.max_in_flight <= 2
+    # 桶里初始 2 个令牌，其余 10 个请求按 20 次/秒发放
+    assert elapsed >= (12 - 2) / 20 - 0.05
+
+
+def _crawler_threads():
+    return [t for t in threading.enumerate()
+            if t.name == "firecrawl-crawler" or t.name.startswith("asyncio_")]
+
+
+@pytest.mark.parametrize("stop", ["break", "collect"])
+def test_early_stop_releases_crawler_threads(site, store, stop):
+    site.delay = 0.01
+    provider = FirecrawlContentProvider([f"{site.url}/page/{i}" for i in range(30)], store=store,
+                                        rate_per_host=1000, follow_links=False, queue_size=1)
+    if stop == "break":
+        items = provider.iter_content()
+        first = next(items)
+        items.close()
+        assert first.source.startswith(site.url)
+    else:
+        assert len(provider.collect(limit=2)) == 2
+
+    assert _crawler_threads() == []
+
+
+def test_full_iteration_yields_every_page(site, store):
+    provider = FirecrawlContentProvider([site.url + "/index.html"], store=store, rate_per_host=1000, queue_size=1)
+    sources = {item.source for item in provider.iter_content()}
+
+    assert sources == {site.url + p for p in PAGES}
+    assert provider.stats.fetched == 4
+    assert _crawler_threads() == []